@@ -0,0 +1,176 @@
+#!/usr/bin/env -S rye run python
+"""Compare fan-out throughput of the HTTP/1.1 connection pool against HTTP/2 multiplexing.
+
+This starts a local stub server that speaks both HTTP/1.1 and HTTP/2 (with prior knowledge),
+answers `GET /v1/products/{product_id}` after a fixed delay and charges a one-off delay for
+every new connection to stand in for the TCP + TLS handshake. The same batch of concurrent
+`products.retrieve` calls is then issued with each transport.
+
+Requires the `http2` extra:
+
+    $ pip install channel3_sdk[http2]
+    $ ./examples/http2_benchmark.py --requests 2000 --concurrency 500
+"""
+
+from __future__ import annotations
+
+import json
+import time
+import asyncio
+import argparse
+import threading
+from typing import Any, Optional
+
+import h2.config
+import h2.events
+import h2.settings
+import h2.connection
+
+from channel3_sdk import AsyncChannel3, DefaultAsyncHttpxClient
+
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+
+class StubServer:
+    def __init__(self, *, latency: float, handshake: float) -> None:
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+        self.port = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=4096))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def _body(self, path: str) -> bytes:
+        product_id = path.rsplit("/", 1)[-1].split("?", 1)[0]
+        return json.dumps({"id": product_id, "title": "Benchmark product"}).encode()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        try:
+            preface = await reader.readexactly(len(H2_PREFACE))
+            if preface == H2_PREFACE:
+                await self._serve_h2(preface, reader, writer)
+            else:
+                await self._serve_h11(preface, reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_h11(self, buffered: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        buffer = buffered
+        while True:
+            while b"\r\n\r\n" not in buffer:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+
+            head, buffer = buffer.split(b"\r\n\r\n", 1)
+            path = head.split(b"\r\n", 1)[0].split(b" ")[1].decode()
+
+            await asyncio.sleep(self.latency)
+            body = self._body(path)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                + f"content-length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+
+    async def _serve_h2(self, preface: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        conn.local_settings = h2.settings.Settings(
+            client=False,
+            initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1000},
+        )
+        conn.initiate_connection()
+
+        async def respond(stream_id: int, path: str) -> None:
+            await asyncio.sleep(self.latency)
+            body = self._body(path)
+            conn.send_headers(
+                stream_id,
+                [(":status", "200"), ("content-type", "application/json"), ("content-length", str(len(body)))],
+            )
+            conn.send_data(stream_id, body, end_stream=True)
+            writer.write(conn.data_to_send())
+
+        data = preface
+        while data:
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    headers: dict[Any, Any] = dict(event.headers or [])
+                    asyncio.ensure_future(respond(event.stream_id, headers[":path"]))
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            writer.write(conn.data_to_send())
+            await writer.drain()
+            data = await reader.read(65536)
+
+
+async def fan_out(client: AsyncChannel3, *, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def retrieve(product_id: str) -> None:
+        async with semaphore:
+            await client.products.retrieve(product_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(retrieve(f"prod_{i}") for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="server time per request, in seconds")
+    parser.add_argument("--handshake", type=float, default=0.05, help="setup cost per new connection, in seconds")
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency, handshake=args.handshake)
+    server.start()
+    base_url = f"http://127.0.0.1:{server.port}"
+
+    # the stub is plaintext so there is no ALPN negotiation, against the real API `http2=True`
+    # is all that is needed while here we have to opt into HTTP/2 with prior knowledge
+    transports = {
+        "HTTP/1.1": AsyncChannel3(base_url=base_url, api_key="benchmark", max_retries=0),
+        "HTTP/2": AsyncChannel3(
+            base_url=base_url,
+            api_key="benchmark",
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(http1=False, http2=True),
+        ),
+    }
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.latency * 1000:.0f}ms server latency")
+    for name, client in transports.items():
+        async with client:
+            # warm up the interpreter and the pool so both transports start in the same state
+            await fan_out(client, requests=10, concurrency=10)
+
+            connections_before = server.connections
+            elapsed = await fan_out(client, requests=args.requests, concurrency=args.concurrency)
+            opened = server.connections - connections_before
+
+        print(f"{name:>8}: {args.requests / elapsed:8.0f} req/s  {elapsed:6.2f}s  {opened:4d} new connections")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
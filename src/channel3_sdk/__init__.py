@@ -3,6 +3,9 @@
 import typing as _t
 
 from . import types
+from ._pool import PoolStats, WarmupResult, WarmupConnection
+from ._batch import BatchStats, ReconcileReport
+from ._cache import CacheEntry, CacheStats, MemoryCache, SQLiteCache, ResponseCache
 from ._types import NOT_GIVEN, Omit, NoneType, NotGiven, Transport, ProxiesTypes, omit, not_given
 from ._utils import file_from_path
 from ._client import (
@@ -17,6 +20,7 @@ from ._client import (
     RequestOptions,
 )
 from ._models import BaseModel
+from ._hedging import HedgingStats, HedgingPolicy
 from ._version import __title__, __version__
 from ._response import APIResponse as APIResponse, AsyncAPIResponse as AsyncAPIResponse
 from ._constants import DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_CONNECTION_LIMITS
@@ -29,6 +33,7 @@ from ._exceptions import (
     RateLimitError,
     APITimeoutError,
     BadRequestError,
+    CircuitOpenError,
     APIConnectionError,
     AuthenticationError,
     InternalServerError,
@@ -36,8 +41,13 @@ from ._exceptions import (
     UnprocessableEntityError,
     APIResponseValidationError,
 )
+from ._rate_limit import RateLimiter, RateLimiterStats
 from ._base_client import DefaultHttpxClient, DefaultAioHttpClient, DefaultAsyncHttpxClient
 from ._utils._logs import setup_logging as _setup_logging
+from ._retry_budget import RetryBudget, RetryBudgetStats
+from ._price_history import PriceHistoryArrays, PriceHistoryColumns
+from ._single_flight import SingleFlight, SingleFlightStats
+from ._circuit_breaker import CircuitState, CircuitBreaker
 
 __all__ = [
     "types",
@@ -81,6 +91,29 @@ __all__ = [
     "DefaultHttpxClient",
     "DefaultAsyncHttpxClient",
     "DefaultAioHttpClient",
+    "WarmupResult",
+    "WarmupConnection",
+    "PoolStats",
+    "HedgingPolicy",
+    "HedgingStats",
+    "RateLimiter",
+    "RateLimiterStats",
+    "RetryBudget",
+    "RetryBudgetStats",
+    "CircuitBreaker",
+    "CircuitState",
+    "CircuitOpenError",
+    "SingleFlight",
+    "SingleFlightStats",
+    "ResponseCache",
+    "MemoryCache",
+    "SQLiteCache",
+    "CacheEntry",
+    "CacheStats",
+    "BatchStats",
+    "ReconcileReport",
+    "PriceHistoryArrays",
+    "PriceHistoryColumns",
 ]
 
 if not _t.TYPE_CHECKING:
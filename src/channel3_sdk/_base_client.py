@@ -5,11 +5,14 @@ import json
 import time
 import uuid
 import email
+import socket
 import asyncio
 import inspect
 import logging
 import platform
 import warnings
+import functools
+import threading
 import email.utils
 from types import TracebackType
 from random import random
@@ -22,6 +25,8 @@ from typing import (
     Generic,
     Mapping,
     TypeVar,
+    Callable,
+    Hashable,
     Iterable,
     Iterator,
     Optional,
@@ -31,6 +36,7 @@ from typing import (
     overload,
 )
 from typing_extensions import Literal, override, get_origin
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 import anyio
 import httpx
@@ -41,6 +47,17 @@ from pydantic import PrivateAttr
 
 from . import _exceptions
 from ._qs import Querystring
+from ._pool import (
+    PoolStats,
+    PoolMonitor,
+    WarmupResult,
+    ConnectionTrace,
+    WarmupConnection,
+    get_pool_limits,
+    get_pool_monitor,
+)
+from ._batch import get_executor, shutdown_executor
+from ._cache import CacheEntry, ResponseCache
 from ._files import to_httpx_files, async_to_httpx_files
 from ._types import (
     Body,
@@ -61,9 +78,10 @@ from ._types import (
     ModelBuilderProtocol,
     not_given,
 )
-from ._utils import is_dict, is_list, asyncify, is_given, lru_cache, is_mapping
+from ._utils import is_dict, is_list, asyncify, is_given, lru_cache, is_mapping, get_async_library
 from ._compat import PYDANTIC_V1, model_copy, model_dump
 from ._models import GenericModel, FinalRequestOptions, validate_type, construct_type
+from ._hedging import HedgingPolicy, close_response, get_hedge_executor, shutdown_hedge_executor
 from ._response import (
     APIResponse,
     BaseAPIResponse,
@@ -78,15 +96,23 @@ from ._constants import (
     RAW_RESPONSE_HEADER,
     OVERRIDE_CAST_TO_HEADER,
     DEFAULT_CONNECTION_LIMITS,
+    DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
 )
+from ._endpoints import endpoint_key
 from ._streaming import Stream, SSEDecoder, AsyncStream, SSEBytesDecoder
 from ._exceptions import (
     APIStatusError,
     APITimeoutError,
+    CircuitOpenError,
     APIConnectionError,
     APIResponseValidationError,
 )
+from ._rate_limit import RateLimiter
+from ._compression import ACCEPT_ENCODING, RequestCompression, compress_body, resolve_request_compression
 from ._utils._json import openapi_dumps
+from ._retry_budget import RetryBudget
+from ._single_flight import SingleFlight
+from ._circuit_breaker import CircuitBreaker
 
 log: logging.Logger = logging.getLogger(__name__)
 
@@ -366,9 +392,21 @@ class BaseClient(Generic[_HttpxClientT, _DefaultStreamT]):
     _base_url: URL
     max_retries: int
     timeout: Union[float, Timeout, None]
+    deadline: float | None
     _strict_response_validation: bool
     _idempotency_header: str | None
     _default_stream_cls: type[_DefaultStreamT] | None = None
+    _pool_monitor: PoolMonitor
+    http2: bool
+    adaptive_pool: bool
+    hedging: HedgingPolicy | None
+    rate_limiter: RateLimiter | None
+    retry_budget: RetryBudget | None
+    circuit_breaker: CircuitBreaker | None
+    single_flight: SingleFlight | None
+    response_cache: ResponseCache | None
+    request_compression: RequestCompression | None
+    request_compression_threshold: int
 
     def __init__(
         self,
@@ -377,14 +415,39 @@ class BaseClient(Generic[_HttpxClientT, _DefaultStreamT]):
         base_url: str | URL,
         _strict_response_validation: bool,
         max_retries: int = DEFAULT_MAX_RETRIES,
+        deadline: float | None = None,
         timeout: float | Timeout | None = DEFAULT_TIMEOUT,
+        http2: bool = False,
+        adaptive_pool: bool = False,
+        hedging: HedgingPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        single_flight: SingleFlight | None = None,
+        response_cache: ResponseCache | None = None,
+        request_compression: RequestCompression | None = None,
+        request_compression_threshold: int = DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
         custom_headers: Mapping[str, str] | None = None,
         custom_query: Mapping[str, object] | None = None,
     ) -> None:
         self._version = version
         self._base_url = self._enforce_trailing_slash(URL(base_url))
         self.max_retries = max_retries
+        self.deadline = deadline
         self.timeout = timeout
+        self.http2 = http2
+        self.adaptive_pool = adaptive_pool
+        self.hedging = hedging
+        self.rate_limiter = rate_limiter
+        self.retry_budget = retry_budget
+        self.circuit_breaker = circuit_breaker
+        self.single_flight = single_flight
+        self.response_cache = response_cache
+        # the cache keys of stale responses that are being refreshed in the background
+        self._refreshing: set[str] = set()
+        self._refreshing_lock = threading.Lock()
+        self.request_compression = resolve_request_compression(request_compression)
+        self.request_compression_threshold = request_compression_threshold
         self._custom_headers = custom_headers or {}
         self._custom_query = custom_query or {}
         self._strict_response_validation = _strict_response_validation
@@ -564,6 +627,16 @@ class BaseClient(Generic[_HttpxClientT, _DefaultStreamT]):
                 # since httpx's content param overrides other body arguments
                 kwargs["content"] = openapi_dumps(json_data) if is_given(json_data) and json_data is not None else None
             kwargs["files"] = files
+
+            content = kwargs.get("content")
+            if (
+                self.request_compression is not None
+                and isinstance(content, bytes)
+                and len(content) >= self.request_compression_threshold
+                and "Content-Encoding" not in headers
+            ):
+                kwargs["content"] = compress_body(content, self.request_compression)
+                headers["Content-Encoding"] = self.request_compression
         else:
             headers.pop("Content-Type", None)
             kwargs.pop("data", None)
@@ -672,6 +745,7 @@ class BaseClient(Generic[_HttpxClientT, _DefaultStreamT]):
     def default_headers(self) -> dict[str, str | Omit]:
         return {
             "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Content-Type": "application/json",
             "User-Agent": self.user_agent,
             **self.platform_headers(),
@@ -807,15 +881,266 @@ class BaseClient(Generic[_HttpxClientT, _DefaultStreamT]):
         log.debug("Not retrying")
         return False
 
+    def _retry_delay(
+        self, remaining_retries: int, options: FinalRequestOptions, *, response: httpx.Response | None
+    ) -> float | None:
+        """Returns how long to wait before retrying the request, or `None` if it shouldn't be retried."""
+        if remaining_retries <= 0 or (response is not None and not self._should_retry(response)):
+            return None
+
+        timeout = self._calculate_retry_timeout(remaining_retries, options, response.headers if response else None)
+        remaining_time = options.get_remaining_time()
+        if remaining_time is not None and timeout >= remaining_time:
+            log.debug("Not retrying as the deadline would pass before the next attempt")
+            return None
+
+        if self.retry_budget is not None and not self.retry_budget.acquire():
+            log.debug("Not retrying as the retry budget is exhausted")
+            return None
+
+        return timeout
+
+    def _start_deadline(self, options: FinalRequestOptions) -> None:
+        if options.deadline_at is not None:
+            # a later page of a paginated request, which shares the deadline of the first page
+            return
+
+        deadline = self.deadline if isinstance(options.deadline, NotGiven) else options.deadline
+        if deadline is not None:
+            options.deadline_at = time.monotonic() + deadline
+
+    def _apply_deadline(self, options: FinalRequestOptions) -> None:
+        """Shrinks the timeout of an attempt so that it doesn't run past the request's deadline."""
+        remaining_time = options.get_remaining_time()
+        if remaining_time is None:
+            return
+
+        remaining_time = max(remaining_time, 0)
+        timeout = self.timeout if isinstance(options.timeout, NotGiven) else options.timeout
+        if isinstance(timeout, httpx.Timeout):
+            options.timeout = httpx.Timeout(
+                connect=_min_timeout(timeout.connect, remaining_time),
+                read=_min_timeout(timeout.read, remaining_time),
+                write=_min_timeout(timeout.write, remaining_time),
+                pool=_min_timeout(timeout.pool, remaining_time),
+            )
+        else:
+            options.timeout = _min_timeout(timeout, remaining_time)
+
+    def _check_circuit(self, request: httpx.Request) -> None:
+        if self.circuit_breaker is None:
+            return
+
+        endpoint = endpoint_key(request.method, request.url.path)
+        retry_after = self.circuit_breaker.allow(endpoint)
+        if retry_after is not None:
+            raise CircuitOpenError(endpoint=endpoint, retry_after=retry_after, request=request)
+
+    def _record_circuit(self, request: httpx.Request, *, success: bool | None) -> None:
+        # `None` marks outcomes that say nothing about the health of the endpoint, e.g. being rate limited
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(endpoint_key(request.method, request.url.path), success)
+
+    def _single_flight_key(self, cast_to: Type[object], options: FinalRequestOptions) -> Hashable | None:
+        headers = self._build_headers(options)
+        if RAW_RESPONSE_HEADER in headers or is_given(options.post_parser):
+            # raw responses can only be read once and custom parsers may return different results
+            return None
+
+        params = _merge_mappings(self.default_query, options.params)
+        return (
+            cast_to,
+            options.method.lower(),
+            str(self._prepare_url(options.url)),
+            self.qs.stringify(cast(Mapping[str, Any], params)),
+            tuple(sorted(headers.multi_items())),
+        )
+
+    def _cache_key_for(self, options: FinalRequestOptions, *, stream: bool) -> str | None:
+        if options.cache_key is None or stream:
+            return None
+
+        # `.with_streaming_response` leaves the body unread
+        if is_given(options.headers) and options.headers.get(RAW_RESPONSE_HEADER) == "stream":
+            return None
+
+        return options.cache_key
+
+    def _cached_response(self, request: httpx.Request, body: bytes) -> httpx.Response:
+        return httpx.Response(200, content=body, headers={"content-type": "application/json"}, request=request)
+
+    def _cached_model(self, cast_to: Type[object], entry: CacheEntry) -> Any:
+        # caches that keep entries in memory also keep the model parsed from the body
+        if entry.model is not None and inspect.isclass(cast_to) and isinstance(entry.model, cast_to):
+            return entry.model
+        return None
+
+    def _revalidate_options(self, options: FinalRequestOptions, entry: CacheEntry) -> None:
+        # conditional headers only make sense for `GET` requests
+        if options.method.lower() != "get":
+            return
+
+        # the API responds with a bodyless `304 Not Modified` if the cached response is still up to date
+        headers = {**options.headers} if is_given(options.headers) else {}
+        if entry.etag is not None:
+            headers.setdefault("If-None-Match", entry.etag)
+        if entry.last_modified is not None:
+            headers.setdefault("If-Modified-Since", entry.last_modified)
+        options.headers = headers
+
+    def _usable_cache_entry(self, options: FinalRequestOptions, entry: CacheEntry | None) -> CacheEntry | None:
+        if entry is None:
+            return None
+
+        if (
+            options.cache_max_age is not None
+            and entry.created_at is not None
+            and time.time() - entry.created_at > options.cache_max_age
+        ):
+            return None
+
+        # only `GET` requests can be revalidated, other stale entries have to be refreshed in the background
+        if entry.stale and not entry.serve_stale and options.method.lower() != "get":
+            return None
+
+        return entry
+
+    def _start_refresh(self, cache_key: str) -> bool:
+        """Returns whether the caller should refresh the cached response, i.e. nobody else is already doing so."""
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return False
+            self._refreshing.add(cache_key)
+            return True
+
+    def _finish_refresh(self, cache_key: str) -> None:
+        with self._refreshing_lock:
+            self._refreshing.discard(cache_key)
+
+    def _refresh_options(self, options: FinalRequestOptions, entry: CacheEntry) -> FinalRequestOptions:
+        options = model_copy(options)
+        options.stale_entry = entry
+        return options
+
+    def _cache_result(
+        self,
+        cache: ResponseCache,
+        cache_key: str,
+        options: FinalRequestOptions,
+        response: httpx.Response,
+        result: object,
+    ) -> None:
+        cache.set(
+            cache_key,
+            CacheEntry(
+                value=response.content,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+                model=result if isinstance(result, pydantic.BaseModel) else None,
+            ),
+        )
+
+        if options.cache_related is not None:
+            # e.g. the product in a lookup response can also answer `products.retrieve()`
+            for key, model in options.cache_related(result):
+                cache.set(key, CacheEntry(value=model.to_json(indent=None).encode(), model=model))
+
+    def _rate_limit_retry_after(self, response: httpx.Response) -> float | None:
+        # mirrors `_calculate_retry_timeout`, unreasonable values are ignored
+        retry_after = self._parse_retry_after_header(response.headers)
+        if retry_after is not None and 0 < retry_after <= 60:
+            return retry_after
+        return None
+
+    def _should_hedge(self, request: httpx.Request, *, stream: bool) -> bool:
+        # only idempotent requests can be safely sent twice, and we can't race streamed responses
+        return self.hedging is not None and request.method == "GET" and not stream
+
     def _idempotency_key(self) -> str:
         return f"stainless-python-retry-{uuid.uuid4()}"
 
+    def pool_stats(self) -> PoolStats:
+        """Returns a snapshot of the connection pool, including how long requests have waited for a connection.
+
+        Wait times are shared by every client using the same underlying `http_client`, e.g. clients
+        created with `.copy()` / `.with_options()`.
+        """
+        return self._pool_monitor.stats()
+
+    def _warmup_connection_count(self, connections: int) -> int:
+        if connections < 1:
+            raise ValueError(f"Expected `connections` to be at least 1 but received {connections}")
+
+        max_connections, max_keepalive_connections = get_pool_limits(self._client)
+        if max_connections is not None and connections > max_connections:
+            # every warm-up request holds on to its connection until all of them have been
+            # opened, so asking for more than the pool allows would never complete
+            log.warning(
+                "Cannot warm up %i connections as the pool is limited to %i, opening %i instead",
+                connections,
+                max_connections,
+                max_connections,
+            )
+            connections = max_connections
+
+        if max_keepalive_connections is not None and connections > max_keepalive_connections:
+            log.warning(
+                "Only %i of the %i warmed up connections will be kept alive, "
+                "configure a larger `max_keepalive_connections` on your `http_client` to keep more",
+                max_keepalive_connections,
+                connections,
+            )
+
+        return connections
+
+    def _build_warmup_request(self, url: URL, trace: Any) -> httpx.Request:
+        # `HEAD` is the cheapest request we can make, we don't care about the response
+        # status as the connection is established and kept alive regardless
+        return self._client.build_request(  # pyright: ignore[reportUnknownMemberType]
+            "HEAD",
+            url,
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout,
+            extensions={"trace": trace},
+        )
+
+    def _warmup_address(self, url: URL) -> tuple[str, int]:
+        return url.host, url.port or (443 if url.scheme == "https" else 80)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  # pyright: ignore[reportUnusedImport]
+    except ImportError:
+        return False
+    return True
+
+
+def _resolve_http2(http2: bool) -> bool:
+    """Returns whether HTTP/2 can actually be used when it's requested."""
+    # httpx raises an `ImportError` at construction time when `http2=True` is given
+    # without the `h2` package installed, we'd rather degrade to HTTP/1.1 than fail
+    if http2 and not _http2_available():
+        log.warning(
+            "HTTP/2 was requested but the `h2` package is not installed, falling back to HTTP/1.1; "
+            "install the package with the `http2` extra to enable it"
+        )
+        return False
+    return http2
+
+
+def _resolve_http2_kwargs(kwargs: dict[str, Any]) -> None:
+    if kwargs.get("http2") and not _resolve_http2(True):
+        kwargs["http2"] = False
+        kwargs["http1"] = True
+
 
 class _DefaultHttpxClient(httpx.Client):
     def __init__(self, **kwargs: Any) -> None:
         kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
         kwargs.setdefault("limits", DEFAULT_CONNECTION_LIMITS)
         kwargs.setdefault("follow_redirects", True)
+        _resolve_http2_kwargs(kwargs)
         super().__init__(**kwargs)
 
 
@@ -852,8 +1177,19 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         version: str,
         base_url: str | URL,
         max_retries: int = DEFAULT_MAX_RETRIES,
+        deadline: float | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         http_client: httpx.Client | None = None,
+        http2: bool = False,
+        adaptive_pool: bool = False,
+        hedging: HedgingPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        single_flight: SingleFlight | None = None,
+        response_cache: ResponseCache | None = None,
+        request_compression: RequestCompression | None = None,
+        request_compression_threshold: int = DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
         custom_headers: Mapping[str, str] | None = None,
         custom_query: Mapping[str, object] | None = None,
         _strict_response_validation: bool,
@@ -876,25 +1212,48 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
                 f"Invalid `http_client` argument; Expected an instance of `httpx.Client` but got {type(http_client)}"
             )
 
+        if http_client is None:
+            # so that `self.http2` reflects the protocol in use after falling back to HTTP/1.1
+            http2 = _resolve_http2(http2)
+
         super().__init__(
             version=version,
             # cast to a valid type because mypy doesn't understand our type narrowing
             timeout=cast(Timeout, timeout),
             base_url=base_url,
             max_retries=max_retries,
+            deadline=deadline,
+            http2=http2,
+            adaptive_pool=adaptive_pool,
+            hedging=hedging,
+            rate_limiter=rate_limiter,
+            retry_budget=retry_budget,
+            circuit_breaker=circuit_breaker,
+            single_flight=single_flight,
+            response_cache=response_cache,
+            request_compression=request_compression,
+            request_compression_threshold=request_compression_threshold,
             custom_query=custom_query,
             custom_headers=custom_headers,
             _strict_response_validation=_strict_response_validation,
         )
+        # note: `http2` only applies to the client we construct ourselves, a custom
+        # `http_client` is expected to have been configured with `http2=True` already
         self._client = http_client or SyncHttpxClientWrapper(
             base_url=base_url,
             # cast to a valid type because mypy doesn't understand our type narrowing
             timeout=cast(Timeout, timeout),
+            http2=http2,
         )
+        self._pool_monitor = get_pool_monitor(self._client)
 
     def is_closed(self) -> bool:
         return self._client.is_closed
 
+    def _batch_executor(self) -> ThreadPoolExecutor:
+        """The thread pool that batch methods such as `products.retrieve_many()` make their calls from."""
+        return get_executor(self._client)
+
     def close(self) -> None:
         """Close the underlying HTTPX client.
 
@@ -904,6 +1263,8 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         # may not be present
         if hasattr(self, "_client"):
             self._client.close()
+            shutdown_executor(self._client)
+            shutdown_hedge_executor(self._client)
 
     def __enter__(self: _T) -> _T:
         return self
@@ -916,6 +1277,66 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
     ) -> None:
         self.close()
 
+    def warmup(self, *, connections: int = 1, path: str = "") -> WarmupResult:
+        """Pre-open connections to the API so that the first requests don't pay for DNS, TCP and TLS setup.
+
+        Every connection is opened with a cheap `HEAD` request to the `base_url`, or `path` relative to it.
+        All of the requests are held open until the last one has been sent so that the pool has to establish
+        a separate connection for each, afterwards up to the pool's `max_keepalive_connections` are kept
+        alive for re-use.
+
+        Note that with HTTP/2 concurrent requests are multiplexed over a single connection.
+        """
+        connections = self._warmup_connection_count(connections)
+        start = time.monotonic()
+        url = self._prepare_url(path)
+
+        dns: float | None = None
+        try:
+            host, port = self._warmup_address(url)
+            socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            dns = time.monotonic() - start
+        except OSError:
+            log.debug("Could not resolve %s", url.host, exc_info=True)
+
+        def open_connection(trace: ConnectionTrace) -> tuple[httpx.Response, WarmupConnection]:
+            opened_at = time.monotonic()
+            response = self._client.send(self._build_warmup_request(url, trace), stream=True)
+            return response, trace.to_warmup_connection(total=time.monotonic() - opened_at)
+
+        results: list[WarmupConnection] = []
+        responses: list[httpx.Response] = []
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="channel3-warmup") as executor:
+            futures = [executor.submit(open_connection, ConnectionTrace()) for _ in range(connections)]
+            for future in futures:
+                try:
+                    response, result = future.result()
+                except Exception:
+                    log.debug("Could not open warm-up connection", exc_info=True)
+                    continue
+
+                responses.append(response)
+                results.append(result)
+
+        # reading the (empty) body is what hands the connection back to the pool as idle
+        for response in responses:
+            try:
+                response.read()
+            except Exception:
+                log.debug("Could not release warm-up connection", exc_info=True)
+            finally:
+                response.close()
+
+        if len(results) < connections:
+            log.warning("Could only open %i of %i warm-up connections", len(results), connections)
+
+        return WarmupResult(
+            dns=dns,
+            connections=results,
+            failed=connections - len(results),
+            elapsed=time.monotonic() - start,
+        )
+
     def _prepare_options(
         self,
         options: FinalRequestOptions,  # noqa: ARG002
@@ -934,6 +1355,127 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         """
         return None
 
+    def _send_request(
+        self,
+        request: httpx.Request,
+        options: FinalRequestOptions,
+        *,
+        retries_taken: int,
+        stream: bool,
+        send_kwargs: HttpxSendArgs,
+    ) -> httpx.Response:
+        limiter = self.rate_limiter
+        rate_limited = 0
+        while True:
+            if limiter is not None:
+                delay = limiter.acquire()
+                if delay > 0:
+                    remaining_time = options.get_remaining_time()
+                    if remaining_time is not None and delay >= remaining_time:
+                        log.debug("Raising timeout error as the rate limiter would delay the request past the deadline")
+                        raise APITimeoutError(request=request)
+
+                    log.debug("Rate limiter is delaying request to %s by %f seconds", request.url, delay)
+                    time.sleep(delay)
+
+            # every send, including re-sends after a `429`, takes its own slot from the circuit breaker
+            self._check_circuit(request)
+            try:
+                if self._should_hedge(request, stream=stream):
+                    response = self._send_hedged(request, options, retries_taken=retries_taken, send_kwargs=send_kwargs)
+                else:
+                    response = self._client.send(request, stream=stream, **send_kwargs)
+            except BaseException as err:
+                # cancellations and interrupts say nothing about the endpoint's health, but they still have to
+                # give back the slot of a half-open circuit's trial request
+                self._record_circuit(request, success=False if isinstance(err, Exception) else None)
+                raise
+            self._record_circuit(request, success=None if response.status_code == 429 else response.status_code < 500)
+
+            if limiter is None or response.status_code != 429 or rate_limited >= limiter.max_attempts:
+                return response
+
+            # wait for the limiter to let us through again instead of spending one of the request's retries
+            limiter.on_rate_limited(self._rate_limit_retry_after(response))
+            rate_limited += 1
+            response.close()
+
+    def _send_hedged(
+        self, request: httpx.Request, options: FinalRequestOptions, *, retries_taken: int, send_kwargs: HttpxSendArgs
+    ) -> httpx.Response:
+        policy = self.hedging
+        assert policy is not None
+
+        endpoint = endpoint_key(request.method, request.url.path)
+        delay = policy.hedge_delay(endpoint)
+        started_at = time.monotonic()
+
+        if delay is None:
+            response = self._client.send(request, **send_kwargs)
+            policy.record(endpoint, time.monotonic() - started_at)
+            return response
+
+        executor = get_hedge_executor(self._client)
+        if not executor.reserve():
+            # every hedging thread is busy, sending the request ourselves is faster than waiting for one
+            response = self._client.send(request, **send_kwargs)
+            policy.record(endpoint, time.monotonic() - started_at)
+            return response
+
+        decided = threading.Event()
+        primary = executor.submit(self._send_hedge_attempt, request, decided, send_kwargs)
+        done, _ = wait([primary], timeout=delay)
+        hedging = not done and executor.reserve()
+        if hedging and not policy.acquire():
+            executor.release()
+            hedging = False
+        if not hedging:
+            response = primary.result()
+            policy.record(endpoint, time.monotonic() - started_at)
+            return response
+
+        log.debug("Hedging request to %s after %f seconds", request.url, delay)
+        hedge_request = self._build_request(options, retries_taken=retries_taken)
+        self._prepare_request(hedge_request)
+        hedged_at = time.monotonic()
+        hedge = executor.submit(self._send_hedge_attempt, hedge_request, decided, send_kwargs)
+
+        winner: Future[httpx.Response] | None = None
+        pending = {primary, hedge}
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in (primary, hedge) if future in done and not future.exception()), None)
+
+        if winner is None:
+            # both requests failed, surface the error of the original one
+            return primary.result()
+
+        # the loser is closed as soon as its response arrives, without reading the body, or never sent if it's
+        # still waiting for a thread; we can't interrupt a request that's already waiting for its response
+        decided.set()
+        loser = hedge if winner is primary else primary
+        loser.cancel()
+        loser.add_done_callback(close_response)
+
+        hedge_won = winner is hedge
+        policy.record(endpoint, time.monotonic() - (hedged_at if hedge_won else started_at), hedge_won=hedge_won)
+        return winner.result()
+
+    def _send_hedge_attempt(
+        self, request: httpx.Request, decided: threading.Event, send_kwargs: HttpxSendArgs
+    ) -> httpx.Response:
+        response = self._client.send(request, stream=True, **send_kwargs)
+        try:
+            if decided.is_set():
+                # the other attempt already won, there's no need to read the body
+                response.close()
+            else:
+                response.read()
+        except BaseException:
+            response.close()
+            raise
+        return response
+
     @overload
     def request(
         self,
@@ -973,6 +1515,26 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
     ) -> ResponseT | _StreamT:
         cast_to = self._maybe_override_cast_to(cast_to, options)
 
+        cache = self.response_cache
+        cache_key = self._cache_key_for(options, stream=stream)
+        if options.stale_entry is not None:
+            # refreshing a stale response in the background, it has already been looked up
+            cached: CacheEntry | None = options.stale_entry
+        else:
+            cached = cache.get(cache_key) if cache is not None and cache_key is not None else None
+            cached = self._usable_cache_entry(options, cached)
+        if cached is not None and not cached.stale:
+            log.debug("Using cached response for %s", options.url)
+            return self._process_cached_response(cast_to, options, cached, stream_cls=stream_cls)
+        if cached is not None and cached.serve_stale and cache_key is not None and options.stale_entry is None:
+            log.debug("Using stale cached response for %s while it is refreshed", options.url)
+            self._refresh_in_background(cast_to, options, cached, cache_key)
+            return self._process_cached_response(cast_to, options, cached, stream_cls=stream_cls)
+
+        # set on the options we were given so that pages fetched from
+        # the response inherit the deadline
+        self._start_deadline(options)
+
         # create a copy of the options we were given so that if the
         # options are mutated later & we then retry, the retries are
         # given the original options
@@ -980,14 +1542,19 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         if input_options.idempotency_key is None and input_options.method.lower() != "get":
             # ensure the idempotency key is reused between requests
             input_options.idempotency_key = self._idempotency_key()
+        if cached is not None:
+            self._revalidate_options(input_options, cached)
 
         response: httpx.Response | None = None
         max_retries = input_options.get_max_retries(self.max_retries)
+        if self.retry_budget is not None:
+            self.retry_budget.record_request()
 
         retries_taken = 0
         for retries_taken in range(max_retries + 1):
             options = model_copy(input_options)
             options = self._prepare_options(options)
+            self._apply_deadline(options)
 
             remaining_retries = max_retries - retries_taken
             request = self._build_request(options, retries_taken=retries_taken)
@@ -1002,22 +1569,37 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
 
             log.debug("Sending HTTP Request: %s %s", request.method, request.url)
 
+            remaining_time = options.get_remaining_time()
+            if remaining_time is not None and remaining_time <= 0:
+                log.debug("Raising timeout error as the deadline has passed")
+                raise APITimeoutError(request=request)
+
+            connection_wait = self._pool_monitor.track(request, adapt=self.adaptive_pool, is_async=False)
+
             response = None
             try:
-                response = self._client.send(
+                response = self._send_request(
                     request,
+                    options,
+                    retries_taken=retries_taken,
                     stream=stream or self._should_stream_response_body(request=request),
-                    **kwargs,
+                    send_kwargs=kwargs,
                 )
+            except (APITimeoutError, CircuitOpenError):
+                # the deadline would pass before the request could be sent, or its endpoint is unhealthy
+                self._pool_monitor.record(connection_wait)
+                raise
             except httpx.TimeoutException as err:
                 log.debug("Encountered httpx.TimeoutException", exc_info=True)
+                self._pool_monitor.record(connection_wait, pool_timeout=isinstance(err, httpx.PoolTimeout))
 
-                if remaining_retries > 0:
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=None)
+                if retry_delay is not None:
                     self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=None,
+                        timeout=retry_delay,
                     )
                     continue
 
@@ -1025,19 +1607,23 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
                 raise APITimeoutError(request=request) from err
             except Exception as err:
                 log.debug("Encountered Exception", exc_info=True)
+                self._pool_monitor.record(connection_wait)
 
-                if remaining_retries > 0:
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=None)
+                if retry_delay is not None:
                     self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=None,
+                        timeout=retry_delay,
                     )
                     continue
 
                 log.debug("Raising connection error")
                 raise APIConnectionError(request=request) from err
 
+            self._pool_monitor.record(connection_wait)
+
             log.debug(
                 'HTTP Response: %s %s "%i %s" %s',
                 request.method,
@@ -1047,18 +1633,23 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
                 response.headers,
             )
 
+            if cached is not None and response.status_code == 304:
+                # not an error, the cached response can be used
+                break
+
             try:
                 response.raise_for_status()
             except httpx.HTTPStatusError as err:  # thrown on 4xx and 5xx status code
                 log.debug("Encountered httpx.HTTPStatusError", exc_info=True)
 
-                if remaining_retries > 0 and self._should_retry(err.response):
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=err.response)
+                if retry_delay is not None:
                     err.response.close()
                     self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=response,
+                        timeout=retry_delay,
                     )
                     continue
 
@@ -1073,7 +1664,13 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
             break
 
         assert response is not None, "could not resolve response (should never happen)"
-        return self._process_response(
+        if cache is not None and cache_key is not None and cached is not None and response.status_code == 304:
+            log.debug("Cached response for %s has not been modified", options.url)
+            response.close()
+            cache.refresh(cache_key)
+            return self._process_cached_response(cast_to, input_options, cached, stream_cls=stream_cls)
+
+        result = self._process_response(
             cast_to=cast_to,
             options=options,
             response=response,
@@ -1081,9 +1678,51 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
             stream_cls=stream_cls,
             retries_taken=retries_taken,
         )
+        if cache is not None and cache_key is not None:
+            self._cache_result(cache, cache_key, options, response, result)
+        return result
+
+    def _refresh_in_background(
+        self, cast_to: Type[ResponseT], options: FinalRequestOptions, entry: CacheEntry, cache_key: str
+    ) -> None:
+        if not self._start_refresh(cache_key):
+            return
+
+        refresh_options = self._refresh_options(options, entry)
+
+        def refresh() -> None:
+            try:
+                self.request(cast_to, refresh_options)
+            except Exception:
+                log.debug("Could not refresh the cached response for %s", refresh_options.url, exc_info=True)
+            finally:
+                self._finish_refresh(cache_key)
+
+        threading.Thread(target=refresh, name="channel3-refresh", daemon=True).start()
+
+    def _process_cached_response(
+        self,
+        cast_to: Type[ResponseT],
+        options: FinalRequestOptions,
+        entry: CacheEntry,
+        *,
+        stream_cls: type[_StreamT] | None,
+    ) -> ResponseT | _StreamT:
+        model = self._cached_model(cast_to, entry)
+        if model is not None:
+            return cast(ResponseT, model)
+
+        options = self._prepare_options(model_copy(options))
+        return self._process_response(
+            cast_to=cast_to,
+            options=options,
+            response=self._cached_response(self._build_request(options), entry.value),
+            stream=False,
+            stream_cls=stream_cls,
+        )
 
     def _sleep_for_retry(
-        self, *, retries_taken: int, max_retries: int, options: FinalRequestOptions, response: httpx.Response | None
+        self, *, retries_taken: int, max_retries: int, options: FinalRequestOptions, timeout: float
     ) -> None:
         remaining_retries = max_retries - retries_taken
         if remaining_retries == 1:
@@ -1091,7 +1730,6 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         else:
             log.debug("%i retries left", remaining_retries)
 
-        timeout = self._calculate_retry_timeout(remaining_retries, options, response.headers if response else None)
         log.info("Retrying request to %s in %f seconds", options.url, timeout)
 
         time.sleep(timeout)
@@ -1210,6 +1848,11 @@ class SyncAPIClient(BaseClient[httpx.Client, Stream[Any]]):
         stream_cls: type[_StreamT] | None = None,
     ) -> ResponseT | _StreamT:
         opts = FinalRequestOptions.construct(method="get", url=path, **options)
+        if self.single_flight is not None and not stream:
+            key = self._single_flight_key(cast_to, opts)
+            if key is not None:
+                return self.single_flight.do(key, lambda: self.request(cast_to, opts))
+
         # cast is required because mypy complains about returning Any even though
         # it understands the type variables
         return cast(ResponseT, self.request(cast_to, opts, stream=stream, stream_cls=stream_cls))
@@ -1375,6 +2018,7 @@ class _DefaultAsyncHttpxClient(httpx.AsyncClient):
         kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
         kwargs.setdefault("limits", DEFAULT_CONNECTION_LIMITS)
         kwargs.setdefault("follow_redirects", True)
+        _resolve_http2_kwargs(kwargs)
         super().__init__(**kwargs)
 
 
@@ -1435,8 +2079,19 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         base_url: str | URL,
         _strict_response_validation: bool,
         max_retries: int = DEFAULT_MAX_RETRIES,
+        deadline: float | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         http_client: httpx.AsyncClient | None = None,
+        http2: bool = False,
+        adaptive_pool: bool = False,
+        hedging: HedgingPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        single_flight: SingleFlight | None = None,
+        response_cache: ResponseCache | None = None,
+        request_compression: RequestCompression | None = None,
+        request_compression_threshold: int = DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
         custom_headers: Mapping[str, str] | None = None,
         custom_query: Mapping[str, object] | None = None,
     ) -> None:
@@ -1458,21 +2113,41 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
                 f"Invalid `http_client` argument; Expected an instance of `httpx.AsyncClient` but got {type(http_client)}"
             )
 
+        if http_client is None:
+            # so that `self.http2` reflects the protocol in use after falling back to HTTP/1.1
+            http2 = _resolve_http2(http2)
+
         super().__init__(
             version=version,
             base_url=base_url,
             # cast to a valid type because mypy doesn't understand our type narrowing
             timeout=cast(Timeout, timeout),
             max_retries=max_retries,
+            deadline=deadline,
+            http2=http2,
+            adaptive_pool=adaptive_pool,
+            hedging=hedging,
+            rate_limiter=rate_limiter,
+            retry_budget=retry_budget,
+            circuit_breaker=circuit_breaker,
+            single_flight=single_flight,
+            response_cache=response_cache,
+            request_compression=request_compression,
+            request_compression_threshold=request_compression_threshold,
             custom_query=custom_query,
             custom_headers=custom_headers,
             _strict_response_validation=_strict_response_validation,
         )
+        # note: `http2` only applies to the client we construct ourselves, a custom
+        # `http_client` is expected to have been configured with `http2=True` already
         self._client = http_client or AsyncHttpxClientWrapper(
             base_url=base_url,
             # cast to a valid type because mypy doesn't understand our type narrowing
             timeout=cast(Timeout, timeout),
+            http2=http2,
         )
+        self._pool_monitor = get_pool_monitor(self._client)
+        self._background_tasks: set[asyncio.Task[None]] = set()
 
     def is_closed(self) -> bool:
         return self._client.is_closed
@@ -1495,6 +2170,65 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
     ) -> None:
         await self.close()
 
+    async def warmup(self, *, connections: int = 1, path: str = "") -> WarmupResult:
+        """Pre-open connections to the API so that the first requests don't pay for DNS, TCP and TLS setup.
+
+        Every connection is opened with a cheap `HEAD` request to the `base_url`, or `path` relative to it.
+        All of the requests are held open until the last one has been sent so that the pool has to establish
+        a separate connection for each, afterwards up to the pool's `max_keepalive_connections` are kept
+        alive for re-use.
+
+        Note that with HTTP/2 concurrent requests are multiplexed over a single connection.
+        """
+        connections = self._warmup_connection_count(connections)
+        start = time.monotonic()
+        url = self._prepare_url(path)
+
+        dns: float | None = None
+        try:
+            host, port = self._warmup_address(url)
+            await anyio.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            dns = time.monotonic() - start
+        except OSError:
+            log.debug("Could not resolve %s", url.host, exc_info=True)
+
+        results: list[WarmupConnection] = []
+        responses: list[httpx.Response] = []
+
+        async def open_connection(trace: ConnectionTrace) -> None:
+            opened_at = time.monotonic()
+            try:
+                response = await self._client.send(self._build_warmup_request(url, trace.atrace), stream=True)
+            except Exception:
+                log.debug("Could not open warm-up connection", exc_info=True)
+                return
+
+            responses.append(response)
+            results.append(trace.to_warmup_connection(total=time.monotonic() - opened_at))
+
+        async with anyio.create_task_group() as task_group:
+            for _ in range(connections):
+                task_group.start_soon(open_connection, ConnectionTrace())
+
+        # reading the (empty) body is what hands the connection back to the pool as idle
+        for response in responses:
+            try:
+                await response.aread()
+            except Exception:
+                log.debug("Could not release warm-up connection", exc_info=True)
+            finally:
+                await response.aclose()
+
+        if len(results) < connections:
+            log.warning("Could only open %i of %i warm-up connections", len(results), connections)
+
+        return WarmupResult(
+            dns=dns,
+            connections=results,
+            failed=connections - len(results),
+            elapsed=time.monotonic() - start,
+        )
+
     async def _prepare_options(
         self,
         options: FinalRequestOptions,  # noqa: ARG002
@@ -1513,6 +2247,110 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         """
         return None
 
+    async def _send_request(
+        self,
+        request: httpx.Request,
+        options: FinalRequestOptions,
+        *,
+        retries_taken: int,
+        stream: bool,
+        send_kwargs: HttpxSendArgs,
+    ) -> httpx.Response:
+        limiter = self.rate_limiter
+        rate_limited = 0
+        while True:
+            if limiter is not None:
+                delay = limiter.acquire()
+                if delay > 0:
+                    remaining_time = options.get_remaining_time()
+                    if remaining_time is not None and delay >= remaining_time:
+                        log.debug("Raising timeout error as the rate limiter would delay the request past the deadline")
+                        raise APITimeoutError(request=request)
+
+                    log.debug("Rate limiter is delaying request to %s by %f seconds", request.url, delay)
+                    await anyio.sleep(delay)
+
+            # every send, including re-sends after a `429`, takes its own slot from the circuit breaker
+            self._check_circuit(request)
+            try:
+                if self._should_hedge(request, stream=stream):
+                    response = await self._send_hedged(
+                        request, options, retries_taken=retries_taken, send_kwargs=send_kwargs
+                    )
+                else:
+                    response = await self._client.send(request, stream=stream, **send_kwargs)
+            except BaseException as err:
+                # cancellations and interrupts say nothing about the endpoint's health, but they still have to
+                # give back the slot of a half-open circuit's trial request
+                self._record_circuit(request, success=False if isinstance(err, Exception) else None)
+                raise
+            self._record_circuit(request, success=None if response.status_code == 429 else response.status_code < 500)
+
+            if limiter is None or response.status_code != 429 or rate_limited >= limiter.max_attempts:
+                return response
+
+            # wait for the limiter to let us through again instead of spending one of the request's retries
+            limiter.on_rate_limited(self._rate_limit_retry_after(response))
+            rate_limited += 1
+            await response.aclose()
+
+    async def _send_hedged(
+        self, request: httpx.Request, options: FinalRequestOptions, *, retries_taken: int, send_kwargs: HttpxSendArgs
+    ) -> httpx.Response:
+        policy = self.hedging
+        assert policy is not None
+
+        endpoint = endpoint_key(request.method, request.url.path)
+        delay = policy.hedge_delay(endpoint)
+        started_at = time.monotonic()
+
+        if delay is None:
+            response = await self._client.send(request, **send_kwargs)
+            policy.record(endpoint, time.monotonic() - started_at)
+            return response
+
+        responses: list[httpx.Response] = []
+        errors: dict[bool, Exception] = {}
+        primary_done = anyio.Event()
+
+        async def attempt(attempt_request: httpx.Request, *, is_hedge: bool) -> None:
+            attempt_started_at = time.monotonic()
+            try:
+                response = await self._client.send(attempt_request, **send_kwargs)
+            except Exception as err:
+                errors[is_hedge] = err
+                return
+            finally:
+                if not is_hedge:
+                    primary_done.set()
+
+            if responses:
+                await response.aclose()
+                return
+
+            responses.append(response)
+            policy.record(endpoint, time.monotonic() - attempt_started_at, hedge_won=is_hedge)
+            # the first response wins, cancelling the other request
+            task_group.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(functools.partial(attempt, request, is_hedge=False))
+
+            with anyio.move_on_after(delay):
+                await primary_done.wait()
+
+            if not primary_done.is_set() and policy.acquire():
+                log.debug("Hedging request to %s after %f seconds", request.url, delay)
+                hedge_request = self._build_request(options, retries_taken=retries_taken)
+                await self._prepare_request(hedge_request)
+                task_group.start_soon(functools.partial(attempt, hedge_request, is_hedge=True))
+
+        if responses:
+            return responses[0]
+
+        # both requests failed, surface the error of the original one
+        raise errors.get(False) or errors[True]
+
     @overload
     async def request(
         self,
@@ -1557,6 +2395,31 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
 
         cast_to = self._maybe_override_cast_to(cast_to, options)
 
+        cache = self.response_cache
+        cache_key = self._cache_key_for(options, stream=stream)
+        if options.stale_entry is not None:
+            # refreshing a stale response in the background, it has already been looked up
+            cached: CacheEntry | None = options.stale_entry
+        else:
+            cached = cache.get(cache_key) if cache is not None and cache_key is not None else None
+            cached = self._usable_cache_entry(options, cached)
+        if cached is not None and not cached.stale:
+            log.debug("Using cached response for %s", options.url)
+            return await self._process_cached_response(cast_to, options, cached, stream_cls=stream_cls)
+        if (
+            cached is not None
+            and cached.serve_stale
+            and cache_key is not None
+            and options.stale_entry is None
+            and self._refresh_in_background(cast_to, options, cached, cache_key)
+        ):
+            log.debug("Using stale cached response for %s while it is refreshed", options.url)
+            return await self._process_cached_response(cast_to, options, cached, stream_cls=stream_cls)
+
+        # set on the options we were given so that pages fetched from
+        # the response inherit the deadline
+        self._start_deadline(options)
+
         # create a copy of the options we were given so that if the
         # options are mutated later & we then retry, the retries are
         # given the original options
@@ -1564,14 +2427,19 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         if input_options.idempotency_key is None and input_options.method.lower() != "get":
             # ensure the idempotency key is reused between requests
             input_options.idempotency_key = self._idempotency_key()
+        if cached is not None:
+            self._revalidate_options(input_options, cached)
 
         response: httpx.Response | None = None
         max_retries = input_options.get_max_retries(self.max_retries)
+        if self.retry_budget is not None:
+            self.retry_budget.record_request()
 
         retries_taken = 0
         for retries_taken in range(max_retries + 1):
             options = model_copy(input_options)
             options = await self._prepare_options(options)
+            self._apply_deadline(options)
 
             remaining_retries = max_retries - retries_taken
             request = self._build_request(options, retries_taken=retries_taken)
@@ -1586,22 +2454,37 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
 
             log.debug("Sending HTTP Request: %s %s", request.method, request.url)
 
+            remaining_time = options.get_remaining_time()
+            if remaining_time is not None and remaining_time <= 0:
+                log.debug("Raising timeout error as the deadline has passed")
+                raise APITimeoutError(request=request)
+
+            connection_wait = self._pool_monitor.track(request, adapt=self.adaptive_pool, is_async=True)
+
             response = None
             try:
-                response = await self._client.send(
+                response = await self._send_request(
                     request,
+                    options,
+                    retries_taken=retries_taken,
                     stream=stream or self._should_stream_response_body(request=request),
-                    **kwargs,
+                    send_kwargs=kwargs,
                 )
+            except (APITimeoutError, CircuitOpenError):
+                # the deadline would pass before the request could be sent, or its endpoint is unhealthy
+                self._pool_monitor.record(connection_wait)
+                raise
             except httpx.TimeoutException as err:
                 log.debug("Encountered httpx.TimeoutException", exc_info=True)
+                self._pool_monitor.record(connection_wait, pool_timeout=isinstance(err, httpx.PoolTimeout))
 
-                if remaining_retries > 0:
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=None)
+                if retry_delay is not None:
                     await self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=None,
+                        timeout=retry_delay,
                     )
                     continue
 
@@ -1609,19 +2492,23 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
                 raise APITimeoutError(request=request) from err
             except Exception as err:
                 log.debug("Encountered Exception", exc_info=True)
+                self._pool_monitor.record(connection_wait)
 
-                if remaining_retries > 0:
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=None)
+                if retry_delay is not None:
                     await self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=None,
+                        timeout=retry_delay,
                     )
                     continue
 
                 log.debug("Raising connection error")
                 raise APIConnectionError(request=request) from err
 
+            self._pool_monitor.record(connection_wait)
+
             log.debug(
                 'HTTP Response: %s %s "%i %s" %s',
                 request.method,
@@ -1631,18 +2518,23 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
                 response.headers,
             )
 
+            if cached is not None and response.status_code == 304:
+                # not an error, the cached response can be used
+                break
+
             try:
                 response.raise_for_status()
             except httpx.HTTPStatusError as err:  # thrown on 4xx and 5xx status code
                 log.debug("Encountered httpx.HTTPStatusError", exc_info=True)
 
-                if remaining_retries > 0 and self._should_retry(err.response):
+                retry_delay = self._retry_delay(remaining_retries, input_options, response=err.response)
+                if retry_delay is not None:
                     await err.response.aclose()
                     await self._sleep_for_retry(
                         retries_taken=retries_taken,
                         max_retries=max_retries,
                         options=input_options,
-                        response=response,
+                        timeout=retry_delay,
                     )
                     continue
 
@@ -1657,7 +2549,13 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
             break
 
         assert response is not None, "could not resolve response (should never happen)"
-        return await self._process_response(
+        if cache is not None and cache_key is not None and cached is not None and response.status_code == 304:
+            log.debug("Cached response for %s has not been modified", options.url)
+            await response.aclose()
+            cache.refresh(cache_key)
+            return await self._process_cached_response(cast_to, input_options, cached, stream_cls=stream_cls)
+
+        result = await self._process_response(
             cast_to=cast_to,
             options=options,
             response=response,
@@ -1665,9 +2563,60 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
             stream_cls=stream_cls,
             retries_taken=retries_taken,
         )
+        if cache is not None and cache_key is not None:
+            self._cache_result(cache, cache_key, options, response, result)
+        return result
+
+    def _refresh_in_background(
+        self, cast_to: Type[ResponseT], options: FinalRequestOptions, entry: CacheEntry, cache_key: str
+    ) -> bool:
+        """Returns whether the stale response can be used while it's refreshed."""
+        # other event loops don't let us run tasks in the background, so they wait for a fresh response instead
+        if get_async_library() != "asyncio":
+            return False
+
+        if not self._start_refresh(cache_key):
+            return True
+
+        refresh_options = self._refresh_options(options, entry)
+
+        async def refresh() -> None:
+            try:
+                await self.request(cast_to, refresh_options)
+            except Exception:
+                log.debug("Could not refresh the cached response for %s", refresh_options.url, exc_info=True)
+            finally:
+                self._finish_refresh(cache_key)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        # the event loop only keeps weak references to tasks
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return True
+
+    async def _process_cached_response(
+        self,
+        cast_to: Type[ResponseT],
+        options: FinalRequestOptions,
+        entry: CacheEntry,
+        *,
+        stream_cls: type[_AsyncStreamT] | None,
+    ) -> ResponseT | _AsyncStreamT:
+        model = self._cached_model(cast_to, entry)
+        if model is not None:
+            return cast(ResponseT, model)
+
+        options = await self._prepare_options(model_copy(options))
+        return await self._process_response(
+            cast_to=cast_to,
+            options=options,
+            response=self._cached_response(self._build_request(options), entry.value),
+            stream=False,
+            stream_cls=stream_cls,
+        )
 
     async def _sleep_for_retry(
-        self, *, retries_taken: int, max_retries: int, options: FinalRequestOptions, response: httpx.Response | None
+        self, *, retries_taken: int, max_retries: int, options: FinalRequestOptions, timeout: float
     ) -> None:
         remaining_retries = max_retries - retries_taken
         if remaining_retries == 1:
@@ -1675,7 +2624,6 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         else:
             log.debug("%i retries left", remaining_retries)
 
-        timeout = self._calculate_retry_timeout(remaining_retries, options, response.headers if response else None)
         log.info("Retrying request to %s in %f seconds", options.url, timeout)
 
         await anyio.sleep(timeout)
@@ -1784,6 +2732,11 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         stream_cls: type[_AsyncStreamT] | None = None,
     ) -> ResponseT | _AsyncStreamT:
         opts = FinalRequestOptions.construct(method="get", url=path, **options)
+        if self.single_flight is not None and not stream:
+            key = self._single_flight_key(cast_to, opts)
+            if key is not None:
+                return await self.single_flight.ado(key, lambda: self.request(cast_to, opts))
+
         return await self.request(cast_to, opts, stream=stream, stream_cls=stream_cls)
 
     @overload
@@ -1947,6 +2900,10 @@ class AsyncAPIClient(BaseClient[httpx.AsyncClient, AsyncStream[Any]]):
         return self._request_api_list(model, page, opts)
 
 
+def _min_timeout(timeout: float | None, limit: float) -> float:
+    return limit if timeout is None else min(timeout, limit)
+
+
 def make_request_options(
     *,
     query: Query | None = None,
@@ -1956,6 +2913,9 @@ def make_request_options(
     idempotency_key: str | None = None,
     timeout: float | httpx.Timeout | None | NotGiven = not_given,
     post_parser: PostParser | NotGiven = not_given,
+    cache_key: str | None = None,
+    cache_max_age: float | None = None,
+    cache_related: Callable[[Any], Iterable[tuple[str, Any]]] | None = None,
 ) -> RequestOptions:
     """Create a dict of type RequestOptions without keys of NotGiven values."""
     options: RequestOptions = {}
@@ -1981,6 +2941,13 @@ def make_request_options(
         # internal
         options["post_parser"] = post_parser  # type: ignore
 
+    # extra params may change the response, so only plain calls are cached
+    if cache_key is not None and extra_headers is None and extra_query is None and extra_body is None:
+        # internal
+        options["cache_key"] = cache_key  # type: ignore
+        options["cache_max_age"] = cache_max_age  # type: ignore
+        options["cache_related"] = cache_related  # type: ignore
+
     return options
 
 
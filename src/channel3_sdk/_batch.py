@@ -0,0 +1,453 @@
+"""Helpers for making many calls at once while bounding how many are in flight."""
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import itertools
+import threading
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Union,
+    TextIO,
+    Generic,
+    TypeVar,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Optional,
+    Awaitable,
+    Generator,
+    NamedTuple,
+    AsyncGenerator,
+    cast,
+)
+from weakref import WeakKeyDictionary
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import anyio
+import httpx
+from anyio.abc import TaskGroup
+from anyio.streams.memory import MemoryObjectSendStream, MemoryObjectReceiveStream
+
+from ._pool import get_pool_limits
+from ._models import BaseModel
+from ._constants import DEFAULT_CONNECTION_LIMITS
+from ._exceptions import APIError
+
+__all__ = ["BatchStats", "ReconcileReport"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# the latency percentiles are over this many of the most recent calls
+_LATENCY_WINDOW = 1024
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+_executors: "WeakKeyDictionary[httpx.Client, ThreadPoolExecutor]" = WeakKeyDictionary()
+_executors_lock = threading.Lock()
+
+
+def get_executor(http_client: httpx.Client) -> ThreadPoolExecutor:
+    """Returns the thread pool for batch calls on the given client, creating one the first time the client is seen.
+
+    Clients that share an httpx client, e.g. those from `client.with_options()`, share the thread pool too.
+    It has a thread for each connection the pool allows, as any more would only wait for a connection.
+    """
+    with _executors_lock:
+        executor = _executors.get(http_client)
+        if executor is None:
+            max_connections, _ = get_pool_limits(http_client)
+            executor = _executors[http_client] = ThreadPoolExecutor(
+                max_workers=max_connections or DEFAULT_CONNECTION_LIMITS.max_connections,
+                thread_name_prefix="channel3-batch",
+            )
+        return executor
+
+
+def shutdown_executor(http_client: httpx.Client) -> None:
+    with _executors_lock:
+        executor = _executors.pop(http_client, None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+class _InFlight(Generic[_T]):
+    """Tracks the items with a call in flight, and the items with the same key that are waiting for it."""
+
+    def __init__(self, key: Optional[Callable[[_T], Hashable]]) -> None:
+        self._key = key
+        self._waiting: Dict[Hashable, List[_T]] = {}
+        # the items that were added and haven't been released yet, including the waiting ones
+        self.held = 0
+
+    def add(self, item: _T) -> bool:
+        """Holds the item until the call that answers it completes, returns whether it needs a call of its own."""
+        self.held += 1
+        if self._key is None:
+            return True
+
+        key = self._key(item)
+        waiting = self._waiting.get(key)
+        if waiting is not None:
+            waiting.append(item)
+            return False
+
+        self._waiting[key] = [item]
+        return True
+
+    def release(self, item: _T) -> List[_T]:
+        """Returns the items answered by the call for the given item, starting with that item."""
+        answered = [item] if self._key is None else self._waiting.pop(self._key(item))
+        self.held -= len(answered)
+        return answered
+
+
+def map_concurrently(
+    executor: ThreadPoolExecutor,
+    fn: Callable[[_T], _R],
+    items: Iterable[_T],
+    *,
+    max_concurrency: int,
+    key: Optional[Callable[[_T], Hashable]] = None,
+) -> Generator[Tuple[_T, Union[_R, APIError]], None, None]:
+    """Calls `fn` for each item from the executor, yielding `(item, result)` pairs as the calls complete.
+
+    At most `max_concurrency` items are in flight, waiting for a call with the same key or waiting to be
+    consumed, and items are only read from the iterable when there's room for them, so a slow consumer or a
+    long run of duplicates holds back new calls and memory use doesn't grow with the length of the iterable. An `APIError` is yielded in place of the result, any other
+    exception is raised. Closing the iterator cancels the calls that haven't started yet.
+
+    With a `key`, an item with the same key as a call that's in flight shares that call, and is yielded
+    with its result right after the item the call was made for.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+    return _map_concurrently(executor, fn, items, max_concurrency=max_concurrency, in_flight=_InFlight(key))
+
+
+def _map_concurrently(
+    executor: ThreadPoolExecutor,
+    fn: Callable[[_T], _R],
+    items: Iterable[_T],
+    *,
+    max_concurrency: int,
+    in_flight: _InFlight[_T],
+) -> Generator[Tuple[_T, Union[_R, APIError]], None, None]:
+    iterator = iter(items)
+    pending: Dict[Future[_R], _T] = {}
+    try:
+        while True:
+            # items waiting for a call with the same key count towards `max_concurrency` too
+            for item in itertools.islice(iterator, max_concurrency - in_flight.held):
+                if in_flight.add(item):
+                    pending[executor.submit(fn, item)] = item
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    result: Union[_R, APIError] = future.result()
+                except APIError as err:
+                    result = err
+                for answered in in_flight.release(item):
+                    yield answered, result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def amap_concurrently(
+    fn: Callable[[_T], Awaitable[_R]],
+    items: Iterable[_T],
+    *,
+    max_concurrency: int,
+    key: Optional[Callable[[_T], Hashable]] = None,
+) -> AsyncGenerator[Tuple[_T, Union[_R, APIError]], None]:
+    """Calls `fn` for each item in a task, yielding `(item, result)` pairs as the calls complete.
+
+    See `map_concurrently()`. Closing the iterator cancels the calls that are still in flight.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+    return _amap_concurrently(fn, items, max_concurrency=max_concurrency, in_flight=_InFlight(key))
+
+
+async def _amap_concurrently(
+    fn: Callable[[_T], Awaitable[_R]],
+    items: Iterable[_T],
+    *,
+    max_concurrency: int,
+    in_flight: _InFlight[_T],
+) -> AsyncGenerator[Tuple[_T, Union[_R, APIError]], None]:
+    # unbuffered, so that a call keeps its slot until its result has been consumed
+    send, receive = cast(
+        "Tuple[MemoryObjectSendStream[Tuple[_T, Union[_R, APIError]]], MemoryObjectReceiveStream[Tuple[_T, Union[_R, APIError]]]]",
+        anyio.create_memory_object_stream(0),
+    )
+    slots = anyio.Semaphore(max_concurrency)
+
+    async def call(item: _T, send: MemoryObjectSendStream[Tuple[_T, Union[_R, APIError]]]) -> None:
+        async with send:
+            try:
+                try:
+                    result: Union[_R, APIError] = await fn(item)
+                except APIError as err:
+                    result = err
+                await send.send((item, result))
+            except anyio.BrokenResourceError:
+                # the iterator was closed before the result was consumed
+                pass
+            finally:
+                slots.release()
+
+    async def start_calls(tg: TaskGroup) -> None:
+        async with send:
+            # a slot is taken before reading each item, so that the iterable is only read when there's room;
+            # items waiting for a call with the same key take a slot too, until they've been consumed
+            await slots.acquire()
+            for item in items:
+                if in_flight.add(item):
+                    tg.start_soon(call, item, send.clone())
+                await slots.acquire()
+            slots.release()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(start_calls, tg)
+        async with receive:
+            try:
+                async for item, result in receive:
+                    item, *waiting = in_flight.release(item)
+                    yield item, result
+                    for answered in waiting:
+                        slots.release()
+                        yield answered, result
+            except GeneratorExit:
+                # the iterator was closed early, so the calls that are still in flight aren't needed
+                tg.cancel_scope.cancel()
+
+
+class BatchStats(BaseModel):
+    completed: int = 0
+    """The number of items that were processed successfully."""
+
+    failed: int = 0
+    """The number of items that failed with an `APIError`."""
+
+    skipped: int = 0
+    """The number of items that were skipped because the checkpoint says they were already completed."""
+
+    elapsed: float = 0.0
+    """The number of seconds since the batch started."""
+
+    items_per_second: float = 0.0
+    """The number of completed and failed items per second since the batch started."""
+
+    p50_latency: Optional[float] = None
+    """The median latency of recent calls, in seconds."""
+
+    p99_latency: Optional[float] = None
+    """The 99th percentile latency of recent calls, in seconds."""
+
+
+class ReconcileReport(NamedTuple):
+    """What `price_tracking.reconcile()` changed."""
+
+    desired: int
+    """The number of distinct products that should be tracked."""
+
+    active: int
+    """The number of products that were tracked before reconciling."""
+
+    unchanged: int
+    """The number of products that were already tracked and should stay tracked."""
+
+    started: List[str]
+    """The products that are now tracked."""
+
+    stopped: List[str]
+    """The products that are no longer tracked."""
+
+    failed: Dict[str, APIError]
+    """The products that couldn't be started or stopped, with the error for each one."""
+
+
+class BatchProgress:
+    """Tracks how a batch is progressing, reporting its `BatchStats` every `interval` seconds and when it ends.
+
+    Reports are logged at the `info` level and passed to `on_progress`, if given.
+    """
+
+    def __init__(self, on_progress: Optional[Callable[[BatchStats], None]], *, interval: float) -> None:
+        if interval <= 0:
+            raise ValueError(f"Expected `progress_interval` to be positive but received {interval}")
+
+        self._on_progress = on_progress
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._started = self._reported = time.monotonic()
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._completed = 0
+        self._failed = 0
+        self._skipped = 0
+
+    def stats(self) -> BatchStats:
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            latencies = sorted(self._latencies)
+            return BatchStats(
+                completed=self._completed,
+                failed=self._failed,
+                skipped=self._skipped,
+                elapsed=elapsed,
+                items_per_second=(self._completed + self._failed) / elapsed if elapsed > 0 else 0.0,
+                p50_latency=_percentile(latencies, 0.5),
+                p99_latency=_percentile(latencies, 0.99),
+            )
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def skip(self) -> None:
+        with self._lock:
+            self._skipped += 1
+
+    def record(self, result: object) -> None:
+        with self._lock:
+            if isinstance(result, APIError):
+                self._failed += 1
+            else:
+                self._completed += 1
+
+            now = time.monotonic()
+            if now - self._reported < self._interval:
+                return
+            self._reported = now
+
+        self.report()
+
+    def report(self) -> None:
+        stats = self.stats()
+        log.info(
+            "Batch progress: %d completed, %d failed, %d skipped, %.1f/s, p50 %s, p99 %s",
+            stats.completed,
+            stats.failed,
+            stats.skipped,
+            stats.items_per_second,
+            _format_latency(stats.p50_latency),
+            _format_latency(stats.p99_latency),
+        )
+        if self._on_progress is not None:
+            self._on_progress(stats)
+
+
+class Checkpoint:
+    """The items a batch has completed, appended to a file as they complete so that a restarted batch skips them.
+
+    The file has one item per line.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike[str]]) -> None:
+        self._path = path
+        self._file: Optional[TextIO] = None
+        self._completed: set[str] = set()
+        self._truncated = False
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    # a line without a newline was cut short when the previous batch was interrupted
+                    if line.endswith("\n"):
+                        self._completed.add(line[:-1])
+                    else:
+                        self._truncated = True
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._completed
+
+    def __len__(self) -> int:
+        return len(self._completed)
+
+    def add(self, item: str) -> None:
+        if item in self._completed:
+            return
+        self._completed.add(item)
+
+        if self._file is None:
+            self._file = open(self._path, "a", encoding="utf-8")
+            if self._truncated:
+                self._file.write("\n")
+        self._file.write(f"{item}\n")
+        # flushed right away, so that nothing is lost if the process is killed
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def skip_completed(items: Iterable[str], checkpoint: Optional[Checkpoint], progress: BatchProgress) -> Iterator[str]:
+    for item in items:
+        if checkpoint is not None and item in checkpoint:
+            progress.skip()
+        else:
+            yield item
+
+
+def track_progress(
+    results: Generator[Tuple[str, Union[_R, APIError]], None, None],
+    progress: BatchProgress,
+    checkpoint: Optional[Checkpoint],
+) -> Generator[Tuple[str, Union[_R, APIError]], None, None]:
+    """Passes the results through, recording them in the progress and the checkpoint."""
+    try:
+        for item, result in results:
+            if checkpoint is not None and not isinstance(result, APIError):
+                checkpoint.add(item)
+            progress.record(result)
+            yield item, result
+        progress.report()
+    finally:
+        results.close()
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+async def atrack_progress(
+    results: AsyncGenerator[Tuple[str, Union[_R, APIError]], None],
+    progress: BatchProgress,
+    checkpoint: Optional[Checkpoint],
+) -> AsyncGenerator[Tuple[str, Union[_R, APIError]], None]:
+    """See `track_progress()`."""
+    try:
+        async for item, result in results:
+            if checkpoint is not None and not isinstance(result, APIError):
+                checkpoint.add(item)
+            progress.record(result)
+            yield item, result
+        progress.report()
+    finally:
+        await results.aclose()
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _format_latency(seconds: Optional[float]) -> str:
+    return f"{seconds:.3f}s" if seconds is not None else "n/a"
@@ -0,0 +1,507 @@
+"""Client-side caching of response bodies."""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Tuple, Union, Mapping, Optional, Generator, NamedTuple
+from contextlib import contextmanager
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+from typing_extensions import Protocol
+
+from ._models import BaseModel
+
+__all__ = ["ResponseCache", "MemoryCache", "SQLiteCache", "CacheEntry", "CacheStats"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# the version of the `SQLiteCache` table, bump it whenever the table changes
+_SCHEMA_VERSION = 3
+
+# query params that only track where a visitor came from, so they never change which product a URL is for
+_TRACKING_PARAMS = frozenset(
+    {"gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl"}
+)
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    """The number of lookups that found a fresh entry."""
+
+    misses: int = 0
+    """The number of lookups that found no entry, or only an expired one."""
+
+    stale_hits: int = 0
+    """The number of lookups that found an expired entry that could be used while it's refreshed."""
+
+    revalidations: int = 0
+    """The number of expired entries that the API confirmed were unchanged, so they were used again."""
+
+    evictions: int = 0
+    """The number of entries removed to stay within the size limits."""
+
+    entries: int = 0
+    """The number of entries currently cached, including ones that have expired but not yet been removed."""
+
+    size: int = 0
+    """The approximate number of bytes the cached entries take up."""
+
+
+class CacheEntry(NamedTuple):
+    """A cached response body, along with the validators needed to check whether it's still up to date."""
+
+    value: bytes
+    """The response body."""
+
+    etag: Optional[str] = None
+    """The `ETag` header of the response."""
+
+    last_modified: Optional[str] = None
+    """The `Last-Modified` header of the response."""
+
+    model: Any = None
+    """The parsed response, for caches that keep entries in memory so they don't have to be parsed again."""
+
+    created_at: Optional[float] = None
+    """When the response was received, or last confirmed to be up to date, as a Unix timestamp.
+
+    Set by the cache when the entry is stored.
+    """
+
+    stale: bool = False
+    """Whether the entry has expired and has to be revalidated before it can be used."""
+
+    serve_stale: bool = False
+    """Whether the expired entry can still be used while it's refreshed in the background.
+
+    Set by caches with a `stale_while_revalidate` window.
+    """
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+class ResponseCache(Protocol):
+    """Stores response bodies by key.
+
+    Implement this to plug in your own storage, e.g. a cache shared between processes.
+    Methods may be called concurrently from multiple threads.
+    """
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns the entry for the key, or `None` if there isn't one.
+
+        Expired entries that can be revalidated may be returned with `stale=True`, and expired entries
+        that can be used while they're refreshed with `stale=True, serve_stale=True`.
+        """
+        ...
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Stores the entry for the key, replacing any existing one."""
+        ...
+
+    def refresh(self, key: str) -> None:
+        """Marks the entry for the key as fresh again, after the API confirmed that it hasn't changed."""
+        ...
+
+    def delete(self, key: str) -> None:
+        """Removes the entry for the key, if there is one."""
+        ...
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        ...
+
+    def stats(self) -> CacheStats: ...
+
+
+class MemoryCache:
+    """An in-process `ResponseCache` that expires entries after `ttl` seconds.
+
+    The least recently used entries are evicted once there are more than `max_entries` entries, or once
+    they take up more than `max_bytes` bytes. Expired entries with an `ETag` or `Last-Modified` validator
+    are kept until they're evicted, so that they can be revalidated.
+
+    For `stale_while_revalidate` seconds after an entry expires, calls are answered with it right away
+    while it's refreshed in the background. After that, calls wait for a fresh response.
+
+    Parsed responses are kept alongside the bodies and every hit returns the same object, so results
+    should be treated as read-only.
+
+    A cache can be shared between threads, tasks and clients, e.g. `client.copy()` /
+    `client.with_options()` re-use the cache of the client they were created from.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 300.0,
+        stale_while_revalidate: float = 0.0,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+    ) -> None:
+        if ttl <= 0:
+            raise ValueError(f"Expected `ttl` to be positive but received {ttl}")
+        if stale_while_revalidate < 0:
+            raise ValueError(
+                f"Expected `stale_while_revalidate` to be non-negative but received {stale_while_revalidate}"
+            )
+        if max_entries < 1:
+            raise ValueError(f"Expected `max_entries` to be at least 1 but received {max_entries}")
+        if max_bytes < 1:
+            raise ValueError(f"Expected `max_bytes` to be at least 1 but received {max_bytes}")
+
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # key -> (entry, when it expires in terms of `time.monotonic()`), least recently used first
+        self._entries: OrderedDict[str, Tuple[CacheEntry, float]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._revalidations = 0
+        self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                stale_hits=self._stale_hits,
+                revalidations=self._revalidations,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size=self._size,
+            )
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+
+            entry, expires_at = item
+            now = time.monotonic()
+            if expires_at <= now:
+                if now < expires_at + self.stale_while_revalidate:
+                    self._stale_hits += 1
+                    return entry._replace(stale=True, serve_stale=True)
+
+                self._misses += 1
+                if not entry.revalidatable:
+                    self._remove(key)
+                    return None
+                return entry._replace(stale=True)
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        size = _entry_size(key, entry.value)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                # caching it would evict everything else
+                return
+
+            self._entries[key] = (
+                entry._replace(stale=False, serve_stale=False, created_at=time.time()),
+                time.monotonic() + self.ttl,
+            )
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def refresh(self, key: str) -> None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return
+
+            self._entries[key] = (item[0]._replace(created_at=time.time()), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._revalidations += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._size -= _entry_size(key, item[0].value)
+
+
+class SQLiteCache:
+    """A `ResponseCache` stored in a SQLite database file, so that every process on a host can share it.
+
+    Entries expire after `ttl` seconds, but ones with an `ETag` or `Last-Modified` validator are kept so
+    that they can be revalidated. For `stale_while_revalidate` seconds after an entry expires, calls are
+    answered with it right away while it's refreshed in the background.
+
+    Once the entries take up more than `max_bytes` bytes, expired entries are removed, followed by the least
+    recently used ones. Removed entries leave free pages behind in the database file; call `compact()` from
+    time to time, e.g. from a cron job, to shrink it.
+
+    The database is opened in WAL mode so that reads don't block each other. Each thread and process uses
+    its own connection, so a cache created before forking workers is safe to use in them. The `hits`,
+    `misses`, `stale_hits`, `revalidations` and `evictions` counts in `stats()` are for the current process
+    only.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike[str]],
+        *,
+        ttl: float = 300.0,
+        stale_while_revalidate: float = 0.0,
+        max_bytes: int = 256 * 1024 * 1024,
+        timeout: float = 5.0,
+    ) -> None:
+        if ttl <= 0:
+            raise ValueError(f"Expected `ttl` to be positive but received {ttl}")
+        if stale_while_revalidate < 0:
+            raise ValueError(
+                f"Expected `stale_while_revalidate` to be non-negative but received {stale_while_revalidate}"
+            )
+        if max_bytes < 1:
+            raise ValueError(f"Expected `max_bytes` to be at least 1 but received {max_bytes}")
+
+        self.path = os.fspath(path)
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_bytes = max_bytes
+        # how long to wait for another process to finish writing before giving up
+        self.timeout = timeout
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._revalidations = 0
+        self._evictions = 0
+
+        with self._transaction() as db:
+            (version,) = db.execute("PRAGMA user_version").fetchone()
+            if version != _SCHEMA_VERSION:
+                # the entries can always be fetched again, so there's no need to migrate them
+                db.execute("DROP TABLE IF EXISTS entries")
+                db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, etag TEXT, last_modified TEXT, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    def stats(self) -> CacheStats:
+        entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                stale_hits=self._stale_hits,
+                revalidations=self._revalidations,
+                evictions=self._evictions,
+                entries=entries,
+                size=size,
+            )
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        try:
+            db = self._connection()
+            row = db.execute(
+                "SELECT value, etag, last_modified, created_at, expires_at, accessed_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        except sqlite3.Error as err:
+            # e.g. another process holding a lock for longer than `timeout`, the request is sent instead
+            log.warning("Could not read from the response cache at %s, treating it as a miss: %s", self.path, err)
+            self._count(misses=1)
+            return None
+        if row is None:
+            self._count(misses=1)
+            return None
+
+        value, etag, last_modified, created_at, expires_at, accessed_at = row
+        entry = CacheEntry(value=bytes(value), etag=etag, last_modified=last_modified, created_at=created_at)
+        if expires_at <= now:
+            if now < expires_at + self.stale_while_revalidate:
+                self._count(stale_hits=1)
+                return entry._replace(stale=True, serve_stale=True)
+
+            self._count(misses=1)
+            return entry._replace(stale=True) if entry.revalidatable else None
+
+        # the eviction order only needs to be approximate, so avoid a write for every read of a hot entry
+        if now - accessed_at > 1:
+            try:
+                db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as err:
+                log.debug("Could not update the access time of a response cache entry: %s", err)
+
+        self._count(hits=1)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        try:
+            self._set(key, entry)
+        except sqlite3.Error as err:
+            log.warning("Could not write to the response cache at %s: %s", self.path, err)
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        size = _entry_size(key, entry.value)
+        with self._transaction() as db:
+            if size > self.max_bytes:
+                # caching it would evict everything else
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return
+
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, size, etag, last_modified, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(entry.value), size, entry.etag, entry.last_modified, now, now + self.ttl, now),
+            )
+
+            (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if total <= self.max_bytes:
+                return
+
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            evicted = db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total FROM entries) "
+                "WHERE total > ?)",
+                (self.max_bytes,),
+            ).rowcount
+            self._count(evictions=evicted)
+
+    def refresh(self, key: str) -> None:
+        now = time.time()
+        try:
+            with self._transaction() as db:
+                updated = db.execute(
+                    "UPDATE entries SET created_at = ?, expires_at = ?, accessed_at = ? WHERE key = ?",
+                    (now, now + self.ttl, now, key),
+                ).rowcount
+        except sqlite3.Error as err:
+            log.warning("Could not write to the response cache at %s: %s", self.path, err)
+            return
+        self._count(revalidations=updated)
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._transaction() as db:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as err:
+            log.warning("Could not write to the response cache at %s: %s", self.path, err)
+
+    def clear(self) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM entries")
+
+    def compact(self) -> None:
+        """Removes expired entries and returns the space they used to the filesystem.
+
+        Entries that can still be used while they're refreshed are kept.
+        """
+        with self._transaction() as db:
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time() - self.stale_while_revalidate,))
+
+        db = self._connection()
+        db.execute("VACUUM")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections can't be shared between threads, or used after a fork
+        pid, db = getattr(self._local, "connection", (None, None))
+        if db is None or pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = (os.getpid(), db)
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Generator[sqlite3.Connection, None, None]:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+            db.execute("COMMIT")
+        except BaseException:
+            # the commit itself can fail, e.g. if another process holds a lock for too long
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+
+    def _count(
+        self, *, hits: int = 0, misses: int = 0, stale_hits: int = 0, revalidations: int = 0, evictions: int = 0
+    ) -> None:
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+            self._stale_hits += stale_hits
+            self._revalidations += revalidations
+            self._evictions += evictions
+
+
+def _entry_size(key: str, value: bytes) -> int:
+    return len(key) + len(value)
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a product URL so that links to the same page share a cache entry.
+
+    The scheme and host are lowercased, and the fragment and tracking params such as `utm_source` are
+    removed. The path and the remaining params are kept as they are, as they can be case-sensitive.
+    """
+    parts = urlsplit(url.strip())
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(params), ""))
+
+
+def make_cache_key(endpoint: str, *parts: object) -> str:
+    """Builds a stable key from the endpoint and any JSON serializable values that affect the response."""
+    return f"{endpoint}:{json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)}"
+
+
+def cache_namespace(base_url: object, headers: Mapping[str, object], query: Mapping[str, object]) -> str:
+    """Returns a short hash of what a client's responses depend on besides the call, i.e. the API it talks to and
+    its credentials, so that clients for different environments or accounts sharing a cache don't see each
+    other's entries. It's hashed so that API keys aren't stored in the cache.
+    """
+    parts = (str(base_url), {name.lower(): value for name, value in headers.items() if isinstance(value, str)}, query)
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    ).hexdigest()[:16]
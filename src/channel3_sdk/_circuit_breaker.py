@@ -0,0 +1,175 @@
+"""A per-endpoint circuit breaker that fails fast while an endpoint is unhealthy."""
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+from typing import Dict, List, Tuple, Callable, Optional
+from typing_extensions import Literal
+
+__all__ = ["CircuitBreaker", "CircuitState"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+# an endpoint along with its previous and new state
+_StateChange = Tuple[str, CircuitState, CircuitState]
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probes")
+
+    def __init__(self) -> None:
+        self.state: CircuitState = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        # when each of the trial requests in flight while half-open was let through, oldest first
+        self.probes: List[float] = []
+
+
+class CircuitBreaker:
+    """Stops sending requests to an endpoint after `failure_threshold` consecutive failures.
+
+    Connection errors, timeouts and `5xx` responses count as failures. While the circuit is open, requests
+    to the endpoint raise a `CircuitOpenError` straight away, without being sent or retried. After
+    `recovery_time` seconds the circuit is half-open and up to `half_open_requests` trial requests are let
+    through. If they succeed the circuit closes again, otherwise it re-opens. A trial request that hasn't
+    completed after `probe_timeout` seconds no longer holds up the next one.
+
+    Endpoints are grouped by their path with the last segment removed, e.g. `/v1/products/*`.
+
+    `on_state_change` is called with the endpoint, the previous state and the new state whenever a
+    circuit changes state. It may be called from any thread and must not block.
+
+    A breaker can be shared between threads, tasks and clients, e.g. `client.copy()` /
+    `client.with_options()` re-use the breaker of the client they were created from.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        half_open_requests: int = 1,
+        probe_timeout: float = 60.0,
+        on_state_change: Optional[Callable[[str, CircuitState, CircuitState], object]] = None,
+    ) -> None:
+        if failure_threshold < 1:
+            raise ValueError(f"Expected `failure_threshold` to be at least 1 but received {failure_threshold}")
+        if half_open_requests < 1:
+            raise ValueError(f"Expected `half_open_requests` to be at least 1 but received {half_open_requests}")
+        if probe_timeout <= 0:
+            raise ValueError(f"Expected `probe_timeout` to be positive but received {probe_timeout}")
+
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_requests = half_open_requests
+        self.probe_timeout = probe_timeout
+        self.on_state_change = on_state_change
+
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def state(self, endpoint: str) -> CircuitState:
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            return circuit.state if circuit is not None else "closed"
+
+    def states(self) -> Dict[str, CircuitState]:
+        """Returns the state of every endpoint that has been seen."""
+        with self._lock:
+            return {endpoint: circuit.state for endpoint, circuit in self._circuits.items()}
+
+    def reset(self, endpoint: Optional[str] = None) -> None:
+        """Closes the circuit of the given endpoint, or of all endpoints."""
+        with self._lock:
+            endpoints = list(self._circuits) if endpoint is None else [endpoint]
+            changes = [self._transition(name, self._circuit(name), "closed") for name in endpoints]
+        self._notify(changes)
+
+    def allow(self, endpoint: str) -> Optional[float]:
+        """Returns `None` if a request to the endpoint may be sent, otherwise how long until it may be retried."""
+        retry_after: Optional[float] = None
+        changes: List[Optional[_StateChange]] = []
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == "open":
+                remaining = circuit.opened_at + self.recovery_time - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                changes.append(self._transition(endpoint, circuit, "half_open"))
+
+            if circuit.state == "half_open":
+                now = time.monotonic()
+                while circuit.probes and now - circuit.probes[0] >= self.probe_timeout:
+                    # the trial request is taking too long, let another one through in its place
+                    circuit.probes.pop(0)
+
+                if len(circuit.probes) >= self.half_open_requests:
+                    # the trial requests are still in flight
+                    retry_after = min(self.recovery_time, circuit.probes[0] + self.probe_timeout - now)
+                else:
+                    circuit.probes.append(now)
+
+        self._notify(changes)
+        return retry_after
+
+    def record(self, endpoint: str, success: Optional[bool]) -> None:
+        """Records the outcome of a request that `allow()` let through, `None` if it was inconclusive.
+
+        Every request that `allow()` lets through must be recorded exactly once, including ones that are
+        cancelled, as trial requests hold up others while the circuit is half-open.
+        """
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == "half_open" and circuit.probes:
+                circuit.probes.pop(0)
+
+            change: Optional[_StateChange] = None
+            if success is True:
+                circuit.failures = 0
+                if circuit.state == "half_open":
+                    change = self._transition(endpoint, circuit, "closed")
+            elif success is False:
+                circuit.failures += 1
+                if circuit.state == "half_open" or (
+                    circuit.state == "closed" and circuit.failures >= self.failure_threshold
+                ):
+                    change = self._transition(endpoint, circuit, "open")
+
+        self._notify([change])
+
+    def _circuit(self, endpoint: str) -> _Circuit:
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit()
+        return circuit
+
+    def _transition(self, endpoint: str, circuit: _Circuit, state: CircuitState) -> Optional[_StateChange]:
+        previous = circuit.state
+        circuit.state = state
+        circuit.probes = []
+        if state == "open":
+            circuit.opened_at = time.monotonic()
+        else:
+            circuit.failures = 0
+
+        if previous == state:
+            return None
+        return endpoint, previous, state
+
+    def _notify(self, changes: List[Optional[_StateChange]]) -> None:
+        # called outside of the lock so that callbacks can inspect the breaker
+        for change in changes:
+            if change is None:
+                continue
+
+            endpoint, previous, state = change
+            log.info("Circuit breaker for %s changed from %s to %s", endpoint, previous, state)
+            if self.on_state_change is not None:
+                try:
+                    self.on_state_change(endpoint, previous, state)
+                except Exception:
+                    log.exception("Circuit breaker `on_state_change` callback raised an exception")
@@ -10,6 +10,7 @@ import httpx
 
 from . import _exceptions
 from ._qs import Querystring
+from ._cache import ResponseCache, make_cache_key, cache_namespace
 from ._types import (
     Omit,
     Timeout,
@@ -25,14 +26,21 @@ from ._utils import (
     get_async_library,
 )
 from ._compat import cached_property
+from ._hedging import HedgingPolicy
 from ._version import __version__
+from ._constants import DEFAULT_REQUEST_COMPRESSION_THRESHOLD
 from ._streaming import Stream as Stream, AsyncStream as AsyncStream
 from ._exceptions import Channel3Error, APIStatusError
+from ._rate_limit import RateLimiter
 from ._base_client import (
     DEFAULT_MAX_RETRIES,
     SyncAPIClient,
     AsyncAPIClient,
 )
+from ._compression import RequestCompression
+from ._retry_budget import RetryBudget
+from ._single_flight import SingleFlight
+from ._circuit_breaker import CircuitBreaker
 
 if TYPE_CHECKING:
     from .resources import brands, enrich, search, products, websites, categories, price_tracking
@@ -73,12 +81,46 @@ class Channel3(SyncAPIClient):
         base_url: str | httpx.URL | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         max_retries: int = DEFAULT_MAX_RETRIES,
+        # Give up on a request once this many seconds have passed, including retries, the time spent waiting
+        # between them and any further pages fetched while auto-paginating.
+        deadline: float | None = None,
         default_headers: Mapping[str, str] | None = None,
         default_query: Mapping[str, object] | None = None,
         # Configure a custom httpx client.
         # We provide a `DefaultHttpxClient` class that you can pass to retain the default values we use for `limits`, `timeout` & `follow_redirects`.
         # See the [httpx documentation](https://www.python-httpx.org/api/#client) for more details.
         http_client: httpx.Client | None = None,
+        # Negotiate HTTP/2 so that many concurrent requests are multiplexed over a small number of connections.
+        # Requires the `h2` package, install it with `pip install channel3_sdk[http2]`; if it is missing we fall back to HTTP/1.1.
+        # This option has no effect when a custom `http_client` is given.
+        http2: bool = False,
+        # Grow the pool's `max_keepalive_connections` to match the observed request concurrency, and shrink it
+        # back down once the load drops, so that bursts of concurrent requests don't keep opening new connections.
+        # See `client.pool_stats()` to check whether requests are waiting for a connection.
+        adaptive_pool: bool = False,
+        # Send a duplicate of `GET` requests that are slower than usual, using whichever response arrives first.
+        # See `HedgingPolicy` for how the delay and the extra load are controlled.
+        hedging: HedgingPolicy | None = None,
+        # Pace requests to stay under the API's rate limit, learning the limit from `429` responses.
+        # Share one `RateLimiter` between all of the clients that use the same API key.
+        rate_limiter: RateLimiter | None = None,
+        # Cap retries to a fraction of the requests made, so that retries don't multiply the load during an outage.
+        retry_budget: RetryBudget | None = None,
+        # Fail fast with a `CircuitOpenError` while an endpoint keeps failing, instead of sending and retrying requests.
+        circuit_breaker: CircuitBreaker | None = None,
+        # Share one network call between identical `GET` requests that are in flight at the same time.
+        # See `SingleFlight` for which requests are considered identical.
+        single_flight: SingleFlight | None = None,
+        # Cache the responses of `products.retrieve()`, `products.lookup()`, `brands.retrieve()`, `categories.retrieve()`
+        # and `websites.retrieve()`, e.g. `MemoryCache(ttl=300)`, or `SQLiteCache(path)` to share the cache between processes.
+        # Pass `stale_while_revalidate` to the cache to answer from expired entries while they're refreshed in the background.
+        # Use `client.with_options(response_cache=None)` to bypass the cache for a single call.
+        response_cache: ResponseCache | None = None,
+        # Compress request bodies of at least `request_compression_threshold` bytes, e.g. searches with a `base64_image`.
+        # `"zstd"` requires the `zstandard` package, install it with `pip install channel3_sdk[compression]`;
+        # if it is missing we fall back to gzip.
+        request_compression: RequestCompression | None = None,
+        request_compression_threshold: int = DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
         # Enable or disable schema validation for data returned by the API.
         # When enabled an error APIResponseValidationError is raised
         # if the API responds with invalid data for the expected schema.
@@ -135,8 +177,19 @@ class Channel3(SyncAPIClient):
             version=__version__,
             base_url=base_url,
             max_retries=max_retries,
+            deadline=deadline,
             timeout=timeout,
             http_client=http_client,
+            http2=http2,
+            adaptive_pool=adaptive_pool,
+            hedging=hedging,
+            rate_limiter=rate_limiter,
+            retry_budget=retry_budget,
+            circuit_breaker=circuit_breaker,
+            single_flight=single_flight,
+            response_cache=response_cache,
+            request_compression=request_compression,
+            request_compression_threshold=request_compression_threshold,
             custom_headers=default_headers,
             custom_query=default_query,
             _strict_response_validation=_strict_response_validation,
@@ -225,7 +278,18 @@ class Channel3(SyncAPIClient):
         base_url: str | httpx.URL | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         http_client: httpx.Client | None = None,
+        http2: bool | None = None,
+        adaptive_pool: bool | None = None,
+        hedging: HedgingPolicy | None | NotGiven = not_given,
+        rate_limiter: RateLimiter | None | NotGiven = not_given,
+        retry_budget: RetryBudget | None | NotGiven = not_given,
+        circuit_breaker: CircuitBreaker | None | NotGiven = not_given,
+        single_flight: SingleFlight | None | NotGiven = not_given,
+        response_cache: ResponseCache | None | NotGiven = not_given,
+        request_compression: RequestCompression | None | NotGiven = not_given,
+        request_compression_threshold: int | None = None,
         max_retries: int | NotGiven = not_given,
+        deadline: float | None | NotGiven = not_given,
         default_headers: Mapping[str, str] | None = None,
         set_default_headers: Mapping[str, str] | None = None,
         default_query: Mapping[str, object] | None = None,
@@ -253,7 +317,11 @@ class Channel3(SyncAPIClient):
         elif set_default_query is not None:
             params = set_default_query
 
-        http_client = http_client or self._client
+        if http2 is None:
+            http2 = self.http2
+
+        # only re-use the existing connection pool if it speaks the requested protocol version
+        http_client = http_client or (self._client if http2 == self.http2 else None)
         return self.__class__(
             api_key=api_key or self.api_key,
             language=language or self.language,
@@ -262,7 +330,22 @@ class Channel3(SyncAPIClient):
             base_url=base_url or self.base_url,
             timeout=self.timeout if isinstance(timeout, NotGiven) else timeout,
             http_client=http_client,
+            http2=http2,
+            adaptive_pool=self.adaptive_pool if adaptive_pool is None else adaptive_pool,
+            hedging=self.hedging if isinstance(hedging, NotGiven) else hedging,
+            rate_limiter=self.rate_limiter if isinstance(rate_limiter, NotGiven) else rate_limiter,
+            retry_budget=self.retry_budget if isinstance(retry_budget, NotGiven) else retry_budget,
+            circuit_breaker=self.circuit_breaker if isinstance(circuit_breaker, NotGiven) else circuit_breaker,
+            single_flight=self.single_flight if isinstance(single_flight, NotGiven) else single_flight,
+            response_cache=self.response_cache if isinstance(response_cache, NotGiven) else response_cache,
+            request_compression=self.request_compression
+            if isinstance(request_compression, NotGiven)
+            else request_compression,
+            request_compression_threshold=self.request_compression_threshold
+            if request_compression_threshold is None
+            else request_compression_threshold,
             max_retries=max_retries if is_given(max_retries) else self.max_retries,
+            deadline=self.deadline if isinstance(deadline, NotGiven) else deadline,
             default_headers=headers,
             default_query=params,
             **_extra_kwargs,
@@ -272,6 +355,11 @@ class Channel3(SyncAPIClient):
     # client.with_options(timeout=10).foo.create(...)
     with_options = copy
 
+    def _cache_key(self, endpoint: str, *parts: object) -> str:
+        # the client's locale is sent in headers, so it affects the response just like the request params
+        namespace = cache_namespace(self.base_url, {**self.auth_headers, **self._custom_headers}, self._custom_query)
+        return make_cache_key(f"{namespace}:{endpoint}", self.language, self.country, self.currency, *parts)
+
     @override
     def _make_status_error(
         self,
@@ -323,12 +411,46 @@ class AsyncChannel3(AsyncAPIClient):
         base_url: str | httpx.URL | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         max_retries: int = DEFAULT_MAX_RETRIES,
+        # Give up on a request once this many seconds have passed, including retries, the time spent waiting
+        # between them and any further pages fetched while auto-paginating.
+        deadline: float | None = None,
         default_headers: Mapping[str, str] | None = None,
         default_query: Mapping[str, object] | None = None,
         # Configure a custom httpx client.
         # We provide a `DefaultAsyncHttpxClient` class that you can pass to retain the default values we use for `limits`, `timeout` & `follow_redirects`.
         # See the [httpx documentation](https://www.python-httpx.org/api/#asyncclient) for more details.
         http_client: httpx.AsyncClient | None = None,
+        # Negotiate HTTP/2 so that many concurrent requests are multiplexed over a small number of connections.
+        # Requires the `h2` package, install it with `pip install channel3_sdk[http2]`; if it is missing we fall back to HTTP/1.1.
+        # This option has no effect when a custom `http_client` is given.
+        http2: bool = False,
+        # Grow the pool's `max_keepalive_connections` to match the observed request concurrency, and shrink it
+        # back down once the load drops, so that bursts of concurrent requests don't keep opening new connections.
+        # See `client.pool_stats()` to check whether requests are waiting for a connection.
+        adaptive_pool: bool = False,
+        # Send a duplicate of `GET` requests that are slower than usual, using whichever response arrives first.
+        # See `HedgingPolicy` for how the delay and the extra load are controlled.
+        hedging: HedgingPolicy | None = None,
+        # Pace requests to stay under the API's rate limit, learning the limit from `429` responses.
+        # Share one `RateLimiter` between all of the clients that use the same API key.
+        rate_limiter: RateLimiter | None = None,
+        # Cap retries to a fraction of the requests made, so that retries don't multiply the load during an outage.
+        retry_budget: RetryBudget | None = None,
+        # Fail fast with a `CircuitOpenError` while an endpoint keeps failing, instead of sending and retrying requests.
+        circuit_breaker: CircuitBreaker | None = None,
+        # Share one network call between identical `GET` requests that are in flight at the same time.
+        # See `SingleFlight` for which requests are considered identical.
+        single_flight: SingleFlight | None = None,
+        # Cache the responses of `products.retrieve()`, `products.lookup()`, `brands.retrieve()`, `categories.retrieve()`
+        # and `websites.retrieve()`, e.g. `MemoryCache(ttl=300)`, or `SQLiteCache(path)` to share the cache between processes.
+        # Pass `stale_while_revalidate` to the cache to answer from expired entries while they're refreshed in the background.
+        # Use `client.with_options(response_cache=None)` to bypass the cache for a single call.
+        response_cache: ResponseCache | None = None,
+        # Compress request bodies of at least `request_compression_threshold` bytes, e.g. searches with a `base64_image`.
+        # `"zstd"` requires the `zstandard` package, install it with `pip install channel3_sdk[compression]`;
+        # if it is missing we fall back to gzip.
+        request_compression: RequestCompression | None = None,
+        request_compression_threshold: int = DEFAULT_REQUEST_COMPRESSION_THRESHOLD,
         # Enable or disable schema validation for data returned by the API.
         # When enabled an error APIResponseValidationError is raised
         # if the API responds with invalid data for the expected schema.
@@ -385,8 +507,19 @@ class AsyncChannel3(AsyncAPIClient):
             version=__version__,
             base_url=base_url,
             max_retries=max_retries,
+            deadline=deadline,
             timeout=timeout,
             http_client=http_client,
+            http2=http2,
+            adaptive_pool=adaptive_pool,
+            hedging=hedging,
+            rate_limiter=rate_limiter,
+            retry_budget=retry_budget,
+            circuit_breaker=circuit_breaker,
+            single_flight=single_flight,
+            response_cache=response_cache,
+            request_compression=request_compression,
+            request_compression_threshold=request_compression_threshold,
             custom_headers=default_headers,
             custom_query=default_query,
             _strict_response_validation=_strict_response_validation,
@@ -475,7 +608,18 @@ class AsyncChannel3(AsyncAPIClient):
         base_url: str | httpx.URL | None = None,
         timeout: float | Timeout | None | NotGiven = not_given,
         http_client: httpx.AsyncClient | None = None,
+        http2: bool | None = None,
+        adaptive_pool: bool | None = None,
+        hedging: HedgingPolicy | None | NotGiven = not_given,
+        rate_limiter: RateLimiter | None | NotGiven = not_given,
+        retry_budget: RetryBudget | None | NotGiven = not_given,
+        circuit_breaker: CircuitBreaker | None | NotGiven = not_given,
+        single_flight: SingleFlight | None | NotGiven = not_given,
+        response_cache: ResponseCache | None | NotGiven = not_given,
+        request_compression: RequestCompression | None | NotGiven = not_given,
+        request_compression_threshold: int | None = None,
         max_retries: int | NotGiven = not_given,
+        deadline: float | None | NotGiven = not_given,
         default_headers: Mapping[str, str] | None = None,
         set_default_headers: Mapping[str, str] | None = None,
         default_query: Mapping[str, object] | None = None,
@@ -503,7 +647,11 @@ class AsyncChannel3(AsyncAPIClient):
         elif set_default_query is not None:
             params = set_default_query
 
-        http_client = http_client or self._client
+        if http2 is None:
+            http2 = self.http2
+
+        # only re-use the existing connection pool if it speaks the requested protocol version
+        http_client = http_client or (self._client if http2 == self.http2 else None)
         return self.__class__(
             api_key=api_key or self.api_key,
             language=language or self.language,
@@ -512,7 +660,22 @@ class AsyncChannel3(AsyncAPIClient):
             base_url=base_url or self.base_url,
             timeout=self.timeout if isinstance(timeout, NotGiven) else timeout,
             http_client=http_client,
+            http2=http2,
+            adaptive_pool=self.adaptive_pool if adaptive_pool is None else adaptive_pool,
+            hedging=self.hedging if isinstance(hedging, NotGiven) else hedging,
+            rate_limiter=self.rate_limiter if isinstance(rate_limiter, NotGiven) else rate_limiter,
+            retry_budget=self.retry_budget if isinstance(retry_budget, NotGiven) else retry_budget,
+            circuit_breaker=self.circuit_breaker if isinstance(circuit_breaker, NotGiven) else circuit_breaker,
+            single_flight=self.single_flight if isinstance(single_flight, NotGiven) else single_flight,
+            response_cache=self.response_cache if isinstance(response_cache, NotGiven) else response_cache,
+            request_compression=self.request_compression
+            if isinstance(request_compression, NotGiven)
+            else request_compression,
+            request_compression_threshold=self.request_compression_threshold
+            if request_compression_threshold is None
+            else request_compression_threshold,
             max_retries=max_retries if is_given(max_retries) else self.max_retries,
+            deadline=self.deadline if isinstance(deadline, NotGiven) else deadline,
             default_headers=headers,
             default_query=params,
             **_extra_kwargs,
@@ -522,6 +685,11 @@ class AsyncChannel3(AsyncAPIClient):
     # client.with_options(timeout=10).foo.create(...)
     with_options = copy
 
+    def _cache_key(self, endpoint: str, *parts: object) -> str:
+        # the client's locale is sent in headers, so it affects the response just like the request params
+        namespace = cache_namespace(self.base_url, {**self.auth_headers, **self._custom_headers}, self._custom_query)
+        return make_cache_key(f"{namespace}:{endpoint}", self.language, self.country, self.currency, *parts)
+
     @override
     def _make_status_error(
         self,
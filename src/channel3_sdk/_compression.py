@@ -0,0 +1,87 @@
+"""Helpers for compressing request bodies and negotiating compressed responses."""
+
+from __future__ import annotations
+
+import gzip
+import logging
+from typing import Optional
+from typing_extensions import Literal
+
+import httpx
+
+__all__ = ["RequestCompression"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+RequestCompression = Literal["gzip", "zstd"]
+
+# response encodings in the order we'd like the server to pick them, zstd and brotli
+# compress JSON better than gzip but can only be decoded if the optional packages are installed
+_PREFERRED_RESPONSE_ENCODINGS = ("zstd", "br", "gzip", "deflate")
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401  # pyright: ignore[reportUnusedImport]
+    except ImportError:
+        return False
+    return True
+
+
+def _brotli_available() -> bool:
+    # httpx decodes brotli with either package
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        return True
+    return False
+
+
+def _httpx_decodes_zstd() -> bool:
+    # httpx only gained a zstd decoder in 0.27.1
+    try:
+        version = tuple(int(part) for part in httpx.__version__.split(".")[:3])
+    except ValueError:
+        return False
+    return version >= (0, 27, 1)
+
+
+def resolve_request_compression(compression: Optional[RequestCompression]) -> Optional[RequestCompression]:
+    """Returns the encoding to compress request bodies with, falling back to gzip if zstd isn't available."""
+    if compression == "zstd" and not zstd_available():
+        log.warning(
+            "zstd request compression was requested but the `zstandard` package is not installed, falling back to gzip; "
+            "install the package with the `compression` extra to enable it"
+        )
+        return "gzip"
+    return compression
+
+
+def compress_body(content: bytes, encoding: RequestCompression) -> bytes:
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(content)
+
+    # a fixed mtime keeps the output identical across retries of the same request
+    return gzip.compress(content, mtime=0)
+
+
+def _build_accept_encoding() -> str:
+    # probed through the optional packages rather than httpx's private decoder table, which may move
+    supported = {
+        "zstd": zstd_available() and _httpx_decodes_zstd(),
+        "br": _brotli_available(),
+        "gzip": True,
+        "deflate": True,
+    }
+    encodings = [encoding for encoding in _PREFERRED_RESPONSE_ENCODINGS if supported[encoding]]
+    return ", ".join(
+        encoding if index == 0 else f"{encoding};q={1 - index / 10:.1f}" for index, encoding in enumerate(encodings)
+    )
+
+
+ACCEPT_ENCODING = _build_accept_encoding()
+"""Lists every encoding httpx can decode, most preferred first."""
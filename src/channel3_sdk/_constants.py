@@ -9,6 +9,8 @@ OVERRIDE_CAST_TO_HEADER = "____stainless_override_cast_to"
 DEFAULT_TIMEOUT = httpx.Timeout(timeout=60, connect=5.0)
 DEFAULT_MAX_RETRIES = 2
 DEFAULT_CONNECTION_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+# request bodies smaller than this are sent uncompressed even when compression is enabled
+DEFAULT_REQUEST_COMPRESSION_THRESHOLD = 16 * 1024
 
 INITIAL_RETRY_DELAY = 0.5
 MAX_RETRY_DELAY = 8.0
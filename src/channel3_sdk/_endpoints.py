@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """Groups requests to the same resource, e.g. `GET /v1/products/prod_123` becomes `GET /v1/products/*`.
+
+    Resource paths end with the ID being retrieved, e.g. `/v1/products/{product_id}`, so dropping
+    the last segment groups every retrieval of the same resource together.
+    """
+    segments = path.rstrip("/").split("/")
+    if len(segments) > 3:
+        segments[-1] = "*"
+    return f"{method.upper()} {'/'.join(segments)}"
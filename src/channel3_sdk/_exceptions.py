@@ -76,6 +76,24 @@ class APITimeoutError(APIConnectionError):
         super().__init__(message="Request timed out.", request=request)
 
 
+class CircuitOpenError(APIError):
+    """Raised without sending the request when the circuit breaker for its endpoint is open."""
+
+    endpoint: str
+    retry_after: float
+    """How long until the circuit breaker lets a trial request through again, in seconds."""
+
+    def __init__(self, *, endpoint: str, retry_after: float, request: httpx.Request) -> None:
+        super().__init__(
+            f"The circuit breaker for `{endpoint}` is open after repeated failures, "
+            f"retry in {retry_after:.1f} seconds.",
+            request,
+            body=None,
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
 class BadRequestError(APIStatusError):
     status_code: Literal[400] = 400  # pyright: ignore[reportIncompatibleVariableOverride]
 
@@ -0,0 +1,192 @@
+"""Hedged requests: re-sending slow idempotent requests so that the fastest response wins."""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Dict, Deque, TypeVar, Callable, Optional
+from weakref import WeakKeyDictionary
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httpx
+
+from ._pool import get_pool_limits
+from ._models import BaseModel
+from ._constants import DEFAULT_CONNECTION_LIMITS
+
+__all__ = ["HedgingPolicy", "HedgingStats"]
+
+_T = TypeVar("_T")
+
+
+class HedgingStats(BaseModel):
+    requests: int = 0
+    """The number of requests that were eligible for hedging."""
+
+    hedged: int = 0
+    """The number of duplicate requests that were sent."""
+
+    wins: int = 0
+    """How many of the duplicate requests responded before the original request."""
+
+    skipped: int = 0
+    """Requests that were slow enough to be hedged but weren't, because the `max_ratio` budget was used up."""
+
+
+class HedgingPolicy:
+    """Sends a duplicate of a `GET` request that hasn't completed after a delay, the first response wins.
+
+    The delay is either fixed, or the observed `percentile` latency of the endpoint once `min_samples`
+    requests to it have completed. Endpoints are grouped by their path with the last segment removed,
+    e.g. `/v1/products/*`.
+
+    Hedging can increase the load on the API, so at most `max_ratio` extra requests are sent for
+    every eligible request, with unused budget carrying over for up to `max_burst` hedges.
+
+    A policy can be shared between clients, e.g. `client.copy()` / `client.with_options()`
+    re-use the policy of the client they were created from.
+    """
+
+    def __init__(
+        self,
+        *,
+        delay: Optional[float] = None,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        max_ratio: float = 0.05,
+        max_burst: float = 10.0,
+        window: int = 200,
+    ) -> None:
+        if delay is not None and delay < 0:
+            raise ValueError(f"Expected `delay` to be positive but received {delay}")
+        if not 0 < percentile < 1:
+            raise ValueError(f"Expected `percentile` to be between 0 and 1 but received {percentile}")
+        if max_ratio < 0:
+            raise ValueError(f"Expected `max_ratio` to be positive but received {max_ratio}")
+
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.max_burst = max_burst
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._requests = 0
+        self._hedged = 0
+        self._wins = 0
+        self._skipped = 0
+
+    def stats(self) -> HedgingStats:
+        with self._lock:
+            return HedgingStats(requests=self._requests, hedged=self._hedged, wins=self._wins, skipped=self._skipped)
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Returns how long to wait before hedging a request to the given endpoint, or `None` if it shouldn't be hedged.
+
+        Every call counts as an eligible request, adding to the hedging budget.
+        """
+        with self._lock:
+            self._requests += 1
+            self._tokens = min(self.max_burst, self._tokens + self.max_ratio)
+
+            if self.delay is not None:
+                return self.delay
+
+            latencies = self._latencies.get(endpoint)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+
+            ordered = sorted(latencies)
+            return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+
+    def acquire(self) -> bool:
+        """Takes a hedge from the budget, returns `False` if it's exhausted."""
+        with self._lock:
+            if self._tokens < 1:
+                self._skipped += 1
+                return False
+
+            self._tokens -= 1
+            self._hedged += 1
+            return True
+
+    def record(self, endpoint: str, latency: float, *, hedge_won: bool = False) -> None:
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = deque(maxlen=self.window)
+            latencies.append(latency)
+
+            if hedge_won:
+                self._wins += 1
+
+
+class HedgeExecutor:
+    """A bounded thread pool that the attempts of hedged requests are sent from.
+
+    Attempts only run on a thread that's free right away, as waiting for one would delay the very requests
+    we're trying to speed up, so callers reserve a thread before submitting and send the request themselves
+    when none is free.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="channel3-hedge")
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def reserve(self) -> bool:
+        """Reserves a thread for a call to `submit()`, returns `False` if they're all busy."""
+        return self._slots.acquire(blocking=False)
+
+    def release(self) -> None:
+        """Gives back a reservation that won't be submitted."""
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., _T], *args: Any, **kwargs: Any) -> Future[_T]:
+        """Runs the function on the thread reserved by `reserve()`, which is released once it completes or is cancelled."""
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_executors: "WeakKeyDictionary[httpx.Client, HedgeExecutor]" = WeakKeyDictionary()
+_executors_lock = threading.Lock()
+
+
+def get_hedge_executor(http_client: httpx.Client) -> HedgeExecutor:
+    """Returns the thread pool for hedged requests on the given client, creating one the first time the client is seen.
+
+    Clients that share an httpx client share the thread pool too. It has a thread for each connection the
+    pool allows, as any more would only wait for a connection.
+    """
+    with _executors_lock:
+        executor = _executors.get(http_client)
+        if executor is None:
+            max_connections, _ = get_pool_limits(http_client)
+            executor = _executors[http_client] = HedgeExecutor(
+                max_connections or DEFAULT_CONNECTION_LIMITS.max_connections or 1
+            )
+        return executor
+
+
+def shutdown_hedge_executor(http_client: httpx.Client) -> None:
+    with _executors_lock:
+        executor = _executors.pop(http_client, None)
+    if executor is not None:
+        executor.shutdown()
+
+
+def close_response(future: Future[httpx.Response]) -> None:
+    """Closes the response of a request that lost the race, once it completes."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
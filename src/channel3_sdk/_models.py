@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import time
 import inspect
 import weakref
 from typing import (
@@ -8,6 +9,7 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Type,
+    Tuple,
     Union,
     Generic,
     TypeVar,
@@ -878,6 +880,7 @@ class FinalRequestOptionsInput(TypedDict, total=False):
     headers: Headers
     max_retries: int
     timeout: float | Timeout | None
+    deadline: float | None
     files: HttpxRequestFiles | None
     idempotency_key: str
     content: Union[bytes, bytearray, IO[bytes], Iterable[bytes], AsyncIterable[bytes], None]
@@ -894,9 +897,20 @@ class FinalRequestOptions(pydantic.BaseModel):
     headers: Union[Headers, NotGiven] = NotGiven()
     max_retries: Union[int, NotGiven] = NotGiven()
     timeout: Union[float, Timeout, None, NotGiven] = NotGiven()
+    deadline: Union[float, None, NotGiven] = NotGiven()
+    # when the deadline passes, in terms of `time.monotonic()`; carried over to the next page when paginating
+    deadline_at: Union[float, None] = None
     files: Union[HttpxRequestFiles, None] = None
     idempotency_key: Union[str, None] = None
     post_parser: Union[Callable[[Any], Any], NotGiven] = NotGiven()
+    # identifies the response in the client's `response_cache`, only set for cacheable requests
+    cache_key: Union[str, None] = None
+    # cached responses older than this many seconds aren't used, e.g. to honour `max_staleness_hours`
+    cache_max_age: Union[float, None] = None
+    # returns other `(cache_key, model)` entries that can be cached from the parsed response
+    cache_related: Union[Callable[[Any], Iterable[Tuple[str, Any]]], None] = None
+    # the stale `CacheEntry` that this request is refreshing in the background
+    stale_entry: Any = None
     follow_redirects: Union[bool, None] = None
 
     content: Union[bytes, bytearray, IO[bytes], Iterable[bytes], AsyncIterable[bytes], None] = None
@@ -917,6 +931,11 @@ class FinalRequestOptions(pydantic.BaseModel):
             return max_retries
         return self.max_retries
 
+    def get_remaining_time(self) -> float | None:
+        if self.deadline_at is None:
+            return None
+        return self.deadline_at - time.monotonic()
+
     def _strip_raw_response_header(self) -> None:
         if not is_given(self.headers):
             return
@@ -0,0 +1,293 @@
+"""Helpers for preparing and inspecting the connection pool of the underlying httpx client."""
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Tuple, Union, Optional
+from weakref import WeakKeyDictionary
+
+import httpx
+
+from ._models import BaseModel
+
+__all__ = ["WarmupConnection", "WarmupResult", "PoolStats"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# how long the adaptive pool sizing waits before shrinking the keep-alive limit
+# back down to the peak concurrency observed since the last adjustment
+ADAPTIVE_POOL_WINDOW = 30.0
+
+
+class WarmupConnection(BaseModel):
+    """Timings for a single connection opened by `client.warmup()`, in seconds.
+
+    Phases are `None` when the transport doesn't report them, e.g. when a custom
+    transport is used or when an idle connection from the pool was re-used.
+    """
+
+    connect: Optional[float] = None
+    """Time spent establishing the TCP connection, including name resolution."""
+
+    tls: Optional[float] = None
+    """Time spent on the TLS handshake."""
+
+    request: Optional[float] = None
+    """Time from sending the warm-up request to receiving the response headers."""
+
+    total: float
+    """Wall-clock time for this connection, including any time spent waiting for the pool."""
+
+
+class WarmupResult(BaseModel):
+    dns: Optional[float] = None
+    """Time spent resolving the `base_url` host, in seconds."""
+
+    connections: List[WarmupConnection]
+    """One entry for every connection that was successfully opened."""
+
+    failed: int = 0
+    """The number of connections that could not be opened."""
+
+    elapsed: float
+    """Total wall-clock time of the warm-up, in seconds."""
+
+
+class PoolStats(BaseModel):
+    """A snapshot of the client's connection pool.
+
+    The connection and request counts are `None` when the pool can't be inspected,
+    e.g. because a custom transport is used.
+    """
+
+    connections: Optional[int] = None
+    """The number of open connections."""
+
+    in_use: Optional[int] = None
+    """Connections that are currently handling a request, or are still being established."""
+
+    idle: Optional[int] = None
+    """Connections that are kept alive, ready to be re-used."""
+
+    pending: Optional[int] = None
+    """Requests that are queued waiting for a connection to become available."""
+
+    max_connections: Optional[int] = None
+
+    max_keepalive_connections: Optional[int] = None
+    """The current keep-alive limit, this changes over time when `adaptive_pool=True`."""
+
+    requests: int = 0
+    """The number of requests for which the time spent waiting for a connection was measured."""
+
+    pool_timeouts: int = 0
+    """Requests that gave up waiting for a connection, see `httpx.PoolTimeout`."""
+
+    wait_time_total: float = 0.0
+    """The total time requests spent waiting for a connection, in seconds."""
+
+    wait_time_max: float = 0.0
+    """The longest time a single request spent waiting for a connection, in seconds."""
+
+    @property
+    def wait_time_mean(self) -> float:
+        if not self.requests:
+            return 0.0
+        return self.wait_time_total / self.requests
+
+
+class ConnectionTrace:
+    """Records the duration of each phase reported through the httpcore `trace` request extension.
+
+    Instances are callable so they can be passed directly to a sync client, async clients
+    must be given the `atrace` method instead.
+    """
+
+    def __init__(self) -> None:
+        self._started: Dict[str, float] = {}
+        self.durations: Dict[str, float] = {}
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:  # noqa: ARG002
+        self._record(event_name)
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:  # noqa: ARG002
+        self._record(event_name)
+
+    def _record(self, event_name: str) -> None:
+        # events are named like `connection.connect_tcp.started` or `http11.send_request_headers.complete`
+        name, _, stage = event_name.rpartition(".")
+        now = time.monotonic()
+        if stage == "started":
+            self._started[name] = now
+        elif stage in ("complete", "failed"):
+            started = self._started.pop(name, None)
+            if started is not None:
+                self.durations[name] = self.durations.get(name, 0.0) + (now - started)
+
+    def phase(self, *names: str) -> Optional[float]:
+        """Returns the summed duration of the given phases, ignoring the protocol prefix, or `None` if none were seen."""
+        durations = [duration for name, duration in self.durations.items() if name.split(".", 1)[-1] in names]
+        if not durations:
+            return None
+        return sum(durations)
+
+    def to_warmup_connection(self, *, total: float) -> WarmupConnection:
+        return WarmupConnection(
+            connect=self.phase("connect_tcp", "connect_unix_socket"),
+            tls=self.phase("start_tls"),
+            request=self.phase("send_request_headers", "send_request_body", "receive_response_headers"),
+            total=total,
+        )
+
+
+def get_connection_pool(http_client: Union[httpx.Client, httpx.AsyncClient]) -> Any:
+    """Returns the httpcore connection pool backing the given client, if it uses the default httpx transport."""
+    transport = getattr(http_client, "_transport", None)
+    return getattr(transport, "_pool", None)
+
+
+def get_pool_limits(http_client: Union[httpx.Client, httpx.AsyncClient]) -> Tuple[Optional[int], Optional[int]]:
+    """Returns the `(max_connections, max_keepalive_connections)` limits of the client's pool, where known."""
+    pool = get_connection_pool(http_client)
+    if pool is None:
+        return None, None
+    return getattr(pool, "_max_connections", None), getattr(pool, "_max_keepalive_connections", None)
+
+
+class ConnectionWait:
+    """Records when the pool hands a request a connection, through the httpcore `trace` request extension.
+
+    The first event httpcore reports for a request is either the start of a new connection
+    or sending the request on an existing one, anything before that was spent in the pool's queue.
+    """
+
+    __slots__ = ("queued_at", "acquired_at")
+
+    def __init__(self) -> None:
+        self.queued_at = time.monotonic()
+        self.acquired_at: Optional[float] = None
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:  # noqa: ARG002
+        if self.acquired_at is None:
+            self.acquired_at = time.monotonic()
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:  # noqa: ARG002
+        if self.acquired_at is None:
+            self.acquired_at = time.monotonic()
+
+
+class PoolMonitor:
+    """Collects connection wait times for, and optionally resizes, the pool of a single httpx client.
+
+    Monitors are shared between every SDK client that uses the same httpx client, see `get_pool_monitor()`.
+    """
+
+    def __init__(self, pool: Any) -> None:
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._pool_timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        # adaptive sizing never shrinks the keep-alive limit below what was configured
+        self._baseline_keepalive: Optional[int] = getattr(pool, "_max_keepalive_connections", None)
+        self._window_started_at = time.monotonic()
+        self._window_peak = 0
+
+    def track(self, request: httpx.Request, *, adapt: bool, is_async: bool) -> Optional[ConnectionWait]:
+        """Starts measuring how long the given request waits for a connection, returns `None` if it can't be measured."""
+        if self._pool is None or "trace" in request.extensions:
+            return None
+
+        if adapt:
+            # requests that are already in the pool, plus the one we're about to send
+            self._adapt(len(self._pool._requests) + 1)
+
+        wait = ConnectionWait()
+        request.extensions["trace"] = wait.atrace if is_async else wait
+        return wait
+
+    def record(self, wait: Optional[ConnectionWait], *, pool_timeout: bool = False) -> None:
+        if wait is None:
+            return
+
+        acquired_at = wait.acquired_at
+        if acquired_at is None:
+            if not pool_timeout:
+                # the request failed before it reached the pool, or the transport doesn't report events
+                return
+            acquired_at = time.monotonic()
+
+        waited = acquired_at - wait.queued_at
+        with self._lock:
+            self._requests += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+            if pool_timeout:
+                self._pool_timeouts += 1
+
+    def _adapt(self, concurrency: int) -> None:
+        pool = self._pool
+        current: int = pool._max_keepalive_connections
+        now = time.monotonic()
+
+        with self._lock:
+            self._window_peak = max(self._window_peak, concurrency)
+            if concurrency > current:
+                # grow straight away so that the connections opened for this burst are kept alive
+                target = concurrency
+            elif now - self._window_started_at >= ADAPTIVE_POOL_WINDOW:
+                target = max(self._baseline_keepalive or 0, self._window_peak)
+                self._window_started_at = now
+                self._window_peak = concurrency
+            else:
+                return
+
+            target = min(target, pool._max_connections)
+            if target == current:
+                return
+
+            # surplus idle connections are closed by the pool the next time a request is assigned
+            pool._max_keepalive_connections = target
+
+        log.debug("Resized the connection pool keep-alive limit from %i to %i", current, target)
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            measured: Dict[str, Any] = {
+                "requests": self._requests,
+                "pool_timeouts": self._pool_timeouts,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_max": self._wait_time_max,
+            }
+
+        pool = self._pool
+        if pool is None:
+            return PoolStats(**measured)
+
+        connections = [connection for connection in list(pool._connections) if not connection.is_closed()]
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return PoolStats(
+            connections=len(connections),
+            in_use=len(connections) - idle,
+            idle=idle,
+            pending=sum(1 for request in list(pool._requests) if request.is_queued()),
+            max_connections=pool._max_connections,
+            max_keepalive_connections=pool._max_keepalive_connections,
+            **measured,
+        )
+
+
+_monitors: "WeakKeyDictionary[Union[httpx.Client, httpx.AsyncClient], PoolMonitor]" = WeakKeyDictionary()
+_monitors_lock = threading.Lock()
+
+
+def get_pool_monitor(http_client: Union[httpx.Client, httpx.AsyncClient]) -> PoolMonitor:
+    """Returns the monitor for the given client's pool, creating one the first time the client is seen."""
+    with _monitors_lock:
+        monitor = _monitors.get(http_client)
+        if monitor is None:
+            monitor = _monitors[http_client] = PoolMonitor(get_connection_pool(http_client))
+        return monitor
@@ -0,0 +1,175 @@
+"""Columnar storage for the price history of many products."""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, List, Union, Mapping, NamedTuple, cast
+from datetime import datetime, timezone, timedelta
+
+from ._utils import parse_datetime
+from ._models import construct_type
+from ._exceptions import APIError
+from .types.price_statistics import PriceStatistics
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+__all__ = ["PriceHistoryArrays", "PriceHistoryColumns"]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401  # pyright: ignore[reportUnusedImport]
+    except ImportError:
+        return False
+    return True
+
+
+def parse_timestamp(value: Union[datetime, str, int, float]) -> int:
+    """Returns a timestamp from the API as whole microseconds since the Unix epoch, taking naive ones to be UTC."""
+    parsed = parse_datetime(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+class PriceHistoryArrays(NamedTuple):
+    """The columns of a `PriceHistoryColumns` as NumPy arrays that share its memory."""
+
+    product_index: npt.NDArray[np.int32]
+    """The index into `PriceHistoryColumns.product_ids` of each point's product."""
+
+    timestamps: npt.NDArray[np.int64]
+    """When each price was seen, in microseconds since the Unix epoch, UTC.
+
+    Use `timestamps.view("datetime64[us]")` for NumPy datetimes.
+    """
+
+    prices: npt.NDArray[np.float64]
+    """The price of each point."""
+
+    currency_codes: npt.NDArray[np.int32]
+    """The index into `PriceHistoryColumns.currencies` of each point's currency."""
+
+    offsets: npt.NDArray[np.int64]
+    """The points of product `i` are the rows `offsets[i]:offsets[i + 1]`."""
+
+
+class PriceHistoryColumns:
+    """The price history of many products, stored as one column per field rather than a model per point.
+
+    Each row is a single price point. The points of a product are stored next to each other, in the order
+    the API returned them, and products are numbered in the order their history was added.
+    """
+
+    product_ids: List[str]
+    """The canonical product IDs, in the order they're numbered by `product_index`."""
+
+    product_index: array[int]
+    """The index into `product_ids` of each point's product, as 32-bit integers."""
+
+    timestamps: array[int]
+    """When each price was seen, in microseconds since the Unix epoch, UTC, as 64-bit integers."""
+
+    prices: array[float]
+    """The price of each point, as 64-bit floats."""
+
+    currency_codes: array[int]
+    """The index into `currencies` of each point's currency, as 32-bit integers."""
+
+    currencies: List[str]
+    """The distinct currency codes, in the order they were first seen."""
+
+    offsets: array[int]
+    """The points of product `i` are the rows `offsets[i]:offsets[i + 1]`, as 64-bit integers."""
+
+    statistics: Dict[str, PriceStatistics]
+    """The statistics the API computed for each product that has them."""
+
+    failed: Dict[str, APIError]
+    """The products whose history couldn't be retrieved, with the error for each."""
+
+    def __init__(self) -> None:
+        self.product_ids = []
+        self.product_index = array("i")
+        self.timestamps = array("q")
+        self.prices = array("d")
+        self.currency_codes = array("i")
+        self.currencies = []
+        self.offsets = array("q", [0])
+        self.statistics = {}
+        self.failed = {}
+        self._indices: Dict[str, int] = {}
+        self._currency_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __contains__(self, canonical_product_id: object) -> bool:
+        return canonical_product_id in self._indices
+
+    def rows(self, canonical_product_id: str) -> slice:
+        """Returns the rows that hold the points of the given product."""
+        index = self._indices[canonical_product_id]
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+    def add(self, canonical_product_id: str, data: Mapping[str, Any]) -> None:
+        """Appends a product's price history from the JSON the API returned for it.
+
+        The points are read straight from the JSON without building a `PriceHistoryPoint` for each one.
+        """
+        if canonical_product_id in self._indices:
+            raise ValueError(f"The price history of {canonical_product_id!r} has already been added")
+
+        index = len(self.product_ids)
+        points: List[Mapping[str, Any]] = data.get("history") or []
+        # read every point before appending so that a malformed one doesn't leave the columns out of step
+        timestamps = [parse_timestamp(point["timestamp"]) for point in points]
+        prices = [float(point["price"]) for point in points]
+        currencies: List[str] = [point["currency"] for point in points]
+        for currency in currencies:
+            if currency not in self._currency_codes:
+                self._currency_codes[currency] = len(self.currencies)
+                self.currencies.append(currency)
+
+        self.timestamps.extend(timestamps)
+        self.prices.extend(prices)
+        self.currency_codes.extend([self._currency_codes[currency] for currency in currencies])
+        self.product_index.extend([index] * len(points))
+        self.offsets.append(len(self.prices))
+        self.product_ids.append(canonical_product_id)
+        self._indices[canonical_product_id] = index
+
+        statistics = data.get("statistics")
+        if statistics is not None:
+            self.statistics[canonical_product_id] = cast(
+                PriceStatistics, construct_type(type_=PriceStatistics, value=statistics)
+            )
+
+    def to_numpy(self) -> PriceHistoryArrays:
+        """Returns the columns as NumPy arrays without copying them.
+
+        Because the arrays share memory with the columns, `add()` raises `BufferError` while any of them are
+        still referenced.
+
+        Requires the `numpy` package, install it with `pip install channel3_sdk[numpy]`.
+        """
+        if not numpy_available():
+            raise ImportError(
+                "`PriceHistoryColumns.to_numpy()` requires the `numpy` package; "
+                "install it with the `numpy` extra, e.g. `pip install channel3_sdk[numpy]`"
+            )
+
+        import numpy as np
+
+        return PriceHistoryArrays(
+            product_index=np.frombuffer(self.product_index, dtype=np.int32),
+            timestamps=np.frombuffer(self.timestamps, dtype=np.int64),
+            prices=np.frombuffer(self.prices, dtype=np.float64),
+            currency_codes=np.frombuffer(self.currency_codes, dtype=np.int32),
+            offsets=np.frombuffer(self.offsets, dtype=np.int64),
+        )
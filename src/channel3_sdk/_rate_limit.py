@@ -0,0 +1,158 @@
+"""A client-side rate limiter that learns the allowed request rate from `429` responses."""
+
+from __future__ import annotations
+
+import time
+import threading
+from typing import Deque, Optional
+from collections import deque
+
+from ._models import BaseModel
+
+__all__ = ["RateLimiter", "RateLimiterStats"]
+
+# how far back we look to estimate the request rate at the time of the first `429`
+_OBSERVATION_WINDOW = 10.0
+
+
+class RateLimiterStats(BaseModel):
+    rate: Optional[float] = None
+    """The current request rate limit, in requests per second, `None` while unlimited."""
+
+    rate_limited: int = 0
+    """The number of `429` responses received."""
+
+    delayed: int = 0
+    """The number of requests that were held back before being sent."""
+
+    delay_total: float = 0.0
+    """The total time requests were held back for, in seconds."""
+
+
+class RateLimiter:
+    """Paces outgoing requests so that clients sharing it stay under the API's rate limit.
+
+    The limiter starts out at `rate` requests per second, or `max_rate`, or unlimited if neither is given.
+    When the API responds with a `429` the limit is multiplied by `backoff` and every request is paused for
+    as long as the `retry-after` header asks. Without further `429`s the limit recovers by `recovery` per
+    second, up to `max_rate` or else `rate`, and is reset to its starting value after `forget_after` seconds.
+
+    Rate limited requests are re-sent once the limiter allows it, up to `max_attempts` times, without
+    counting towards the client's `max_retries`.
+
+    A limiter is safe to share between threads, tasks and clients, e.g. `client.copy()` /
+    `client.with_options()` re-use the limiter of the client they were created from.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        min_rate: float = 1.0,
+        burst: int = 1,
+        backoff: float = 0.5,
+        recovery: float = 0.05,
+        forget_after: float = 60.0,
+        max_attempts: int = 10,
+    ) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError(f"Expected `rate` to be positive but received {rate}")
+        if burst < 1:
+            raise ValueError(f"Expected `burst` to be at least 1 but received {burst}")
+        if not 0 < backoff < 1:
+            raise ValueError(f"Expected `backoff` to be between 0 and 1 but received {backoff}")
+
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.backoff = backoff
+        self.recovery = recovery
+        self.forget_after = forget_after
+        self.max_attempts = max_attempts
+
+        if rate is None:
+            rate = max_rate
+        elif max_rate is not None:
+            rate = min(rate, max_rate)
+
+        self._lock = threading.Lock()
+        self._initial_rate = rate
+        # recovery never raises the limit above this, a `rate` given on its own caps it too
+        self._ceiling = max_rate if max_rate is not None else rate
+        self._rate = rate
+        # the earliest time at which the next request may be sent
+        self._next_at = 0.0
+        self._adjusted_at = time.monotonic()
+        self._rate_limited_at: Optional[float] = None
+        self._recent: Deque[float] = deque(maxlen=1000)
+        self._rate_limited = 0
+        self._delayed = 0
+        self._delay_total = 0.0
+
+    def stats(self) -> RateLimiterStats:
+        with self._lock:
+            return RateLimiterStats(
+                rate=self._rate,
+                rate_limited=self._rate_limited,
+                delayed=self._delayed,
+                delay_total=self._delay_total,
+            )
+
+    def acquire(self) -> float:
+        """Reserves a slot for a request, returning how long to wait before sending it, in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            self._recover(now)
+
+            if self._rate is None:
+                at = max(now, self._next_at)
+            else:
+                # let up to `burst` requests through back to back after an idle period
+                at = max(now - (self.burst - 1) / self._rate, self._next_at)
+                self._next_at = at + 1 / self._rate
+                at = max(now, at)
+
+            delay = at - now
+            if delay > 0:
+                self._delayed += 1
+                self._delay_total += delay
+            return delay
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Records a `429` response, slowing down all requests."""
+        with self._lock:
+            now = time.monotonic()
+            self._rate_limited += 1
+
+            # a burst of requests is likely to be rejected together, only back off once for all of them
+            cooldown = max(1.0, retry_after or 0.0)
+            if self._rate_limited_at is None or now - self._rate_limited_at >= cooldown:
+                current = self._rate if self._rate is not None else self._observed_rate(now)
+                self._rate = max(self.min_rate, current * self.backoff)
+                self._rate_limited_at = now
+                self._adjusted_at = now
+
+            if retry_after is not None:
+                self._next_at = max(self._next_at, now + retry_after)
+
+    def _recover(self, now: float) -> None:
+        if self._rate is None or self._rate_limited_at is None:
+            return
+
+        if now - self._rate_limited_at >= self.forget_after:
+            self._rate = self._initial_rate
+            self._rate_limited_at = None
+            return
+
+        self._rate *= (1 + self.recovery) ** (now - self._adjusted_at)
+        if self._ceiling is not None:
+            self._rate = min(self._rate, self._ceiling)
+        self._adjusted_at = now
+
+    def _observed_rate(self, now: float) -> float:
+        recent = [sent_at for sent_at in self._recent if now - sent_at <= _OBSERVATION_WINDOW]
+        if len(recent) < 2:
+            return self.min_rate
+        return len(recent) / max(now - recent[0], 1.0)
@@ -0,0 +1,66 @@
+"""A retry budget, capping retries to a fraction of the requests made."""
+
+from __future__ import annotations
+
+import threading
+
+from ._models import BaseModel
+
+__all__ = ["RetryBudget", "RetryBudgetStats"]
+
+
+class RetryBudgetStats(BaseModel):
+    requests: int = 0
+    """The number of requests made, not counting retries."""
+
+    retries: int = 0
+    """The number of retries that were allowed."""
+
+    exhausted: int = 0
+    """The number of retries that were denied because the budget was used up."""
+
+
+class RetryBudget:
+    """Limits retries to `ratio` of the requests made, so that retries can't multiply the load during an outage.
+
+    Every request adds `ratio` to the budget and every retry takes one from it. The budget starts out with,
+    and is capped at, `min_retries` so that a few retries are always possible at low request rates.
+
+    A budget can be shared between threads, tasks and clients, e.g. `client.copy()` /
+    `client.with_options()` re-use the budget of the client they were created from.
+    """
+
+    def __init__(self, *, ratio: float = 0.1, min_retries: float = 10.0) -> None:
+        if ratio < 0:
+            raise ValueError(f"Expected `ratio` to be positive but received {ratio}")
+        if min_retries < 0:
+            raise ValueError(f"Expected `min_retries` to be positive but received {min_retries}")
+
+        self.ratio = ratio
+        self.min_retries = min_retries
+
+        self._lock = threading.Lock()
+        self._balance = min_retries
+        self._requests = 0
+        self._retries = 0
+        self._exhausted = 0
+
+    def stats(self) -> RetryBudgetStats:
+        with self._lock:
+            return RetryBudgetStats(requests=self._requests, retries=self._retries, exhausted=self._exhausted)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._requests += 1
+            self._balance = min(self.min_retries, self._balance + self.ratio)
+
+    def acquire(self) -> bool:
+        """Takes a retry from the budget, returns `False` if it's exhausted."""
+        with self._lock:
+            if self._balance < 1:
+                self._exhausted += 1
+                return False
+
+            self._balance -= 1
+            self._retries += 1
+            return True
@@ -0,0 +1,128 @@
+"""Single-flight request coalescing: identical concurrent `GET` requests share one network call."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Tuple, Union, TypeVar, Callable, Hashable, Optional, Awaitable, cast
+
+import anyio
+
+from ._models import BaseModel
+
+__all__ = ["SingleFlight", "SingleFlightStats"]
+
+_T = TypeVar("_T")
+
+
+class SingleFlightStats(BaseModel):
+    requests: int = 0
+    """The number of requests that were eligible for coalescing."""
+
+    coalesced: int = 0
+    """How many of those requests waited for an identical in-flight request instead of being sent."""
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "completed")
+
+    def __init__(self, done: Union[threading.Event, anyio.Event]) -> None:
+        self.done = done
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        # stays `False` if the leader was interrupted, e.g. cancelled, in which case a waiter takes over
+        self.completed = False
+
+
+class SingleFlight:
+    """Coalesces identical concurrent `GET` requests so that only one of them is sent.
+
+    Requests are identical when they have the same method, URL, query and headers, which includes the
+    locale headers. Every caller receives the same parsed result, or the same exception, so results
+    should be treated as read-only.
+
+    Streamed and raw responses are never coalesced.
+
+    `Channel3` coalesces requests across threads and `AsyncChannel3` across tasks in the same event
+    loop. A `SingleFlight` can be shared between clients, e.g. `client.copy()` / `client.with_options()`
+    re-use the instance of the client they were created from.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._requests = 0
+        self._coalesced = 0
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(requests=self._requests, coalesced=self._coalesced)
+
+    def _join(self, key: Hashable, new_flight: Callable[[], _Flight]) -> Tuple[_Flight, bool]:
+        """Returns the flight for the key and whether the caller has to make the request."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._coalesced += 1
+                return flight, False
+
+            flight = self._flights[key] = new_flight()
+            return flight, True
+
+    def _land(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def do(self, key: Hashable, fn: Callable[[], _T]) -> _T:
+        with self._lock:
+            self._requests += 1
+
+        while True:
+            flight, leader = self._join(key, lambda: _Flight(threading.Event()))
+            if leader:
+                try:
+                    flight.result = fn()
+                    flight.completed = True
+                except Exception as err:
+                    flight.error = err
+                    flight.completed = True
+                    raise
+                finally:
+                    self._land(key, flight)
+                    cast(threading.Event, flight.done).set()
+                return cast(_T, flight.result)
+
+            cast(threading.Event, flight.done).wait()
+            if flight.completed:
+                return cast(_T, _outcome(flight))
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[_T]]) -> _T:
+        with self._lock:
+            self._requests += 1
+
+        # events can't be shared between event loops, so only coalesce requests made from the same thread
+        key = (threading.get_ident(), key)
+        while True:
+            flight, leader = self._join(key, lambda: _Flight(anyio.Event()))
+            if leader:
+                try:
+                    flight.result = await fn()
+                    flight.completed = True
+                except Exception as err:
+                    flight.error = err
+                    flight.completed = True
+                    raise
+                finally:
+                    self._land(key, flight)
+                    cast(anyio.Event, flight.done).set()
+                return cast(_T, flight.result)
+
+            await cast(anyio.Event, flight.done).wait()
+            if flight.completed:
+                return cast(_T, _outcome(flight))
+
+
+def _outcome(flight: _Flight) -> Any:
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
@@ -120,6 +120,7 @@ class RequestOptions(TypedDict, total=False):
     headers: Headers
     max_retries: int
     timeout: float | Timeout | None
+    deadline: float | None
     params: Query
     extra_json: AnyMapping
     idempotency_key: str
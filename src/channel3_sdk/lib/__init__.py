@@ -0,0 +1,13 @@
+from .price_watcher import (
+    PriceDrop as PriceDrop,
+    PriceWatcher as PriceWatcher,
+    AsyncPriceWatcher as AsyncPriceWatcher,
+    PriceWatcherStats as PriceWatcherStats,
+)
+from .category_index import CategoryIndex as CategoryIndex
+from .brand_directory import BrandDirectory as BrandDirectory
+from .website_resolver import (
+    WebsiteResolver as WebsiteResolver,
+    AsyncWebsiteResolver as AsyncWebsiteResolver,
+    WebsiteResolverStats as WebsiteResolverStats,
+)
@@ -0,0 +1,260 @@
+"""An in-memory directory of brands with name search, for autocomplete without calling the API."""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import unicodedata
+from typing import TYPE_CHECKING, Set, Dict, List, Tuple, Iterable, Iterator, Optional, FrozenSet
+from collections import Counter
+
+import anyio
+
+from ..types.brand import Brand
+
+if TYPE_CHECKING:
+    from .._client import Channel3, AsyncChannel3
+
+__all__ = ["BrandDirectory"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("brand", "name", "words", "trigrams", "name_trigrams", "word_trigrams")
+
+    def __init__(self, brand: Brand) -> None:
+        self.brand = brand
+        self.name = _normalize(brand.name)
+        self.words = self.name.split()
+        # a query is compared with the whole name and with each word, so that typing one word of a
+        # longer name still finds it
+        self.name_trigrams = _trigrams(self.name)
+        self.word_trigrams = [_trigrams(word) for word in self.words]
+        self.trigrams = self.name_trigrams.union(*self.word_trigrams)
+
+    def similarity(self, trigrams: FrozenSet[str]) -> float:
+        return max(_jaccard(trigrams, self.name_trigrams), *(_jaccard(trigrams, word) for word in self.word_trigrams))
+
+
+class _Index:
+    """The lookup structures for one version of the directory, never modified once built."""
+
+    def __init__(self, entries: Dict[str, _Entry]) -> None:
+        self.entries = entries
+
+        # (normalized name, id), sorted for prefix matching
+        self.names = sorted((entry.name, id) for id, entry in entries.items())
+
+        self.words: Dict[str, Set[str]] = {}
+        self.trigrams: Dict[str, Set[str]] = {}
+        for id, entry in entries.items():
+            for word in entry.words:
+                self.words.setdefault(word, set()).add(id)
+            for trigram in entry.trigrams:
+                self.trigrams.setdefault(trigram, set()).add(id)
+        self.sorted_words = sorted(self.words)
+
+        self.by_commission = sorted(
+            (entry.brand for entry in entries.values() if entry.brand.best_commission_rate is not None),
+            key=lambda brand: (-(brand.best_commission_rate or 0), brand.name),
+        )
+
+
+class BrandDirectory:
+    """Every brand from `brands.list()`, indexed for searching by name.
+
+    Build one with `BrandDirectory.build(client)` / `await BrandDirectory.abuild(client)`. Searches are
+    answered from memory: full name and word prefixes for autocomplete, falling back to fuzzy matching on
+    the trigrams of the name to tolerate typos.
+
+    `refresh()` pages through `brands.list()` again and swaps in the new brands once they've all been
+    fetched, so searches never see a partially refreshed directory and never wait for the API. Brands whose
+    name hasn't changed re-use their existing index entries. `start_refreshing()` refreshes the directory
+    from a background thread, or run `refresh_periodically()` as a task with the async client.
+    """
+
+    def __init__(self, brands: Iterable[Brand] = ()) -> None:
+        self._index = _Index({brand.id: _Entry(brand) for brand in brands})
+        self._refresh_lock = threading.Lock()
+        self._stop: Optional[threading.Event] = None
+
+    @classmethod
+    def build(cls, client: Channel3, *, page_size: int = 100) -> BrandDirectory:
+        directory = cls()
+        directory.refresh(client, page_size=page_size)
+        return directory
+
+    @classmethod
+    async def abuild(cls, client: AsyncChannel3, *, page_size: int = 100) -> BrandDirectory:
+        directory = cls()
+        await directory.arefresh(client, page_size=page_size)
+        return directory
+
+    def refresh(self, client: Channel3, *, page_size: int = 100) -> None:
+        brands = list(client.brands.list(limit=page_size))
+        self._update(brands)
+
+    async def arefresh(self, client: AsyncChannel3, *, page_size: int = 100) -> None:
+        brands = [brand async for brand in client.brands.list(limit=page_size)]
+        self._update(brands)
+
+    def start_refreshing(self, client: Channel3, *, interval: float = 3600.0, page_size: int = 100) -> None:
+        """Refreshes the directory every `interval` seconds from a daemon thread, until `stop_refreshing()`.
+
+        Failed refreshes are logged and the current brands are kept.
+        """
+        if interval <= 0:
+            raise ValueError(f"Expected `interval` to be positive but received {interval}")
+        if self._stop is not None:
+            raise RuntimeError("The directory is already being refreshed")
+
+        stop = self._stop = threading.Event()
+
+        def run() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.refresh(client, page_size=page_size)
+                except Exception:
+                    log.warning("Could not refresh the brand directory", exc_info=True)
+
+        threading.Thread(target=run, name="channel3-brands", daemon=True).start()
+
+    def stop_refreshing(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    async def refresh_periodically(
+        self, client: AsyncChannel3, *, interval: float = 3600.0, page_size: int = 100
+    ) -> None:
+        """Refreshes the directory every `interval` seconds until cancelled, e.g. `asyncio.create_task(...)`.
+
+        Failed refreshes are logged and the current brands are kept.
+        """
+        if interval <= 0:
+            raise ValueError(f"Expected `interval` to be positive but received {interval}")
+
+        while True:
+            await anyio.sleep(interval)
+            try:
+                await self.arefresh(client, page_size=page_size)
+            except Exception:
+                log.warning("Could not refresh the brand directory", exc_info=True)
+
+    def __len__(self) -> int:
+        return len(self._index.entries)
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._index.entries
+
+    def __iter__(self) -> Iterator[Brand]:
+        return (entry.brand for entry in self._index.entries.values())
+
+    def __getitem__(self, id: str) -> Brand:
+        return self._index.entries[id].brand
+
+    def get(self, id: str) -> Optional[Brand]:
+        entry = self._index.entries.get(id)
+        return entry.brand if entry is not None else None
+
+    def top_by_commission(self, k: int = 10) -> List[Brand]:
+        """Returns the `k` brands with the highest `best_commission_rate`."""
+        return self._index.by_commission[:k]
+
+    def search(self, query: str, *, limit: int = 10, fuzzy: bool = True, threshold: float = 0.3) -> List[Brand]:
+        """Finds brands by name, ignoring case, accents and punctuation.
+
+        Exact names come first, then names starting with the query, then names with a word starting with
+        each word of the query. If there are fewer than `limit` of those and `fuzzy` is set, names that share
+        at least `threshold` of their trigrams with the query are added, most similar first.
+        """
+        index = self._index  # a refresh may swap it out while we're searching
+        name = _normalize(query)
+        if not name:
+            return []
+
+        # id -> (group, negated similarity)
+        ranks: Dict[str, Tuple[int, float]] = {}
+
+        for i in range(bisect.bisect_left(index.names, (name, "")), len(index.names)):
+            candidate, id = index.names[i]
+            if not candidate.startswith(name):
+                break
+            ranks[id] = (0 if candidate == name else 1, 0.0)
+
+        *complete, prefix = name.split()
+        matches: Optional[Set[str]] = None
+        for word in complete:
+            ids = index.words.get(word, set())
+            matches = ids if matches is None else matches & ids
+
+        prefixed: Set[str] = set()
+        for i in range(bisect.bisect_left(index.sorted_words, prefix), len(index.sorted_words)):
+            word = index.sorted_words[i]
+            if not word.startswith(prefix):
+                break
+            prefixed |= index.words[word]
+
+        for id in prefixed if matches is None else matches & prefixed:
+            ranks.setdefault(id, (2, 0.0))
+
+        if fuzzy and len(ranks) < limit:
+            trigrams = _trigrams(name)
+            shared = Counter(id for trigram in trigrams for id in index.trigrams.get(trigram, ()))
+            # the similarity can't be more than the share of the query's trigrams found in the name
+            required = threshold * len(trigrams)
+            for id, count in shared.items():
+                if count < required or id in ranks:
+                    continue
+                similarity = index.entries[id].similarity(trigrams)
+                if similarity >= threshold:
+                    ranks[id] = (3, -similarity)
+
+        ordered = sorted(ranks, key=lambda id: (*ranks[id], len(index.entries[id].name), index.entries[id].name))
+        return [index.entries[id].brand for id in ordered[:limit]]
+
+    def _update(self, brands: Iterable[Brand]) -> None:
+        with self._refresh_lock:
+            current = self._index.entries
+            entries: Dict[str, _Entry] = {}
+            for brand in brands:
+                entry = current.get(brand.id)
+                if entry is not None and entry.brand.name == brand.name:
+                    # the name is all that's indexed, so the rest of the brand can be swapped in directly
+                    entry = entry if entry.brand == brand else _reuse(entry, brand)
+                else:
+                    entry = _Entry(brand)
+                entries[brand.id] = entry
+
+            self._index = _Index(entries)
+
+
+def _reuse(entry: _Entry, brand: Brand) -> _Entry:
+    updated = _Entry.__new__(_Entry)
+    updated.brand = brand
+    updated.name = entry.name
+    updated.words = entry.words
+    updated.trigrams = entry.trigrams
+    updated.name_trigrams = entry.name_trigrams
+    updated.word_trigrams = entry.word_trigrams
+    return updated
+
+
+def _normalize(text: str) -> str:
+    # "Chloé & Co." -> "chloe co"
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join(
+        "".join(char if char.isalnum() else " " for char in decomposed if not unicodedata.combining(char)).split()
+    )
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+def _trigrams(name: str) -> FrozenSet[str]:
+    padded = f"  {name} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
@@ -0,0 +1,271 @@
+"""An in-memory index of the category taxonomy, for walking the tree without calling the API."""
+
+from __future__ import annotations
+
+import os
+import json
+import bisect
+import logging
+from typing import TYPE_CHECKING, Any, Set, Dict, List, Tuple, Union, Iterable, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+
+from ..types.category import Category
+from ..types.category_attribute import CategoryAttribute
+
+if TYPE_CHECKING:
+    from .._client import Channel3, AsyncChannel3
+
+__all__ = ["CategoryIndex"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# bump whenever the snapshot format changes
+_SNAPSHOT_VERSION = 1
+
+
+class CategoryIndex:
+    """Every category in the taxonomy, indexed by slug.
+
+    Build one with `CategoryIndex.build(client)` / `await CategoryIndex.abuild(client)`, which page through
+    `categories.list()` and then, with `details=True`, fetch each category with `categories.retrieve()` to
+    get its attributes and description. Building is the only part that calls the API; every lookup is
+    answered from memory.
+
+    `snapshot()` / `from_snapshot()` and `save()` / `load()` store the index as JSON, so that other processes
+    can start with it without crawling the API again. An index is immutable once built, so it can be shared
+    between threads.
+    """
+
+    def __init__(self, categories: Iterable[Category]) -> None:
+        self._categories: Dict[str, Category] = {}
+        for category in categories:
+            self._categories[category.slug] = category
+
+        self._parents: Dict[str, Optional[str]] = {}
+        self._children: Dict[str, List[str]] = {}
+        for slug, category in self._categories.items():
+            parent = _parent_slug(category)
+            if parent is not None and parent not in self._categories:
+                log.debug("Category %s has an unknown parent %s", slug, parent)
+                parent = None
+
+            self._parents[slug] = parent
+            self._children.setdefault(slug, [])
+            if parent is not None:
+                self._children.setdefault(parent, []).append(slug)
+
+        self._roots = [slug for slug, parent in self._parents.items() if parent is None]
+
+        self._attributes: Dict[str, Dict[str, CategoryAttribute]] = {
+            slug: {attribute.slug: attribute for attribute in category.attributes or []}
+            for slug, category in self._categories.items()
+        }
+
+        # title word -> slugs, and the sorted words for prefix matching
+        self._words: Dict[str, Set[str]] = {}
+        for slug, category in self._categories.items():
+            for word in _words(category.title):
+                self._words.setdefault(word, set()).add(slug)
+        self._sorted_words = sorted(self._words)
+
+    @classmethod
+    def build(
+        cls,
+        client: Channel3,
+        *,
+        details: bool = True,
+        max_concurrency: int = 8,
+        page_size: int = 100,
+    ) -> CategoryIndex:
+        """Crawls the taxonomy, fetching up to `max_concurrency` categories at a time."""
+        if max_concurrency < 1:
+            raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+
+        summaries = list(client.categories.list(page_size=page_size))
+        if not details:
+            return cls(_category(summary.to_dict()) for summary in summaries)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="channel3-categories") as executor:
+            categories = list(executor.map(client.categories.retrieve, [summary.slug for summary in summaries]))
+
+        return cls(categories)
+
+    @classmethod
+    async def abuild(
+        cls,
+        client: AsyncChannel3,
+        *,
+        details: bool = True,
+        max_concurrency: int = 8,
+        page_size: int = 100,
+    ) -> CategoryIndex:
+        """Crawls the taxonomy, fetching up to `max_concurrency` categories at a time."""
+        if max_concurrency < 1:
+            raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+
+        summaries = [summary async for summary in client.categories.list(page_size=page_size)]
+        if not details:
+            return cls(_category(summary.to_dict()) for summary in summaries)
+
+        categories: List[Optional[Category]] = [None] * len(summaries)
+        limiter = anyio.CapacityLimiter(max_concurrency)
+
+        async def retrieve(index: int, slug: str) -> None:
+            async with limiter:
+                categories[index] = await client.categories.retrieve(slug)
+
+        async with anyio.create_task_group() as tg:
+            for index, summary in enumerate(summaries):
+                tg.start_soon(retrieve, index, summary.slug)
+
+        return cls(category for category in categories if category is not None)
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self._categories
+
+    def __iter__(self) -> Iterator[Category]:
+        return iter(self._categories.values())
+
+    def __getitem__(self, slug: str) -> Category:
+        return self._categories[slug]
+
+    def get(self, slug: str) -> Optional[Category]:
+        return self._categories.get(slug)
+
+    def roots(self) -> List[Category]:
+        return [self._categories[slug] for slug in self._roots]
+
+    def parent(self, slug: str) -> Optional[Category]:
+        parent = self._parents[slug]
+        return self._categories[parent] if parent is not None else None
+
+    def children(self, slug: str) -> List[Category]:
+        return [self._categories[child] for child in self._children[slug]]
+
+    def ancestors(self, slug: str) -> List[Category]:
+        """Returns the category's ancestors, root first, not including the category itself."""
+        ancestors: List[Category] = []
+        parent = self._parents[slug]
+        while parent is not None:
+            ancestors.append(self._categories[parent])
+            parent = self._parents[parent]
+        ancestors.reverse()
+        return ancestors
+
+    def descendants(self, slug: str) -> List[Category]:
+        """Returns every category below the given one, depth first."""
+        return [self._categories[descendant] for descendant in self._descendant_slugs(slug)]
+
+    def expand(self, slugs: Iterable[str]) -> Set[str]:
+        """Returns the given slugs along with the slugs of all their descendants.
+
+        Unknown slugs are returned as they are.
+        """
+        expanded: Set[str] = set()
+        for slug in slugs:
+            expanded.add(slug)
+            if slug in self._children:
+                expanded.update(self._descendant_slugs(slug))
+        return expanded
+
+    def attributes(self, slug: str) -> List[CategoryAttribute]:
+        """Returns the attributes that can be used as `SearchFilters.attributes` keys for the category."""
+        return list(self._attributes[slug].values())
+
+    def attribute(self, slug: str, attribute: str) -> Optional[CategoryAttribute]:
+        return self._attributes[slug].get(attribute)
+
+    def search(self, query: str, *, limit: int = 10) -> List[Category]:
+        """Finds categories whose title contains every word in the query, treating the last word as a prefix.
+
+        Exact title matches come first, followed by titles that start with the query, then the rest. Within
+        each group shallower categories, and then shorter titles, come first.
+        """
+        words = _words(query)
+        if not words:
+            return []
+
+        *complete, prefix = words
+        matches: Optional[Set[str]] = None
+        for word in complete:
+            slugs = self._words.get(word, set())
+            matches = slugs if matches is None else matches & slugs
+
+        prefixed: Set[str] = set()
+        start = bisect.bisect_left(self._sorted_words, prefix)
+        for word in self._sorted_words[start:]:
+            if not word.startswith(prefix):
+                break
+            prefixed |= self._words[word]
+        matches = prefixed if matches is None else matches & prefixed
+
+        normalized = " ".join(words)
+
+        def rank(slug: str) -> Tuple[int, int, int, str]:
+            title = " ".join(_words(self._categories[slug].title))
+            group = 0 if title == normalized else 1 if title.startswith(normalized) else 2
+            return group, len(self.ancestors(slug)), len(title), title
+
+        return [self._categories[slug] for slug in sorted(matches, key=rank)[:limit]]
+
+    def snapshot(self) -> bytes:
+        """Serializes the index, see `from_snapshot()`."""
+        return json.dumps(
+            {
+                "version": _SNAPSHOT_VERSION,
+                "categories": [category.to_dict() for category in self._categories.values()],
+            },
+            separators=(",", ":"),
+        ).encode()
+
+    @classmethod
+    def from_snapshot(cls, data: Union[str, bytes]) -> CategoryIndex:
+        snapshot = json.loads(data)
+        if snapshot.get("version") != _SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported category index snapshot version {snapshot.get('version')!r}, expected {_SNAPSHOT_VERSION}"
+            )
+        return cls(_category(category) for category in snapshot["categories"])
+
+    def save(self, path: Union[str, os.PathLike[str]]) -> None:
+        """Writes a snapshot to the given file, replacing it atomically so readers never see a partial index."""
+        path = os.fspath(path)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.snapshot())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike[str]]) -> CategoryIndex:
+        with open(path, "rb") as f:
+            return cls.from_snapshot(f.read())
+
+    def _descendant_slugs(self, slug: str) -> List[str]:
+        descendants: List[str] = []
+        stack = list(reversed(self._children[slug]))
+        while stack:
+            child = stack.pop()
+            descendants.append(child)
+            stack.extend(reversed(self._children[child]))
+        return descendants
+
+
+def _parent_slug(category: Category) -> Optional[str]:
+    # the path ends with the category itself
+    if not category.path or len(category.path) < 2:
+        return None
+    return category.path[-2].slug
+
+
+def _category(data: Dict[str, Any]) -> Category:
+    # the summaries from `categories.list()` have a subset of the fields
+    return Category.construct(**data)
+
+
+def _words(text: str) -> List[str]:
+    return "".join(char if char.isalnum() else " " for char in text.casefold()).split()
@@ -0,0 +1,436 @@
+"""Vectorized statistics over the price history of many products, computed with NumPy.
+
+Every function takes the `PriceHistoryColumns` returned by `price_tracking.retrieve_history_many()` and
+returns arrays with one entry per product, indexed like `PriceHistoryColumns.product_ids`, or one entry per
+point, in the same order as the columns. Requires the `numpy` package, install it with
+`pip install channel3_sdk[numpy]`.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Tuple, Mapping, TypeVar, Optional, NamedTuple, cast
+from datetime import datetime
+
+from .._price_history import PriceHistoryColumns, parse_timestamp
+from ..types.price_statistics import PriceStatistics
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as exc:  # pragma: no cover
+    raise ImportError(
+        "`channel3_sdk.lib.price_analytics` requires the `numpy` package; "
+        "install it with the `numpy` extra, e.g. `pip install channel3_sdk[numpy]`"
+    ) from exc
+
+__all__ = [
+    "NAT",
+    "PriceDrops",
+    "WindowStatistics",
+    "RollingStatistics",
+    "classify",
+    "time_at_low",
+    "largest_drops",
+    "verify_statistics",
+    "window_statistics",
+    "rolling_statistics",
+]
+
+_ScalarT = TypeVar("_ScalarT", bound=np.generic)
+
+_MICROSECONDS_PER_DAY = 86_400_000_000
+
+NAT = np.iinfo(np.int64).min
+"""The timestamp given when there isn't one, which is `NaT` once viewed as `datetime64[us]`."""
+
+
+class WindowStatistics(NamedTuple):
+    """The statistics of each product's prices over a window, like the `PriceStatistics` the API returns.
+
+    Products without any points in the window have 0 points, NaN statistics and an empty status.
+    """
+
+    points: npt.NDArray[np.int64]
+    """The number of points in the window."""
+
+    current_price: npt.NDArray[np.float64]
+    """The price of the latest point in the window."""
+
+    min_price: npt.NDArray[np.float64]
+
+    max_price: npt.NDArray[np.float64]
+
+    mean: npt.NDArray[np.float64]
+
+    std_dev: npt.NDArray[np.float64]
+
+    current_status: npt.NDArray[np.str_]
+    """Whether the current price is `"low"`, `"typical"` or `"high"`, see `classify()`."""
+
+
+class RollingStatistics(NamedTuple):
+    """The statistics of each point's product over the window that ends at that point, inclusive."""
+
+    points: npt.NDArray[np.int64]
+    """The number of points in the window."""
+
+    min_price: npt.NDArray[np.float64]
+
+    max_price: npt.NDArray[np.float64]
+
+    mean: npt.NDArray[np.float64]
+
+    std_dev: npt.NDArray[np.float64]
+
+
+class PriceDrops(NamedTuple):
+    """The largest peak-to-trough drop in each product's price over a window.
+
+    Products whose price never dropped have an amount of 0 and no timestamp, products without any points
+    in the window have NaN amounts.
+    """
+
+    amount: npt.NDArray[np.float64]
+    """How far the price fell from the highest price before it."""
+
+    fraction: npt.NDArray[np.float64]
+    """The amount as a fraction of the peak price."""
+
+    peak_price: npt.NDArray[np.float64]
+
+    trough_price: npt.NDArray[np.float64]
+
+    timestamp: npt.NDArray[np.int64]
+    """When the trough was seen, in microseconds since the Unix epoch, or `NAT`."""
+
+
+class _Sorted:
+    """The points sorted by product, then timestamp, with the rows each product spans."""
+
+    def __init__(self, history: PriceHistoryColumns) -> None:
+        arrays = history.to_numpy()
+        self.order = np.lexsort((arrays.timestamps, arrays.product_index))
+        self.products = arrays.product_index[self.order].astype(np.int64)
+        self.timestamps = arrays.timestamps[self.order]
+        self.prices = arrays.prices[self.order]
+
+        self.product_count = len(history.product_ids)
+        product_range = np.arange(self.product_count)
+        self.first = np.searchsorted(self.products, product_range, side="left")
+        self.last = np.searchsorted(self.products, product_range, side="right")
+
+    def unsort(self, values: npt.NDArray[_ScalarT]) -> npt.NDArray[_ScalarT]:
+        """Returns per point values in the order of the columns."""
+        result = np.empty_like(values)
+        result[self.order] = values
+        return result
+
+    def window(
+        self, days: Optional[float], end: Optional[datetime]
+    ) -> Tuple[int, npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Returns the end of the window and the rows of each product's points within it."""
+        if end is not None:
+            end_timestamp = parse_timestamp(end)
+        elif len(self.timestamps):
+            end_timestamp = int(self.timestamps.max())
+        else:
+            end_timestamp = 0
+
+        stops = _bisect(self.timestamps, self.first, self.last, np.full(self.product_count, end_timestamp), "right")
+        if days is None:
+            return end_timestamp, self.first, stops
+
+        start_timestamp = end_timestamp - _window_length(days)
+        starts = _bisect(self.timestamps, self.first, stops, np.full(self.product_count, start_timestamp), "left")
+        return end_timestamp, starts, stops
+
+    def statistics(
+        self, starts: npt.NDArray[np.int64], stops: npt.NDArray[np.int64], ddof: int
+    ) -> Tuple[
+        npt.NDArray[np.int64],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+    ]:
+        """Returns the count, min, max, mean and standard deviation of the prices in each range of rows."""
+        counts = stops - starts
+
+        # two passes over the rows of every range, the first for the means and the second for the squared
+        # deviations from them, which unlike prefix sums gives exactly 0 for ranges with a constant price
+        means = np.full(len(starts), np.nan)
+        squares = np.zeros(len(starts))
+        by_length = np.argsort(-counts, kind="stable")
+        descending = counts[by_length]
+        longest = int(descending[0]) if len(descending) else 0
+
+        totals = np.zeros(len(starts))
+        for offset in range(longest):
+            ranges = by_length[: np.searchsorted(-descending, -offset, side="left")]
+            totals[ranges] += self.prices[starts[ranges] + offset]
+        nonempty = counts > 0
+        means[nonempty] = totals[nonempty] / counts[nonempty]
+
+        for offset in range(longest):
+            ranges = by_length[: np.searchsorted(-descending, -offset, side="left")]
+            deviations = self.prices[starts[ranges] + offset] - means[ranges]
+            squares[ranges] += deviations * deviations
+
+        variances = np.full(len(starts), np.nan)
+        enough = counts > ddof
+        variances[enough] = squares[enough] / (counts[enough] - ddof)
+
+        return (
+            counts,
+            _range_reduce(self.prices, starts, stops, np.minimum),
+            _range_reduce(self.prices, starts, stops, np.maximum),
+            means,
+            np.sqrt(variances),
+        )
+
+
+def classify(
+    prices: npt.ArrayLike, mean: npt.ArrayLike, std_dev: npt.ArrayLike, *, band: float = 1.0
+) -> npt.NDArray[np.str_]:
+    """Returns `"low"` for prices more than `band` standard deviations below the mean, `"high"` for prices
+    more than `band` above it and `"typical"` otherwise. Prices without statistics get an empty string.
+    """
+    prices, mean, std_dev = np.asarray(prices, dtype=np.float64), np.asarray(mean), np.asarray(std_dev)
+    status = np.full(np.broadcast(prices, mean, std_dev).shape, "typical", dtype="<U7")
+    status[prices < mean - band * std_dev] = "low"
+    status[prices > mean + band * std_dev] = "high"
+    status[np.isnan(prices) | np.isnan(mean) | np.isnan(std_dev)] = ""
+    return status
+
+
+def window_statistics(
+    history: PriceHistoryColumns,
+    *,
+    days: float = 30,
+    end: Optional[datetime] = None,
+    ddof: int = 0,
+    band: float = 1.0,
+) -> WindowStatistics:
+    """Computes the statistics of each product's prices over the `days` up to `end`, inclusive.
+
+    With the defaults this reproduces the `PriceStatistics` the API returns for the 30 day window, which
+    `verify_statistics()` checks. `end` defaults to the latest point of any product, `ddof` is the delta
+    degrees of freedom of the standard deviation and `band` is passed to `classify()`.
+    """
+    points = _Sorted(history)
+    _, starts, stops = points.window(days, end)
+    counts, min_prices, max_prices, means, std_devs = points.statistics(starts, stops, ddof)
+
+    current_prices = np.full(points.product_count, np.nan)
+    current_prices[counts > 0] = points.prices[stops[counts > 0] - 1]
+    return WindowStatistics(
+        points=counts,
+        current_price=current_prices,
+        min_price=min_prices,
+        max_price=max_prices,
+        mean=means,
+        std_dev=std_devs,
+        current_status=classify(current_prices, means, std_devs, band=band),
+    )
+
+
+def rolling_statistics(history: PriceHistoryColumns, *, days: float, ddof: int = 0) -> RollingStatistics:
+    """Computes the statistics of each point's product over the `days` up to and including that point."""
+    points = _Sorted(history)
+    rows = np.arange(len(points.prices), dtype=np.int64)
+    stops = rows + 1
+    starts = _bisect(
+        points.timestamps,
+        points.first[points.products],
+        stops,
+        points.timestamps - _window_length(days),
+        "left",
+    )
+    counts, min_prices, max_prices, means, std_devs = points.statistics(starts, stops, ddof)
+    return RollingStatistics(
+        points=points.unsort(counts),
+        min_price=points.unsort(min_prices),
+        max_price=points.unsort(max_prices),
+        mean=points.unsort(means),
+        std_dev=points.unsort(std_devs),
+    )
+
+
+def largest_drops(
+    history: PriceHistoryColumns, *, days: Optional[float] = None, end: Optional[datetime] = None
+) -> PriceDrops:
+    """Finds the largest drop in each product's price from an earlier peak, over the `days` up to `end`.
+
+    The whole history is searched when `days` isn't given.
+    """
+    points = _Sorted(history)
+    _, starts, stops = points.window(days, end)
+
+    in_window = _rows(starts, stops)
+    products = points.products[in_window]
+    peaks = _range_reduce(points.prices, starts[products], in_window + 1, np.maximum)
+    drops = peaks - points.prices[in_window]
+
+    amounts = np.full(points.product_count, np.nan)
+    peak_prices = np.full(points.product_count, np.nan)
+    trough_prices = np.full(points.product_count, np.nan)
+    timestamps = np.full(points.product_count, NAT, dtype=np.int64)
+
+    # the largest drop of each product sorts first among its rows
+    order = np.lexsort((-drops, products))
+    present, first = np.unique(products[order], return_index=True)
+    largest = order[first]
+    amounts[present] = drops[largest]
+    peak_prices[present] = peaks[largest]
+    trough_prices[present] = points.prices[in_window[largest]]
+    dropped = largest[drops[largest] > 0]
+    timestamps[products[dropped]] = points.timestamps[in_window[dropped]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fractions = np.where(amounts > 0, amounts / peak_prices, amounts)
+    return PriceDrops(
+        amount=amounts,
+        fraction=fractions,
+        peak_price=peak_prices,
+        trough_price=trough_prices,
+        timestamp=timestamps,
+    )
+
+
+def time_at_low(
+    history: PriceHistoryColumns,
+    *,
+    days: float = 30,
+    end: Optional[datetime] = None,
+    ddof: int = 0,
+    band: float = 1.0,
+) -> npt.NDArray[np.float64]:
+    """Returns the fraction of the time between each product's first point in the window and `end` that its
+    price was `"low"`, as classified against the statistics of the same window.
+
+    Each price is taken to hold until the product's next point. Products whose points don't span any time
+    get NaN.
+    """
+    points = _Sorted(history)
+    end_timestamp, starts, stops = points.window(days, end)
+    _, _, _, means, std_devs = points.statistics(starts, stops, ddof)
+
+    in_window = _rows(starts, stops)
+    products = points.products[in_window]
+    is_last = in_window + 1 == stops[products]
+    following = np.where(
+        is_last, end_timestamp, points.timestamps[np.minimum(in_window + 1, len(points.timestamps) - 1)]
+    )
+    durations = (following - points.timestamps[in_window]).astype(np.float64)
+    low = classify(points.prices[in_window], means[products], std_devs[products], band=band) == "low"
+
+    total = np.bincount(products, weights=durations, minlength=points.product_count)
+    at_low = np.bincount(products, weights=durations * low, minlength=points.product_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, at_low / total, np.nan)
+
+
+def verify_statistics(
+    history: PriceHistoryColumns,
+    statistics: Optional[Mapping[str, PriceStatistics]] = None,
+    *,
+    days: float = 30,
+    end: Optional[datetime] = None,
+    ddof: int = 0,
+    band: float = 1.0,
+    rel_tol: float = 1e-6,
+    abs_tol: float = 1e-9,
+) -> Dict[str, List[str]]:
+    """Compares `window_statistics()` with the statistics the API returned, `history.statistics` by default.
+
+    Returns the names of the fields that differ for each product that has any.
+    """
+    if statistics is None:
+        statistics = history.statistics
+    computed = window_statistics(history, days=days, end=end, ddof=ddof, band=band)
+    indices = {canonical_product_id: index for index, canonical_product_id in enumerate(history.product_ids)}
+
+    mismatches: Dict[str, List[str]] = {}
+    for canonical_product_id, expected in statistics.items():
+        index = indices.get(canonical_product_id)
+        if index is None:
+            continue
+
+        fields: List[str] = []
+        for field in ("current_price", "min_price", "max_price", "mean", "std_dev"):
+            value = float(getattr(computed, field)[index])
+            if not math.isclose(value, getattr(expected, field), rel_tol=rel_tol, abs_tol=abs_tol):
+                fields.append(field)
+        if computed.current_status[index] != expected.current_status:
+            fields.append("current_status")
+        if fields:
+            mismatches[canonical_product_id] = fields
+    return mismatches
+
+
+def _window_length(days: float) -> int:
+    if days <= 0:
+        raise ValueError(f"Expected `days` to be positive but received {days}")
+    return round(days * _MICROSECONDS_PER_DAY)
+
+
+def _rows(starts: npt.NDArray[np.int64], stops: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Returns every row in the given ranges, which mustn't overlap, in order."""
+    counts = stops - starts
+    offsets: npt.NDArray[np.int64] = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    return np.arange(int(counts.sum()), dtype=np.int64) + offsets
+
+
+def _bisect(
+    values: npt.NDArray[np.int64],
+    lo: npt.NDArray[np.int64],
+    hi: npt.NDArray[np.int64],
+    targets: npt.NDArray[np.int64],
+    side: str,
+) -> npt.NDArray[np.int64]:
+    """`np.searchsorted()` for many sorted ranges of `values` at once, each with its own target."""
+    lo, hi = lo.astype(np.int64), hi.astype(np.int64)
+    last = max(len(values) - 1, 0)
+    while True:
+        searching = lo < hi
+        if not searching.any():
+            return lo
+        middle = (lo + hi) // 2
+        middle_values = values[np.minimum(middle, last)]
+        right = (middle_values < targets if side == "left" else middle_values <= targets) & searching
+        lo = np.where(right, middle + 1, lo)
+        hi = np.where(searching & ~right, middle, hi)
+
+
+def _range_reduce(
+    values: npt.NDArray[np.float64],
+    starts: npt.NDArray[np.int64],
+    stops: npt.NDArray[np.int64],
+    ufunc: np.ufunc,
+) -> npt.NDArray[np.float64]:
+    """Reduces each range of `values` with an idempotent `ufunc` like `np.minimum`, NaN for empty ranges.
+
+    Each range is covered by two overlapping runs with a power of two length, reduced ahead of time for
+    every run length up to the longest range.
+    """
+    result = np.full(len(starts), np.nan)
+    lengths = stops - starts
+    nonempty = lengths > 0
+    if not nonempty.any():
+        return result
+
+    starts, lengths = starts[nonempty], lengths[nonempty]
+    levels = np.frexp(lengths.astype(np.float64))[1].astype(np.int64) - 1
+    runs: List[npt.NDArray[np.float64]] = [values]
+    for level in range(1, int(levels.max()) + 1):
+        previous, half = runs[-1], 1 << (level - 1)
+        runs.append(ufunc(previous[:-half], previous[half:]))
+
+    reduced = np.empty(len(starts))
+    for level in cast("List[int]", np.unique(levels).tolist()):
+        at_level = levels == level
+        run, level_starts = runs[level], starts[at_level]
+        reduced[at_level] = ufunc(run[level_starts], run[level_starts + lengths[at_level] - (1 << level)])
+    result[nonempty] = reduced
+    return result
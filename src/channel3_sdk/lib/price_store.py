@@ -0,0 +1,519 @@
+"""A local, append-only store of price history, memory-mapped for reading ranges without copying them.
+
+Requires the `numpy` package, install it with `pip install channel3_sdk[numpy]`.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import logging
+import threading
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Dict, List, Type, Tuple, Union, BinaryIO, Iterable, Optional, NamedTuple, cast
+from datetime import datetime
+
+from .._price_history import PriceHistoryColumns, parse_timestamp
+from ..types.price_history import PriceHistory
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as exc:  # pragma: no cover
+    raise ImportError(
+        "`channel3_sdk.lib.price_store` requires the `numpy` package; "
+        "install it with the `numpy` extra, e.g. `pip install channel3_sdk[numpy]`"
+    ) from exc
+
+if TYPE_CHECKING:
+    from .._client import Channel3, AsyncChannel3
+
+__all__ = ["PriceStore", "StoredPriceHistory"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+# one record per point appended since the last compaction, little-endian so the files can be moved between hosts
+_LOG_RECORD = np.dtype([("product", "<i4"), ("currency", "<i4"), ("timestamp", "<i8"), ("price", "<f8")])
+
+# the compacted columns, sorted by product and then timestamp, with `offsets` giving the rows of each product
+_COLUMNS: Dict[str, "np.dtype[Any]"] = {
+    "timestamps": np.dtype("<i8"),
+    "prices": np.dtype("<f8"),
+    "currency_codes": np.dtype("<i4"),
+}
+_OFFSETS = np.dtype("<i8")
+
+
+class StoredPriceHistory(NamedTuple):
+    """A product's points over a range of time, oldest first."""
+
+    timestamps: npt.NDArray[np.int64]
+    """When each price was seen, in microseconds since the Unix epoch, UTC.
+
+    Use `timestamps.view("datetime64[us]")` for NumPy datetimes.
+    """
+
+    prices: npt.NDArray[np.float64]
+
+    currency_codes: npt.NDArray[np.int32]
+    """The index into `PriceStore.currencies` of each point's currency."""
+
+
+class PriceStore:
+    """Price history kept in a directory of column files, for longer than the 30 days `retrieve_history()` covers.
+
+    Points are keyed by canonical product ID and timestamp; adding a point that's already stored does
+    nothing. New points are appended to a log and, once there are `compact_after` of them, merged into
+    column files sorted by product and timestamp, which are memory-mapped so that `read()` returns NumPy views
+    of them instead of copies. A compaction writes a new set of column files and then switches to them, so a
+    store that's interrupted mid-way opens with the previous set and the log.
+
+    Feed the store with `add()` from `retrieve_history()`, `add_columns()` from `retrieve_history_many()`, or
+    `update()` to do both. A store can be shared between threads, but only one process should open a
+    directory at a time.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike[str]], *, compact_after: int = 1_000_000) -> None:
+        if compact_after < 1:
+            raise ValueError(f"Expected `compact_after` to be at least 1 but received {compact_after}")
+
+        self.path = os.fspath(path)
+        self.compact_after = compact_after
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._product_ids: List[str] = []
+        self._products: Dict[str, int] = {}
+        self._currencies: List[str] = []
+        self._currency_codes: Dict[str, int] = {}
+        self._names_file = _NamesFile(os.path.join(self.path, "products.txt"), self._product_ids, self._products)
+        self._currencies_file = _NamesFile(
+            os.path.join(self.path, "currencies.txt"), self._currencies, self._currency_codes
+        )
+
+        self._generation = self._read_manifest()
+        self._remove_other_generations()
+        self._timestamps: npt.NDArray[np.int64]
+        self._prices: npt.NDArray[np.float64]
+        self._currency_codes_column: npt.NDArray[np.int32]
+        self._offsets: npt.NDArray[np.int64]
+        self._load_columns()
+        self._log: Optional[BinaryIO] = None
+        # product -> {timestamp: (price, currency code)} for the points in the log
+        self._pending: Dict[int, Dict[int, Tuple[float, int]]] = {}
+        self._pending_count = 0
+        self._replay_log()
+
+    def __enter__(self) -> PriceStore:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._timestamps) + self._pending_count
+
+    def __contains__(self, canonical_product_id: object) -> bool:
+        with self._lock:
+            return canonical_product_id in self._products
+
+    @property
+    def product_ids(self) -> List[str]:
+        """The canonical product IDs with stored points, in the order they were first added."""
+        with self._lock:
+            return list(self._product_ids)
+
+    @property
+    def currencies(self) -> List[str]:
+        """The currency codes `StoredPriceHistory.currency_codes` index into."""
+        with self._lock:
+            return list(self._currencies)
+
+    def add(self, history: PriceHistory) -> int:
+        """Stores the points of a `retrieve_history()` response and returns how many weren't stored already."""
+        points = history.history or []
+        currencies = list(dict.fromkeys(point.currency for point in points))
+        codes = {currency: code for code, currency in enumerate(currencies)}
+        return self._add_points(
+            [
+                (
+                    history.canonical_product_id,
+                    np.array([parse_timestamp(point.timestamp) for point in points], dtype=np.int64),
+                    np.array([point.price for point in points], dtype=np.float64),
+                    np.array([codes[point.currency] for point in points], dtype=np.int32),
+                )
+            ],
+            currencies,
+        )
+
+    def add_columns(self, columns: PriceHistoryColumns) -> int:
+        """Stores the points of a `retrieve_history_many()` result and returns how many weren't stored already."""
+        arrays = columns.to_numpy()
+        offsets = arrays.offsets.tolist()
+        return self._add_points(
+            (
+                (
+                    canonical_product_id,
+                    arrays.timestamps[offsets[index] : offsets[index + 1]],
+                    arrays.prices[offsets[index] : offsets[index + 1]],
+                    arrays.currency_codes[offsets[index] : offsets[index + 1]],
+                )
+                for index, canonical_product_id in enumerate(columns.product_ids)
+            ),
+            columns.currencies,
+        )
+
+    def update(
+        self, client: Channel3, canonical_product_ids: Iterable[str], *, days: int = 30, max_concurrency: int = 8
+    ) -> PriceHistoryColumns:
+        """Retrieves the last `days` of history of each product and stores the points that are new.
+
+        Returns what was retrieved, products whose history couldn't be retrieved are in its `failed`.
+        """
+        columns = client.price_tracking.retrieve_history_many(
+            canonical_product_ids, days=days, max_concurrency=max_concurrency
+        )
+        self.add_columns(columns)
+        return columns
+
+    async def aupdate(
+        self,
+        client: AsyncChannel3,
+        canonical_product_ids: Iterable[str],
+        *,
+        days: int = 30,
+        max_concurrency: int = 8,
+    ) -> PriceHistoryColumns:
+        """Retrieves the last `days` of history of each product and stores the points that are new.
+
+        Returns what was retrieved, products whose history couldn't be retrieved are in its `failed`.
+        """
+        columns = await client.price_tracking.retrieve_history_many(
+            canonical_product_ids, days=days, max_concurrency=max_concurrency
+        )
+        self.add_columns(columns)
+        return columns
+
+    def read(
+        self,
+        canonical_product_id: str,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> StoredPriceHistory:
+        """Returns the product's points from `start` to `end`, inclusive, oldest first.
+
+        The arrays are views of the memory-mapped column files unless some of the points haven't been
+        compacted yet, in which case they're copies. Views stay valid after later compactions.
+        """
+        start_timestamp = parse_timestamp(start) if start is not None else None
+        end_timestamp = parse_timestamp(end) if end is not None else None
+        with self._lock:
+            product = self._products.get(canonical_product_id)
+            if product is None:
+                return _empty_history()
+
+            first, last = self._rows(product)
+            product_timestamps = self._timestamps[first:last]
+            if end_timestamp is not None:
+                last = first + int(np.searchsorted(product_timestamps, end_timestamp, side="right"))
+            if start_timestamp is not None:
+                first += int(np.searchsorted(product_timestamps, start_timestamp, side="left"))
+            stored = StoredPriceHistory(
+                timestamps=self._timestamps[first:last],
+                prices=self._prices[first:last],
+                currency_codes=self._currency_codes_column[first:last],
+            )
+
+            pending = [
+                (timestamp, price, currency)
+                for timestamp, (price, currency) in self._pending.get(product, {}).items()
+                if (start_timestamp is None or timestamp >= start_timestamp)
+                and (end_timestamp is None or timestamp <= end_timestamp)
+            ]
+        if not pending:
+            return stored
+
+        timestamps = np.concatenate((stored.timestamps, np.array([point[0] for point in pending], dtype=np.int64)))
+        order = np.argsort(timestamps, kind="stable")
+        return StoredPriceHistory(
+            timestamps=timestamps[order],
+            prices=np.concatenate((stored.prices, np.array([point[1] for point in pending])))[order],
+            currency_codes=np.concatenate(
+                (stored.currency_codes, np.array([point[2] for point in pending], dtype=np.int32))
+            )[order],
+        )
+
+    def compact(self) -> None:
+        """Merges the points in the log into a new set of column files and starts a new log."""
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self._names_file.close()
+            self._currencies_file.close()
+
+    def _add_points(
+        self,
+        products: Iterable[Tuple[str, npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.int32]]],
+        currencies: List[str],
+    ) -> int:
+        """Stores the points of each product that aren't stored yet, given their timestamps, prices and
+        currency codes, which index into `currencies`.
+        """
+        with self._lock:
+            # (canonical product ID, timestamps, prices, indices into `currencies`) of the points that aren't
+            # stored yet
+            new_points: List[Tuple[str, npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.int32]]] = []
+            for canonical_product_id, timestamps, prices, codes in products:
+                # the first of any points with the same timestamp is kept
+                timestamps, unique = np.unique(timestamps, return_index=True)
+                product = self._products.get(canonical_product_id)
+                if product is not None:
+                    is_new = ~self._stored(product, timestamps)
+                    timestamps, unique = timestamps[is_new], unique[is_new]
+                if len(timestamps):
+                    new_points.append((canonical_product_id, timestamps, prices[unique], codes[unique]))
+
+            if not new_points:
+                return 0
+
+            # products and currencies are only numbered once they have points, and the names are written
+            # before the log so that every record in the log refers to a stored name
+            currency_codes = np.zeros(len(currencies), dtype=np.int32)
+            used: List[int] = np.unique(np.concatenate([codes for _, _, _, codes in new_points])).tolist()
+            for code in used:
+                currency_codes[code] = self._currencies_file.number(currencies[code])
+            records = np.empty(sum(len(timestamps) for _, timestamps, _, _ in new_points), dtype=_LOG_RECORD)
+            by_product: List[Tuple[int, npt.NDArray[np.void]]] = []
+            row = 0
+            for canonical_product_id, timestamps, prices, codes in new_points:
+                product = self._names_file.number(canonical_product_id)
+                product_records = records[row : row + len(timestamps)]
+                product_records["product"] = product
+                product_records["currency"] = currency_codes[codes]
+                product_records["timestamp"] = timestamps
+                product_records["price"] = prices
+                by_product.append((product, product_records))
+                row += len(timestamps)
+            self._names_file.flush()
+            self._currencies_file.flush()
+            self._append_log(records)
+
+            for product, product_records in by_product:
+                self._pending.setdefault(product, {}).update(
+                    zip(
+                        product_records["timestamp"].tolist(),
+                        zip(product_records["price"].tolist(), product_records["currency"].tolist()),
+                    )
+                )
+            added = len(records)
+            self._pending_count += added
+            if self._pending_count >= self.compact_after:
+                self._compact()
+        return added
+
+    def _stored(self, product: int, timestamps: npt.NDArray[np.int64]) -> npt.NDArray[np.bool_]:
+        """Returns whether each of the product's timestamps, which must be sorted, is already stored."""
+        first, last = self._rows(product)
+        stored = np.zeros(len(timestamps), dtype=np.bool_)
+        if first < last:
+            compacted = self._timestamps[first:last]
+            index = np.searchsorted(compacted, timestamps)
+            stored = compacted[np.minimum(index, len(compacted) - 1)] == timestamps
+
+        pending = self._pending.get(product)
+        if pending:
+            stored |= np.isin(timestamps, np.fromiter(pending, dtype=np.int64, count=len(pending)))
+        return stored
+
+    def _rows(self, product: int) -> Tuple[int, int]:
+        if product + 1 >= len(self._offsets):
+            return 0, 0
+        return int(self._offsets[product]), int(self._offsets[product + 1])
+
+    def _append_log(self, records: npt.NDArray[np.void]) -> None:
+        if self._log is None:
+            self._log = open(self._file("log"), "ab")
+        self._log.write(records.tobytes())
+        # flushed right away, so that nothing is lost if the process is killed
+        self._log.flush()
+
+    def _replay_log(self) -> None:
+        path = self._file("log")
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+
+        count = size // _LOG_RECORD.itemsize
+        if count * _LOG_RECORD.itemsize != size:
+            # the last record was cut short when the store was interrupted
+            log.warning("Ignoring a partial record at the end of %s", path)
+            with open(path, "r+b") as f:
+                f.truncate(count * _LOG_RECORD.itemsize)
+
+        records = np.fromfile(path, dtype=_LOG_RECORD, count=count)
+        # the log only has points that weren't in this generation's columns when they were added
+        for product, currency, timestamp, price in records.tolist():
+            self._pending.setdefault(product, {})[timestamp] = (price, currency)
+        self._pending_count = sum(len(points) for points in self._pending.values())
+
+    def _compact(self) -> None:
+        if not self._pending_count:
+            return
+
+        pending = [
+            (product, timestamp, price, currency)
+            for product, points in self._pending.items()
+            for timestamp, (price, currency) in points.items()
+        ]
+        pending_columns = np.array(pending, dtype=[("p", "<i8"), ("t", "<i8"), ("price", "<f8"), ("c", "<i4")])
+        products = np.concatenate(
+            (np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets)), pending_columns["p"])
+        )
+        timestamps = np.concatenate((self._timestamps, pending_columns["t"]))
+        order = np.lexsort((timestamps, products))
+        products = products[order]
+        offsets = np.searchsorted(products, np.arange(len(self._product_ids) + 1), side="left").astype(_OFFSETS)
+        columns = {
+            "timestamps": timestamps[order],
+            "prices": np.concatenate((self._prices, pending_columns["price"]))[order],
+            "currency_codes": np.concatenate((self._currency_codes_column, pending_columns["c"]))[order],
+        }
+
+        generation = self._generation + 1
+        for name, dtype in _COLUMNS.items():
+            _write(self._file(name, generation), columns[name].astype(dtype, copy=False))
+        _write(self._file("offsets", generation), offsets)
+
+        # switching the manifest is what commits the compaction
+        manifest = os.path.join(self.path, "manifest.json")
+        with open(f"{manifest}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{manifest}.tmp", manifest)
+
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._generation = generation
+        self._remove_other_generations()
+        self._load_columns()
+        self._pending = {}
+        self._pending_count = 0
+
+    def _read_manifest(self) -> int:
+        try:
+            with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as f:
+                return int(json.load(f)["generation"])
+        except FileNotFoundError:
+            return 0
+
+    def _remove_other_generations(self) -> None:
+        current = {self._file(name) for name in (*_COLUMNS, "offsets", "log")}
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.endswith(".bin") and path not in current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # e.g. still mapped on Windows, it's removed the next time the store is opened
+                    log.debug("Could not remove %s", path, exc_info=True)
+
+    def _load_columns(self) -> None:
+        self._timestamps = cast("npt.NDArray[np.int64]", _map(self._file("timestamps"), _COLUMNS["timestamps"]))
+        self._prices = cast("npt.NDArray[np.float64]", _map(self._file("prices"), _COLUMNS["prices"]))
+        self._currency_codes_column = cast(
+            "npt.NDArray[np.int32]", _map(self._file("currency_codes"), _COLUMNS["currency_codes"])
+        )
+        self._offsets = cast("npt.NDArray[np.int64]", _map(self._file("offsets"), _OFFSETS))
+
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self.path, f"{name}-{self._generation if generation is None else generation}.bin")
+
+
+class _NamesFile:
+    """Numbers names in the order they were first seen, appending each new one to a file on its own line."""
+
+    def __init__(self, path: str, names: List[str], numbers: Dict[str, int]) -> None:
+        self._path = path
+        self._names = names
+        self._numbers = numbers
+        self._file: Optional[BinaryIO] = None
+        self._buffer: List[str] = []
+        try:
+            with open(path, "r+b") as f:
+                complete = 0
+                for line in f:
+                    # a line without a newline was cut short when the store was interrupted, it's dropped
+                    # so that the next name is numbered as it was when it was first added
+                    if not line.endswith(b"\n"):
+                        f.truncate(complete)
+                        break
+                    self._add(line[:-1].decode("utf-8"))
+                    complete += len(line)
+        except FileNotFoundError:
+            pass
+
+    def number(self, name: str) -> int:
+        number = self._numbers.get(name)
+        if number is None:
+            number = self._add(name)
+            self._buffer.append(name)
+        return number
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._file = open(self._path, "ab")
+        self._file.write("".join(f"{name}\n" for name in self._buffer).encode("utf-8"))
+        self._file.flush()
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _add(self, name: str) -> int:
+        number = self._numbers[name] = len(self._names)
+        self._names.append(name)
+        return number
+
+
+def _map(path: str, dtype: np.dtype[Any]) -> npt.NDArray[Any]:
+    """Memory-maps a column file read-only, empty files can't be mapped so they get an empty array."""
+    try:
+        if os.path.getsize(path) > 0:
+            return np.memmap(path, dtype=dtype, mode="r")
+    except FileNotFoundError:
+        pass
+    return np.empty(0, dtype=dtype)
+
+
+def _write(path: str, values: npt.NDArray[np.generic]) -> None:
+    with open(path, "wb") as f:
+        f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _empty_history() -> StoredPriceHistory:
+    return StoredPriceHistory(
+        timestamps=np.empty(0, dtype=np.int64),
+        prices=np.empty(0, dtype=np.float64),
+        currency_codes=np.empty(0, dtype=np.int32),
+    )
@@ -0,0 +1,480 @@
+"""Incremental polling of price history for drops, polling volatile products more often than stable ones."""
+
+from __future__ import annotations
+
+import math
+import time
+import heapq
+import logging
+import threading
+from typing import TYPE_CHECKING, Set, Dict, List, Tuple, Callable, Optional, Generator, NamedTuple, AsyncGenerator
+from datetime import datetime, timezone, timedelta
+
+import anyio
+
+from .._models import BaseModel
+from .._price_history import PriceHistoryColumns, parse_timestamp
+
+if TYPE_CHECKING:
+    from .._client import Channel3, AsyncChannel3
+
+__all__ = ["PriceDrop", "PriceWatcher", "AsyncPriceWatcher", "PriceWatcherStats"]
+
+log: logging.Logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# the most history `retrieve_history()` returns
+_MAX_DAYS = 30
+
+
+class PriceDrop(NamedTuple):
+    """A new price point that fell far enough below the one before it, or below the product's target price."""
+
+    canonical_product_id: str
+
+    previous_price: float
+    """The price of the product's previous point."""
+
+    price: float
+
+    currency: str
+
+    timestamp: datetime
+    """When the new price was seen."""
+
+    reached_target: bool
+    """Whether the price fell to or below the product's `target_price` from above it."""
+
+    @property
+    def fraction(self) -> float:
+        """How far the price fell, as a fraction of the previous price."""
+        return (self.previous_price - self.price) / self.previous_price if self.previous_price else 0.0
+
+
+class PriceWatcherStats(BaseModel):
+    watched: int = 0
+    """The number of products being watched."""
+
+    polls: int = 0
+    """The number of times a product's history has been retrieved."""
+
+    failed: int = 0
+    """How many of those failed, they're retried at the product's next poll."""
+
+    new_points: int = 0
+    """The number of points newer than the last one seen for their product."""
+
+    drops: int = 0
+    """The number of `PriceDrop`s reported."""
+
+
+class _Product:
+    __slots__ = (
+        "canonical_product_id",
+        "target_price",
+        "interval",
+        "next_poll",
+        "checked_at",
+        "last_timestamp",
+        "last_price",
+        "currency",
+    )
+
+    def __init__(
+        self, canonical_product_id: str, target_price: Optional[float], interval: float, last_seen: Optional[datetime]
+    ) -> None:
+        self.canonical_product_id = canonical_product_id
+        self.target_price = target_price
+        self.interval = interval
+        # in terms of `time.monotonic()`
+        self.next_poll = 0.0
+        # in terms of `time.time()`, when the history was last retrieved
+        self.checked_at: Optional[float] = None
+        # microseconds since the epoch, like `PriceHistoryColumns.timestamps`
+        self.last_timestamp: Optional[int] = parse_timestamp(last_seen) if last_seen is not None else None
+        self.last_price: Optional[float] = None
+        self.currency: Optional[str] = None
+
+
+class _BasePriceWatcher:
+    def __init__(
+        self,
+        *,
+        min_drop: Optional[float],
+        min_interval: float,
+        max_interval: float,
+        backoff: float,
+        max_concurrency: int,
+        on_drop: Optional[Callable[[PriceDrop], object]],
+    ) -> None:
+        if min_drop is not None and not 0 < min_drop < 1:
+            raise ValueError(f"Expected `min_drop` to be between 0 and 1 but received {min_drop}")
+        if min_interval <= 0:
+            raise ValueError(f"Expected `min_interval` to be positive but received {min_interval}")
+        if max_interval < min_interval:
+            raise ValueError(
+                f"Expected `max_interval` to be at least `min_interval` ({min_interval}) but received {max_interval}"
+            )
+        if backoff < 1:
+            raise ValueError(f"Expected `backoff` to be at least 1 but received {backoff}")
+        if max_concurrency < 1:
+            raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+
+        self.min_drop = min_drop
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.on_drop = on_drop
+
+        self._lock = threading.Lock()
+        self._products: Dict[str, _Product] = {}
+        # (next poll, canonical product ID), entries whose product was rescheduled or unwatched are skipped
+        self._schedule: List[Tuple[float, str]] = []
+        self._polls = 0
+        self._failed = 0
+        self._new_points = 0
+        self._drops = 0
+
+    def watch(
+        self,
+        canonical_product_id: str,
+        *,
+        target_price: Optional[float] = None,
+        last_seen: Optional[datetime] = None,
+    ) -> None:
+        """Starts watching a product, polling it right away.
+
+        A `PriceDrop` is reported when a new price is at least `min_drop` below the previous one, or when it
+        falls to or below `target_price`. The first poll only records the latest price unless `last_seen` is
+        given, in which case points after it are compared too. Watching a product again updates its target
+        price and keeps what's been seen.
+        """
+        with self._lock:
+            product = self._products.get(canonical_product_id)
+            if product is not None:
+                product.target_price = target_price
+            else:
+                self._add(canonical_product_id, target_price=target_price, last_seen=last_seen)
+
+    def unwatch(self, canonical_product_id: str) -> None:
+        with self._lock:
+            self._products.pop(canonical_product_id, None)
+
+    def last_seen(self, canonical_product_id: str) -> Optional[datetime]:
+        """Returns when the latest point seen for the product was, to pass to `watch()` after a restart."""
+        with self._lock:
+            last_timestamp = self._products[canonical_product_id].last_timestamp
+        return _EPOCH + timedelta(microseconds=last_timestamp) if last_timestamp is not None else None
+
+    def stats(self) -> PriceWatcherStats:
+        with self._lock:
+            return PriceWatcherStats(
+                watched=len(self._products),
+                polls=self._polls,
+                failed=self._failed,
+                new_points=self._new_points,
+                drops=self._drops,
+            )
+
+    def _add(self, canonical_product_id: str, *, target_price: Optional[float], last_seen: Optional[datetime]) -> None:
+        product = self._products[canonical_product_id] = _Product(
+            canonical_product_id, target_price, self.min_interval, last_seen
+        )
+        product.next_poll = time.monotonic()
+        heapq.heappush(self._schedule, (product.next_poll, canonical_product_id))
+
+    def _update(self, active: Set[str]) -> None:
+        """Watches the given products, keeping what's been seen of the ones already watched, and no others."""
+        with self._lock:
+            for canonical_product_id in set(self._products) - active:
+                del self._products[canonical_product_id]
+            for canonical_product_id in active - set(self._products):
+                self._add(canonical_product_id, target_price=None, last_seen=None)
+
+    def _due(self) -> Dict[int, List[str]]:
+        """Takes the products that are due to be polled off the schedule, grouped by the days of history needed."""
+        now = time.monotonic()
+        wall_now = time.time()
+        due: Dict[int, List[str]] = {}
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                next_poll, canonical_product_id = heapq.heappop(self._schedule)
+                product = self._products.get(canonical_product_id)
+                if product is None or product.next_poll != next_poll:
+                    continue
+
+                # only ask for the days since the last poll, the whole window is only needed for the first one
+                if product.checked_at is None:
+                    days = _MAX_DAYS
+                else:
+                    days = min(max(math.ceil((wall_now - product.checked_at) / 86400), 1), _MAX_DAYS)
+                due.setdefault(days, []).append(canonical_product_id)
+                # keeps the product scheduled if the poll doesn't get as far as rescheduling it
+                self._reschedule(product, now, changed=None)
+        return due
+
+    def _seconds_until_due(self) -> float:
+        with self._lock:
+            while self._schedule:
+                next_poll, canonical_product_id = self._schedule[0]
+                product = self._products.get(canonical_product_id)
+                if product is not None and product.next_poll == next_poll:
+                    return max(next_poll - time.monotonic(), 0.0)
+                heapq.heappop(self._schedule)
+        return self.min_interval
+
+    def _process(self, columns: PriceHistoryColumns, checked_at: float) -> List[PriceDrop]:
+        """Compares the points newer than the last one seen for each product, and reschedules the products."""
+        drops: List[PriceDrop] = []
+        now = time.monotonic()
+        with self._lock:
+            self._polls += len(columns.product_ids) + len(columns.failed)
+            self._failed += len(columns.failed)
+            for canonical_product_id in columns.failed:
+                log.warning(
+                    "Could not retrieve the price history of %s",
+                    canonical_product_id,
+                    exc_info=columns.failed[canonical_product_id],
+                )
+                product = self._products.get(canonical_product_id)
+                if product is not None:
+                    self._reschedule(product, now, changed=None)
+
+            for canonical_product_id in columns.product_ids:
+                product = self._products.get(canonical_product_id)
+                if product is None:
+                    continue
+
+                # the points can come back in any order
+                rows = sorted(
+                    range(*columns.rows(canonical_product_id).indices(len(columns))),
+                    key=columns.timestamps.__getitem__,
+                )
+                if product.last_timestamp is None and product.checked_at is None:
+                    # the first poll only records where the product's history is up to
+                    rows = rows[-1:]
+                else:
+                    if product.last_timestamp is not None:
+                        last_timestamp = product.last_timestamp
+                        seen = [row for row in rows if columns.timestamps[row] <= last_timestamp]
+                        if seen and product.last_price is None:
+                            # resuming from `last_seen`, the points up to it give the price to compare with
+                            product.last_price = columns.prices[seen[-1]]
+                            product.currency = columns.currencies[columns.currency_codes[seen[-1]]]
+                        rows = rows[len(seen) :]
+                    self._new_points += len(rows)
+
+                changed = False
+                for row in rows:
+                    price = columns.prices[row]
+                    currency = columns.currencies[columns.currency_codes[row]]
+                    previous = product.last_price if product.currency == currency else None
+                    if previous is not None and price != previous:
+                        changed = True
+                        drop = self._drop(
+                            canonical_product_id, product, previous, price, currency, columns.timestamps[row]
+                        )
+                        if drop is not None:
+                            drops.append(drop)
+                    product.last_price = price
+                    product.currency = currency
+
+                if rows:
+                    product.last_timestamp = columns.timestamps[rows[-1]]
+                product.checked_at = checked_at
+                self._reschedule(product, now, changed=changed)
+
+            self._drops += len(drops)
+        return drops
+
+    def _drop(
+        self,
+        canonical_product_id: str,
+        product: _Product,
+        previous: float,
+        price: float,
+        currency: str,
+        timestamp: int,
+    ) -> Optional[PriceDrop]:
+        reached_target = product.target_price is not None and price <= product.target_price < previous
+        fell = self.min_drop is not None and previous - price >= self.min_drop * previous
+        if not (reached_target or fell):
+            return None
+
+        return PriceDrop(
+            canonical_product_id=canonical_product_id,
+            previous_price=previous,
+            price=price,
+            currency=currency,
+            timestamp=_EPOCH + timedelta(microseconds=timestamp),
+            reached_target=reached_target,
+        )
+
+    def _reschedule(self, product: _Product, now: float, *, changed: Optional[bool]) -> None:
+        """Polls products whose price changed sooner and ones whose price didn't later, `None` if it's unknown."""
+        if changed:
+            product.interval = max(product.interval / self.backoff, self.min_interval)
+        elif changed is not None:
+            product.interval = min(product.interval * self.backoff, self.max_interval)
+
+        product.next_poll = now + product.interval
+        heapq.heappush(self._schedule, (product.next_poll, product.canonical_product_id))
+
+    def _report(self, drops: List[PriceDrop]) -> None:
+        if self.on_drop is not None:
+            for drop in drops:
+                self.on_drop(drop)
+
+
+class PriceWatcher(_BasePriceWatcher):
+    """Watches products for price drops, polling `retrieve_history()` only for the history that's new.
+
+    Each product is polled every `min_interval` to `max_interval` seconds: the interval is divided by
+    `backoff` whenever a poll finds that the price changed and multiplied by it whenever it didn't, so stable
+    products are polled rarely and the number of requests follows how often prices change. Each poll only
+    asks for the days since the product was last polled and only the points after the last one seen are
+    compared, as `PriceDrop`s passed to `on_drop` and returned from `poll()`.
+
+    Call `poll()` yourself, iterate over `drops()`, or `start()` polling from a daemon thread. A watcher can
+    be shared between threads.
+    """
+
+    def __init__(
+        self,
+        client: Channel3,
+        *,
+        min_drop: Optional[float] = 0.05,
+        min_interval: float = 900.0,
+        max_interval: float = 24 * 3600.0,
+        backoff: float = 2.0,
+        max_concurrency: int = 8,
+        on_drop: Optional[Callable[[PriceDrop], object]] = None,
+    ) -> None:
+        super().__init__(
+            min_drop=min_drop,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            backoff=backoff,
+            max_concurrency=max_concurrency,
+            on_drop=on_drop,
+        )
+        self._client = client
+        self._stop: Optional[threading.Event] = None
+
+    def watch_subscriptions(self, *, page_size: int = 100) -> None:
+        """Watches the products with an active price tracking subscription, and stops watching the others."""
+        subscriptions = self._client.price_tracking.list_subscriptions(limit=page_size)
+        self._update(
+            {
+                subscription.canonical_product_id
+                for subscription in subscriptions
+                if subscription.subscription_status == "active"
+            }
+        )
+
+    def poll(self) -> List[PriceDrop]:
+        """Polls the products that are due and returns the drops found, after passing each to `on_drop`."""
+        drops: List[PriceDrop] = []
+        for days, canonical_product_ids in self._due().items():
+            checked_at = time.time()
+            columns = self._client.price_tracking.retrieve_history_many(
+                canonical_product_ids, days=days, max_concurrency=self.max_concurrency
+            )
+            drops.extend(self._process(columns, checked_at))
+
+        self._report(drops)
+        return drops
+
+    def drops(self) -> Generator[PriceDrop, None, None]:
+        """Polls forever, sleeping until the next product is due, and yields each drop found."""
+        while True:
+            yield from self.poll()
+            time.sleep(self._seconds_until_due())
+
+    def start(self) -> None:
+        """Polls from a daemon thread until `stop()`, passing the drops found to `on_drop`.
+
+        Failed polls are logged and retried.
+        """
+        if self._stop is not None:
+            raise RuntimeError("The watcher has already been started")
+
+        stop = self._stop = threading.Event()
+
+        def run() -> None:
+            while True:
+                try:
+                    self.poll()
+                except Exception:
+                    log.warning("Could not poll the watched products", exc_info=True)
+                if stop.wait(self._seconds_until_due()):
+                    return
+
+        threading.Thread(target=run, name="channel3-price-watcher", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+
+class AsyncPriceWatcher(_BasePriceWatcher):
+    """Watches products for price drops, polling `retrieve_history()` only for the history that's new.
+
+    See `PriceWatcher` for how products are polled. Call `poll()` yourself or iterate over `drops()`, e.g.
+    from a task.
+    """
+
+    def __init__(
+        self,
+        client: AsyncChannel3,
+        *,
+        min_drop: Optional[float] = 0.05,
+        min_interval: float = 900.0,
+        max_interval: float = 24 * 3600.0,
+        backoff: float = 2.0,
+        max_concurrency: int = 8,
+        on_drop: Optional[Callable[[PriceDrop], object]] = None,
+    ) -> None:
+        super().__init__(
+            min_drop=min_drop,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            backoff=backoff,
+            max_concurrency=max_concurrency,
+            on_drop=on_drop,
+        )
+        self._client = client
+
+    async def watch_subscriptions(self, *, page_size: int = 100) -> None:
+        """Watches the products with an active price tracking subscription, and stops watching the others."""
+        subscriptions = self._client.price_tracking.list_subscriptions(limit=page_size)
+        self._update(
+            {
+                subscription.canonical_product_id
+                async for subscription in subscriptions
+                if subscription.subscription_status == "active"
+            }
+        )
+
+    async def poll(self) -> List[PriceDrop]:
+        """Polls the products that are due and returns the drops found, after passing each to `on_drop`."""
+        drops: List[PriceDrop] = []
+        for days, canonical_product_ids in self._due().items():
+            checked_at = time.time()
+            columns = await self._client.price_tracking.retrieve_history_many(
+                canonical_product_ids, days=days, max_concurrency=self.max_concurrency
+            )
+            drops.extend(self._process(columns, checked_at))
+
+        self._report(drops)
+        return drops
+
+    async def drops(self) -> AsyncGenerator[PriceDrop, None]:
+        """Polls forever, sleeping until the next product is due, and yields each drop found."""
+        while True:
+            for drop in await self.poll():
+                yield drop
+            await anyio.sleep(self._seconds_until_due())
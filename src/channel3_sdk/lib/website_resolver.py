@@ -0,0 +1,214 @@
+"""Memoized resolution of merchant domains to websites, for building `website_ids` filters."""
+
+from __future__ import annotations
+
+import time
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Iterable, Optional
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
+
+from .._models import BaseModel
+from ..types.website import Website
+from .._single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from .._client import Channel3, AsyncChannel3
+
+__all__ = ["WebsiteResolver", "AsyncWebsiteResolver", "WebsiteResolverStats"]
+
+
+class WebsiteResolverStats(BaseModel):
+    hits: int = 0
+    """The number of lookups answered with a memoized website."""
+
+    negative_hits: int = 0
+    """The number of lookups answered with a memoized miss, i.e. a domain the API doesn't know."""
+
+    misses: int = 0
+    """The number of lookups that had to call the API."""
+
+    coalesced: int = 0
+    """How many of those waited for an identical lookup that was already in flight."""
+
+    entries: int = 0
+    """The number of memoized websites and misses, including ones that have expired but not yet been removed."""
+
+
+class _BaseWebsiteResolver:
+    def __init__(self, *, ttl: float, negative_ttl: float, max_entries: int) -> None:
+        if ttl <= 0:
+            raise ValueError(f"Expected `ttl` to be positive but received {ttl}")
+        if negative_ttl < 0:
+            raise ValueError(f"Expected `negative_ttl` to be non-negative but received {negative_ttl}")
+        if max_entries < 1:
+            raise ValueError(f"Expected `max_entries` to be at least 1 but received {max_entries}")
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # domain -> (website or `None` for a miss, when it expires in terms of `time.monotonic()`)
+        self._entries: OrderedDict[str, Tuple[Optional[Website], float]] = OrderedDict()
+        self._single_flight = SingleFlight()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+
+    def stats(self) -> WebsiteResolverStats:
+        with self._lock:
+            return WebsiteResolverStats(
+                hits=self._hits,
+                negative_hits=self._negative_hits,
+                misses=self._misses,
+                coalesced=self._single_flight.stats().coalesced,
+                entries=len(self._entries),
+            )
+
+    def invalidate(self, query: str) -> None:
+        with self._lock:
+            self._entries.pop(normalize_domain(query), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, domain: str) -> Tuple[bool, Optional[Website]]:
+        """Returns whether the domain is memoized, and if so the website."""
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None or entry[1] <= time.monotonic():
+                self._misses += 1
+                return False, None
+
+            self._entries.move_to_end(domain)
+            website = entry[0]
+            if website is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return True, website
+
+    def _store(self, domain: str, website: Optional[Website]) -> None:
+        ttl = self.ttl if website is not None else self.negative_ttl
+        if ttl == 0:
+            return
+
+        with self._lock:
+            self._entries[domain] = (website, time.monotonic() + ttl)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class WebsiteResolver(_BaseWebsiteResolver):
+    """Resolves domains to websites with `websites.retrieve()`, memoizing the results.
+
+    Websites are memoized for `ttl` seconds and domains the API doesn't know for `negative_ttl` seconds,
+    up to `max_entries` domains in total with the least recently used ones dropped first. Errors aren't
+    memoized. Queries are normalized first, so `https://www.Nike.com/shoes` and `nike.com` share an entry,
+    and concurrent lookups of the same domain share one request.
+
+    A resolver can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        client: Channel3,
+        *,
+        ttl: float = 24 * 3600.0,
+        negative_ttl: float = 3600.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        super().__init__(ttl=ttl, negative_ttl=negative_ttl, max_entries=max_entries)
+        self._client = client
+
+    def resolve(self, query: str) -> Optional[Website]:
+        domain = normalize_domain(query)
+        found, website = self._lookup(domain)
+        if found:
+            return website
+
+        return self._single_flight.do(domain, lambda: self._fetch(domain))
+
+    def resolve_many(self, queries: Iterable[str], *, max_concurrency: int = 8) -> Dict[str, Optional[Website]]:
+        """Resolves each query, calling the API for up to `max_concurrency` of them at a time.
+
+        The results are keyed by the queries as given.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+
+        queries = list(dict.fromkeys(queries))
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="channel3-websites") as executor:
+            return dict(zip(queries, executor.map(self.resolve, queries)))
+
+    def _fetch(self, domain: str) -> Optional[Website]:
+        website = self._client.websites.retrieve(query=domain)
+        self._store(domain, website)
+        return website
+
+
+class AsyncWebsiteResolver(_BaseWebsiteResolver):
+    """Resolves domains to websites with `websites.retrieve()`, memoizing the results.
+
+    See `WebsiteResolver` for how results are memoized. A resolver can be shared between tasks.
+    """
+
+    def __init__(
+        self,
+        client: AsyncChannel3,
+        *,
+        ttl: float = 24 * 3600.0,
+        negative_ttl: float = 3600.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        super().__init__(ttl=ttl, negative_ttl=negative_ttl, max_entries=max_entries)
+        self._client = client
+
+    async def resolve(self, query: str) -> Optional[Website]:
+        domain = normalize_domain(query)
+        found, website = self._lookup(domain)
+        if found:
+            return website
+
+        return await self._single_flight.ado(domain, lambda: self._fetch(domain))
+
+    async def resolve_many(self, queries: Iterable[str], *, max_concurrency: int = 8) -> Dict[str, Optional[Website]]:
+        """Resolves each query, calling the API for up to `max_concurrency` of them at a time.
+
+        The results are keyed by the queries as given.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"Expected `max_concurrency` to be at least 1 but received {max_concurrency}")
+
+        queries = list(dict.fromkeys(queries))
+        results: List[Optional[Website]] = [None] * len(queries)
+        limiter = anyio.CapacityLimiter(max_concurrency)
+
+        async def resolve(index: int, query: str) -> None:
+            async with limiter:
+                results[index] = await self.resolve(query)
+
+        async with anyio.create_task_group() as tg:
+            for index, query in enumerate(queries):
+                tg.start_soon(resolve, index, query)
+
+        return dict(zip(queries, results))
+
+    async def _fetch(self, domain: str) -> Optional[Website]:
+        website = await self._client.websites.retrieve(query=domain)
+        self._store(domain, website)
+        return website
+
+
+def normalize_domain(query: str) -> str:
+    """Reduces a URL or domain to its lowercased host, without any `www.` prefix, port or trailing dot."""
+    query = query.strip()
+    host = urlsplit(query if "//" in query else f"//{query}").hostname or query.lower()
+    host = host.rstrip(".")
+    return host[4:] if host.startswith("www.") else host
@@ -74,7 +74,11 @@ class BrandsResource(SyncAPIResource):
         return self._get(
             path_template("/v1/brands/{brand_id}", brand_id=brand_id),
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                cache_key=self._client._cache_key("brands.retrieve", brand_id),
             ),
             cast_to=Brand,
         )
@@ -258,7 +262,11 @@ class AsyncBrandsResource(AsyncAPIResource):
         return await self._get(
             path_template("/v1/brands/{brand_id}", brand_id=brand_id),
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                cache_key=self._client._cache_key("brands.retrieve", brand_id),
             ),
             cast_to=Brand,
         )
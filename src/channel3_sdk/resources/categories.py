@@ -72,7 +72,11 @@ class CategoriesResource(SyncAPIResource):
         return self._get(
             path_template("/v1/categories/{slug}", slug=slug),
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                cache_key=self._client._cache_key("categories.retrieve", slug),
             ),
             cast_to=Category,
         )
@@ -224,7 +228,11 @@ class AsyncCategoriesResource(AsyncAPIResource):
         return await self._get(
             path_template("/v1/categories/{slug}", slug=slug),
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                cache_key=self._client._cache_key("categories.retrieve", slug),
             ),
             cast_to=Category,
         )
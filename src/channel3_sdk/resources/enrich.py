@@ -2,11 +2,25 @@
 
 from __future__ import annotations
 
+import os
+import time
 import typing_extensions
+from typing import Tuple, Union, Callable, Iterable, Iterator, Optional, AsyncIterator
 
 import httpx
 
 from ..types import enrich_enrich_url_params
+from .._batch import (
+    BatchStats,
+    Checkpoint,
+    BatchProgress,
+    skip_completed,
+    track_progress,
+    atrack_progress,
+    map_concurrently,
+    amap_concurrently,
+)
+from .._cache import normalize_url
 from .._types import Body, Query, Headers, NotGiven, not_given
 from .._utils import maybe_transform, async_maybe_transform
 from .._compat import cached_property
@@ -17,6 +31,7 @@ from .._response import (
     async_to_raw_response_wrapper,
     async_to_streamed_response_wrapper,
 )
+from .._exceptions import APIError
 from .._base_client import make_request_options
 from ..types.enrich_enrich_url_response import EnrichEnrichURLResponse
 
@@ -85,6 +100,75 @@ class EnrichResource(SyncAPIResource):
             cast_to=EnrichEnrichURLResponse,
         )
 
+    @typing_extensions.deprecated("use `products.lookup_many` instead; will be removed in the next major version")
+    def enrich_url_many(
+        self,
+        urls: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        checkpoint: Union[str, os.PathLike[str], None] = None,
+        on_progress: Optional[Callable[[BatchStats], None]] = None,
+        progress_interval: float = 10.0,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Iterator[Tuple[str, Union[EnrichEnrichURLResponse, APIError]]]:
+        """
+        **Deprecated** — use `products.lookup_many()` instead.
+
+        Enrich many product URLs with `enrich_url()`, yielding `(url, response)` pairs as they complete.
+
+        URLs are read and deduplicated like `products.lookup_many()` does, with up to `max_concurrency`
+        enriched at a time. An `APIError` is yielded in place of the response for a URL that couldn't be
+        enriched.
+
+        With a `checkpoint` file, each URL that's enriched successfully is appended to it and URLs that are
+        already in it are skipped, so a job that's restarted with the same file carries on where it stopped.
+
+        Every `progress_interval` seconds, and once every URL has been enriched, the `BatchStats` with the
+        URLs per second and the p50 / p99 latency are logged at the `info` level and passed to `on_progress`.
+
+        Args:
+          checkpoint: The file that records the URLs that have been enriched, created if it doesn't exist.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        progress = BatchProgress(on_progress, interval=progress_interval)
+        completed = Checkpoint(checkpoint) if checkpoint is not None else None
+        options = make_request_options(
+            extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+        )
+
+        def enrich(url: str) -> EnrichEnrichURLResponse:
+            started = time.monotonic()
+            try:
+                return self._post(
+                    "/v0/enrich",
+                    body=maybe_transform({"url": url}, enrich_enrich_url_params.EnrichEnrichURLParams),
+                    options=options,
+                    cast_to=EnrichEnrichURLResponse,
+                )
+            finally:
+                progress.record_latency(time.monotonic() - started)
+
+        results = map_concurrently(
+            self._client._batch_executor(),
+            enrich,
+            skip_completed(urls, completed, progress),
+            max_concurrency=max_concurrency,
+            key=normalize_url,
+        )
+        return track_progress(results, progress, completed)
+
 
 class AsyncEnrichResource(AsyncAPIResource):
     @cached_property
@@ -148,6 +232,74 @@ class AsyncEnrichResource(AsyncAPIResource):
             cast_to=EnrichEnrichURLResponse,
         )
 
+    @typing_extensions.deprecated("use `products.lookup_many` instead; will be removed in the next major version")
+    def enrich_url_many(
+        self,
+        urls: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        checkpoint: Union[str, os.PathLike[str], None] = None,
+        on_progress: Optional[Callable[[BatchStats], None]] = None,
+        progress_interval: float = 10.0,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> AsyncIterator[Tuple[str, Union[EnrichEnrichURLResponse, APIError]]]:
+        """
+        **Deprecated** — use `products.lookup_many()` instead.
+
+        Enrich many product URLs with `enrich_url()`, yielding `(url, response)` pairs as they complete.
+
+        URLs are read and deduplicated like `products.lookup_many()` does, with up to `max_concurrency`
+        enriched at a time. An `APIError` is yielded in place of the response for a URL that couldn't be
+        enriched.
+
+        With a `checkpoint` file, each URL that's enriched successfully is appended to it and URLs that are
+        already in it are skipped, so a job that's restarted with the same file carries on where it stopped.
+
+        Every `progress_interval` seconds, and once every URL has been enriched, the `BatchStats` with the
+        URLs per second and the p50 / p99 latency are logged at the `info` level and passed to `on_progress`.
+
+        Args:
+          checkpoint: The file that records the URLs that have been enriched, created if it doesn't exist.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        progress = BatchProgress(on_progress, interval=progress_interval)
+        completed = Checkpoint(checkpoint) if checkpoint is not None else None
+        options = make_request_options(
+            extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+        )
+
+        async def enrich(url: str) -> EnrichEnrichURLResponse:
+            started = time.monotonic()
+            try:
+                return await self._post(
+                    "/v0/enrich",
+                    body=await async_maybe_transform({"url": url}, enrich_enrich_url_params.EnrichEnrichURLParams),
+                    options=options,
+                    cast_to=EnrichEnrichURLResponse,
+                )
+            finally:
+                progress.record_latency(time.monotonic() - started)
+
+        results = amap_concurrently(
+            enrich,
+            skip_completed(urls, completed, progress),
+            max_concurrency=max_concurrency,
+            key=normalize_url,
+        )
+        return atrack_progress(results, progress, completed)
+
 
 class EnrichResourceWithRawResponse:
     def __init__(self, enrich: EnrichResource) -> None:
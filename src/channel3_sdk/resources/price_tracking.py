@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import itertools
 import typing_extensions
-from typing import Optional
+from typing import Any, Tuple, Mapping, Iterable, Optional, cast
 
 import httpx
 
@@ -13,6 +14,7 @@ from ..types import (
     price_tracking_retrieve_history_params,
     price_tracking_list_subscriptions_params,
 )
+from .._batch import ReconcileReport, map_concurrently, amap_concurrently
 from .._types import Body, Omit, Query, Headers, NotGiven, omit, not_given
 from .._utils import path_template, maybe_transform, async_maybe_transform
 from .._compat import cached_property
@@ -24,7 +26,9 @@ from .._response import (
     async_to_streamed_response_wrapper,
 )
 from ..pagination import SyncCursorPage, AsyncCursorPage
+from .._exceptions import APIError
 from .._base_client import AsyncPaginator, make_request_options
+from .._price_history import PriceHistoryColumns
 from ..types.subscription import Subscription
 from ..types.price_history import PriceHistory
 
@@ -134,6 +138,85 @@ class PriceTrackingResource(SyncAPIResource):
             model=Subscription,
         )
 
+    def reconcile(
+        self,
+        desired_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        page_size: int = 100,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> ReconcileReport:
+        """
+        Make the tracked products match `desired_ids`, starting and stopping only the subscriptions that differ.
+
+        The active subscriptions are listed `page_size` at a time and only their IDs are kept. Then `start()`
+        is called for each desired product that isn't tracked yet and `stop()` for each tracked product that
+        isn't desired, up to `max_concurrency` at a time. A call that fails is reported in
+        `ReconcileReport.failed` rather than raised, so reconciling again retries it.
+
+        Args:
+          desired_ids: The canonical product IDs that should be tracked.
+
+          page_size: Subscriptions per page, 1-100.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        desired = set(desired_ids)
+        subscriptions = self.list_subscriptions(
+            limit=page_size,
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+        )
+        active = {
+            subscription.canonical_product_id
+            for subscription in subscriptions
+            if subscription.subscription_status == "active"
+        }
+        to_start = sorted(desired - active)
+        to_stop = sorted(active - desired)
+
+        def change(action: Tuple[bool, str]) -> Subscription:
+            start, canonical_product_id = action
+            return (self.start if start else self.stop)(
+                canonical_product_id=canonical_product_id,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        actions = itertools.chain(((True, id) for id in to_start), ((False, id) for id in to_stop))
+        report = ReconcileReport(
+            desired=len(desired),
+            active=len(active),
+            unchanged=len(desired & active),
+            started=[],
+            stopped=[],
+            failed={},
+        )
+        for (start, canonical_product_id), result in map_concurrently(
+            self._client._batch_executor(), change, actions, max_concurrency=max_concurrency
+        ):
+            if isinstance(result, APIError):
+                report.failed[canonical_product_id] = result
+            else:
+                (report.started if start else report.stopped).append(canonical_product_id)
+
+        return report
+
     def retrieve_history(
         self,
         canonical_product_id: str,
@@ -180,6 +263,75 @@ class PriceTrackingResource(SyncAPIResource):
             cast_to=PriceHistory,
         )
 
+    def retrieve_history_many(
+        self,
+        canonical_product_ids: Iterable[str],
+        *,
+        days: int | Omit = omit,
+        max_concurrency: int = 8,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> PriceHistoryColumns:
+        """
+        Get the price history of many canonical products as columns, making up to `max_concurrency` requests at a time.
+
+        The points are read straight from each response into `PriceHistoryColumns`, one column per field,
+        without building a `PriceHistoryPoint` for each of them. Call `.to_numpy()` on the result for NumPy
+        arrays. A product whose history can't be retrieved is reported in `PriceHistoryColumns.failed` rather
+        than raised.
+
+        Args:
+          canonical_product_ids: The canonical product IDs to get the history of, duplicates are requested once.
+
+          days: Number of days of history to fetch (max 30)
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        ids = list(dict.fromkeys(canonical_product_ids))
+        if not all(ids):
+            raise ValueError("Expected every `canonical_product_ids` value to be non-empty")
+
+        options = make_request_options(
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+            query=maybe_transform(
+                {"days": days}, price_tracking_retrieve_history_params.PriceTrackingRetrieveHistoryParams
+            ),
+        )
+
+        def fetch(canonical_product_id: str) -> object:
+            # `object` skips building models, the raw JSON is read straight into the columns
+            return self._get(
+                path_template(
+                    "/v0/price-tracking/history/{canonical_product_id}", canonical_product_id=canonical_product_id
+                ),
+                options=options,
+                cast_to=object,
+            )
+
+        columns = PriceHistoryColumns()
+        for canonical_product_id, result in map_concurrently(
+            self._client._batch_executor(), fetch, ids, max_concurrency=max_concurrency
+        ):
+            if isinstance(result, APIError):
+                columns.failed[canonical_product_id] = result
+            else:
+                columns.add(canonical_product_id, cast("Mapping[str, Any]", result))
+
+        return columns
+
     def start(
         self,
         *,
@@ -352,6 +504,85 @@ class AsyncPriceTrackingResource(AsyncAPIResource):
             model=Subscription,
         )
 
+    async def reconcile(
+        self,
+        desired_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        page_size: int = 100,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> ReconcileReport:
+        """
+        Make the tracked products match `desired_ids`, starting and stopping only the subscriptions that differ.
+
+        The active subscriptions are listed `page_size` at a time and only their IDs are kept. Then `start()`
+        is called for each desired product that isn't tracked yet and `stop()` for each tracked product that
+        isn't desired, up to `max_concurrency` at a time. A call that fails is reported in
+        `ReconcileReport.failed` rather than raised, so reconciling again retries it.
+
+        Args:
+          desired_ids: The canonical product IDs that should be tracked.
+
+          page_size: Subscriptions per page, 1-100.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        desired = set(desired_ids)
+        subscriptions = self.list_subscriptions(
+            limit=page_size,
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+        )
+        active = {
+            subscription.canonical_product_id
+            async for subscription in subscriptions
+            if subscription.subscription_status == "active"
+        }
+        to_start = sorted(desired - active)
+        to_stop = sorted(active - desired)
+
+        async def change(action: Tuple[bool, str]) -> Subscription:
+            start, canonical_product_id = action
+            return await (self.start if start else self.stop)(
+                canonical_product_id=canonical_product_id,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        actions = itertools.chain(((True, id) for id in to_start), ((False, id) for id in to_stop))
+        report = ReconcileReport(
+            desired=len(desired),
+            active=len(active),
+            unchanged=len(desired & active),
+            started=[],
+            stopped=[],
+            failed={},
+        )
+        async for (start, canonical_product_id), result in amap_concurrently(
+            change, actions, max_concurrency=max_concurrency
+        ):
+            if isinstance(result, APIError):
+                report.failed[canonical_product_id] = result
+            else:
+                (report.started if start else report.stopped).append(canonical_product_id)
+
+        return report
+
     async def retrieve_history(
         self,
         canonical_product_id: str,
@@ -398,6 +629,73 @@ class AsyncPriceTrackingResource(AsyncAPIResource):
             cast_to=PriceHistory,
         )
 
+    async def retrieve_history_many(
+        self,
+        canonical_product_ids: Iterable[str],
+        *,
+        days: int | Omit = omit,
+        max_concurrency: int = 8,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> PriceHistoryColumns:
+        """
+        Get the price history of many canonical products as columns, making up to `max_concurrency` requests at a time.
+
+        The points are read straight from each response into `PriceHistoryColumns`, one column per field,
+        without building a `PriceHistoryPoint` for each of them. Call `.to_numpy()` on the result for NumPy
+        arrays. A product whose history can't be retrieved is reported in `PriceHistoryColumns.failed` rather
+        than raised.
+
+        Args:
+          canonical_product_ids: The canonical product IDs to get the history of, duplicates are requested once.
+
+          days: Number of days of history to fetch (max 30)
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        ids = list(dict.fromkeys(canonical_product_ids))
+        if not all(ids):
+            raise ValueError("Expected every `canonical_product_ids` value to be non-empty")
+
+        options = make_request_options(
+            extra_headers=extra_headers,
+            extra_query=extra_query,
+            extra_body=extra_body,
+            timeout=timeout,
+            query=await async_maybe_transform(
+                {"days": days}, price_tracking_retrieve_history_params.PriceTrackingRetrieveHistoryParams
+            ),
+        )
+
+        async def fetch(canonical_product_id: str) -> object:
+            # `object` skips building models, the raw JSON is read straight into the columns
+            return await self._get(
+                path_template(
+                    "/v0/price-tracking/history/{canonical_product_id}", canonical_product_id=canonical_product_id
+                ),
+                options=options,
+                cast_to=object,
+            )
+
+        columns = PriceHistoryColumns()
+        async for canonical_product_id, result in amap_concurrently(fetch, ids, max_concurrency=max_concurrency):
+            if isinstance(result, APIError):
+                columns.failed[canonical_product_id] = result
+            else:
+                columns.add(canonical_product_id, cast("Mapping[str, Any]", result))
+
+        return columns
+
     async def start(
         self,
         *,
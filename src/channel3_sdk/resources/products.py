@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Tuple, Union, Iterable, Iterator, Optional, Awaitable, AsyncIterator, overload
 from typing_extensions import Literal
 
 import httpx
@@ -14,8 +14,10 @@ from ..types import (
     product_find_similar_params,
     product_search_by_image_params,
 )
+from .._batch import map_concurrently, amap_concurrently
+from .._cache import normalize_url
 from .._types import Body, Omit, Query, Headers, NotGiven, SequenceNotStr, omit, not_given
-from .._utils import path_template, maybe_transform, async_maybe_transform
+from .._utils import is_given, path_template, maybe_transform, async_maybe_transform
 from .._compat import cached_property
 from .._resource import SyncAPIResource, AsyncAPIResource
 from .._response import (
@@ -25,6 +27,7 @@ from .._response import (
     async_to_streamed_response_wrapper,
 )
 from ..pagination import SyncSearchPage, AsyncSearchPage
+from .._exceptions import APIError
 from .._base_client import AsyncPaginator, make_request_options
 from ..types.product_detail import ProductDetail
 from ..types.lookup_response import LookupResponse
@@ -34,6 +37,9 @@ from ..types.search_filters_param import SearchFiltersParam
 
 __all__ = ["ProductsResource", "AsyncProductsResource"]
 
+# used by the API when `max_staleness_hours` isn't given
+_DEFAULT_MAX_STALENESS_HOURS = 3
+
 
 class ProductsResource(SyncAPIResource):
     @cached_property
@@ -120,6 +126,15 @@ class ProductsResource(SyncAPIResource):
         """
         if not product_id:
             raise ValueError(f"Expected a non-empty value for `product_id` but received {product_id!r}")
+        query = maybe_transform(
+            {
+                "country": country,
+                "currency": currency,
+                "language": language,
+                "website_ids": website_ids,
+            },
+            product_retrieve_params.ProductRetrieveParams,
+        )
         return self._get(
             path_template("/v1/products/{product_id}", product_id=product_id),
             options=make_request_options(
@@ -127,19 +142,124 @@ class ProductsResource(SyncAPIResource):
                 extra_query=extra_query,
                 extra_body=extra_body,
                 timeout=timeout,
-                query=maybe_transform(
-                    {
-                        "country": country,
-                        "currency": currency,
-                        "language": language,
-                        "website_ids": website_ids,
-                    },
-                    product_retrieve_params.ProductRetrieveParams,
-                ),
+                query=query,
+                cache_key=self._client._cache_key("products.retrieve", product_id, query),
             ),
             cast_to=ProductDetail,
         )
 
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: Literal[False] = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Dict[str, Union[ProductDetail, APIError]]: ...
+
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: Literal[True],
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Iterator[Tuple[str, Union[ProductDetail, APIError]]]: ...
+
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: bool = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Dict[str, Union[ProductDetail, APIError]] | Iterator[Tuple[str, Union[ProductDetail, APIError]]]: ...
+
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: bool = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Dict[str, Union[ProductDetail, APIError]] | Iterator[Tuple[str, Union[ProductDetail, APIError]]]:
+        """
+        Get many products by their IDs, calling `retrieve()` for up to `max_concurrency` of them at a time, from a thread pool shared with the other batch methods.
+
+        Duplicate IDs are only retrieved once. Returns a dict keyed by the product IDs in the order they were
+        given, with the `APIError` in place of any product that couldn't be retrieved, e.g. a `NotFoundError`.
+        With `as_completed=True`, `(product_id, product)` pairs are yielded as the calls complete instead.
+
+        Args:
+          locale: Locale options sent with every call, see `retrieve()`.
+
+          website_ids: Optional list of website IDs to constrain the buy URLs to, sent with every call.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        for product_id in product_ids:
+            if not product_id:
+                raise ValueError(f"Expected a non-empty value for `product_id` but received {product_id!r}")
+        params: LocaleConfigParam = locale if is_given(locale) else {}
+
+        def retrieve(product_id: str) -> ProductDetail:
+            return self.retrieve(
+                product_id,
+                **params,
+                website_ids=website_ids,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        results = map_concurrently(
+            self._client._batch_executor(), retrieve, product_ids, max_concurrency=max_concurrency
+        )
+        if as_completed:
+            return results
+
+        completed = dict(results)
+        return {product_id: completed[product_id] for product_id in product_ids}
+
     def find_similar(
         self,
         *,
@@ -234,21 +354,79 @@ class ProductsResource(SyncAPIResource):
 
           timeout: Override the client-level default timeout for this request, in seconds
         """
+        body = maybe_transform(
+            {
+                "url": url,
+                "max_staleness_hours": max_staleness_hours,
+            },
+            product_lookup_params.ProductLookupParams,
+        )
+        staleness_hours = max_staleness_hours if is_given(max_staleness_hours) else _DEFAULT_MAX_STALENESS_HOURS
         return self._post(
             "/v1/lookup",
-            body=maybe_transform(
-                {
-                    "url": url,
-                    "max_staleness_hours": max_staleness_hours,
-                },
-                product_lookup_params.ProductLookupParams,
-            ),
+            body=body,
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                # the same product can be linked to in many ways, and it's the product data that may be stale
+                cache_key=self._client._cache_key("products.lookup", normalize_url(url)),
+                cache_max_age=staleness_hours * 3600,
+                cache_related=self._cache_lookup_product,
             ),
             cast_to=LookupResponse,
         )
 
+    def lookup_many(
+        self,
+        urls: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        max_staleness_hours: int | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Iterator[Tuple[str, Union[LookupResponse, APIError]]]:
+        """
+        Look up many product URLs with `lookup()`, yielding `(url, response)` pairs as the lookups complete.
+
+        At most `max_concurrency` lookups are in flight or waiting to be consumed, and URLs are only read from
+        the iterable when there's room for them, so it can be arbitrarily long, e.g. a generator reading a
+        file, and a slow consumer holds back new lookups. A URL for the same page as a lookup that's in
+        flight, ignoring fragments and tracking params, shares that lookup. An `APIError` is yielded in
+        place of the response for a URL that couldn't be looked up.
+
+        Args:
+          max_staleness_hours: Maximum age (in hours) of cached product data before forcing a fresh lookup,
+              sent with every lookup. Defaults to 3 hours.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+
+        def lookup(url: str) -> LookupResponse:
+            return self.lookup(
+                url=url,
+                max_staleness_hours=max_staleness_hours,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        return map_concurrently(
+            self._client._batch_executor(), lookup, urls, max_concurrency=max_concurrency, key=normalize_url
+        )
+
     def search(
         self,
         *,
@@ -387,6 +565,10 @@ class ProductsResource(SyncAPIResource):
             method="post",
         )
 
+    def _cache_lookup_product(self, response: LookupResponse) -> List[Tuple[str, object]]:
+        # a lookup responds with the same product as `retrieve()` without any params
+        return [(self._client._cache_key("products.retrieve", response.product.id, {}), response.product)]
+
 
 class AsyncProductsResource(AsyncAPIResource):
     @cached_property
@@ -473,6 +655,15 @@ class AsyncProductsResource(AsyncAPIResource):
         """
         if not product_id:
             raise ValueError(f"Expected a non-empty value for `product_id` but received {product_id!r}")
+        query = await async_maybe_transform(
+            {
+                "country": country,
+                "currency": currency,
+                "language": language,
+                "website_ids": website_ids,
+            },
+            product_retrieve_params.ProductRetrieveParams,
+        )
         return await self._get(
             path_template("/v1/products/{product_id}", product_id=product_id),
             options=make_request_options(
@@ -480,19 +671,129 @@ class AsyncProductsResource(AsyncAPIResource):
                 extra_query=extra_query,
                 extra_body=extra_body,
                 timeout=timeout,
-                query=await async_maybe_transform(
-                    {
-                        "country": country,
-                        "currency": currency,
-                        "language": language,
-                        "website_ids": website_ids,
-                    },
-                    product_retrieve_params.ProductRetrieveParams,
-                ),
+                query=query,
+                cache_key=self._client._cache_key("products.retrieve", product_id, query),
             ),
             cast_to=ProductDetail,
         )
 
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: Literal[False] = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> Awaitable[Dict[str, Union[ProductDetail, APIError]]]: ...
+
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: Literal[True],
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> AsyncIterator[Tuple[str, Union[ProductDetail, APIError]]]: ...
+
+    @overload
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: bool = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> (
+        Awaitable[Dict[str, Union[ProductDetail, APIError]]] | AsyncIterator[Tuple[str, Union[ProductDetail, APIError]]]
+    ): ...
+
+    def retrieve_many(
+        self,
+        product_ids: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        as_completed: bool = False,
+        locale: LocaleConfigParam | Omit = omit,
+        website_ids: Optional[SequenceNotStr[str]] | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> (
+        Awaitable[Dict[str, Union[ProductDetail, APIError]]] | AsyncIterator[Tuple[str, Union[ProductDetail, APIError]]]
+    ):
+        """
+        Get many products by their IDs, calling `retrieve()` for up to `max_concurrency` of them at a time.
+
+        Duplicate IDs are only retrieved once. Returns a dict keyed by the product IDs in the order they were
+        given, with the `APIError` in place of any product that couldn't be retrieved, e.g. a `NotFoundError`.
+        With `as_completed=True`, `(product_id, product)` pairs are yielded as the calls complete instead.
+
+        Args:
+          locale: Locale options sent with every call, see `retrieve()`.
+
+          website_ids: Optional list of website IDs to constrain the buy URLs to, sent with every call.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        for product_id in product_ids:
+            if not product_id:
+                raise ValueError(f"Expected a non-empty value for `product_id` but received {product_id!r}")
+        params: LocaleConfigParam = locale if is_given(locale) else {}
+
+        async def retrieve(product_id: str) -> ProductDetail:
+            return await self.retrieve(
+                product_id,
+                **params,
+                website_ids=website_ids,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        results = amap_concurrently(retrieve, product_ids, max_concurrency=max_concurrency)
+        if as_completed:
+            return results
+
+        async def collect() -> Dict[str, Union[ProductDetail, APIError]]:
+            completed = {product_id: result async for product_id, result in results}
+            return {product_id: completed[product_id] for product_id in product_ids}
+
+        return collect()
+
     def find_similar(
         self,
         *,
@@ -587,21 +888,77 @@ class AsyncProductsResource(AsyncAPIResource):
 
           timeout: Override the client-level default timeout for this request, in seconds
         """
+        body = await async_maybe_transform(
+            {
+                "url": url,
+                "max_staleness_hours": max_staleness_hours,
+            },
+            product_lookup_params.ProductLookupParams,
+        )
+        staleness_hours = max_staleness_hours if is_given(max_staleness_hours) else _DEFAULT_MAX_STALENESS_HOURS
         return await self._post(
             "/v1/lookup",
-            body=await async_maybe_transform(
-                {
-                    "url": url,
-                    "max_staleness_hours": max_staleness_hours,
-                },
-                product_lookup_params.ProductLookupParams,
-            ),
+            body=body,
             options=make_request_options(
-                extra_headers=extra_headers, extra_query=extra_query, extra_body=extra_body, timeout=timeout
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+                # the same product can be linked to in many ways, and it's the product data that may be stale
+                cache_key=self._client._cache_key("products.lookup", normalize_url(url)),
+                cache_max_age=staleness_hours * 3600,
+                cache_related=self._cache_lookup_product,
             ),
             cast_to=LookupResponse,
         )
 
+    def lookup_many(
+        self,
+        urls: Iterable[str],
+        *,
+        max_concurrency: int = 8,
+        max_staleness_hours: int | Omit = omit,
+        # Use the following arguments if you need to pass additional parameters to the API that aren't available via kwargs.
+        # The extra values given here take precedence over values defined on the client or passed to this method.
+        extra_headers: Headers | None = None,
+        extra_query: Query | None = None,
+        extra_body: Body | None = None,
+        timeout: float | httpx.Timeout | None | NotGiven = not_given,
+    ) -> AsyncIterator[Tuple[str, Union[LookupResponse, APIError]]]:
+        """
+        Look up many product URLs with `lookup()`, yielding `(url, response)` pairs as the lookups complete.
+
+        At most `max_concurrency` lookups are in flight or waiting to be consumed, and URLs are only read from
+        the iterable when there's room for them, so it can be arbitrarily long, e.g. a generator reading a
+        file, and a slow consumer holds back new lookups. A URL for the same page as a lookup that's in
+        flight, ignoring fragments and tracking params, shares that lookup. An `APIError` is yielded in
+        place of the response for a URL that couldn't be looked up.
+
+        Args:
+          max_staleness_hours: Maximum age (in hours) of cached product data before forcing a fresh lookup,
+              sent with every lookup. Defaults to 3 hours.
+
+          extra_headers: Send extra headers
+
+          extra_query: Add additional query parameters to the request
+
+          extra_body: Add additional JSON properties to the request
+
+          timeout: Override the client-level default timeout for each request, in seconds
+        """
+
+        async def lookup(url: str) -> LookupResponse:
+            return await self.lookup(
+                url=url,
+                max_staleness_hours=max_staleness_hours,
+                extra_headers=extra_headers,
+                extra_query=extra_query,
+                extra_body=extra_body,
+                timeout=timeout,
+            )
+
+        return amap_concurrently(lookup, urls, max_concurrency=max_concurrency, key=normalize_url)
+
     def search(
         self,
         *,
@@ -740,6 +1097,10 @@ class AsyncProductsResource(AsyncAPIResource):
             method="post",
         )
 
+    def _cache_lookup_product(self, response: LookupResponse) -> List[Tuple[str, object]]:
+        # a lookup responds with the same product as `retrieve()` without any params
+        return [(self._client._cache_key("products.retrieve", response.product.id, {}), response.product)]
+
 
 class ProductsResourceWithRawResponse:
     def __init__(self, products: ProductsResource) -> None:
@@ -78,6 +78,7 @@ class WebsitesResource(SyncAPIResource):
                 extra_body=extra_body,
                 timeout=timeout,
                 query=maybe_transform({"query": query}, website_retrieve_params.WebsiteRetrieveParams),
+                cache_key=self._client._cache_key("websites.retrieve", query),
             ),
             cast_to=Website,
         )
@@ -168,6 +169,7 @@ class AsyncWebsitesResource(AsyncAPIResource):
                 extra_body=extra_body,
                 timeout=timeout,
                 query=await async_maybe_transform({"query": query}, website_retrieve_params.WebsiteRetrieveParams),
+                cache_key=self._client._cache_key("websites.retrieve", query),
             ),
             cast_to=Website,
         )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from channel3_sdk import Channel3, AsyncChannel3
+from channel3_sdk.lib import BrandDirectory
+from channel3_sdk.types import Brand
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+BRANDS: List[Dict[str, Any]] = [
+    {"id": "b1", "name": "Nike", "best_commission_rate": 8.0},
+    {"id": "b2", "name": "Nike Kids", "best_commission_rate": 5.0},
+    {"id": "b3", "name": "Nikon"},
+    {"id": "b4", "name": "Chloé", "best_commission_rate": 12.5},
+    {"id": "b5", "name": "The North Face", "best_commission_rate": 3.0},
+    {"id": "b6", "name": "Adidas Originals"},
+]
+
+
+def make_handler(brands: List[Dict[str, Any]], requests: List[httpx.Request]) -> Any:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        limit = int(request.url.params["limit"])
+        start = int(request.url.params.get("cursor", "0"))
+        end = start + limit
+        return httpx.Response(
+            200, json={"items": brands[start:end], "next_cursor": str(end) if end < len(brands) else None}
+        )
+
+    return handler
+
+
+def make_client(brands: List[Dict[str, Any]], requests: List[httpx.Request]) -> Channel3:
+    transport = httpx.MockTransport(make_handler(brands, requests))
+    return Channel3(base_url=base_url, api_key=api_key, http_client=httpx.Client(transport=transport))
+
+
+@pytest.fixture(scope="module")
+def directory() -> BrandDirectory:
+    with make_client(BRANDS, []) as client:
+        return BrandDirectory.build(client, page_size=4)
+
+
+def names(brands: List[Brand]) -> List[str]:
+    return [brand.name for brand in brands]
+
+
+def test_lookup(directory: BrandDirectory) -> None:
+    assert len(directory) == len(BRANDS)
+    assert "b1" in directory
+    assert directory["b3"].name == "Nikon"
+    assert directory.get("missing") is None
+    assert names(list(directory)) == [brand["name"] for brand in BRANDS]
+
+
+def test_prefix_search(directory: BrandDirectory) -> None:
+    assert names(directory.search("nike", fuzzy=False)) == ["Nike", "Nike Kids"]
+    assert names(directory.search("NIK", fuzzy=False)) == ["Nike", "Nikon", "Nike Kids"]
+    assert names(directory.search("nike", limit=1)) == ["Nike"]
+    assert directory.search(" - ") == []
+
+
+def test_word_search(directory: BrandDirectory) -> None:
+    assert names(directory.search("north", fuzzy=False)) == ["The North Face"]
+    assert names(directory.search("face nor", fuzzy=False)) == ["The North Face"]
+    assert names(directory.search("origi", fuzzy=False)) == ["Adidas Originals"]
+
+
+def test_accents_are_ignored(directory: BrandDirectory) -> None:
+    assert names(directory.search("chloe", fuzzy=False)) == ["Chloé"]
+
+
+def test_fuzzy_search(directory: BrandDirectory) -> None:
+    assert directory.search("adidsa", fuzzy=False) == []
+    assert names(directory.search("adidsa")) == ["Adidas Originals"]
+    assert names(directory.search("north fase"))[0] == "The North Face"
+
+
+def test_top_by_commission(directory: BrandDirectory) -> None:
+    assert names(directory.top_by_commission(3)) == ["Chloé", "Nike", "Nike Kids"]
+
+
+def test_refresh() -> None:
+    requests: List[httpx.Request] = []
+    brands = [dict(brand) for brand in BRANDS]
+    with make_client(brands, requests) as client:
+        directory = BrandDirectory.build(client)
+        entry = directory._index.entries["b1"]
+
+        brands[0]["best_commission_rate"] = 20.0
+        brands[2]["name"] = "Nikon Imaging"
+        del brands[5]
+        directory.refresh(client)
+
+    assert len(requests) == 2
+    assert len(directory) == 5
+    assert directory.top_by_commission(1)[0].best_commission_rate == 20.0
+    assert names(directory.search("imaging", fuzzy=False)) == ["Nikon Imaging"]
+    assert directory.search("adidas", fuzzy=False) == []
+    # the name didn't change, so its index entry was re-used
+    assert directory._index.entries["b1"].trigrams is entry.trigrams
+
+
+def test_start_refreshing() -> None:
+    requests: List[httpx.Request] = []
+    with make_client(BRANDS, requests) as client:
+        directory = BrandDirectory()
+        directory.start_refreshing(client, interval=0.01)
+        with pytest.raises(RuntimeError):
+            directory.start_refreshing(client)
+
+        deadline = time.monotonic() + 5
+        while len(directory) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        directory.stop_refreshing()
+
+    assert len(directory) == len(BRANDS)
+
+
+async def test_abuild() -> None:
+    sync_handler = make_handler(BRANDS, [])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return sync_handler(request)
+
+    async with AsyncChannel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ) as client:
+        directory = await BrandDirectory.abuild(client, page_size=2)
+
+    assert names(directory.search("nik", fuzzy=False)) == ["Nike", "Nikon", "Nike Kids"]
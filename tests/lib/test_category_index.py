@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+from pathlib import Path
+
+import httpx
+import pytest
+
+from channel3_sdk import Channel3, AsyncChannel3
+from channel3_sdk.lib import CategoryIndex
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+
+def _ref(slug: str) -> Dict[str, str]:
+    return {"slug": slug, "title": slug.replace("-", " ").title()}
+
+
+# slug -> path from the root
+TAXONOMY: Dict[str, List[str]] = {
+    "home": ["home"],
+    "furniture": ["home", "furniture"],
+    "sofas": ["home", "furniture", "sofas"],
+    "sectional-sofas": ["home", "furniture", "sofas", "sectional-sofas"],
+    "sofa-beds": ["home", "furniture", "sofa-beds"],
+    "apparel": ["apparel"],
+    "shoes": ["apparel", "shoes"],
+}
+
+
+def _category(slug: str) -> Dict[str, Any]:
+    children = [child for child, path in TAXONOMY.items() if path[:-1] == TAXONOMY[slug]]
+    return {
+        **_ref(slug),
+        "has_children": bool(children),
+        "path": [_ref(part) for part in TAXONOMY[slug]],
+        "children": [_ref(child) for child in children],
+        "attributes": [{"name": "Color", "slug": "color", "values": ["red", "blue"]}] if slug == "sofas" else [],
+    }
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/categories":
+        page = int(request.url.params.get("page", "1"))
+        page_size = int(request.url.params["page_size"])
+        slugs = list(TAXONOMY)[(page - 1) * page_size : page * page_size]
+        items = [
+            {key: value for key, value in _category(slug).items() if key in ("slug", "title", "has_children", "path")}
+            for slug in slugs
+        ]
+        return httpx.Response(200, json={"items": items, "page": page, "page_size": page_size, "total": len(TAXONOMY)})
+
+    slug = request.url.path.rsplit("/", 1)[-1]
+    return httpx.Response(200, json=_category(slug))
+
+
+async def async_handler(request: httpx.Request) -> httpx.Response:
+    return handler(request)
+
+
+@pytest.fixture(scope="module")
+def index() -> CategoryIndex:
+    with Channel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.Client(transport=httpx.MockTransport(handler))
+    ) as client:
+        return CategoryIndex.build(client, page_size=3)
+
+
+def test_tree(index: CategoryIndex) -> None:
+    assert len(index) == len(TAXONOMY)
+    assert "sofas" in index
+    assert [category.slug for category in index.roots()] == ["home", "apparel"]
+    assert [category.slug for category in index.children("furniture")] == ["sofas", "sofa-beds"]
+    assert [category.slug for category in index.ancestors("sectional-sofas")] == ["home", "furniture", "sofas"]
+    assert [category.slug for category in index.descendants("home")] == [
+        "furniture",
+        "sofas",
+        "sectional-sofas",
+        "sofa-beds",
+    ]
+    assert index.parent("home") is None
+    assert index.parent("shoes") == index["apparel"]
+    assert index.get("missing") is None
+
+    with pytest.raises(KeyError):
+        index.ancestors("missing")
+
+
+def test_expand(index: CategoryIndex) -> None:
+    assert index.expand(["sofas", "shoes", "missing"]) == {"sofas", "sectional-sofas", "shoes", "missing"}
+
+
+def test_attributes(index: CategoryIndex) -> None:
+    color = index.attribute("sofas", "color")
+    assert color is not None
+    assert color.values == ["red", "blue"]
+    assert index.attributes("sofas") == [color]
+    assert index.attribute("shoes", "color") is None
+
+
+def test_search(index: CategoryIndex) -> None:
+    assert [category.slug for category in index.search("sofa")] == ["sofas", "sofa-beds", "sectional-sofas"]
+    assert [category.slug for category in index.search("Sectional SOF")] == ["sectional-sofas"]
+    assert [category.slug for category in index.search("sofas", limit=1)] == ["sofas"]
+    assert index.search("chairs") == []
+    assert index.search("  ") == []
+
+
+def test_snapshot(index: CategoryIndex, tmp_path: Path) -> None:
+    index.save(tmp_path / "categories.json")
+    loaded = CategoryIndex.load(tmp_path / "categories.json")
+
+    assert [category.slug for category in loaded] == [category.slug for category in index]
+    assert loaded["sofas"] == index["sofas"]
+    assert [category.slug for category in loaded.ancestors("sectional-sofas")] == ["home", "furniture", "sofas"]
+
+    with pytest.raises(ValueError, match="version"):
+        CategoryIndex.from_snapshot(json.dumps({"version": 0, "categories": []}))
+
+
+def test_without_details() -> None:
+    with Channel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.Client(transport=httpx.MockTransport(handler))
+    ) as client:
+        index = CategoryIndex.build(client, details=False)
+
+    assert [category.slug for category in index.children("furniture")] == ["sofas", "sofa-beds"]
+    assert index.attributes("sofas") == []
+
+
+async def test_abuild() -> None:
+    async with AsyncChannel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.AsyncClient(transport=httpx.MockTransport(async_handler))
+    ) as client:
+        index = await CategoryIndex.abuild(client, page_size=2, max_concurrency=2)
+
+    assert [category.slug for category in index] == list(TAXONOMY)
+    assert [category.slug for category in index.descendants("apparel")] == ["shoes"]
+    assert index.attribute("sofas", "color") is not None
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import random
+import statistics
+from typing import Any, Dict, List, Tuple
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from channel3_sdk import PriceHistoryColumns
+
+np = pytest.importorskip("numpy")
+
+from channel3_sdk.lib.price_analytics import (  # noqa: E402
+    NAT,
+    classify,
+    time_at_low,
+    largest_drops,
+    verify_statistics,
+    window_statistics,
+    rolling_statistics,
+)
+
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+DAY = 86_400_000_000
+
+
+def _history(seed: int = 0, products: int = 20) -> Tuple[PriceHistoryColumns, Dict[str, List[Tuple[int, float]]]]:
+    """Returns random histories, with the points of each product shuffled, and the same points by product."""
+    rng = random.Random(seed)
+    columns = PriceHistoryColumns()
+    points: Dict[str, List[Tuple[int, float]]] = {}
+    for index in range(products):
+        canonical_product_id = f"prod_{index}"
+        days = rng.sample(range(60), rng.randint(0, 20))
+        product_points = [
+            (int((END - timedelta(days=day)).timestamp()) * 1_000_000, float(rng.randint(50, 150))) for day in days
+        ]
+        points[canonical_product_id] = sorted(product_points)
+        history: List[Dict[str, Any]] = [
+            {"currency": "USD", "price": price, "timestamp": timestamp / 1_000_000}
+            for timestamp, price in product_points
+        ]
+        columns.add(canonical_product_id, {"history": history})
+    return columns, points
+
+
+def _in_window(points: List[Tuple[int, float]], days: float) -> List[Tuple[int, float]]:
+    end = int(END.timestamp()) * 1_000_000
+    return [(timestamp, price) for timestamp, price in points if end - days * DAY <= timestamp <= end]
+
+
+def test_window_statistics() -> None:
+    columns, points = _history()
+    result = window_statistics(columns, days=30, end=END)
+
+    for index, canonical_product_id in enumerate(columns.product_ids):
+        window = _in_window(points[canonical_product_id], 30)
+        assert result.points[index] == len(window)
+        if not window:
+            assert np.isnan(result.mean[index])
+            assert result.current_status[index] == ""
+            continue
+
+        prices = [price for _, price in window]
+        assert result.current_price[index] == prices[-1]
+        assert result.min_price[index] == min(prices)
+        assert result.max_price[index] == max(prices)
+        assert result.mean[index] == pytest.approx(statistics.fmean(prices))  # pyright: ignore[reportUnknownMemberType]
+        assert result.std_dev[index] == pytest.approx(statistics.pstdev(prices), abs=1e-9)  # pyright: ignore[reportUnknownMemberType]
+
+
+def test_verify_statistics() -> None:
+    columns, points = _history(seed=1)
+    for canonical_product_id, product_points in points.items():
+        prices = [price for _, price in _in_window(product_points, 30)]
+        if not prices:
+            continue
+        mean, std_dev = statistics.fmean(prices), statistics.pstdev(prices)
+        current = prices[-1]
+        status = "low" if current < mean - std_dev else "high" if current > mean + std_dev else "typical"
+        columns.add(
+            f"{canonical_product_id}_copy",
+            {
+                "history": [],
+                "statistics": {
+                    "currency": "USD",
+                    "current_price": current,
+                    "current_status": status,
+                    "max_price": max(prices),
+                    "mean": mean,
+                    "min_price": min(prices),
+                    "std_dev": std_dev,
+                },
+            },
+        )
+        columns.statistics[canonical_product_id] = columns.statistics.pop(f"{canonical_product_id}_copy")
+
+    assert columns.statistics
+    assert verify_statistics(columns, end=END) == {}
+
+    canonical_product_id = next(iter(columns.statistics))
+    columns.statistics[canonical_product_id] = columns.statistics[canonical_product_id].model_copy(
+        update={"mean": -1.0}
+    )
+    assert verify_statistics(columns, end=END) == {canonical_product_id: ["mean"]}
+
+
+def test_rolling_statistics() -> None:
+    columns, points = _history(seed=2)
+    result = rolling_statistics(columns, days=7)
+
+    for row in range(len(columns)):
+        canonical_product_id = columns.product_ids[columns.product_index[row]]
+        timestamp = columns.timestamps[row]
+        prices = [price for other, price in points[canonical_product_id] if timestamp - 7 * DAY <= other <= timestamp]
+        assert result.points[row] == len(prices)
+        assert result.min_price[row] == min(prices)
+        assert result.max_price[row] == max(prices)
+        assert result.mean[row] == pytest.approx(statistics.fmean(prices))  # pyright: ignore[reportUnknownMemberType]
+        assert result.std_dev[row] == pytest.approx(statistics.pstdev(prices), abs=1e-9)  # pyright: ignore[reportUnknownMemberType]
+
+
+def test_largest_drops() -> None:
+    columns, points = _history(seed=3)
+    result = largest_drops(columns, days=30, end=END)
+
+    for index, canonical_product_id in enumerate(columns.product_ids):
+        window = _in_window(points[canonical_product_id], 30)
+        if not window:
+            assert np.isnan(result.amount[index])
+            continue
+
+        best, trough_at = 0.0, NAT
+        for position, (timestamp, price) in enumerate(window):
+            drop = max(other for _, other in window[: position + 1]) - price
+            if drop > best:
+                best, trough_at = drop, timestamp
+        assert result.amount[index] == best
+        assert result.timestamp[index] == trough_at
+        if best:
+            assert result.fraction[index] == pytest.approx(best / result.peak_price[index])  # pyright: ignore[reportUnknownMemberType]
+            assert result.peak_price[index] - result.trough_price[index] == best
+
+
+def test_time_at_low() -> None:
+    columns = PriceHistoryColumns()
+    day = 86_400
+    start = END.timestamp() - 10 * day
+    columns.add(
+        "prod_1",
+        {
+            "history": [
+                {"currency": "USD", "price": 100, "timestamp": start},
+                {"currency": "USD", "price": 100, "timestamp": start + day},
+                {"currency": "USD", "price": 100, "timestamp": start + 2 * day},
+                {"currency": "USD", "price": 40, "timestamp": start + 4 * day},
+                {"currency": "USD", "price": 100, "timestamp": start + 9 * day},
+            ]
+        },
+    )
+    columns.add("prod_2", {"history": []})
+
+    fractions = time_at_low(columns, days=30, end=END)
+    assert fractions[0] == pytest.approx(0.5)  # pyright: ignore[reportUnknownMemberType]
+    assert np.isnan(fractions[1])
+
+
+def test_classify() -> None:
+    assert classify([1.0, 5.0, 9.0, float("nan")], 5.0, 2.0).tolist() == ["low", "typical", "high", ""]
+    assert classify([5.0], 5.0, 0.0).tolist() == ["typical"]
+    assert classify([4.0], 5.0, 2.0, band=0.25).tolist() == ["low"]
+
+
+def test_invalid_window() -> None:
+    columns, _ = _history()
+    with pytest.raises(ValueError):
+        window_statistics(columns, days=0)
+
+
+def test_empty_history() -> None:
+    result = window_statistics(PriceHistoryColumns())
+    assert len(result.mean) == 0
+    assert len(largest_drops(PriceHistoryColumns()).amount) == 0
+    assert len(rolling_statistics(PriceHistoryColumns(), days=1).mean) == 0
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import os
+from typing import Any, List, Tuple
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+import httpx
+import pytest
+
+from channel3_sdk import Channel3
+from channel3_sdk.types import PriceHistory, PriceHistoryPoint
+
+np = pytest.importorskip("numpy")
+
+from channel3_sdk.lib.price_store import PriceStore  # noqa: E402
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _history(canonical_product_id: str, points: List[Tuple[int, float]], currency: str = "USD") -> PriceHistory:
+    return PriceHistory(
+        canonical_product_id=canonical_product_id,
+        history=[
+            PriceHistoryPoint(currency=currency, price=price, timestamp=START + timedelta(days=day))
+            for day, price in points
+        ],
+    )
+
+
+def _days(timestamps: Any) -> List[int]:
+    start = int(START.timestamp()) * 1_000_000
+    return [(timestamp - start) // 86_400_000_000 for timestamp in timestamps.tolist()]
+
+
+def test_add_and_read(tmp_path: Path) -> None:
+    with PriceStore(tmp_path) as store:
+        assert store.add(_history("prod_1", [(2, 12), (0, 10), (1, 11)])) == 3
+        assert store.add(_history("prod_1", [(1, 11), (3, 13)])) == 1
+        assert store.add(_history("prod_2", [(0, 5)], currency="EUR")) == 1
+        assert len(store) == 5
+        assert store.product_ids == ["prod_1", "prod_2"]
+        assert store.currencies == ["USD", "EUR"]
+
+        history = store.read("prod_1")
+        assert _days(history.timestamps) == [0, 1, 2, 3]
+        assert history.prices.tolist() == [10, 11, 12, 13]
+
+        history = store.read("prod_1", start=START + timedelta(days=1), end=START + timedelta(days=2))
+        assert history.prices.tolist() == [11, 12]
+        assert store.read("prod_2").currency_codes.tolist() == [1]
+        assert len(store.read("missing").prices) == 0
+
+
+def test_only_products_with_points_are_numbered(tmp_path: Path) -> None:
+    with PriceStore(tmp_path) as store:
+        assert store.add(_history("prod_1", [])) == 0
+        assert "prod_1" not in store
+
+        assert store.add(_history("prod_2", [(0, 10)])) == 1
+        # a point that's already stored doesn't record its currency either
+        assert store.add(_history("prod_2", [(0, 10)], currency="EUR")) == 0
+        assert store.product_ids == ["prod_2"]
+        assert store.currencies == ["USD"]
+
+        assert store.add(_history("prod_1", [(0, 5)], currency="EUR")) == 1
+
+    with PriceStore(tmp_path) as store:
+        assert store.product_ids == ["prod_2", "prod_1"]
+        assert store.currencies == ["USD", "EUR"]
+        assert store.read("prod_1").currency_codes.tolist() == [1]
+
+
+def test_compacted_reads_are_views(tmp_path: Path) -> None:
+    with PriceStore(tmp_path) as store:
+        store.add(_history("prod_1", [(0, 10), (1, 11), (2, 12)]))
+        store.add(_history("prod_2", [(0, 5)]))
+        store.compact()
+
+        history = store.read("prod_1", start=START + timedelta(days=1))
+        assert history.prices.tolist() == [11, 12]
+        assert isinstance(history.prices.base, np.memmap)
+        assert isinstance(history.timestamps.base, np.memmap)
+
+        # new points are read alongside the compacted ones until the next compaction
+        assert store.add(_history("prod_1", [(2, 12), (3, 13)])) == 1
+        history = store.read("prod_1")
+        assert history.prices.tolist() == [10, 11, 12, 13]
+        assert history.prices.base is None or not isinstance(history.prices.base, np.memmap)
+
+        views = store.read("prod_2")
+        store.compact()
+        assert views.prices.tolist() == [5]
+        assert store.read("prod_1").prices.tolist() == [10, 11, 12, 13]
+        assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".bin")) == [
+            "currency_codes-2.bin",
+            "offsets-2.bin",
+            "prices-2.bin",
+            "timestamps-2.bin",
+        ]
+
+
+def test_compacts_automatically(tmp_path: Path) -> None:
+    with PriceStore(tmp_path, compact_after=3) as store:
+        store.add(_history("prod_1", [(0, 10), (1, 11)]))
+        assert store._pending_count == 2
+        store.add(_history("prod_2", [(0, 5)]))
+        assert store._pending_count == 0
+        assert len(store) == 3
+
+
+def test_reopens(tmp_path: Path) -> None:
+    with PriceStore(tmp_path) as store:
+        store.add(_history("prod_1", [(0, 10), (1, 11)]))
+        store.compact()
+        store.add(_history("prod_1", [(2, 12)]))
+        store.add(_history("prod_2", [(0, 5)], currency="EUR"))
+
+    # the last record and name were cut short
+    with open(tmp_path / "log-1.bin", "ab") as f:
+        f.write(b"\0" * 10)
+    with open(tmp_path / "products.txt", "a") as f:
+        f.write("prod_")
+
+    with PriceStore(tmp_path) as store:
+        assert store.product_ids == ["prod_1", "prod_2"]
+        assert store.read("prod_1").prices.tolist() == [10, 11, 12]
+        assert store.read("prod_2").currency_codes.tolist() == [1]
+        assert store.add(_history("prod_1", [(1, 11), (2, 12)])) == 0
+        assert store.add(_history("prod_3", [(0, 1)])) == 1
+
+    with PriceStore(tmp_path) as store:
+        assert store.product_ids == ["prod_1", "prod_2", "prod_3"]
+        assert store.read("prod_3").prices.tolist() == [1]
+        assert len(store) == 5
+
+
+def test_interrupted_compaction(tmp_path: Path) -> None:
+    with PriceStore(tmp_path) as store:
+        store.add(_history("prod_1", [(0, 10)]))
+
+    # a compaction that didn't get as far as switching the manifest
+    (tmp_path / "prices-1.bin").write_bytes(b"\0" * 4)
+
+    with PriceStore(tmp_path) as store:
+        assert not (tmp_path / "prices-1.bin").exists()
+        assert store.read("prod_1").prices.tolist() == [10]
+
+
+def test_add_columns(tmp_path: Path) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        canonical_product_id = request.url.path.rsplit("/", 1)[-1]
+        history = [{"currency": "USD", "price": 10.0, "timestamp": "2024-01-01T00:00:00Z"}]
+        return httpx.Response(200, json={"canonical_product_id": canonical_product_id, "history": history})
+
+    with Channel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.Client(transport=httpx.MockTransport(handler))
+    ) as client, PriceStore(tmp_path) as store:
+        columns = store.update(client, ["prod_1", "prod_2"])
+        assert sorted(columns.product_ids) == ["prod_1", "prod_2"]
+        assert len(store) == 2
+        assert store.add_columns(columns) == 0
+        assert store.read("prod_2").timestamps.view("datetime64[us]").tolist() == [datetime(2024, 1, 1)]
+
+
+def test_invalid_compact_after(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        PriceStore(tmp_path, compact_after=0)
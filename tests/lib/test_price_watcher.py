@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import time
+import heapq
+from typing import Any, Dict, List
+from datetime import datetime, timezone, timedelta
+
+import httpx
+import pytest
+
+from channel3_sdk import Channel3, AsyncChannel3
+from channel3_sdk.lib import PriceDrop, PriceWatcher, AsyncPriceWatcher
+from channel3_sdk.lib.price_watcher import _BasePriceWatcher
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeAPI:
+    def __init__(self) -> None:
+        self.history: Dict[str, List[Dict[str, Any]]] = {}
+        self.subscriptions: List[str] = []
+        self.days: List[str] = []
+
+    def add(self, canonical_product_id: str, day: int, price: float, currency: str = "USD") -> None:
+        timestamp = (START + timedelta(days=day)).isoformat().replace("+00:00", "Z")
+        self.history.setdefault(canonical_product_id, []).append(
+            {"currency": currency, "price": price, "timestamp": timestamp}
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/subscriptions"):
+            items = [
+                {"canonical_product_id": id, "created_at": "2024-01-01T00:00:00Z", "subscription_status": "active"}
+                for id in self.subscriptions
+            ]
+            return httpx.Response(200, json={"items": items})
+
+        canonical_product_id = request.url.path.rsplit("/", 1)[-1]
+        self.days.append(request.url.params["days"])
+        if canonical_product_id not in self.history:
+            return httpx.Response(404, json={"error": "not found"})
+        # newest first, the watcher mustn't rely on the order
+        history = list(reversed(self.history[canonical_product_id]))
+        return httpx.Response(200, json={"canonical_product_id": canonical_product_id, "history": history})
+
+
+def make_due(watcher: _BasePriceWatcher) -> None:
+    for canonical_product_id, product in watcher._products.items():
+        product.next_poll = 0.0
+        heapq.heappush(watcher._schedule, (0.0, canonical_product_id))
+
+
+@pytest.fixture
+def api() -> FakeAPI:
+    return FakeAPI()
+
+
+@pytest.fixture
+def client(api: FakeAPI) -> Channel3:
+    return Channel3(
+        base_url=base_url,
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(api.handler)),
+    )
+
+
+def test_reports_drops_in_new_points(api: FakeAPI, client: Channel3) -> None:
+    reported: List[PriceDrop] = []
+    watcher = PriceWatcher(client, min_drop=0.1, on_drop=reported.append)
+    api.add("prod_1", 0, 100)
+    api.add("prod_1", 1, 50)
+    watcher.watch("prod_1", target_price=40)
+
+    # the first poll only records the latest price
+    assert watcher.poll() == []
+    assert watcher.last_seen("prod_1") == START + timedelta(days=1)
+    assert watcher.poll() == []  # not due yet
+
+    api.add("prod_1", 2, 48)  # less than `min_drop`
+    api.add("prod_1", 3, 40)  # reaches the target
+    api.add("prod_1", 4, 60)
+    api.add("prod_1", 5, 30)
+    make_due(watcher)
+    drops = watcher.poll()
+
+    assert [(drop.previous_price, drop.price, drop.reached_target) for drop in drops] == [
+        (48, 40, True),
+        (60, 30, True),
+    ]
+    assert drops[0].timestamp == START + timedelta(days=3)
+    assert drops[1].fraction == 0.5
+    assert reported == drops
+    assert api.days == ["30", "1"]
+
+    stats = watcher.stats()
+    assert stats.watched == 1
+    assert stats.polls == 2
+    assert stats.new_points == 4
+    assert stats.drops == 2
+
+
+def test_resumes_from_last_seen(api: FakeAPI, client: Channel3) -> None:
+    watcher = PriceWatcher(client)
+    api.add("prod_1", 0, 100)
+    api.add("prod_1", 1, 90)
+    api.add("prod_1", 2, 95)
+    api.add("prod_1", 3, 80, currency="EUR")
+    watcher.watch("prod_1", last_seen=START)
+
+    # the change of currency isn't compared
+    assert [(drop.previous_price, drop.price) for drop in watcher.poll()] == [(100, 90)]
+    assert watcher.stats().new_points == 3
+
+
+def test_schedules_by_volatility(api: FakeAPI, client: Channel3) -> None:
+    watcher = PriceWatcher(client, min_interval=10, max_interval=40)
+    api.add("stable", 0, 100)
+    api.add("volatile", 0, 100)
+    watcher.watch("stable")
+    watcher.watch("volatile")
+    watcher.poll()
+
+    for day in range(1, 4):
+        api.add("stable", day, 100)
+        api.add("volatile", day, 100 + day)
+        make_due(watcher)
+        watcher.poll()
+
+    assert watcher._products["stable"].interval == 40
+    assert watcher._products["volatile"].interval == 10
+
+    api.add("stable", 4, 90)
+    make_due(watcher)
+    watcher.poll()
+    assert watcher._products["stable"].interval == 20
+
+
+def test_failed_polls_are_retried(api: FakeAPI, client: Channel3) -> None:
+    watcher = PriceWatcher(client, min_interval=10)
+    watcher.watch("missing")
+    assert watcher.poll() == []
+
+    stats = watcher.stats()
+    assert stats.polls == 1
+    assert stats.failed == 1
+    product = watcher._products["missing"]
+    assert product.interval == 10
+    assert (product.next_poll, "missing") in watcher._schedule
+
+    api.add("missing", 0, 100)
+    make_due(watcher)
+    watcher.poll()
+    assert watcher.last_seen("missing") == START
+
+
+def test_watch_subscriptions(api: FakeAPI, client: Channel3) -> None:
+    watcher = PriceWatcher(client)
+    watcher.watch("prod_1", target_price=10)
+    watcher.watch("prod_2")
+    api.subscriptions = ["prod_1", "prod_3"]
+    watcher.watch_subscriptions()
+
+    assert sorted(watcher._products) == ["prod_1", "prod_3"]
+    assert watcher._products["prod_1"].target_price == 10
+
+
+def test_start(api: FakeAPI, client: Channel3) -> None:
+    reported: List[PriceDrop] = []
+    watcher = PriceWatcher(client, min_interval=0.01, max_interval=0.01, on_drop=reported.append)
+    api.add("prod_1", 0, 100)
+    watcher.watch("prod_1")
+    watcher.start()
+    try:
+        with pytest.raises(RuntimeError):
+            watcher.start()
+
+        deadline = time.monotonic() + 5
+        while watcher.stats().polls < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        api.add("prod_1", 1, 50)
+        while not reported and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+
+    assert [drop.price for drop in reported] == [50]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"min_drop": 0},
+        {"min_drop": 1},
+        {"min_interval": 0},
+        {"max_interval": 1},
+        {"backoff": 0.5},
+        {"max_concurrency": 0},
+    ],
+)
+def test_invalid_arguments(client: Channel3, kwargs: Dict[str, Any]) -> None:
+    with pytest.raises(ValueError):
+        PriceWatcher(client, **kwargs)
+
+
+async def test_async_watcher(api: FakeAPI) -> None:
+    transport = httpx.MockTransport(api.handler)
+    async with AsyncChannel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.AsyncClient(transport=transport)
+    ) as client:
+        watcher = AsyncPriceWatcher(client)
+        api.add("prod_1", 0, 100)
+        api.subscriptions = ["prod_1"]
+        await watcher.watch_subscriptions()
+        assert await watcher.poll() == []
+
+        api.add("prod_1", 1, 50)
+        make_due(watcher)
+        drops = watcher.drops()
+        drop = await drops.__anext__()
+        await drops.aclose()
+
+    assert (drop.canonical_product_id, drop.price, drop.reached_target) == ("prod_1", 50, False)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import time
+import threading
+from typing import List
+
+import httpx
+import pytest
+
+from channel3_sdk import Channel3, AsyncChannel3, BadRequestError
+from channel3_sdk.lib import WebsiteResolver, AsyncWebsiteResolver
+from channel3_sdk.lib.website_resolver import normalize_domain
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+KNOWN = {"nike.com": "web_nike", "adidas.com": "web_adidas"}
+
+
+def respond(request: httpx.Request) -> httpx.Response:
+    query = request.url.params["query"]
+    if query == "broken.com":
+        return httpx.Response(400, json={"detail": "bad query"})
+    if query not in KNOWN:
+        return httpx.Response(200, content=b"null", headers={"content-type": "application/json"})
+    return httpx.Response(200, json={"id": KNOWN[query], "url": query, "best_commission_rate": 5.0})
+
+
+def make_client(requests: List[httpx.Request], release: threading.Event | None = None) -> Channel3:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if release is not None:
+            release.wait(5)
+        return respond(request)
+
+    return Channel3(
+        base_url=base_url,
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+
+
+@pytest.mark.parametrize(
+    "query,domain",
+    [
+        ("nike.com", "nike.com"),
+        ("https://www.Nike.com/shoes?size=10", "nike.com"),
+        ("WWW.NIKE.COM.", "nike.com"),
+        ("nike.com:443", "nike.com"),
+        (" shop.example.co.uk/p ", "shop.example.co.uk"),
+    ],
+)
+def test_normalize_domain(query: str, domain: str) -> None:
+    assert normalize_domain(query) == domain
+
+
+def test_memoizes_hits_and_misses() -> None:
+    requests: List[httpx.Request] = []
+    with make_client(requests) as client:
+        resolver = WebsiteResolver(client)
+
+        website = resolver.resolve("https://www.nike.com/shoes")
+        assert website is not None
+        assert website.id == "web_nike"
+        assert resolver.resolve("NIKE.com") is website
+        assert requests[0].url.params["query"] == "nike.com"
+
+        assert resolver.resolve("unknown.com") is None
+        assert resolver.resolve("www.unknown.com") is None
+        assert len(requests) == 2
+
+        # errors aren't memoized
+        for _ in range(2):
+            with pytest.raises(BadRequestError):
+                resolver.resolve("broken.com")
+        assert len(requests) == 4
+
+    stats = resolver.stats()
+    assert stats.hits == 1
+    assert stats.negative_hits == 1
+    assert stats.misses == 4
+    assert stats.entries == 2
+
+
+def test_separate_ttls() -> None:
+    requests: List[httpx.Request] = []
+    with make_client(requests) as client:
+        resolver = WebsiteResolver(client, ttl=60, negative_ttl=0)
+        resolver.resolve("nike.com")
+        resolver.resolve("unknown.com")
+        resolver.resolve("nike.com")
+        resolver.resolve("unknown.com")
+        assert len(requests) == 3
+
+        # pretend the website was resolved a minute ago
+        website, expires_at = resolver._entries["nike.com"]
+        resolver._entries["nike.com"] = (website, expires_at - 60)
+        resolver.resolve("nike.com")
+        assert len(requests) == 4
+
+        resolver.invalidate("https://nike.com")
+        resolver.resolve("nike.com")
+        assert len(requests) == 5
+
+
+def test_max_entries() -> None:
+    with make_client([]) as client:
+        resolver = WebsiteResolver(client, max_entries=2)
+        for query in ("nike.com", "adidas.com", "unknown.com"):
+            resolver.resolve(query)
+
+    assert list(resolver._entries) == ["adidas.com", "unknown.com"]
+
+
+def test_resolve_many_dedupes_in_flight_lookups() -> None:
+    requests: List[httpx.Request] = []
+    release = threading.Event()
+    with make_client(requests, release) as client:
+        resolver = WebsiteResolver(client)
+        result: dict[str, object] = {}
+
+        def run() -> None:
+            result.update(resolver.resolve_many(["nike.com", "www.nike.com", "unknown.com", "nike.com"]))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while resolver.stats().coalesced < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        thread.join()
+
+    assert list(result) == ["nike.com", "www.nike.com", "unknown.com"]
+    assert result["nike.com"] is result["www.nike.com"]
+    assert result["unknown.com"] is None
+    assert sorted(request.url.params["query"] for request in requests) == ["nike.com", "unknown.com"]
+
+
+async def test_async_resolver() -> None:
+    requests: List[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return respond(request)
+
+    async with AsyncChannel3(
+        base_url=base_url, api_key=api_key, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ) as client:
+        resolver = AsyncWebsiteResolver(client)
+        results = await resolver.resolve_many(["nike.com", "https://adidas.com", "unknown.com", "www.nike.com"])
+        assert await resolver.resolve("nike.com") is results["nike.com"]
+
+    assert results["https://adidas.com"] is not None
+    assert results["unknown.com"] is None
+    assert len(requests) == 3
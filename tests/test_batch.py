@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import threading
+from typing import Iterator
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from channel3_sdk import BatchStats, APIConnectionError
+from channel3_sdk._batch import (
+    Checkpoint,
+    BatchProgress,
+    get_executor,
+    map_concurrently,
+    amap_concurrently,
+    shutdown_executor,
+)
+
+request = httpx.Request("GET", "http://127.0.0.1:4010")
+
+
+def _counting(n: int, read: list[int]) -> Iterator[int]:
+    for i in range(n):
+        read.append(i)
+        yield i
+
+
+def test_bounds_concurrency() -> None:
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def square(i: int) -> int:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return i * i
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = dict(map_concurrently(executor, square, range(20), max_concurrency=3))
+
+    assert results == {i: i * i for i in range(20)}
+    assert peak <= 3
+
+
+def test_yields_api_errors() -> None:
+    def call(i: int) -> int:
+        if i == 1:
+            raise APIConnectionError(request=request)
+        return i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = dict(map_concurrently(executor, call, range(3), max_concurrency=2))
+        assert results[0] == 0
+        assert isinstance(results[1], APIConnectionError)
+
+        def fail(_i: int) -> int:
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            list(map_concurrently(executor, fail, range(3), max_concurrency=2))
+
+
+def test_reads_items_as_there_is_room() -> None:
+    read: list[int] = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = map_concurrently(executor, lambda i: i, _counting(1000, read), max_concurrency=4)
+        next(results)
+        assert len(read) <= 8
+        results.close()
+
+    assert len(read) <= 8
+
+
+def test_coalesces_items_in_flight() -> None:
+    calls: list[str] = []
+
+    def call(item: str) -> str:
+        calls.append(item)
+        return item.lower()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # "a" and "A" are read before the call for "a" completes
+        pairs = list(map_concurrently(executor, call, ["a", "A", "b"], max_concurrency=2, key=str.lower))
+
+    assert sorted(calls) == ["a", "b"]
+    assert sorted(pairs) == [("A", "a"), ("a", "a"), ("b", "b")]
+
+
+def test_waiting_duplicates_count_towards_max_concurrency() -> None:
+    read: list[int] = []
+    read_while_in_flight: list[int] = []
+
+    def call(_item: int) -> int:
+        time.sleep(0.05)
+        read_while_in_flight.append(len(read))
+        return 0
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # every item has the same key, so they'd all wait for the first call
+        results = map_concurrently(executor, call, _counting(1000, read), max_concurrency=2, key=lambda _: 0)
+        next(results)
+        results.close()
+
+    assert read_while_in_flight == [2]
+
+
+def test_invalid_max_concurrency() -> None:
+    with pytest.raises(ValueError):
+        map_concurrently(ThreadPoolExecutor(), lambda i: i, [1], max_concurrency=0)
+    with pytest.raises(ValueError):
+        amap_concurrently(asyncio.sleep, [1], max_concurrency=0)
+
+
+def test_executor_is_shared_per_http_client() -> None:
+    http_client = httpx.Client(limits=httpx.Limits(max_connections=5))
+    executor = get_executor(http_client)
+    assert get_executor(http_client) is executor
+    assert executor._max_workers == 5
+    assert get_executor(httpx.Client()) is not executor
+
+    shutdown_executor(http_client)
+    assert get_executor(http_client) is not executor
+    shutdown_executor(http_client)
+
+
+async def test_async_bounds_concurrency() -> None:
+    running = 0
+    peak = 0
+
+    async def square(i: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        if i == 1:
+            raise APIConnectionError(request=request)
+        return i * i
+
+    results = {i: result async for i, result in amap_concurrently(square, range(20), max_concurrency=3)}
+
+    assert len(results) == 20
+    assert results[2] == 4
+    assert isinstance(results[1], APIConnectionError)
+    assert peak <= 3
+
+
+async def test_async_coalesces_items_in_flight() -> None:
+    calls: list[str] = []
+
+    async def call(item: str) -> str:
+        calls.append(item)
+        await asyncio.sleep(0.01)
+        return item.lower()
+
+    pairs = [pair async for pair in amap_concurrently(call, ["a", "A", "b"], max_concurrency=2, key=str.lower)]
+
+    assert sorted(calls) == ["a", "b"]
+    assert sorted(pairs) == [("A", "a"), ("a", "a"), ("b", "b")]
+
+
+async def test_async_waiting_duplicates_count_towards_max_concurrency() -> None:
+    read: list[int] = []
+    read_while_in_flight: list[int] = []
+
+    async def call(_item: int) -> int:
+        await asyncio.sleep(0.05)
+        read_while_in_flight.append(len(read))
+        return 0
+
+    # every item has the same key, so they'd all wait for the first call
+    results = amap_concurrently(call, _counting(1000, read), max_concurrency=2, key=lambda _: 0)
+    async for _ in results:
+        break
+    await results.aclose()
+
+    assert read_while_in_flight == [2]
+
+
+async def test_async_stops_when_closed() -> None:
+    read: list[int] = []
+    started: list[int] = []
+
+    async def call(i: int) -> int:
+        started.append(i)
+        await asyncio.sleep(0.001)
+        return i
+
+    results = amap_concurrently(call, _counting(1000, read), max_concurrency=4)
+    async for _ in results:
+        break
+    await results.aclose()
+
+    assert len(read) <= 8
+    assert len(started) <= 8
+
+
+def test_checkpoint(tmp_path: Path) -> None:
+    path = tmp_path / "checkpoint.txt"
+    checkpoint = Checkpoint(path)
+    assert "a" not in checkpoint
+    assert not path.exists()
+
+    checkpoint.add("a")
+    checkpoint.add("b")
+    checkpoint.add("a")
+    checkpoint.close()
+    assert path.read_text() == "a\nb\n"
+
+    # the last line of an interrupted batch may have been cut short
+    with open(path, "a") as f:
+        f.write("c")
+    checkpoint = Checkpoint(path)
+    assert len(checkpoint) == 2
+    assert "c" not in checkpoint
+
+    checkpoint.add("c")
+    checkpoint.close()
+    assert Checkpoint(path)._completed == {"a", "b", "c"}
+
+
+def test_batch_progress() -> None:
+    reports: list[BatchStats] = []
+    progress = BatchProgress(reports.append, interval=3600)
+    for latency in range(1, 101):
+        progress.record_latency(latency / 1000)
+    progress.record(1)
+    progress.record(APIConnectionError(request=request))
+    progress.skip()
+    assert reports == []
+
+    progress.report()
+    stats = reports[0]
+    assert stats.completed == 1
+    assert stats.failed == 1
+    assert stats.skipped == 1
+    assert stats.items_per_second > 0
+    assert stats.p50_latency == 0.051
+    assert stats.p99_latency == 0.1
+
+    with pytest.raises(ValueError):
+        BatchProgress(None, interval=0)
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import sys
+import time
+import sqlite3
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from channel3_sdk import CacheEntry, MemoryCache, SQLiteCache
+from channel3_sdk._cache import normalize_url, make_cache_key
+
+
+def test_ttl() -> None:
+    cache = MemoryCache(ttl=60)
+    cache.set("a", CacheEntry(b"1"))
+    assert _value(cache.get("a")) == b"1"
+
+    # pretend the entry was stored a minute ago
+    entry, expires_at = cache._entries["a"]
+    cache._entries["a"] = (entry, expires_at - 60)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.entries == 0
+
+
+def test_keeps_revalidatable_entries() -> None:
+    cache = MemoryCache(ttl=60)
+    model = object()
+    cache.set("a", CacheEntry(b"1", etag='"v1"', model=model))
+
+    entry, expires_at = cache._entries["a"]
+    cache._entries["a"] = (entry, expires_at - 60)
+    stale = cache.get("a")
+    assert stale is not None
+    assert stale.stale
+    assert stale.etag == '"v1"'
+    assert stale.model is model
+
+    cache.refresh("a")
+    fresh = cache.get("a")
+    assert fresh is not None
+    assert not fresh.stale
+    assert fresh.model is model
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.revalidations == 1
+
+    # refreshing an entry that has been evicted is a no-op
+    cache.delete("a")
+    cache.refresh("a")
+    assert cache.get("a") is None
+    assert cache.stats().revalidations == 1
+
+
+def test_stale_while_revalidate() -> None:
+    cache = MemoryCache(ttl=60, stale_while_revalidate=600)
+    cache.set("a", CacheEntry(b"1"))
+
+    entry, expires_at = cache._entries["a"]
+    cache._entries["a"] = (entry, expires_at - 60)
+    stale = cache.get("a")
+    assert stale is not None
+    assert stale.stale
+    assert stale.serve_stale
+    assert stale.value == b"1"
+
+    # past the window the entry is treated like any other expired one
+    cache._entries["a"] = (entry, expires_at - 660)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats.stale_hits == 1
+    assert stats.misses == 1
+    assert stats.entries == 0
+
+
+def test_evicts_least_recently_used() -> None:
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", CacheEntry(b"1"))
+    cache.set("b", CacheEntry(b"2"))
+    cache.get("a")
+    cache.set("c", CacheEntry(b"3"))
+
+    assert cache.get("b") is None
+    assert _value(cache.get("a")) == b"1"
+    assert _value(cache.get("c")) == b"3"
+    assert cache.stats().evictions == 1
+
+
+def test_max_bytes() -> None:
+    cache = MemoryCache(max_bytes=25)
+    cache.set("a", CacheEntry(b"x" * 10))
+    cache.set("b", CacheEntry(b"x" * 10))
+    assert cache.stats().size == 22
+
+    cache.set("c", CacheEntry(b"x" * 10))
+    assert cache.get("a") is None
+    assert cache.stats().size == 22
+
+    # an entry that could never fit isn't cached
+    cache.set("d", CacheEntry(b"x" * 30))
+    assert cache.get("d") is None
+    assert cache.stats().entries == 2
+
+
+def test_delete_and_clear() -> None:
+    cache = MemoryCache()
+    cache.set("a", CacheEntry(b"1"))
+    cache.set("b", CacheEntry(b"2"))
+
+    cache.delete("a")
+    assert cache.get("a") is None
+
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats().size == 0
+
+
+def test_records_created_at() -> None:
+    cache = MemoryCache()
+    before = time.time()
+    cache.set("a", CacheEntry(b"1", created_at=0))
+
+    entry = cache.get("a")
+    assert entry is not None
+    assert entry.created_at is not None and entry.created_at >= before
+
+
+@pytest.mark.parametrize(
+    "url,normalized",
+    [
+        ("HTTPS://Shop.Example.com/Products/Shoe", "https://shop.example.com/Products/Shoe"),
+        ("https://shop.example.com/p?utm_source=x&UTM_Medium=y&gclid=1&fbclid=2#reviews", "https://shop.example.com/p"),
+        ("https://shop.example.com/p?variant=2&color=red&_ga=1", "https://shop.example.com/p?color=red&variant=2"),
+        ("  https://shop.example.com ", "https://shop.example.com/"),
+    ],
+)
+def test_normalize_url(url: str, normalized: str) -> None:
+    assert normalize_url(url) == normalized
+
+
+def test_make_cache_key() -> None:
+    key = make_cache_key("products.retrieve", "prod_1", {"currency": "USD", "country": "US"})
+    assert key == make_cache_key("products.retrieve", "prod_1", {"country": "US", "currency": "USD"})
+    assert key != make_cache_key("products.retrieve", "prod_1", {"country": "GB", "currency": "USD"})
+
+
+@pytest.mark.parametrize("kwargs", [{"ttl": 0}, {"max_entries": 0}, {"max_bytes": 0}, {"stale_while_revalidate": -1}])
+def test_invalid_cache(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ValueError):
+        MemoryCache(**kwargs)  # type: ignore[arg-type]
+
+
+def test_sqlite_cache(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
+    cache.set("a", CacheEntry(b"1"))
+    assert _value(cache.get("a")) == b"1"
+    assert cache.get("b") is None
+
+    # another process opening the same file sees the entry
+    other = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from channel3_sdk import SQLiteCache; "
+            "sys.stdout.write(repr(SQLiteCache(sys.argv[1]).get('a').value))",
+            str(tmp_path / "cache.db"),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert other.stdout == "b'1'"
+
+    cache._connection().execute("UPDATE entries SET expires_at = expires_at - 60")
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 2
+    assert stats.entries == 1
+
+
+def test_sqlite_cache_locked(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db", ttl=60, timeout=0.01)
+    cache.set("a", CacheEntry(b"1"))
+
+    # another process holding a lock for longer than `timeout`
+    other = sqlite3.connect(tmp_path / "cache.db", isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+
+    # writes are skipped rather than failing the request
+    cache.set("b", CacheEntry(b"2"))
+    cache.refresh("a")
+    cache.delete("a")
+
+    other.execute("ROLLBACK")
+    other.close()
+
+    assert _value(cache.get("a")) == b"1"
+    assert cache.get("b") is None
+    cache.set("b", CacheEntry(b"2"))
+    assert _value(cache.get("b")) == b"2"
+
+    def locked() -> sqlite3.Connection:
+        raise sqlite3.OperationalError("database is locked")
+
+    # as are reads, which are treated as misses
+    monkeypatch.setattr(cache, "_connection", locked)
+    assert cache.get("a") is None
+    assert cache._misses == 2
+
+
+def test_sqlite_cache_revalidation(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
+    cache.set("a", CacheEntry(b"1", last_modified="Wed, 21 Oct 2015 07:28:00 GMT", model=object()))
+    cache._connection().execute("UPDATE entries SET created_at = created_at - 60, expires_at = expires_at - 60")
+
+    stale = cache.get("a")
+    assert stale is not None
+    assert stale._replace(created_at=None) == CacheEntry(
+        b"1", last_modified="Wed, 21 Oct 2015 07:28:00 GMT", stale=True
+    )
+
+    cache.refresh("a")
+    fresh = cache.get("a")
+    assert fresh is not None
+    assert fresh._replace(created_at=None) == CacheEntry(b"1", last_modified="Wed, 21 Oct 2015 07:28:00 GMT")
+    # the entry is as old as the revalidation
+    assert fresh.created_at is not None and stale.created_at is not None
+    assert fresh.created_at - stale.created_at >= 60
+    assert cache.stats().revalidations == 1
+
+
+def test_sqlite_cache_resets_outdated_schema(tmp_path: Path) -> None:
+    db = sqlite3.connect(tmp_path / "cache.db")
+    db.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+    db.execute("INSERT INTO entries VALUES ('a', x'31')")
+    db.commit()
+    db.close()
+
+    cache = SQLiteCache(tmp_path / "cache.db")
+    assert cache.get("a") is None
+    cache.set("a", CacheEntry(b"1"))
+    assert _value(cache.get("a")) == b"1"
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db", max_bytes=25)
+    cache.set("a", CacheEntry(b"x" * 10))
+    cache.set("b", CacheEntry(b"x" * 10))
+    cache._connection().execute("UPDATE entries SET accessed_at = accessed_at - 10 WHERE key = 'b'")
+
+    cache.set("c", CacheEntry(b"x" * 10))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.size == 22
+
+    # an entry that could never fit isn't cached
+    cache.set("d", CacheEntry(b"x" * 30))
+    assert cache.get("d") is None
+
+
+def test_sqlite_cache_compact(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db")
+    for i in range(100):
+        cache.set(str(i), CacheEntry(b"x" * 10_000))
+    cache._connection().execute("UPDATE entries SET expires_at = 0 WHERE key != '0'")
+    size = _disk_usage(tmp_path)
+
+    cache.compact()
+    assert cache.stats().entries == 1
+    assert _disk_usage(tmp_path) < size / 10
+
+    cache.delete("0")
+    cache.set("1", CacheEntry(b"1"))
+    cache.clear()
+    assert cache.stats().entries == 0
+
+
+def test_sqlite_cache_stale_while_revalidate(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.db", ttl=60, stale_while_revalidate=600)
+    cache.set("a", CacheEntry(b"1"))
+    cache.set("b", CacheEntry(b"2"))
+    cache._connection().execute("UPDATE entries SET expires_at = ? WHERE key = 'a'", (time.time() - 60,))
+    cache._connection().execute("UPDATE entries SET expires_at = ? WHERE key = 'b'", (time.time() - 660,))
+
+    stale = cache.get("a")
+    assert stale is not None
+    assert stale.serve_stale
+    assert stale.value == b"1"
+    assert cache.get("b") is None
+
+    # entries inside the window are kept until it has passed
+    cache.compact()
+    assert cache.stats().entries == 1
+    assert cache.stats().stale_hits == 1
+
+
+def _disk_usage(directory: Path) -> int:
+    # includes the write-ahead log
+    return sum(path.stat().st_size for path in directory.iterdir())
+
+
+def _value(entry: CacheEntry | None) -> bytes | None:
+    return entry.value if entry is not None else None
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pytest
+
+from channel3_sdk import CircuitState, CircuitBreaker
+
+endpoint = "GET /v1/products/*"
+
+
+def _recover(breaker: CircuitBreaker) -> None:
+    breaker._circuits[endpoint].opened_at -= breaker.recovery_time
+
+
+def test_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=10)
+
+    breaker.record(endpoint, False)
+    breaker.record(endpoint, False)
+    # a success resets the count
+    breaker.record(endpoint, True)
+    breaker.record(endpoint, False)
+    breaker.record(endpoint, False)
+    # as does nothing inconclusive
+    breaker.record(endpoint, None)
+    assert breaker.allow(endpoint) is None
+
+    breaker.record(endpoint, False)
+    assert breaker.state(endpoint) == "open"
+
+    retry_after = breaker.allow(endpoint)
+    assert retry_after is not None
+    assert 9 < retry_after <= 10
+    assert breaker.allow("GET /v1/brands") is None
+
+
+def test_half_open() -> None:
+    changes: list[tuple[str, CircuitState, CircuitState]] = []
+    breaker = CircuitBreaker(
+        failure_threshold=1,
+        recovery_time=10,
+        on_state_change=lambda endpoint, previous, state: changes.append((endpoint, previous, state)),
+    )
+
+    breaker.record(endpoint, False)
+    _recover(breaker)
+
+    # only one trial request is let through
+    assert breaker.allow(endpoint) is None
+    assert breaker.state(endpoint) == "half_open"
+    assert breaker.allow(endpoint) == 10
+
+    # the trial failed, so the circuit opens again
+    breaker.record(endpoint, False)
+    assert breaker.state(endpoint) == "open"
+
+    _recover(breaker)
+    assert breaker.allow(endpoint) is None
+    breaker.record(endpoint, True)
+    assert breaker.states() == {endpoint: "closed"}
+
+    assert changes == [
+        (endpoint, "closed", "open"),
+        (endpoint, "open", "half_open"),
+        (endpoint, "half_open", "open"),
+        (endpoint, "open", "half_open"),
+        (endpoint, "half_open", "closed"),
+    ]
+
+
+def test_half_open_probe_timeout() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=10, probe_timeout=20)
+    breaker.record(endpoint, False)
+    _recover(breaker)
+
+    assert breaker.allow(endpoint) is None
+    assert breaker.allow(endpoint) == 10
+
+    # the trial request never completed, e.g. it was abandoned without being recorded
+    breaker._circuits[endpoint].probes[0] -= 20
+    assert breaker.allow(endpoint) is None
+    assert breaker.state(endpoint) == "half_open"
+
+    breaker.record(endpoint, True)
+    assert breaker.state(endpoint) == "closed"
+
+
+def test_reset() -> None:
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(endpoint, False)
+    breaker.record("GET /v1/brands", False)
+
+    breaker.reset(endpoint)
+    assert breaker.states() == {endpoint: "closed", "GET /v1/brands": "open"}
+
+    breaker.reset()
+    assert breaker.allow("GET /v1/brands") is None
+
+
+def test_callback_errors_are_ignored() -> None:
+    def on_state_change(_endpoint: str, _previous: CircuitState, _state: CircuitState) -> None:
+        raise RuntimeError("boom")
+
+    breaker = CircuitBreaker(failure_threshold=1, on_state_change=on_state_change)
+    breaker.record(endpoint, False)
+    assert breaker.state(endpoint) == "open"
+
+
+@pytest.mark.parametrize("kwargs", [{"failure_threshold": 0}, {"half_open_requests": 0}, {"probe_timeout": 0}])
+def test_invalid_breaker(kwargs: dict[str, int]) -> None:
+    with pytest.raises(ValueError):
+        CircuitBreaker(**kwargs)  # type: ignore[arg-type]
@@ -5,24 +5,52 @@ from __future__ import annotations
 import gc
 import os
 import sys
+import gzip
 import json
+import time
 import asyncio
 import inspect
+import threading
 import dataclasses
 import tracemalloc
 from typing import Any, Union, TypeVar, Callable, Iterable, Iterator, Optional, Coroutine, cast
+from pathlib import Path
 from unittest import mock
 from typing_extensions import Literal, AsyncIterator, override
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 import pytest
 from respx import MockRouter
 from pydantic import ValidationError
 
-from channel3_sdk import Channel3, AsyncChannel3, APIResponseValidationError
+from channel3_sdk import (
+    Channel3,
+    BatchStats,
+    MemoryCache,
+    RateLimiter,
+    RetryBudget,
+    SQLiteCache,
+    CircuitState,
+    HedgingStats,
+    SingleFlight,
+    AsyncChannel3,
+    HedgingPolicy,
+    NotFoundError,
+    CircuitBreaker,
+    RateLimitError,
+    APITimeoutError,
+    BadRequestError,
+    CircuitOpenError,
+    SingleFlightStats,
+    InternalServerError,
+    APIResponseValidationError,
+)
+from channel3_sdk.types import ProductDetail, LookupResponse
 from channel3_sdk._types import Omit
 from channel3_sdk._utils import asyncify
 from channel3_sdk._models import BaseModel, FinalRequestOptions
+from channel3_sdk.pagination import SyncCursorPage, AsyncCursorPage
 from channel3_sdk._exceptions import Channel3Error, APIStatusError, APIResponseValidationError
 from channel3_sdk._base_client import (
     DEFAULT_TIMEOUT,
@@ -34,6 +62,7 @@ from channel3_sdk._base_client import (
     get_platform,
     make_request_options,
 )
+from channel3_sdk._compression import _build_accept_encoding
 
 from .utils import update_env
 
@@ -971,444 +1000,1429 @@ class TestChannel3:
             limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
         )
 
-    @pytest.mark.respx(base_url=base_url)
-    def test_follow_redirects(self, respx_mock: MockRouter, client: Channel3) -> None:
-        # Test that the default follow_redirects=True allows following redirects
-        respx_mock.post("/redirect").mock(
-            return_value=httpx.Response(302, headers={"Location": f"{base_url}/redirected"})
-        )
-        respx_mock.get("/redirected").mock(return_value=httpx.Response(200, json={"status": "ok"}))
+    def test_http2_option(self) -> None:
+        pytest.importorskip("h2")
 
-        response = client.post("/redirect", body={"key": "value"}, cast_to=httpx.Response)
-        assert response.status_code == 200
-        assert response.json() == {"status": "ok"}
+        client = Channel3(base_url=base_url, api_key=api_key, _strict_response_validation=True, http2=True)
+        assert client.http2 is True
+        assert client._client._transport._pool._http2 is True  # type: ignore[attr-defined]
 
-    @pytest.mark.respx(base_url=base_url)
-    def test_follow_redirects_disabled(self, respx_mock: MockRouter, client: Channel3) -> None:
-        # Test that follow_redirects=False prevents following redirects
-        respx_mock.post("/redirect").mock(
-            return_value=httpx.Response(302, headers={"Location": f"{base_url}/redirected"})
-        )
+        # copies share the connection pool unless the protocol changes
+        assert client.copy()._client is client._client
+        http1_copy = client.copy(http2=False)
+        assert http1_copy._client is not client._client
+        assert http1_copy._client._transport._pool._http2 is False  # type: ignore[attr-defined]
 
-        with pytest.raises(APIStatusError) as exc_info:
-            client.post("/redirect", body={"key": "value"}, options={"follow_redirects": False}, cast_to=httpx.Response)
+        http1_copy.close()
+        client.close()
 
-        assert exc_info.value.response.status_code == 302
-        assert exc_info.value.response.headers["Location"] == f"{base_url}/redirected"
+    def test_http2_falls_back_without_h2(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # `None` entries in `sys.modules` make the import raise an `ImportError`
+        monkeypatch.setitem(sys.modules, "h2", None)
 
+        client = Channel3(base_url=base_url, api_key=api_key, _strict_response_validation=True, http2=True)
+        assert client.http2 is False
+        assert client.copy()._client is client._client
+        assert client._client._transport._pool._http1 is True  # type: ignore[attr-defined]
+        assert client._client._transport._pool._http2 is False  # type: ignore[attr-defined]
 
-class TestAsyncChannel3:
-    @pytest.mark.respx(base_url=base_url)
-    async def test_raw_response(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+        client.close()
 
-        response = await async_client.post("/foo", cast_to=httpx.Response)
-        assert response.status_code == 200
-        assert isinstance(response, httpx.Response)
-        assert response.json() == {"foo": "bar"}
+    def test_hedging(self) -> None:
+        calls = Counter()
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_raw_response_for_binary(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        respx_mock.post("/foo").mock(
-            return_value=httpx.Response(200, headers={"Content-Type": "application/binary"}, content='{"foo": "bar"}')
-        )
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            if calls.value == 1:
+                # the original request is stuck, e.g. on a slow backend
+                time.sleep(0.5)
+                return httpx.Response(200, json={"attempt": "original"})
+            assert request.headers["x-stainless-retry-count"] == "0"
+            return httpx.Response(200, json={"attempt": "hedge"})
 
-        response = await async_client.post("/foo", cast_to=httpx.Response)
-        assert response.status_code == 200
-        assert isinstance(response, httpx.Response)
-        assert response.json() == {"foo": "bar"}
+        policy = HedgingPolicy(delay=0.05, max_ratio=1)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            hedging=policy,
+        ) as client:
+            response = client.get("/v1/products/prod_1", cast_to=httpx.Response)
+            assert response.json() == {"attempt": "hedge"}
+            assert calls.value == 2
 
-    def test_copy(self, async_client: AsyncChannel3) -> None:
-        copied = async_client.copy()
-        assert id(copied) != id(async_client)
+            # copies share the policy
+            assert client.copy().hedging is policy
 
-        copied = async_client.copy(api_key="another My API Key")
-        assert copied.api_key == "another My API Key"
-        assert async_client.api_key == "My API Key"
+        stats = policy.stats()
+        assert stats.requests == 1
+        assert stats.hedged == 1
+        assert stats.wins == 1
 
-    def test_copy_default_options(self, async_client: AsyncChannel3) -> None:
-        # options that have a default are overridden correctly
-        copied = async_client.copy(max_retries=7)
-        assert copied.max_retries == 7
-        assert async_client.max_retries == 2
+    def test_hedging_budget(self) -> None:
+        calls = Counter()
 
-        copied2 = copied.copy(max_retries=6)
-        assert copied2.max_retries == 6
-        assert copied.max_retries == 7
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            time.sleep(0.05)
+            return httpx.Response(200, json={})
 
-        # timeout
-        assert isinstance(async_client.timeout, httpx.Timeout)
-        copied = async_client.copy(timeout=None)
-        assert copied.timeout is None
-        assert isinstance(async_client.timeout, httpx.Timeout)
+        policy = HedgingPolicy(delay=0, max_ratio=0)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            hedging=policy,
+        ) as client:
+            client.get("/v1/products/prod_1", cast_to=httpx.Response)
+            # only `GET` requests are hedged
+            client.post("/v1/search", cast_to=httpx.Response)
+
+        assert calls.value == 2
+        assert policy.stats() == HedgingStats(requests=1, skipped=1)
+
+    def test_hedging_closes_losing_attempt(self) -> None:
+        calls = Counter()
+        original_closed = threading.Event()
+        original_read = threading.Event()
+
+        class OriginalStream(httpx.SyncByteStream):
+            @override
+            def __iter__(self) -> Iterator[bytes]:
+                original_read.set()
+                yield b"{}"
+
+            @override
+            def close(self) -> None:
+                original_closed.set()
+
+        def handler(_request: httpx.Request) -> httpx.Response:
+            # both attempts are sent from the client's bounded pool of hedging threads
+            assert threading.current_thread().name.startswith("channel3-hedge")
+            calls.value += 1
+            if calls.value == 1:
+                # the original request is stuck until after the hedge has won
+                time.sleep(0.3)
+                return httpx.Response(200, stream=OriginalStream())
+            return httpx.Response(200, json={"attempt": "hedge"})
 
-    async def test_copy_default_headers(self) -> None:
-        client = AsyncChannel3(
-            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_headers={"X-Foo": "bar"}
-        )
-        assert client.default_headers["X-Foo"] == "bar"
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            hedging=HedgingPolicy(delay=0.05, max_ratio=1),
+        ) as client:
+            response = client.get("/v1/products/prod_1", cast_to=httpx.Response)
+            assert response.json() == {"attempt": "hedge"}
 
-        # does not override the already given value when not specified
-        copied = client.copy()
-        assert copied.default_headers["X-Foo"] == "bar"
+            # the original's response is closed as soon as it arrives, without reading its body
+            assert original_closed.wait(timeout=5)
+            assert not original_read.is_set()
 
-        # merges already given headers
-        copied = client.copy(default_headers={"X-Bar": "stainless"})
-        assert copied.default_headers["X-Foo"] == "bar"
-        assert copied.default_headers["X-Bar"] == "stainless"
+    def test_rate_limiter(self) -> None:
+        calls = Counter()
 
-        # uses new values for any already given headers
-        copied = client.copy(default_headers={"X-Foo": "stainless"})
-        assert copied.default_headers["X-Foo"] == "stainless"
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            if calls.value == 1:
+                return httpx.Response(429, headers={"retry-after-ms": "10"})
+            return httpx.Response(200, json={})
 
-        # set_default_headers
+        limiter = RateLimiter()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            rate_limiter=limiter,
+        ) as client:
+            # the rate limited request is re-sent without needing any retries
+            response = client.get("/foo", cast_to=httpx.Response)
+            assert response.status_code == 200
+            assert calls.value == 2
 
-        # completely overrides already set values
-        copied = client.copy(set_default_headers={})
-        assert copied.default_headers.get("X-Foo") is None
+            assert client.copy().rate_limiter is limiter
 
-        copied = client.copy(set_default_headers={"X-Bar": "Robert"})
-        assert copied.default_headers["X-Bar"] == "Robert"
+        stats = limiter.stats()
+        assert stats.rate_limited == 1
+        assert stats.rate is not None
+        assert stats.delayed == 1
+        assert stats.delay_total > 0
 
-        with pytest.raises(
-            ValueError,
-            match="`default_headers` and `set_default_headers` arguments are mutually exclusive",
-        ):
-            client.copy(set_default_headers={}, default_headers={"X-Foo": "Bar"})
-        await client.close()
+    def test_rate_limiter_max_attempts(self) -> None:
+        calls = Counter()
 
-    async def test_copy_default_query(self) -> None:
-        client = AsyncChannel3(
-            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_query={"foo": "bar"}
-        )
-        assert _get_params(client)["foo"] == "bar"
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(429, headers={"retry-after-ms": "1"})
 
-        # does not override the already given value when not specified
-        copied = client.copy()
-        assert _get_params(copied)["foo"] == "bar"
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            rate_limiter=RateLimiter(max_attempts=2, min_rate=1000),
+        ) as client:
+            with pytest.raises(RateLimitError):
+                client.get("/foo", cast_to=httpx.Response)
 
-        # merges already given params
-        copied = client.copy(default_query={"bar": "stainless"})
-        params = _get_params(copied)
-        assert params["foo"] == "bar"
-        assert params["bar"] == "stainless"
+        assert calls.value == 3
 
-        # uses new values for any already given headers
-        copied = client.copy(default_query={"foo": "stainless"})
-        assert _get_params(copied)["foo"] == "stainless"
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    def test_retry_budget(self) -> None:
+        calls = Counter()
 
-        # set_default_query
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(503)
 
-        # completely overrides already set values
-        copied = client.copy(set_default_query={})
-        assert _get_params(copied) == {}
+        budget = RetryBudget(ratio=0, min_retries=3)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=2,
+            retry_budget=budget,
+        ) as client:
+            with pytest.raises(APIStatusError):
+                client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 3
 
-        copied = client.copy(set_default_query={"bar": "Robert"})
-        assert _get_params(copied)["bar"] == "Robert"
+            # only one retry is left in the budget
+            with pytest.raises(APIStatusError):
+                client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 5
 
-        with pytest.raises(
-            ValueError,
-            # TODO: update
-            match="`default_query` and `set_default_query` arguments are mutually exclusive",
-        ):
-            client.copy(set_default_query={}, default_query={"foo": "Bar"})
+            assert client.copy().retry_budget is budget
 
-        await client.close()
+        stats = budget.stats()
+        assert stats.requests == 2
+        assert stats.retries == 3
+        assert stats.exhausted == 1
 
-    def test_copy_signature(self, async_client: AsyncChannel3) -> None:
-        # ensure the same parameters that can be passed to the client are defined in the `.copy()` method
-        init_signature = inspect.signature(
-            # mypy doesn't like that we access the `__init__` property.
-            async_client.__init__,  # type: ignore[misc]
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    def test_circuit_breaker(self) -> None:
+        calls = Counter()
+        healthy = False
+
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(200, json={}) if healthy else httpx.Response(500)
+
+        changes: list[tuple[str, CircuitState, CircuitState]] = []
+        breaker = CircuitBreaker(
+            failure_threshold=2,
+            recovery_time=5,
+            on_state_change=lambda endpoint, previous, state: changes.append((endpoint, previous, state)),
         )
-        copy_signature = inspect.signature(async_client.copy)
-        exclude_params = {"transport", "proxies", "_strict_response_validation"}
-
-        for name in init_signature.parameters.keys():
-            if name in exclude_params:
-                continue
-
-            copy_param = copy_signature.parameters.get(name)
-            assert copy_param is not None, f"copy() signature is missing the {name} param"
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=3,
+            circuit_breaker=breaker,
+        ) as client:
+            # the second failure opens the circuit, so the remaining retries fail fast
+            with pytest.raises(CircuitOpenError) as exc_info:
+                client.get("/products/prod_1", cast_to=httpx.Response)
+            assert calls.value == 2
+            assert exc_info.value.endpoint == "GET /products/prod_1"
+            assert 0 < exc_info.value.retry_after <= 5
+
+            # other endpoints are unaffected
+            healthy = True
+            client.get("/brands", cast_to=httpx.Response)
+            assert calls.value == 3
+
+            # pretend the recovery time has passed
+            breaker._circuits["GET /products/prod_1"].opened_at -= 5
+            client.get("/products/prod_1", cast_to=httpx.Response)
+            assert calls.value == 4
+            assert breaker.state("GET /products/prod_1") == "closed"
+
+            assert client.copy().circuit_breaker is breaker
+
+        assert changes == [
+            ("GET /products/prod_1", "closed", "open"),
+            ("GET /products/prod_1", "open", "half_open"),
+            ("GET /products/prod_1", "half_open", "closed"),
+        ]
 
-    @pytest.mark.skipif(sys.version_info >= (3, 10), reason="fails because of a memory leak that started from 3.12")
-    def test_copy_build_request(self, async_client: AsyncChannel3) -> None:
-        options = FinalRequestOptions(method="get", url="/foo")
+    def test_deadline_stops_retries(self) -> None:
+        calls = Counter()
 
-        def build_request(options: FinalRequestOptions) -> None:
-            client_copy = async_client.copy()
-            client_copy._build_request(options)
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(500, headers={"retry-after-ms": "100"})
 
-        # ensure that the machinery is warmed up before tracing starts.
-        build_request(options)
-        gc.collect()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=5,
+            deadline=0.15,
+        ) as client:
+            # the second retry would only start after the deadline
+            with pytest.raises(InternalServerError):
+                client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 2
 
-        tracemalloc.start(1000)
+            calls.value = 0
+            with pytest.raises(APITimeoutError):
+                client.with_options(deadline=0).get("/foo", cast_to=httpx.Response)
+            assert calls.value == 0
 
-        snapshot_before = tracemalloc.take_snapshot()
+    def test_deadline_caps_rate_limiter_delay(self) -> None:
+        calls = Counter()
 
-        ITERATIONS = 10
-        for _ in range(ITERATIONS):
-            build_request(options)
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(429, headers={"retry-after": "5"})
 
-        gc.collect()
-        snapshot_after = tracemalloc.take_snapshot()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            deadline=0.5,
+            rate_limiter=RateLimiter(),
+        ) as client:
+            started_at = time.monotonic()
+            # waiting out the `retry-after` would pass the deadline
+            with pytest.raises(APITimeoutError):
+                client.get("/foo", cast_to=httpx.Response)
+            assert time.monotonic() - started_at < 0.5
+            assert calls.value == 1
 
-        tracemalloc.stop()
+    def test_deadline_shrinks_timeout(self) -> None:
+        requests: list[httpx.Request] = []
 
-        def add_leak(leaks: list[tracemalloc.StatisticDiff], diff: tracemalloc.StatisticDiff) -> None:
-            if diff.count == 0:
-                # Avoid false positives by considering only leaks (i.e. allocations that persist).
-                return
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={})
 
-            if diff.count % ITERATIONS != 0:
-                # Avoid false positives by considering only leaks that appear per iteration.
-                return
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            timeout=httpx.Timeout(60, connect=1),
+        ) as client:
+            client.get("/foo", cast_to=httpx.Response, options={"deadline": 5})
+            client.get("/foo", cast_to=httpx.Response)
 
-            for frame in diff.traceback:
-                if any(
-                    frame.filename.endswith(fragment)
-                    for fragment in [
-                        # to_raw_response_wrapper leaks through the @functools.wraps() decorator.
-                        #
-                        # removing the decorator fixes the leak for reasons we don't understand.
-                        "channel3_sdk/_legacy_response.py",
-                        "channel3_sdk/_response.py",
-                        # pydantic.BaseModel.model_dump || pydantic.BaseModel.dict leak memory for some reason.
-                        "channel3_sdk/_compat.py",
-                        # Standard library leaks we don't care about.
-                        "/logging/__init__.py",
-                    ]
-                ):
-                    return
+        assert 4 < float(requests[0].headers["x-stainless-read-timeout"]) <= 5
+        timeout = requests[0].extensions["timeout"]
+        assert timeout["connect"] == 1
+        assert 4 < timeout["read"] <= 5
 
-            leaks.append(diff)
+        assert requests[1].headers["x-stainless-read-timeout"] == "60"
 
-        leaks: list[tracemalloc.StatisticDiff] = []
-        for diff in snapshot_after.compare_to(snapshot_before, "traceback"):
-            add_leak(leaks, diff)
-        if leaks:
-            for leak in leaks:
-                print("MEMORY LEAK:", leak)
-                for frame in leak.traceback:
-                    print(frame)
-            raise AssertionError()
+    def test_deadline_spans_pages(self) -> None:
+        calls = Counter()
 
-    async def test_request_timeout(self, async_client: AsyncChannel3) -> None:
-        request = async_client._build_request(FinalRequestOptions(method="get", url="/foo"))
-        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-        assert timeout == DEFAULT_TIMEOUT
+        def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(200, json={"items": [{"id": calls.value}], "next_cursor": "next"})
 
-        request = async_client._build_request(
-            FinalRequestOptions(method="get", url="/foo", timeout=httpx.Timeout(100.0))
-        )
-        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-        assert timeout == httpx.Timeout(100.0)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            deadline=0.05,
+        ) as client:
+            page = client.get_api_list("/items", model=object, page=SyncCursorPage[object])
+            assert page.has_next_page()
 
-    async def test_client_timeout_option(self) -> None:
-        client = AsyncChannel3(
-            base_url=base_url, api_key=api_key, _strict_response_validation=True, timeout=httpx.Timeout(0)
-        )
+            time.sleep(0.1)
+            with pytest.raises(APITimeoutError):
+                page.get_next_page()
+            assert calls.value == 1
 
-        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-        assert timeout == httpx.Timeout(0)
+    def test_single_flight(self) -> None:
+        calls = Counter()
+        release = threading.Event()
 
-        await client.close()
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            release.wait(5)
+            return httpx.Response(200, json={"country": request.url.params["country"]})
 
-    async def test_http_client_timeout_option(self) -> None:
-        # custom timeout given to the httpx client should be used
-        async with httpx.AsyncClient(timeout=None) as http_client:
-            client = AsyncChannel3(
-                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
+        single_flight = SingleFlight()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            single_flight=single_flight,
+        ) as client:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                futures = [
+                    pool.submit(
+                        client.get, "/products/prod_1", cast_to=object, options={"params": {"country": country}}
+                    )
+                    for country in ("US", "US", "US", "GB")
+                ]
+                started = time.monotonic()
+                while single_flight.stats().coalesced < 2 and time.monotonic() - started < 5:
+                    time.sleep(0.01)
+                release.set()
+                results = [future.result() for future in futures]
+
+            assert client.copy().single_flight is single_flight
+
+        assert calls.value == 2
+        assert results[0] is results[1] is results[2]
+        assert results[3] == {"country": "GB"}
+        assert single_flight.stats() == SingleFlightStats(requests=4, coalesced=2)
+
+    def test_response_cache(self) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path.endswith("missing"):
+                return httpx.Response(404, json={"detail": "not found"})
+            return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1], "title": "Shoe"})
+
+        cache = MemoryCache(ttl=60)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            country="US",
+            response_cache=cache,
+        ) as client:
+            first = client.products.retrieve("prod_1", currency="USD")
+            second = client.products.retrieve("prod_1", currency="USD")
+            assert second == first
+            assert len(requests) == 1
+
+            # raw responses always come from the API
+            response = client.products.with_raw_response.retrieve("prod_1", currency="USD")
+            assert response.parse().id == "prod_1"
+            assert len(requests) == 2
+
+            # the locale, whether from the client or the params, is part of the key
+            client.products.retrieve("prod_1", currency="EUR")
+            client.with_options(country="GB").products.retrieve("prod_1", currency="USD")
+            assert len(requests) == 4
+
+            # bypassing the cache
+            client.with_options(response_cache=None).products.retrieve("prod_1", currency="USD")
+            client.products.retrieve("prod_1", currency="USD", extra_query={"foo": "bar"})
+            assert len(requests) == 6
+
+            # errors aren't cached
+            for _ in range(2):
+                with pytest.raises(NotFoundError):
+                    client.products.retrieve("missing")
+            assert len(requests) == 8
+
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 5
+        assert stats.entries == 3
+
+    def test_shared_response_cache(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path == "/v1/lookup":
+                return httpx.Response(200, json={"product": {"id": "prod_1", "title": "Shoe"}})
+            if request.url.path.startswith("/v1/brands/"):
+                return httpx.Response(200, json={"id": "brand_1", "name": "Nike"})
+            return httpx.Response(200, json={"has_children": False, "slug": "sofas", "title": "Sofas"})
+
+        def make_calls(client: Channel3) -> None:
+            client.products.lookup(url="https://example.com/shoe")
+            client.brands.retrieve("brand_1")
+            client.categories.retrieve("sofas")
+
+        # each client stands in for a separate worker process sharing the cache file
+        for _ in range(2):
+            with Channel3(
+                base_url=base_url,
+                api_key=api_key,
+                _strict_response_validation=True,
+                http_client=httpx.Client(transport=MockTransport(handler=handler)),
+                response_cache=SQLiteCache(tmp_path / "cache.db"),
+            ) as client:
+                make_calls(client)
+
+        assert len(requests) == 3
+
+    def test_response_cache_revalidation(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+        version = {"etag": '"v1"', "title": "Shoe"}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == version["etag"]:
+                return httpx.Response(304, headers={"ETag": version["etag"]})
+            return httpx.Response(
+                200, json={"id": "prod_1", "title": version["title"]}, headers={"ETag": version["etag"]}
             )
 
-            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-            assert timeout == httpx.Timeout(None)
+        cache = MemoryCache(ttl=60)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            first = client.products.retrieve("prod_1")
+            assert "If-None-Match" not in requests[-1].headers
 
-            await client.close()
+            entry, expires_at = cache._entries[next(iter(cache._entries))]
+            cache._entries[next(iter(cache._entries))] = (entry, expires_at - 60)
 
-        # no timeout given to the httpx client should not use the httpx default
-        async with httpx.AsyncClient() as http_client:
-            client = AsyncChannel3(
-                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
-            )
+            # the API confirms the cached response is up to date, so the model is re-used
+            second = client.products.retrieve("prod_1")
+            assert second is first
+            assert requests[-1].headers["If-None-Match"] == '"v1"'
+            assert len(requests) == 2
 
-            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-            assert timeout == DEFAULT_TIMEOUT
+            # and the entry is fresh again
+            client.products.retrieve("prod_1")
+            assert len(requests) == 2
 
-            await client.close()
+            version.update(etag='"v2"', title="Boot")
+            cache.clear()
+            assert client.products.retrieve("prod_1").title == "Boot"
 
-        # explicitly passing the default timeout currently results in it being ignored
-        async with httpx.AsyncClient(timeout=HTTPX_DEFAULT_TIMEOUT) as http_client:
-            client = AsyncChannel3(
-                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
-            )
+        stats = cache.stats()
+        assert stats.revalidations == 1
+        assert stats.hits == 1
 
-            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
-            assert timeout == DEFAULT_TIMEOUT  # our default
+        # caches that don't keep models parse the cached body again
+        sqlite_cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            response_cache=sqlite_cache,
+        ) as client:
+            first = client.products.retrieve("prod_1")
+            sqlite_cache._connection().execute("UPDATE entries SET expires_at = expires_at - 60")
 
-            await client.close()
+            second = client.products.retrieve("prod_1")
+            assert second == first
+            assert second is not first
+            assert requests[-1].headers["If-None-Match"] == '"v2"'
+            assert sqlite_cache.stats().revalidations == 1
 
-    def test_invalid_http_client(self) -> None:
-        with pytest.raises(TypeError, match="Invalid `http_client` arg"):
-            with httpx.Client() as http_client:
-                AsyncChannel3(
+    def test_cache_is_namespaced_by_client(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"id": "prod_1", "title": request.url.host})
+
+        cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
+
+        clients: list[Channel3] = []
+
+        def make_client(base_url: str, api_key: str) -> Channel3:
+            clients.append(
+                Channel3(
                     base_url=base_url,
                     api_key=api_key,
                     _strict_response_validation=True,
-                    http_client=cast(Any, http_client),
+                    http_client=httpx.Client(transport=MockTransport(handler=handler)),
+                    response_cache=cache,
                 )
+            )
+            return clients[-1]
+
+        a = make_client("https://a.example", "k1")
+        b = make_client("https://b.example", "k2")
+        # clients for different environments or accounts don't see each other's entries
+        assert a.products.retrieve("prod_1").title == "a.example"
+        assert b.products.retrieve("prod_1").title == "b.example"
+        assert make_client("https://a.example", "k2").products.retrieve("prod_1").title == "a.example"
+        assert len(requests) == 3
+
+        # while copies of a client share them
+        assert a.copy(timeout=5).products.retrieve("prod_1").title == "a.example"
+        assert len(requests) == 3
+
+        # the API key isn't stored in the cache
+        keys = [key for (key,) in cache._connection().execute("SELECT key FROM entries")]
+        assert keys
+        assert not any("k1" in key or "k2" in key for key in keys)
+
+        for client in clients:
+            client.close()
 
-    async def test_default_headers_option(self) -> None:
-        test_client = AsyncChannel3(
-            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_headers={"X-Foo": "bar"}
-        )
-        request = test_client._build_request(FinalRequestOptions(method="get", url="/foo"))
-        assert request.headers.get("x-foo") == "bar"
-        assert request.headers.get("x-stainless-lang") == "python"
+    def test_lookup_cache(self) -> None:
+        requests: list[httpx.Request] = []
 
-        test_client2 = AsyncChannel3(
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"product": {"id": "prod_1", "title": "Shoe"}})
+
+        cache = MemoryCache(ttl=24 * 3600)
+        with Channel3(
             base_url=base_url,
             api_key=api_key,
             _strict_response_validation=True,
-            default_headers={
-                "X-Foo": "stainless",
-                "X-Stainless-Lang": "my-overriding-header",
-            },
-        )
-        request = test_client2._build_request(FinalRequestOptions(method="get", url="/foo"))
-        assert request.headers.get("x-foo") == "stainless"
-        assert request.headers.get("x-stainless-lang") == "my-overriding-header"
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            first = client.products.lookup(url="https://Shop.Example.com/shoe?utm_source=newsletter")
+            assert json.loads(requests[0].content)["url"] == "https://Shop.Example.com/shoe?utm_source=newsletter"
+
+            # links to the same page share an entry
+            second = client.products.lookup(url="https://shop.example.com/shoe#reviews")
+            assert second is first
+            assert len(requests) == 1
+
+            # and the product can be retrieved by its ID
+            product = client.products.retrieve("prod_1")
+            assert product is first.product
+            assert len(requests) == 1
+
+            # pretend the lookup was made two hours ago
+            key = next(key for key in cache._entries if ":products.lookup:" in key)
+            entry, expires_at = cache._entries[key]
+            cache._entries[key] = (entry._replace(created_at=time.time() - 2 * 3600), expires_at)
+
+            client.products.lookup(url="https://shop.example.com/shoe", max_staleness_hours=3)
+            assert len(requests) == 1
+
+            client.products.lookup(url="https://shop.example.com/shoe", max_staleness_hours=1)
+            assert len(requests) == 2
+            assert json.loads(requests[1].content)["max_staleness_hours"] == 1
+
+    def test_stale_while_revalidate(self) -> None:
+        requests: list[httpx.Request] = []
+        brand = {"id": "brand_1", "name": "Nike"}
+        refreshed = threading.Event()
+        refreshed.set()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            refreshed.wait(5)
+            return httpx.Response(200, json=brand)
+
+        cache = MemoryCache(ttl=60, stale_while_revalidate=3600)
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            assert client.brands.retrieve("brand_1").name == "Nike"
+
+            def expire(seconds: float) -> None:
+                for key, (entry, expires_at) in list(cache._entries.items()):
+                    cache._entries[key] = (entry, expires_at - seconds)
+
+            # the stale response is returned right away and refreshed in the background
+            brand["name"] = "Nike Inc."
+            refreshed.clear()
+            expire(61)
+            for _ in range(3):
+                assert client.brands.retrieve("brand_1").name == "Nike"
+            refreshed.set()
+
+            deadline = time.monotonic() + 5
+            while (len(requests) < 2 or client._refreshing) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(requests) == 2
+            assert requests[1].headers["X-Stainless-Retry-Count"] == "0"
+            assert client.brands.retrieve("brand_1").name == "Nike Inc."
+
+            # past the window the call waits for a fresh response
+            brand["name"] = "Nike, Inc."
+            expire(60 + 3600)
+            assert client.brands.retrieve("brand_1").name == "Nike, Inc."
+            assert len(requests) == 3
+
+        stats = cache.stats()
+        assert stats.stale_hits == 3
+        assert stats.misses == 2
+
+    def test_retrieve_many(self) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            product_id = request.url.path.rsplit("/", 1)[-1]
+            if product_id == "prod_missing":
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(200, json={"id": product_id, "title": product_id.title()})
 
-        await test_client.close()
-        await test_client2.close()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            products = client.products.retrieve_many(
+                ["prod_2", "prod_missing", "prod_1", "prod_2"], max_concurrency=2, locale={"country": "GB"}
+            )
+            assert list(products) == ["prod_2", "prod_missing", "prod_1"]
+            assert isinstance(products["prod_1"], ProductDetail)
+            assert products["prod_1"].title == "Prod_1"
+            assert isinstance(products["prod_missing"], NotFoundError)
+            assert len(requests) == 3
+            assert all(request.url.params["country"] == "GB" for request in requests)
+
+            completed = dict(client.products.retrieve_many(["prod_3", "prod_4"], as_completed=True))
+            assert sorted(completed) == ["prod_3", "prod_4"]
+
+            with pytest.raises(ValueError):
+                client.products.retrieve_many(["prod_1"], max_concurrency=0)
+
+    def test_lookup_many(self) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            url = json.loads(request.content)["url"]
+            if "missing" in url:
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(200, json={"product": {"id": url.rsplit("/", 1)[-1], "title": "Shoe"}})
+
+        urls = [
+            "https://shop.example.com/shoe_1?utm_source=newsletter",
+            "https://Shop.Example.com/shoe_1#reviews",
+            "https://shop.example.com/missing",
+            "https://shop.example.com/shoe_2",
+        ]
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            results = dict(client.products.lookup_many(iter(urls), max_concurrency=3, max_staleness_hours=1))
+
+        assert list(sorted(results)) == sorted(urls)
+        first, second = results[urls[0]], results[urls[1]]
+        assert isinstance(first, LookupResponse)
+        assert first is second
+        assert isinstance(results[urls[2]], NotFoundError)
+        # the second link to the first page shared its lookup
+        assert len(requests) == 3
+        assert all(json.loads(request.content)["max_staleness_hours"] == 1 for request in requests)
+
+    def test_enrich_url_many(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            url = json.loads(request.content)["url"]
+            if "missing" in url:
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(
+                200,
+                json={
+                    "id": url.rsplit("/", 1)[-1],
+                    "availability": "InStock",
+                    "price": {"currency": "USD", "price": 10.0},
+                    "title": "Shoe",
+                    "url": url,
+                },
+            )
 
-    def test_validate_headers(self) -> None:
-        client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
-        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-        assert request.headers.get("x-api-key") == api_key
+        urls = [
+            "https://shop.example.com/shoe_1",
+            "https://shop.example.com/missing",
+            "https://shop.example.com/shoe_2",
+        ]
+        checkpoint = tmp_path / "enriched.txt"
+        progress: list[BatchStats] = []
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            with pytest.warns(DeprecationWarning):
+                results = client.enrich.enrich_url_many(  # pyright: ignore[reportDeprecated]
+                    urls, checkpoint=checkpoint, on_progress=progress.append
+                )
+            enriched = dict(results)
+
+            assert sorted(enriched) == sorted(urls)
+            assert isinstance(enriched[urls[1]], NotFoundError)
+            assert sorted(checkpoint.read_text().splitlines()) == [urls[0], urls[2]]
+            assert progress[-1].completed == 2
+            assert progress[-1].failed == 1
+            assert progress[-1].p50_latency is not None
+
+            # a restarted job only retries the URL that failed
+            with pytest.warns(DeprecationWarning):
+                results = client.enrich.enrich_url_many(  # pyright: ignore[reportDeprecated]
+                    urls, checkpoint=checkpoint, on_progress=progress.append
+                )
+            assert list(dict(results)) == [urls[1]]
+            assert len(requests) == 4
+            assert progress[-1].skipped == 2
+
+    def test_reconcile_price_tracking(self) -> None:
+        changes: list[tuple[str, str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/subscriptions"):
+                assert request.url.params["limit"] == "2"
+                if "cursor" not in request.url.params:
+                    items = [subscription("prod_1", "active"), subscription("prod_2", "active")]
+                    return httpx.Response(200, json={"items": items, "next_cursor": "page_2"})
+                items = [subscription("prod_3", "active"), subscription("prod_4", "cancelled")]
+                return httpx.Response(200, json={"items": items})
+
+            action = request.url.path.rsplit("/", 1)[-1]
+            canonical_product_id = json.loads(request.content)["canonical_product_id"]
+            changes.append((action, canonical_product_id))
+            if canonical_product_id == "prod_6":
+                return httpx.Response(400, json={"error": "unknown product"})
+            return httpx.Response(
+                200, json=subscription(canonical_product_id, "active" if action == "start" else "cancelled")
+            )
 
-        with pytest.raises(Channel3Error):
-            with update_env(**{"CHANNEL3_API_KEY": Omit()}):
-                client2 = AsyncChannel3(base_url=base_url, api_key=None, _strict_response_validation=True)
-            _ = client2
+        def subscription(canonical_product_id: str, status: str) -> dict[str, str]:
+            return {
+                "canonical_product_id": canonical_product_id,
+                "created_at": "2024-01-01T00:00:00Z",
+                "subscription_status": status,
+            }
 
-    async def test_default_query_option(self) -> None:
-        client = AsyncChannel3(
-            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_query={"query_param": "bar"}
-        )
-        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
-        url = httpx.URL(request.url)
-        assert dict(url.params) == {"query_param": "bar"}
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            report = client.price_tracking.reconcile(
+                ["prod_2", "prod_3", "prod_5", "prod_6", "prod_5"], max_concurrency=2, page_size=2
+            )
 
-        request = client._build_request(
-            FinalRequestOptions(
-                method="get",
-                url="/foo",
-                params={"foo": "baz", "query_param": "overridden"},
+        assert report.desired == 4
+        assert report.active == 3
+        assert report.unchanged == 2
+        assert report.started == ["prod_5"]
+        assert report.stopped == ["prod_1"]
+        assert list(report.failed) == ["prod_6"]
+        assert isinstance(report.failed["prod_6"], BadRequestError)
+        assert sorted(changes) == [("start", "prod_5"), ("start", "prod_6"), ("stop", "prod_1")]
+
+    def test_retrieve_history_many(self) -> None:
+        requested: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["days"] == "7"
+            canonical_product_id = request.url.path.rsplit("/", 1)[-1]
+            requested.append(canonical_product_id)
+            if canonical_product_id == "prod_3":
+                return httpx.Response(400, json={"error": "unknown product"})
+            history = [
+                {"currency": "USD", "price": 10.0, "timestamp": "2024-01-01T00:00:00Z"},
+                {"currency": "EUR", "price": 9.5, "timestamp": "2024-01-02T00:00:00Z"},
+            ]
+            return httpx.Response(
+                200,
+                json={
+                    "canonical_product_id": canonical_product_id,
+                    "history": history if canonical_product_id == "prod_1" else [],
+                    "statistics": {"currency": "USD", "current_price": 9.5, "current_status": "low"},
+                },
             )
-        )
-        url = httpx.URL(request.url)
-        assert dict(url.params) == {"foo": "baz", "query_param": "overridden"}
 
-        await client.close()
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            columns = client.price_tracking.retrieve_history_many(
+                ["prod_1", "prod_2", "prod_3", "prod_1"], days=7, max_concurrency=2
+            )
 
-    async def test_hardcoded_query_params_in_url(self, async_client: AsyncChannel3) -> None:
-        request = async_client._build_request(FinalRequestOptions(method="get", url="/foo?beta=true"))
-        url = httpx.URL(request.url)
-        assert dict(url.params) == {"beta": "true"}
+        assert sorted(requested) == ["prod_1", "prod_2", "prod_3"]
+        assert sorted(columns.product_ids) == ["prod_1", "prod_2"]
+        assert list(columns.failed) == ["prod_3"]
+        assert isinstance(columns.failed["prod_3"], BadRequestError)
+        assert len(columns) == 2
+        rows = columns.rows("prod_1")
+        assert list(columns.prices[rows]) == [10.0, 9.5]
+        assert list(columns.timestamps[rows]) == [1_704_067_200_000_000, 1_704_153_600_000_000]
+        assert [columns.currencies[code] for code in columns.currency_codes[rows]] == ["USD", "EUR"]
+        assert set(columns.product_index[rows]) == {columns.product_ids.index("prod_1")}
+        assert len(columns.prices[columns.rows("prod_2")]) == 0
+        assert columns.statistics["prod_2"].current_status == "low"
+
+    def test_warmup(self) -> None:
+        methods: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            # simulate the events httpcore reports when it opens a new connection
+            trace = request.extensions["trace"]
+            trace("connection.connect_tcp.started", {})
+            trace("connection.connect_tcp.complete", {})
+            methods.append(request.method)
+            return httpx.Response(404)
 
-        request = async_client._build_request(
-            FinalRequestOptions(
-                method="get",
-                url="/foo?beta=true",
-                params={"limit": "10", "page": "abc"},
-            )
-        )
-        url = httpx.URL(request.url)
-        assert dict(url.params) == {"beta": "true", "limit": "10", "page": "abc"}
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            result = client.warmup(connections=3)
 
-        request = async_client._build_request(
-            FinalRequestOptions(
-                method="get",
-                url="/files/a%2Fb?beta=true",
-                params={"limit": "10"},
-            )
-        )
-        assert request.url.raw_path == b"/files/a%2Fb?beta=true&limit=10"
+        assert methods == ["HEAD", "HEAD", "HEAD"]
+        assert result.failed == 0
+        assert result.dns is not None
+        assert len(result.connections) == 3
+        for connection in result.connections:
+            assert connection.connect is not None
+            assert connection.tls is None
+            assert connection.total >= connection.connect
 
-    def test_request_extra_json(self, client: Channel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                json_data={"foo": "bar"},
-                extra_json={"baz": False},
-            ),
-        )
-        data = json.loads(request.content.decode("utf-8"))
-        assert data == {"foo": "bar", "baz": False}
+    def test_warmup_failures(self) -> None:
+        def handler(_request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused")
 
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                extra_json={"baz": False},
-            ),
-        )
-        data = json.loads(request.content.decode("utf-8"))
-        assert data == {"baz": False}
+        with Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.Client(transport=MockTransport(handler=handler)),
+        ) as client:
+            result = client.warmup(connections=2)
+            assert result.failed == 2
+            assert result.connections == []
 
-        # `extra_json` takes priority over `json_data` when keys clash
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                json_data={"foo": "bar", "baz": True},
-                extra_json={"baz": None},
-            ),
-        )
-        data = json.loads(request.content.decode("utf-8"))
-        assert data == {"foo": "bar", "baz": None}
+            with pytest.raises(ValueError, match="at least 1"):
+                client.warmup(connections=0)
 
-    def test_request_extra_headers(self, client: Channel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                **make_request_options(extra_headers={"X-Foo": "Foo"}),
-            ),
+    @pytest.mark.respx(base_url=base_url)
+    def test_request_compression(self, respx_mock: MockRouter) -> None:
+        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={}))
+
+        client = Channel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            request_compression="gzip",
+            request_compression_threshold=1024,
         )
-        assert request.headers.get("X-Foo") == "Foo"
 
-        # `extra_headers` takes priority over `default_headers` when keys clash
-        request = client.with_options(default_headers={"X-Bar": "true"})._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                **make_request_options(
-                    extra_headers={"X-Bar": "false"},
-                ),
-            ),
+        body = {"base64_image": "a" * 2048}
+        client.post("/foo", body=body, cast_to=httpx.Response)
+        request = respx_mock.calls.last.request
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(request.content)) == body
+
+        # small bodies are sent as-is
+        client.post("/foo", body={"query": "shoes"}, cast_to=httpx.Response)
+        request = respx_mock.calls.last.request
+        assert "Content-Encoding" not in request.headers
+        assert json.loads(request.content) == {"query": "shoes"}
+
+        # as are requests from a copy with compression disabled
+        client.copy(request_compression=None).post("/foo", body=body, cast_to=httpx.Response)
+        assert "Content-Encoding" not in respx_mock.calls.last.request.headers
+
+        client.close()
+
+    @pytest.mark.respx(base_url=base_url)
+    def test_request_compression_zstd(self, respx_mock: MockRouter) -> None:
+        zstandard = pytest.importorskip("zstandard")
+        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={}))
+
+        client = Channel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, request_compression="zstd"
         )
-        assert request.headers.get("X-Bar") == "false"
+        body = {"base64_image": "a" * 32 * 1024}
+        client.post("/foo", body=body, cast_to=httpx.Response)
 
-    def test_request_extra_query(self, client: Channel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                **make_request_options(
-                    extra_query={"my_query_param": "Foo"},
-                ),
-            ),
+        request = respx_mock.calls.last.request
+        assert request.headers["Content-Encoding"] == "zstd"
+        assert json.loads(zstandard.ZstdDecompressor().decompress(request.content)) == body
+
+        client.close()
+
+    def test_request_compression_falls_back_without_zstandard(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setitem(sys.modules, "zstandard", None)
+
+        client = Channel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, request_compression="zstd"
         )
-        params = dict(request.url.params)
-        assert params == {"my_query_param": "Foo"}
+        assert client.request_compression == "gzip"
+
+        client.close()
+
+    def test_accept_encoding(self, client: Channel3) -> None:
+        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        encodings = [encoding.split(";")[0] for encoding in request.headers["Accept-Encoding"].split(", ")]
+        assert encodings[0] in ("zstd", "br", "gzip")
+        assert "gzip" in encodings
+
+    def test_accept_encoding_without_optional_decoders(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # `None` entries in `sys.modules` make the import raise an `ImportError`
+        for module in ("zstandard", "brotli", "brotlicffi"):
+            monkeypatch.setitem(sys.modules, module, None)
+
+        assert _build_accept_encoding() == "gzip, deflate;q=0.9"
+
+    @pytest.mark.respx(base_url=base_url)
+    def test_follow_redirects(self, respx_mock: MockRouter, client: Channel3) -> None:
+        # Test that the default follow_redirects=True allows following redirects
+        respx_mock.post("/redirect").mock(
+            return_value=httpx.Response(302, headers={"Location": f"{base_url}/redirected"})
+        )
+        respx_mock.get("/redirected").mock(return_value=httpx.Response(200, json={"status": "ok"}))
+
+        response = client.post("/redirect", body={"key": "value"}, cast_to=httpx.Response)
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok"}
+
+    @pytest.mark.respx(base_url=base_url)
+    def test_follow_redirects_disabled(self, respx_mock: MockRouter, client: Channel3) -> None:
+        # Test that follow_redirects=False prevents following redirects
+        respx_mock.post("/redirect").mock(
+            return_value=httpx.Response(302, headers={"Location": f"{base_url}/redirected"})
+        )
+
+        with pytest.raises(APIStatusError) as exc_info:
+            client.post("/redirect", body={"key": "value"}, options={"follow_redirects": False}, cast_to=httpx.Response)
+
+        assert exc_info.value.response.status_code == 302
+        assert exc_info.value.response.headers["Location"] == f"{base_url}/redirected"
+
+
+class TestAsyncChannel3:
+    @pytest.mark.respx(base_url=base_url)
+    async def test_raw_response(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+
+        response = await async_client.post("/foo", cast_to=httpx.Response)
+        assert response.status_code == 200
+        assert isinstance(response, httpx.Response)
+        assert response.json() == {"foo": "bar"}
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_raw_response_for_binary(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        respx_mock.post("/foo").mock(
+            return_value=httpx.Response(200, headers={"Content-Type": "application/binary"}, content='{"foo": "bar"}')
+        )
+
+        response = await async_client.post("/foo", cast_to=httpx.Response)
+        assert response.status_code == 200
+        assert isinstance(response, httpx.Response)
+        assert response.json() == {"foo": "bar"}
+
+    def test_copy(self, async_client: AsyncChannel3) -> None:
+        copied = async_client.copy()
+        assert id(copied) != id(async_client)
+
+        copied = async_client.copy(api_key="another My API Key")
+        assert copied.api_key == "another My API Key"
+        assert async_client.api_key == "My API Key"
+
+    def test_copy_default_options(self, async_client: AsyncChannel3) -> None:
+        # options that have a default are overridden correctly
+        copied = async_client.copy(max_retries=7)
+        assert copied.max_retries == 7
+        assert async_client.max_retries == 2
+
+        copied2 = copied.copy(max_retries=6)
+        assert copied2.max_retries == 6
+        assert copied.max_retries == 7
+
+        # timeout
+        assert isinstance(async_client.timeout, httpx.Timeout)
+        copied = async_client.copy(timeout=None)
+        assert copied.timeout is None
+        assert isinstance(async_client.timeout, httpx.Timeout)
+
+    async def test_copy_default_headers(self) -> None:
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_headers={"X-Foo": "bar"}
+        )
+        assert client.default_headers["X-Foo"] == "bar"
+
+        # does not override the already given value when not specified
+        copied = client.copy()
+        assert copied.default_headers["X-Foo"] == "bar"
+
+        # merges already given headers
+        copied = client.copy(default_headers={"X-Bar": "stainless"})
+        assert copied.default_headers["X-Foo"] == "bar"
+        assert copied.default_headers["X-Bar"] == "stainless"
+
+        # uses new values for any already given headers
+        copied = client.copy(default_headers={"X-Foo": "stainless"})
+        assert copied.default_headers["X-Foo"] == "stainless"
+
+        # set_default_headers
+
+        # completely overrides already set values
+        copied = client.copy(set_default_headers={})
+        assert copied.default_headers.get("X-Foo") is None
+
+        copied = client.copy(set_default_headers={"X-Bar": "Robert"})
+        assert copied.default_headers["X-Bar"] == "Robert"
+
+        with pytest.raises(
+            ValueError,
+            match="`default_headers` and `set_default_headers` arguments are mutually exclusive",
+        ):
+            client.copy(set_default_headers={}, default_headers={"X-Foo": "Bar"})
+        await client.close()
+
+    async def test_copy_default_query(self) -> None:
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_query={"foo": "bar"}
+        )
+        assert _get_params(client)["foo"] == "bar"
+
+        # does not override the already given value when not specified
+        copied = client.copy()
+        assert _get_params(copied)["foo"] == "bar"
+
+        # merges already given params
+        copied = client.copy(default_query={"bar": "stainless"})
+        params = _get_params(copied)
+        assert params["foo"] == "bar"
+        assert params["bar"] == "stainless"
+
+        # uses new values for any already given headers
+        copied = client.copy(default_query={"foo": "stainless"})
+        assert _get_params(copied)["foo"] == "stainless"
+
+        # set_default_query
+
+        # completely overrides already set values
+        copied = client.copy(set_default_query={})
+        assert _get_params(copied) == {}
+
+        copied = client.copy(set_default_query={"bar": "Robert"})
+        assert _get_params(copied)["bar"] == "Robert"
+
+        with pytest.raises(
+            ValueError,
+            # TODO: update
+            match="`default_query` and `set_default_query` arguments are mutually exclusive",
+        ):
+            client.copy(set_default_query={}, default_query={"foo": "Bar"})
+
+        await client.close()
+
+    def test_copy_signature(self, async_client: AsyncChannel3) -> None:
+        # ensure the same parameters that can be passed to the client are defined in the `.copy()` method
+        init_signature = inspect.signature(
+            # mypy doesn't like that we access the `__init__` property.
+            async_client.__init__,  # type: ignore[misc]
+        )
+        copy_signature = inspect.signature(async_client.copy)
+        exclude_params = {"transport", "proxies", "_strict_response_validation"}
+
+        for name in init_signature.parameters.keys():
+            if name in exclude_params:
+                continue
+
+            copy_param = copy_signature.parameters.get(name)
+            assert copy_param is not None, f"copy() signature is missing the {name} param"
+
+    @pytest.mark.skipif(sys.version_info >= (3, 10), reason="fails because of a memory leak that started from 3.12")
+    def test_copy_build_request(self, async_client: AsyncChannel3) -> None:
+        options = FinalRequestOptions(method="get", url="/foo")
+
+        def build_request(options: FinalRequestOptions) -> None:
+            client_copy = async_client.copy()
+            client_copy._build_request(options)
+
+        # ensure that the machinery is warmed up before tracing starts.
+        build_request(options)
+        gc.collect()
+
+        tracemalloc.start(1000)
+
+        snapshot_before = tracemalloc.take_snapshot()
+
+        ITERATIONS = 10
+        for _ in range(ITERATIONS):
+            build_request(options)
+
+        gc.collect()
+        snapshot_after = tracemalloc.take_snapshot()
+
+        tracemalloc.stop()
+
+        def add_leak(leaks: list[tracemalloc.StatisticDiff], diff: tracemalloc.StatisticDiff) -> None:
+            if diff.count == 0:
+                # Avoid false positives by considering only leaks (i.e. allocations that persist).
+                return
+
+            if diff.count % ITERATIONS != 0:
+                # Avoid false positives by considering only leaks that appear per iteration.
+                return
+
+            for frame in diff.traceback:
+                if any(
+                    frame.filename.endswith(fragment)
+                    for fragment in [
+                        # to_raw_response_wrapper leaks through the @functools.wraps() decorator.
+                        #
+                        # removing the decorator fixes the leak for reasons we don't understand.
+                        "channel3_sdk/_legacy_response.py",
+                        "channel3_sdk/_response.py",
+                        # pydantic.BaseModel.model_dump || pydantic.BaseModel.dict leak memory for some reason.
+                        "channel3_sdk/_compat.py",
+                        # Standard library leaks we don't care about.
+                        "/logging/__init__.py",
+                    ]
+                ):
+                    return
+
+            leaks.append(diff)
+
+        leaks: list[tracemalloc.StatisticDiff] = []
+        for diff in snapshot_after.compare_to(snapshot_before, "traceback"):
+            add_leak(leaks, diff)
+        if leaks:
+            for leak in leaks:
+                print("MEMORY LEAK:", leak)
+                for frame in leak.traceback:
+                    print(frame)
+            raise AssertionError()
+
+    async def test_request_timeout(self, async_client: AsyncChannel3) -> None:
+        request = async_client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+        assert timeout == DEFAULT_TIMEOUT
+
+        request = async_client._build_request(
+            FinalRequestOptions(method="get", url="/foo", timeout=httpx.Timeout(100.0))
+        )
+        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+        assert timeout == httpx.Timeout(100.0)
+
+    async def test_client_timeout_option(self) -> None:
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, timeout=httpx.Timeout(0)
+        )
+
+        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+        assert timeout == httpx.Timeout(0)
+
+        await client.close()
+
+    async def test_http_client_timeout_option(self) -> None:
+        # custom timeout given to the httpx client should be used
+        async with httpx.AsyncClient(timeout=None) as http_client:
+            client = AsyncChannel3(
+                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
+            )
+
+            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+            assert timeout == httpx.Timeout(None)
+
+            await client.close()
+
+        # no timeout given to the httpx client should not use the httpx default
+        async with httpx.AsyncClient() as http_client:
+            client = AsyncChannel3(
+                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
+            )
+
+            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+            assert timeout == DEFAULT_TIMEOUT
+
+            await client.close()
+
+        # explicitly passing the default timeout currently results in it being ignored
+        async with httpx.AsyncClient(timeout=HTTPX_DEFAULT_TIMEOUT) as http_client:
+            client = AsyncChannel3(
+                base_url=base_url, api_key=api_key, _strict_response_validation=True, http_client=http_client
+            )
+
+            request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+            timeout = httpx.Timeout(**request.extensions["timeout"])  # type: ignore
+            assert timeout == DEFAULT_TIMEOUT  # our default
+
+            await client.close()
+
+    def test_invalid_http_client(self) -> None:
+        with pytest.raises(TypeError, match="Invalid `http_client` arg"):
+            with httpx.Client() as http_client:
+                AsyncChannel3(
+                    base_url=base_url,
+                    api_key=api_key,
+                    _strict_response_validation=True,
+                    http_client=cast(Any, http_client),
+                )
+
+    async def test_default_headers_option(self) -> None:
+        test_client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_headers={"X-Foo": "bar"}
+        )
+        request = test_client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        assert request.headers.get("x-foo") == "bar"
+        assert request.headers.get("x-stainless-lang") == "python"
+
+        test_client2 = AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            default_headers={
+                "X-Foo": "stainless",
+                "X-Stainless-Lang": "my-overriding-header",
+            },
+        )
+        request = test_client2._build_request(FinalRequestOptions(method="get", url="/foo"))
+        assert request.headers.get("x-foo") == "stainless"
+        assert request.headers.get("x-stainless-lang") == "my-overriding-header"
+
+        await test_client.close()
+        await test_client2.close()
+
+    def test_validate_headers(self) -> None:
+        client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
+        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        assert request.headers.get("x-api-key") == api_key
+
+        with pytest.raises(Channel3Error):
+            with update_env(**{"CHANNEL3_API_KEY": Omit()}):
+                client2 = AsyncChannel3(base_url=base_url, api_key=None, _strict_response_validation=True)
+            _ = client2
+
+    async def test_default_query_option(self) -> None:
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, default_query={"query_param": "bar"}
+        )
+        request = client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        url = httpx.URL(request.url)
+        assert dict(url.params) == {"query_param": "bar"}
+
+        request = client._build_request(
+            FinalRequestOptions(
+                method="get",
+                url="/foo",
+                params={"foo": "baz", "query_param": "overridden"},
+            )
+        )
+        url = httpx.URL(request.url)
+        assert dict(url.params) == {"foo": "baz", "query_param": "overridden"}
+
+        await client.close()
+
+    async def test_hardcoded_query_params_in_url(self, async_client: AsyncChannel3) -> None:
+        request = async_client._build_request(FinalRequestOptions(method="get", url="/foo?beta=true"))
+        url = httpx.URL(request.url)
+        assert dict(url.params) == {"beta": "true"}
+
+        request = async_client._build_request(
+            FinalRequestOptions(
+                method="get",
+                url="/foo?beta=true",
+                params={"limit": "10", "page": "abc"},
+            )
+        )
+        url = httpx.URL(request.url)
+        assert dict(url.params) == {"beta": "true", "limit": "10", "page": "abc"}
+
+        request = async_client._build_request(
+            FinalRequestOptions(
+                method="get",
+                url="/files/a%2Fb?beta=true",
+                params={"limit": "10"},
+            )
+        )
+        assert request.url.raw_path == b"/files/a%2Fb?beta=true&limit=10"
+
+    def test_request_extra_json(self, client: Channel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                json_data={"foo": "bar"},
+                extra_json={"baz": False},
+            ),
+        )
+        data = json.loads(request.content.decode("utf-8"))
+        assert data == {"foo": "bar", "baz": False}
+
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                extra_json={"baz": False},
+            ),
+        )
+        data = json.loads(request.content.decode("utf-8"))
+        assert data == {"baz": False}
+
+        # `extra_json` takes priority over `json_data` when keys clash
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                json_data={"foo": "bar", "baz": True},
+                extra_json={"baz": None},
+            ),
+        )
+        data = json.loads(request.content.decode("utf-8"))
+        assert data == {"foo": "bar", "baz": None}
+
+    def test_request_extra_headers(self, client: Channel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                **make_request_options(extra_headers={"X-Foo": "Foo"}),
+            ),
+        )
+        assert request.headers.get("X-Foo") == "Foo"
+
+        # `extra_headers` takes priority over `default_headers` when keys clash
+        request = client.with_options(default_headers={"X-Bar": "true"})._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                **make_request_options(
+                    extra_headers={"X-Bar": "false"},
+                ),
+            ),
+        )
+        assert request.headers.get("X-Bar") == "false"
+
+    def test_request_extra_query(self, client: Channel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                **make_request_options(
+                    extra_query={"my_query_param": "Foo"},
+                ),
+            ),
+        )
+        params = dict(request.url.params)
+        assert params == {"my_query_param": "Foo"}
 
         # if both `query` and `extra_query` are given, they are merged
         request = client._build_request(
@@ -1428,463 +2442,1447 @@ class TestAsyncChannel3:
         request = client._build_request(
             FinalRequestOptions(
                 method="post",
-                url="/foo",
-                **make_request_options(
-                    query={"foo": "1"},
-                    extra_query={"foo": "2"},
-                ),
+                url="/foo",
+                **make_request_options(
+                    query={"foo": "1"},
+                    extra_query={"foo": "2"},
+                ),
+            ),
+        )
+        params = dict(request.url.params)
+        assert params == {"foo": "2"}
+
+    def test_multipart_repeating_array(self, async_client: AsyncChannel3) -> None:
+        request = async_client._build_request(
+            FinalRequestOptions.construct(
+                method="post",
+                url="/foo",
+                headers={"Content-Type": "multipart/form-data; boundary=6b7ba517decee4a450543ea6ae821c82"},
+                json_data={"array": ["foo", "bar"]},
+                files=[("foo.txt", b"hello world")],
+            )
+        )
+
+        assert request.read().split(b"\r\n") == [
+            b"--6b7ba517decee4a450543ea6ae821c82",
+            b'Content-Disposition: form-data; name="array[]"',
+            b"",
+            b"foo",
+            b"--6b7ba517decee4a450543ea6ae821c82",
+            b'Content-Disposition: form-data; name="array[]"',
+            b"",
+            b"bar",
+            b"--6b7ba517decee4a450543ea6ae821c82",
+            b'Content-Disposition: form-data; name="foo.txt"; filename="upload"',
+            b"Content-Type: application/octet-stream",
+            b"",
+            b"hello world",
+            b"--6b7ba517decee4a450543ea6ae821c82--",
+            b"",
+        ]
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_binary_content_upload(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        respx_mock.post("/upload").mock(side_effect=mirror_request_content)
+
+        file_content = b"Hello, this is a test file."
+
+        response = await async_client.post(
+            "/upload",
+            content=file_content,
+            cast_to=httpx.Response,
+            options={"headers": {"Content-Type": "application/octet-stream"}},
+        )
+
+        assert response.status_code == 200
+        assert response.request.headers["Content-Type"] == "application/octet-stream"
+        assert response.content == file_content
+
+    async def test_binary_content_upload_with_asynciterator(self) -> None:
+        file_content = b"Hello, this is a test file."
+        counter = Counter()
+        iterator = _make_async_iterator([file_content], counter=counter)
+
+        async def mock_handler(request: httpx.Request) -> httpx.Response:
+            assert counter.value == 0, "the request body should not have been read"
+            return httpx.Response(200, content=await request.aread())
+
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=mock_handler)),
+        ) as client:
+            response = await client.post(
+                "/upload",
+                content=iterator,
+                cast_to=httpx.Response,
+                options={"headers": {"Content-Type": "application/octet-stream"}},
+            )
+
+            assert response.status_code == 200
+            assert response.request.headers["Content-Type"] == "application/octet-stream"
+            assert response.content == file_content
+            assert counter.value == 1
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_binary_content_upload_with_body_is_deprecated(
+        self, respx_mock: MockRouter, async_client: AsyncChannel3
+    ) -> None:
+        respx_mock.post("/upload").mock(side_effect=mirror_request_content)
+
+        file_content = b"Hello, this is a test file."
+
+        with pytest.deprecated_call(
+            match="Passing raw bytes as `body` is deprecated and will be removed in a future version. Please pass raw bytes via the `content` parameter instead."
+        ):
+            response = await async_client.post(
+                "/upload",
+                body=file_content,
+                cast_to=httpx.Response,
+                options={"headers": {"Content-Type": "application/octet-stream"}},
+            )
+
+        assert response.status_code == 200
+        assert response.request.headers["Content-Type"] == "application/octet-stream"
+        assert response.content == file_content
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_basic_union_response(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        class Model1(BaseModel):
+            name: str
+
+        class Model2(BaseModel):
+            foo: str
+
+        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+
+        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
+        assert isinstance(response, Model2)
+        assert response.foo == "bar"
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_union_response_different_types(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        """Union of objects with the same field name using a different type"""
+
+        class Model1(BaseModel):
+            foo: int
+
+        class Model2(BaseModel):
+            foo: str
+
+        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+
+        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
+        assert isinstance(response, Model2)
+        assert response.foo == "bar"
+
+        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": 1}))
+
+        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
+        assert isinstance(response, Model1)
+        assert response.foo == 1
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_non_application_json_content_type_for_json_data(
+        self, respx_mock: MockRouter, async_client: AsyncChannel3
+    ) -> None:
+        """
+        Response that sets Content-Type to something other than application/json but returns json data
+        """
+
+        class Model(BaseModel):
+            foo: int
+
+        respx_mock.get("/foo").mock(
+            return_value=httpx.Response(
+                200,
+                content=json.dumps({"foo": 2}),
+                headers={"Content-Type": "application/text"},
+            )
+        )
+
+        response = await async_client.get("/foo", cast_to=Model)
+        assert isinstance(response, Model)
+        assert response.foo == 2
+
+    async def test_base_url_setter(self) -> None:
+        client = AsyncChannel3(
+            base_url="https://example.com/from_init", api_key=api_key, _strict_response_validation=True
+        )
+        assert client.base_url == "https://example.com/from_init/"
+
+        client.base_url = "https://example.com/from_setter"  # type: ignore[assignment]
+
+        assert client.base_url == "https://example.com/from_setter/"
+
+        await client.close()
+
+    async def test_base_url_env(self) -> None:
+        with update_env(CHANNEL3_BASE_URL="http://localhost:5000/from/env"):
+            client = AsyncChannel3(api_key=api_key, _strict_response_validation=True)
+            assert client.base_url == "http://localhost:5000/from/env/"
+
+    @pytest.mark.parametrize(
+        "client",
+        [
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
+            ),
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/",
+                api_key=api_key,
+                _strict_response_validation=True,
+                http_client=httpx.AsyncClient(),
+            ),
+        ],
+        ids=["standard", "custom http client"],
+    )
+    async def test_base_url_trailing_slash(self, client: AsyncChannel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                json_data={"foo": "bar"},
+            ),
+        )
+        assert request.url == "http://localhost:5000/custom/path/foo"
+        await client.close()
+
+    @pytest.mark.parametrize(
+        "client",
+        [
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
+            ),
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/",
+                api_key=api_key,
+                _strict_response_validation=True,
+                http_client=httpx.AsyncClient(),
+            ),
+        ],
+        ids=["standard", "custom http client"],
+    )
+    async def test_base_url_no_trailing_slash(self, client: AsyncChannel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="/foo",
+                json_data={"foo": "bar"},
+            ),
+        )
+        assert request.url == "http://localhost:5000/custom/path/foo"
+        await client.close()
+
+    @pytest.mark.parametrize(
+        "client",
+        [
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
+            ),
+            AsyncChannel3(
+                base_url="http://localhost:5000/custom/path/",
+                api_key=api_key,
+                _strict_response_validation=True,
+                http_client=httpx.AsyncClient(),
+            ),
+        ],
+        ids=["standard", "custom http client"],
+    )
+    async def test_absolute_request_url(self, client: AsyncChannel3) -> None:
+        request = client._build_request(
+            FinalRequestOptions(
+                method="post",
+                url="https://myapi.com/foo",
+                json_data={"foo": "bar"},
             ),
         )
-        params = dict(request.url.params)
-        assert params == {"foo": "2"}
+        assert request.url == "https://myapi.com/foo"
+        await client.close()
+
+    async def test_copied_client_does_not_close_http(self) -> None:
+        test_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
+        assert not test_client.is_closed()
+
+        copied = test_client.copy()
+        assert copied is not test_client
+
+        del copied
+
+        await asyncio.sleep(0.2)
+        assert not test_client.is_closed()
+
+    async def test_client_context_manager(self) -> None:
+        test_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
+        async with test_client as c2:
+            assert c2 is test_client
+            assert not c2.is_closed()
+            assert not test_client.is_closed()
+        assert test_client.is_closed()
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_client_response_validation_error(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
+        class Model(BaseModel):
+            foo: str
+
+        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": {"invalid": True}}))
+
+        with pytest.raises(APIResponseValidationError) as exc:
+            await async_client.get("/foo", cast_to=Model)
+
+        assert isinstance(exc.value.__cause__, ValidationError)
+
+    async def test_client_max_retries_validation(self) -> None:
+        with pytest.raises(TypeError, match=r"max_retries cannot be None"):
+            AsyncChannel3(
+                base_url=base_url, api_key=api_key, _strict_response_validation=True, max_retries=cast(Any, None)
+            )
+
+    @pytest.mark.respx(base_url=base_url)
+    async def test_received_text_for_expected_json(self, respx_mock: MockRouter) -> None:
+        class Model(BaseModel):
+            name: str
+
+        respx_mock.get("/foo").mock(return_value=httpx.Response(200, text="my-custom-format"))
+
+        strict_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
+
+        with pytest.raises(APIResponseValidationError):
+            await strict_client.get("/foo", cast_to=Model)
+
+        non_strict_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=False)
+
+        response = await non_strict_client.get("/foo", cast_to=Model)
+        assert isinstance(response, str)  # type: ignore[unreachable]
+
+        await strict_client.close()
+        await non_strict_client.close()
+
+    @pytest.mark.parametrize(
+        "remaining_retries,retry_after,timeout",
+        [
+            [3, "20", 20],
+            [3, "0", 0.5],
+            [3, "-10", 0.5],
+            [3, "60", 60],
+            [3, "61", 0.5],
+            [3, "Fri, 29 Sep 2023 16:26:57 GMT", 20],
+            [3, "Fri, 29 Sep 2023 16:26:37 GMT", 0.5],
+            [3, "Fri, 29 Sep 2023 16:26:27 GMT", 0.5],
+            [3, "Fri, 29 Sep 2023 16:27:37 GMT", 60],
+            [3, "Fri, 29 Sep 2023 16:27:38 GMT", 0.5],
+            [3, "99999999999999999999999999999999999", 0.5],
+            [3, "Zun, 29 Sep 2023 16:26:27 GMT", 0.5],
+            [3, "", 0.5],
+            [2, "", 0.5 * 2.0],
+            [1, "", 0.5 * 4.0],
+            [-1100, "", 8],  # test large number potentially overflowing
+        ],
+    )
+    @mock.patch("time.time", mock.MagicMock(return_value=1696004797))
+    async def test_parse_retry_after_header(
+        self, remaining_retries: int, retry_after: str, timeout: float, async_client: AsyncChannel3
+    ) -> None:
+        headers = httpx.Headers({"retry-after": retry_after})
+        options = FinalRequestOptions(method="get", url="/foo", max_retries=3)
+        calculated = async_client._calculate_retry_timeout(remaining_retries, options, headers)
+        assert calculated == pytest.approx(timeout, 0.5 * 0.875)  # pyright: ignore[reportUnknownMemberType]
+
+    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    @pytest.mark.respx(base_url=base_url)
+    @pytest.mark.parametrize("failure_mode", ["status", "exception"])
+    async def test_retries_taken(
+        self,
+        async_client: AsyncChannel3,
+        failures_before_success: int,
+        failure_mode: Literal["status", "exception"],
+        respx_mock: MockRouter,
+    ) -> None:
+        client = async_client.with_options(max_retries=4)
+
+        nb_retries = 0
+
+        def retry_handler(_request: httpx.Request) -> httpx.Response:
+            nonlocal nb_retries
+            if nb_retries < failures_before_success:
+                nb_retries += 1
+                if failure_mode == "exception":
+                    raise RuntimeError("oops")
+                return httpx.Response(500)
+            return httpx.Response(200)
+
+        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+
+        response = await client.products.with_raw_response.search()
+
+        assert response.retries_taken == failures_before_success
+        assert int(response.http_request.headers.get("x-stainless-retry-count")) == failures_before_success
+
+    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    @pytest.mark.respx(base_url=base_url)
+    async def test_omit_retry_count_header(
+        self, async_client: AsyncChannel3, failures_before_success: int, respx_mock: MockRouter
+    ) -> None:
+        client = async_client.with_options(max_retries=4)
+
+        nb_retries = 0
+
+        def retry_handler(_request: httpx.Request) -> httpx.Response:
+            nonlocal nb_retries
+            if nb_retries < failures_before_success:
+                nb_retries += 1
+                return httpx.Response(500)
+            return httpx.Response(200)
+
+        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+
+        response = await client.products.with_raw_response.search(extra_headers={"x-stainless-retry-count": Omit()})
+
+        assert len(response.http_request.headers.get_list("x-stainless-retry-count")) == 0
+
+    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    @pytest.mark.respx(base_url=base_url)
+    async def test_overwrite_retry_count_header(
+        self, async_client: AsyncChannel3, failures_before_success: int, respx_mock: MockRouter
+    ) -> None:
+        client = async_client.with_options(max_retries=4)
+
+        nb_retries = 0
+
+        def retry_handler(_request: httpx.Request) -> httpx.Response:
+            nonlocal nb_retries
+            if nb_retries < failures_before_success:
+                nb_retries += 1
+                return httpx.Response(500)
+            return httpx.Response(200)
+
+        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+
+        response = await client.products.with_raw_response.search(extra_headers={"x-stainless-retry-count": "42"})
+
+        assert response.http_request.headers.get("x-stainless-retry-count") == "42"
+
+    async def test_get_platform(self) -> None:
+        platform = await asyncify(get_platform)()
+        assert isinstance(platform, (str, OtherPlatform))
+
+    async def test_proxy_environment_variables(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Test that the proxy environment variables are set correctly
+        monkeypatch.setenv("HTTPS_PROXY", "https://example.org")
+        # Delete in case our environment has any proxy env vars set
+        monkeypatch.delenv("HTTP_PROXY", raising=False)
+        monkeypatch.delenv("ALL_PROXY", raising=False)
+        monkeypatch.delenv("NO_PROXY", raising=False)
+        monkeypatch.delenv("http_proxy", raising=False)
+        monkeypatch.delenv("https_proxy", raising=False)
+        monkeypatch.delenv("all_proxy", raising=False)
+        monkeypatch.delenv("no_proxy", raising=False)
+
+        client = DefaultAsyncHttpxClient()
+
+        mounts = tuple(client._mounts.items())
+        assert len(mounts) == 1
+        assert mounts[0][0].pattern == "https://"
+
+    @pytest.mark.filterwarnings("ignore:.*deprecated.*:DeprecationWarning")
+    async def test_default_client_creation(self) -> None:
+        # Ensure that the client can be initialized without any exceptions
+        DefaultAsyncHttpxClient(
+            verify=True,
+            cert=None,
+            trust_env=True,
+            http1=True,
+            http2=False,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+
+    async def test_http2_option(self) -> None:
+        pytest.importorskip("h2")
+
+        client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True, http2=True)
+        assert client.http2 is True
+        assert client._client._transport._pool._http2 is True  # type: ignore[attr-defined]
+
+        # copies share the connection pool unless the protocol changes
+        assert client.copy()._client is client._client
+        http1_copy = client.copy(http2=False)
+        assert http1_copy._client is not client._client
+        assert http1_copy._client._transport._pool._http2 is False  # type: ignore[attr-defined]
+
+        await http1_copy.close()
+        await client.close()
+
+    async def test_http2_falls_back_without_h2(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # `None` entries in `sys.modules` make the import raise an `ImportError`
+        monkeypatch.setitem(sys.modules, "h2", None)
+
+        client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True, http2=True)
+        assert client.http2 is False
+        assert client.copy()._client is client._client
+        assert client._client._transport._pool._http1 is True  # type: ignore[attr-defined]
+        assert client._client._transport._pool._http2 is False  # type: ignore[attr-defined]
+
+        await client.close()
+
+    async def test_hedging(self) -> None:
+        calls = Counter()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            if calls.value == 1:
+                # the original request is stuck, e.g. on a slow backend
+                await asyncio.sleep(0.5)
+                return httpx.Response(200, json={"attempt": "original"})
+            assert request.headers["x-stainless-retry-count"] == "0"
+            return httpx.Response(200, json={"attempt": "hedge"})
+
+        policy = HedgingPolicy(delay=0.05, max_ratio=1)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            hedging=policy,
+        ) as client:
+            response = await client.get("/v1/products/prod_1", cast_to=httpx.Response)
+            assert response.json() == {"attempt": "hedge"}
+            assert calls.value == 2
+
+            # copies share the policy
+            assert client.copy().hedging is policy
+
+        stats = policy.stats()
+        assert stats.requests == 1
+        assert stats.hedged == 1
+        assert stats.wins == 1
+
+    async def test_hedging_budget(self) -> None:
+        calls = Counter()
+
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={})
+
+        policy = HedgingPolicy(delay=0, max_ratio=0)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            hedging=policy,
+        ) as client:
+            await client.get("/v1/products/prod_1", cast_to=httpx.Response)
+            # only `GET` requests are hedged
+            await client.post("/v1/search", cast_to=httpx.Response)
+
+        assert calls.value == 2
+        assert policy.stats() == HedgingStats(requests=1, skipped=1)
+
+    async def test_rate_limiter(self) -> None:
+        calls = Counter()
+
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            if calls.value == 1:
+                return httpx.Response(429, headers={"retry-after-ms": "10"})
+            return httpx.Response(200, json={})
+
+        limiter = RateLimiter()
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            rate_limiter=limiter,
+        ) as client:
+            # the rate limited request is re-sent without needing any retries
+            response = await client.get("/foo", cast_to=httpx.Response)
+            assert response.status_code == 200
+            assert calls.value == 2
+
+            assert client.copy().rate_limiter is limiter
+
+        stats = limiter.stats()
+        assert stats.rate_limited == 1
+        assert stats.rate is not None
+        assert stats.delayed == 1
+        assert stats.delay_total > 0
 
-    def test_multipart_repeating_array(self, async_client: AsyncChannel3) -> None:
-        request = async_client._build_request(
-            FinalRequestOptions.construct(
-                method="post",
-                url="/foo",
-                headers={"Content-Type": "multipart/form-data; boundary=6b7ba517decee4a450543ea6ae821c82"},
-                json_data={"array": ["foo", "bar"]},
-                files=[("foo.txt", b"hello world")],
-            )
-        )
+    async def test_rate_limiter_max_attempts(self) -> None:
+        calls = Counter()
 
-        assert request.read().split(b"\r\n") == [
-            b"--6b7ba517decee4a450543ea6ae821c82",
-            b'Content-Disposition: form-data; name="array[]"',
-            b"",
-            b"foo",
-            b"--6b7ba517decee4a450543ea6ae821c82",
-            b'Content-Disposition: form-data; name="array[]"',
-            b"",
-            b"bar",
-            b"--6b7ba517decee4a450543ea6ae821c82",
-            b'Content-Disposition: form-data; name="foo.txt"; filename="upload"',
-            b"Content-Type: application/octet-stream",
-            b"",
-            b"hello world",
-            b"--6b7ba517decee4a450543ea6ae821c82--",
-            b"",
-        ]
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(429, headers={"retry-after-ms": "1"})
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_binary_content_upload(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        respx_mock.post("/upload").mock(side_effect=mirror_request_content)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            rate_limiter=RateLimiter(max_attempts=2, min_rate=1000),
+        ) as client:
+            with pytest.raises(RateLimitError):
+                await client.get("/foo", cast_to=httpx.Response)
 
-        file_content = b"Hello, this is a test file."
+        assert calls.value == 3
 
-        response = await async_client.post(
-            "/upload",
-            content=file_content,
-            cast_to=httpx.Response,
-            options={"headers": {"Content-Type": "application/octet-stream"}},
-        )
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    async def test_retry_budget(self) -> None:
+        calls = Counter()
 
-        assert response.status_code == 200
-        assert response.request.headers["Content-Type"] == "application/octet-stream"
-        assert response.content == file_content
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(503)
 
-    async def test_binary_content_upload_with_asynciterator(self) -> None:
-        file_content = b"Hello, this is a test file."
-        counter = Counter()
-        iterator = _make_async_iterator([file_content], counter=counter)
+        budget = RetryBudget(ratio=0, min_retries=3)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=2,
+            retry_budget=budget,
+        ) as client:
+            with pytest.raises(APIStatusError):
+                await client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 3
 
-        async def mock_handler(request: httpx.Request) -> httpx.Response:
-            assert counter.value == 0, "the request body should not have been read"
-            return httpx.Response(200, content=await request.aread())
+            # only one retry is left in the budget
+            with pytest.raises(APIStatusError):
+                await client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 5
+
+            assert client.copy().retry_budget is budget
+
+        stats = budget.stats()
+        assert stats.requests == 2
+        assert stats.retries == 3
+        assert stats.exhausted == 1
 
+    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
+    async def test_circuit_breaker(self) -> None:
+        calls = Counter()
+        healthy = False
+
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(200, json={}) if healthy else httpx.Response(500)
+
+        changes: list[tuple[str, CircuitState, CircuitState]] = []
+        breaker = CircuitBreaker(
+            failure_threshold=2,
+            recovery_time=5,
+            on_state_change=lambda endpoint, previous, state: changes.append((endpoint, previous, state)),
+        )
         async with AsyncChannel3(
             base_url=base_url,
             api_key=api_key,
             _strict_response_validation=True,
-            http_client=httpx.AsyncClient(transport=MockTransport(handler=mock_handler)),
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=3,
+            circuit_breaker=breaker,
         ) as client:
-            response = await client.post(
-                "/upload",
-                content=iterator,
-                cast_to=httpx.Response,
-                options={"headers": {"Content-Type": "application/octet-stream"}},
-            )
+            # the second failure opens the circuit, so the remaining retries fail fast
+            with pytest.raises(CircuitOpenError) as exc_info:
+                await client.get("/products/prod_1", cast_to=httpx.Response)
+            assert calls.value == 2
+            assert exc_info.value.endpoint == "GET /products/prod_1"
+            assert 0 < exc_info.value.retry_after <= 5
+
+            # other endpoints are unaffected
+            healthy = True
+            await client.get("/brands", cast_to=httpx.Response)
+            assert calls.value == 3
+
+            # pretend the recovery time has passed
+            breaker._circuits["GET /products/prod_1"].opened_at -= 5
+            await client.get("/products/prod_1", cast_to=httpx.Response)
+            assert calls.value == 4
+            assert breaker.state("GET /products/prod_1") == "closed"
+
+            assert client.copy().circuit_breaker is breaker
+
+        assert changes == [
+            ("GET /products/prod_1", "closed", "open"),
+            ("GET /products/prod_1", "open", "half_open"),
+            ("GET /products/prod_1", "half_open", "closed"),
+        ]
 
-            assert response.status_code == 200
-            assert response.request.headers["Content-Type"] == "application/octet-stream"
-            assert response.content == file_content
-            assert counter.value == 1
+    async def test_circuit_breaker_cancelled_probe(self) -> None:
+        calls = Counter()
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_binary_content_upload_with_body_is_deprecated(
-        self, respx_mock: MockRouter, async_client: AsyncChannel3
-    ) -> None:
-        respx_mock.post("/upload").mock(side_effect=mirror_request_content)
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            if calls.value == 2:
+                # the trial request hangs until it's cancelled
+                await asyncio.sleep(10)
+            return httpx.Response(500) if calls.value == 1 else httpx.Response(200, json={})
 
-        file_content = b"Hello, this is a test file."
+        breaker = CircuitBreaker(failure_threshold=1, recovery_time=5)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            circuit_breaker=breaker,
+        ) as client:
+            with pytest.raises(InternalServerError):
+                await client.get("/products/prod_1", cast_to=httpx.Response)
+            assert breaker.state("GET /products/prod_1") == "open"
 
-        with pytest.deprecated_call(
-            match="Passing raw bytes as `body` is deprecated and will be removed in a future version. Please pass raw bytes via the `content` parameter instead."
-        ):
-            response = await async_client.post(
-                "/upload",
-                body=file_content,
-                cast_to=httpx.Response,
-                options={"headers": {"Content-Type": "application/octet-stream"}},
-            )
+            breaker._circuits["GET /products/prod_1"].opened_at -= 5
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.get("/products/prod_1", cast_to=httpx.Response), timeout=0.1)
+            assert breaker.state("GET /products/prod_1") == "half_open"
 
-        assert response.status_code == 200
-        assert response.request.headers["Content-Type"] == "application/octet-stream"
-        assert response.content == file_content
+            # the cancelled trial request gave back its slot
+            await client.get("/products/prod_1", cast_to=httpx.Response)
+            assert calls.value == 3
+            assert breaker.state("GET /products/prod_1") == "closed"
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_basic_union_response(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        class Model1(BaseModel):
-            name: str
+    async def test_deadline_stops_retries(self) -> None:
+        calls = Counter()
 
-        class Model2(BaseModel):
-            foo: str
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(500, headers={"retry-after-ms": "100"})
 
-        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=5,
+            deadline=0.15,
+        ) as client:
+            # the second retry would only start after the deadline
+            with pytest.raises(InternalServerError):
+                await client.get("/foo", cast_to=httpx.Response)
+            assert calls.value == 2
 
-        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
-        assert isinstance(response, Model2)
-        assert response.foo == "bar"
+            calls.value = 0
+            with pytest.raises(APITimeoutError):
+                await client.with_options(deadline=0).get("/foo", cast_to=httpx.Response)
+            assert calls.value == 0
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_union_response_different_types(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        """Union of objects with the same field name using a different type"""
+    async def test_deadline_caps_rate_limiter_delay(self) -> None:
+        calls = Counter()
 
-        class Model1(BaseModel):
-            foo: int
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(429, headers={"retry-after": "5"})
 
-        class Model2(BaseModel):
-            foo: str
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            max_retries=0,
+            deadline=0.5,
+            rate_limiter=RateLimiter(),
+        ) as client:
+            started_at = time.monotonic()
+            # waiting out the `retry-after` would pass the deadline
+            with pytest.raises(APITimeoutError):
+                await client.get("/foo", cast_to=httpx.Response)
+            assert time.monotonic() - started_at < 0.5
+            assert calls.value == 1
 
-        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": "bar"}))
+    async def test_deadline_shrinks_timeout(self) -> None:
+        requests: list[httpx.Request] = []
 
-        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
-        assert isinstance(response, Model2)
-        assert response.foo == "bar"
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={})
 
-        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": 1}))
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            timeout=httpx.Timeout(60, connect=1),
+        ) as client:
+            await client.get("/foo", cast_to=httpx.Response, options={"deadline": 5})
+            await client.get("/foo", cast_to=httpx.Response)
 
-        response = await async_client.get("/foo", cast_to=cast(Any, Union[Model1, Model2]))
-        assert isinstance(response, Model1)
-        assert response.foo == 1
+        assert 4 < float(requests[0].headers["x-stainless-read-timeout"]) <= 5
+        timeout = requests[0].extensions["timeout"]
+        assert timeout["connect"] == 1
+        assert 4 < timeout["read"] <= 5
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_non_application_json_content_type_for_json_data(
-        self, respx_mock: MockRouter, async_client: AsyncChannel3
-    ) -> None:
-        """
-        Response that sets Content-Type to something other than application/json but returns json data
-        """
+        assert requests[1].headers["x-stainless-read-timeout"] == "60"
 
-        class Model(BaseModel):
-            foo: int
+    async def test_deadline_spans_pages(self) -> None:
+        calls = Counter()
 
-        respx_mock.get("/foo").mock(
-            return_value=httpx.Response(
-                200,
-                content=json.dumps({"foo": 2}),
-                headers={"Content-Type": "application/text"},
-            )
-        )
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            return httpx.Response(200, json={"items": [{"id": calls.value}], "next_cursor": "next"})
 
-        response = await async_client.get("/foo", cast_to=Model)
-        assert isinstance(response, Model)
-        assert response.foo == 2
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            deadline=0.05,
+        ) as client:
+            page = await client.get_api_list("/items", model=object, page=AsyncCursorPage[object])
+            assert page.has_next_page()
 
-    async def test_base_url_setter(self) -> None:
-        client = AsyncChannel3(
-            base_url="https://example.com/from_init", api_key=api_key, _strict_response_validation=True
-        )
-        assert client.base_url == "https://example.com/from_init/"
+            await asyncio.sleep(0.1)
+            with pytest.raises(APITimeoutError):
+                await page.get_next_page()
+            assert calls.value == 1
 
-        client.base_url = "https://example.com/from_setter"  # type: ignore[assignment]
+    async def test_single_flight(self) -> None:
+        calls = Counter()
+        release = asyncio.Event()
 
-        assert client.base_url == "https://example.com/from_setter/"
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.value += 1
+            await release.wait()
+            return httpx.Response(200, json={"country": request.url.params["country"]})
 
-        await client.close()
+        single_flight = SingleFlight()
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            single_flight=single_flight,
+        ) as client:
 
-    async def test_base_url_env(self) -> None:
-        with update_env(CHANNEL3_BASE_URL="http://localhost:5000/from/env"):
-            client = AsyncChannel3(api_key=api_key, _strict_response_validation=True)
-            assert client.base_url == "http://localhost:5000/from/env/"
+            async def retrieve(country: str) -> object:
+                return await client.get("/products/prod_1", cast_to=object, options={"params": {"country": country}})
 
-    @pytest.mark.parametrize(
-        "client",
-        [
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
-            ),
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/",
-                api_key=api_key,
-                _strict_response_validation=True,
-                http_client=httpx.AsyncClient(),
-            ),
-        ],
-        ids=["standard", "custom http client"],
-    )
-    async def test_base_url_trailing_slash(self, client: AsyncChannel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                json_data={"foo": "bar"},
-            ),
-        )
-        assert request.url == "http://localhost:5000/custom/path/foo"
-        await client.close()
+            async def release_after_coalescing() -> None:
+                while single_flight.stats().coalesced < 2:
+                    await asyncio.sleep(0.01)
+                release.set()
 
-    @pytest.mark.parametrize(
-        "client",
-        [
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
-            ),
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/",
-                api_key=api_key,
-                _strict_response_validation=True,
-                http_client=httpx.AsyncClient(),
-            ),
-        ],
-        ids=["standard", "custom http client"],
-    )
-    async def test_base_url_no_trailing_slash(self, client: AsyncChannel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="/foo",
-                json_data={"foo": "bar"},
-            ),
-        )
-        assert request.url == "http://localhost:5000/custom/path/foo"
-        await client.close()
+            results = await asyncio.wait_for(
+                asyncio.gather(
+                    retrieve("US"), retrieve("US"), retrieve("US"), retrieve("GB"), release_after_coalescing()
+                ),
+                timeout=5,
+            )
 
-    @pytest.mark.parametrize(
-        "client",
-        [
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/", api_key=api_key, _strict_response_validation=True
-            ),
-            AsyncChannel3(
-                base_url="http://localhost:5000/custom/path/",
-                api_key=api_key,
-                _strict_response_validation=True,
-                http_client=httpx.AsyncClient(),
-            ),
-        ],
-        ids=["standard", "custom http client"],
-    )
-    async def test_absolute_request_url(self, client: AsyncChannel3) -> None:
-        request = client._build_request(
-            FinalRequestOptions(
-                method="post",
-                url="https://myapi.com/foo",
-                json_data={"foo": "bar"},
-            ),
-        )
-        assert request.url == "https://myapi.com/foo"
-        await client.close()
+            # requests that aren't in flight at the same time are sent separately
+            await client.get("/products/prod_1", cast_to=object, options={"params": {"country": "US"}})
+
+        assert calls.value == 3
+        assert results[0] is results[1] is results[2]
+        assert results[3] == {"country": "GB"}
+        assert single_flight.stats() == SingleFlightStats(requests=5, coalesced=2)
 
-    async def test_copied_client_does_not_close_http(self) -> None:
-        test_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
-        assert not test_client.is_closed()
+    async def test_response_cache(self) -> None:
+        requests: list[httpx.Request] = []
 
-        copied = test_client.copy()
-        assert copied is not test_client
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path.endswith("missing"):
+                return httpx.Response(404, json={"detail": "not found"})
+            return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1], "title": "Shoe"})
 
-        del copied
+        cache = MemoryCache(ttl=60)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            country="US",
+            response_cache=cache,
+        ) as client:
+            first = await client.products.retrieve("prod_1", currency="USD")
+            second = await client.products.retrieve("prod_1", currency="USD")
+            assert second == first
+            assert len(requests) == 1
+
+            # raw responses always come from the API
+            response = await client.products.with_raw_response.retrieve("prod_1", currency="USD")
+            assert (await response.parse()).id == "prod_1"
+            assert len(requests) == 2
+
+            # the locale, whether from the client or the params, is part of the key
+            await client.products.retrieve("prod_1", currency="EUR")
+            await client.with_options(country="GB").products.retrieve("prod_1", currency="USD")
+            assert len(requests) == 4
+
+            # bypassing the cache
+            await client.with_options(response_cache=None).products.retrieve("prod_1", currency="USD")
+            await client.products.retrieve("prod_1", currency="USD", extra_query={"foo": "bar"})
+            assert len(requests) == 6
+
+            # errors aren't cached
+            for _ in range(2):
+                with pytest.raises(NotFoundError):
+                    await client.products.retrieve("missing")
+            assert len(requests) == 8
+
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 5
+        assert stats.entries == 3
+
+    async def test_shared_response_cache(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path == "/v1/lookup":
+                return httpx.Response(200, json={"product": {"id": "prod_1", "title": "Shoe"}})
+            if request.url.path.startswith("/v1/brands/"):
+                return httpx.Response(200, json={"id": "brand_1", "name": "Nike"})
+            return httpx.Response(200, json={"has_children": False, "slug": "sofas", "title": "Sofas"})
+
+        async def make_calls(client: AsyncChannel3) -> None:
+            await client.products.lookup(url="https://example.com/shoe")
+            await client.brands.retrieve("brand_1")
+            await client.categories.retrieve("sofas")
+
+        # each client stands in for a separate worker process sharing the cache file
+        for _ in range(2):
+            async with AsyncChannel3(
+                base_url=base_url,
+                api_key=api_key,
+                _strict_response_validation=True,
+                http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+                response_cache=SQLiteCache(tmp_path / "cache.db"),
+            ) as client:
+                await make_calls(client)
+
+        assert len(requests) == 3
+
+    async def test_response_cache_revalidation(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+        version = {"etag": '"v1"', "title": "Shoe"}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == version["etag"]:
+                return httpx.Response(304, headers={"ETag": version["etag"]})
+            return httpx.Response(
+                200, json={"id": "prod_1", "title": version["title"]}, headers={"ETag": version["etag"]}
+            )
 
-        await asyncio.sleep(0.2)
-        assert not test_client.is_closed()
+        cache = MemoryCache(ttl=60)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            first = await client.products.retrieve("prod_1")
+            assert "If-None-Match" not in requests[-1].headers
 
-    async def test_client_context_manager(self) -> None:
-        test_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
-        async with test_client as c2:
-            assert c2 is test_client
-            assert not c2.is_closed()
-            assert not test_client.is_closed()
-        assert test_client.is_closed()
+            entry, expires_at = cache._entries[next(iter(cache._entries))]
+            cache._entries[next(iter(cache._entries))] = (entry, expires_at - 60)
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_client_response_validation_error(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
-        class Model(BaseModel):
-            foo: str
+            # the API confirms the cached response is up to date, so the model is re-used
+            second = await client.products.retrieve("prod_1")
+            assert second is first
+            assert requests[-1].headers["If-None-Match"] == '"v1"'
+            assert len(requests) == 2
 
-        respx_mock.get("/foo").mock(return_value=httpx.Response(200, json={"foo": {"invalid": True}}))
+            # and the entry is fresh again
+            await client.products.retrieve("prod_1")
+            assert len(requests) == 2
 
-        with pytest.raises(APIResponseValidationError) as exc:
-            await async_client.get("/foo", cast_to=Model)
+            version.update(etag='"v2"', title="Boot")
+            cache.clear()
+            assert (await client.products.retrieve("prod_1")).title == "Boot"
 
-        assert isinstance(exc.value.__cause__, ValidationError)
+        stats = cache.stats()
+        assert stats.revalidations == 1
+        assert stats.hits == 1
 
-    async def test_client_max_retries_validation(self) -> None:
-        with pytest.raises(TypeError, match=r"max_retries cannot be None"):
-            AsyncChannel3(
-                base_url=base_url, api_key=api_key, _strict_response_validation=True, max_retries=cast(Any, None)
-            )
+        # caches that don't keep models parse the cached body again
+        sqlite_cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            response_cache=sqlite_cache,
+        ) as client:
+            first = await client.products.retrieve("prod_1")
+            sqlite_cache._connection().execute("UPDATE entries SET expires_at = expires_at - 60")
 
-    @pytest.mark.respx(base_url=base_url)
-    async def test_received_text_for_expected_json(self, respx_mock: MockRouter) -> None:
-        class Model(BaseModel):
-            name: str
+            second = await client.products.retrieve("prod_1")
+            assert second == first
+            assert second is not first
+            assert requests[-1].headers["If-None-Match"] == '"v2"'
+            assert sqlite_cache.stats().revalidations == 1
 
-        respx_mock.get("/foo").mock(return_value=httpx.Response(200, text="my-custom-format"))
+    async def test_cache_is_namespaced_by_client(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
 
-        strict_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=True)
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"id": "prod_1", "title": request.url.host})
 
-        with pytest.raises(APIResponseValidationError):
-            await strict_client.get("/foo", cast_to=Model)
+        cache = SQLiteCache(tmp_path / "cache.db", ttl=60)
 
-        non_strict_client = AsyncChannel3(base_url=base_url, api_key=api_key, _strict_response_validation=False)
+        clients: list[AsyncChannel3] = []
 
-        response = await non_strict_client.get("/foo", cast_to=Model)
-        assert isinstance(response, str)  # type: ignore[unreachable]
+        def make_client(base_url: str, api_key: str) -> AsyncChannel3:
+            clients.append(
+                AsyncChannel3(
+                    base_url=base_url,
+                    api_key=api_key,
+                    _strict_response_validation=True,
+                    http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+                    response_cache=cache,
+                )
+            )
+            return clients[-1]
+
+        a = make_client("https://a.example", "k1")
+        b = make_client("https://b.example", "k2")
+        # clients for different environments or accounts don't see each other's entries
+        assert (await a.products.retrieve("prod_1")).title == "a.example"
+        assert (await b.products.retrieve("prod_1")).title == "b.example"
+        assert (await make_client("https://a.example", "k2").products.retrieve("prod_1")).title == "a.example"
+        assert len(requests) == 3
+
+        # while copies of a client share them
+        assert (await a.copy(timeout=5).products.retrieve("prod_1")).title == "a.example"
+        assert len(requests) == 3
+
+        # the API key isn't stored in the cache
+        keys = [key for (key,) in cache._connection().execute("SELECT key FROM entries")]
+        assert keys
+        assert not any("k1" in key or "k2" in key for key in keys)
+
+        for client in clients:
+            await client.close()
 
-        await strict_client.close()
-        await non_strict_client.close()
+    async def test_lookup_cache(self) -> None:
+        requests: list[httpx.Request] = []
 
-    @pytest.mark.parametrize(
-        "remaining_retries,retry_after,timeout",
-        [
-            [3, "20", 20],
-            [3, "0", 0.5],
-            [3, "-10", 0.5],
-            [3, "60", 60],
-            [3, "61", 0.5],
-            [3, "Fri, 29 Sep 2023 16:26:57 GMT", 20],
-            [3, "Fri, 29 Sep 2023 16:26:37 GMT", 0.5],
-            [3, "Fri, 29 Sep 2023 16:26:27 GMT", 0.5],
-            [3, "Fri, 29 Sep 2023 16:27:37 GMT", 60],
-            [3, "Fri, 29 Sep 2023 16:27:38 GMT", 0.5],
-            [3, "99999999999999999999999999999999999", 0.5],
-            [3, "Zun, 29 Sep 2023 16:26:27 GMT", 0.5],
-            [3, "", 0.5],
-            [2, "", 0.5 * 2.0],
-            [1, "", 0.5 * 4.0],
-            [-1100, "", 8],  # test large number potentially overflowing
-        ],
-    )
-    @mock.patch("time.time", mock.MagicMock(return_value=1696004797))
-    async def test_parse_retry_after_header(
-        self, remaining_retries: int, retry_after: str, timeout: float, async_client: AsyncChannel3
-    ) -> None:
-        headers = httpx.Headers({"retry-after": retry_after})
-        options = FinalRequestOptions(method="get", url="/foo", max_retries=3)
-        calculated = async_client._calculate_retry_timeout(remaining_retries, options, headers)
-        assert calculated == pytest.approx(timeout, 0.5 * 0.875)  # pyright: ignore[reportUnknownMemberType]
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"product": {"id": "prod_1", "title": "Shoe"}})
 
-    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
-    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
-    @pytest.mark.respx(base_url=base_url)
-    @pytest.mark.parametrize("failure_mode", ["status", "exception"])
-    async def test_retries_taken(
-        self,
-        async_client: AsyncChannel3,
-        failures_before_success: int,
-        failure_mode: Literal["status", "exception"],
-        respx_mock: MockRouter,
-    ) -> None:
-        client = async_client.with_options(max_retries=4)
+        cache = MemoryCache(ttl=24 * 3600)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            first = await client.products.lookup(url="https://Shop.Example.com/shoe?utm_source=newsletter")
+            assert json.loads(requests[0].content)["url"] == "https://Shop.Example.com/shoe?utm_source=newsletter"
+
+            # links to the same page share an entry
+            second = await client.products.lookup(url="https://shop.example.com/shoe#reviews")
+            assert second is first
+            assert len(requests) == 1
+
+            # and the product can be retrieved by its ID
+            product = await client.products.retrieve("prod_1")
+            assert product is first.product
+            assert len(requests) == 1
+
+            # pretend the lookup was made two hours ago
+            key = next(key for key in cache._entries if ":products.lookup:" in key)
+            entry, expires_at = cache._entries[key]
+            cache._entries[key] = (entry._replace(created_at=time.time() - 2 * 3600), expires_at)
+
+            await client.products.lookup(url="https://shop.example.com/shoe", max_staleness_hours=3)
+            assert len(requests) == 1
+
+            await client.products.lookup(url="https://shop.example.com/shoe", max_staleness_hours=1)
+            assert len(requests) == 2
+            assert json.loads(requests[1].content)["max_staleness_hours"] == 1
+
+    async def test_stale_while_revalidate(self) -> None:
+        requests: list[httpx.Request] = []
+        brand = {"id": "brand_1", "name": "Nike"}
+        refreshed = asyncio.Event()
+        refreshed.set()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await refreshed.wait()
+            return httpx.Response(200, json=brand)
+
+        cache = MemoryCache(ttl=60, stale_while_revalidate=3600)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+            response_cache=cache,
+        ) as client:
+            assert (await client.brands.retrieve("brand_1")).name == "Nike"
+
+            def expire(seconds: float) -> None:
+                for key, (entry, expires_at) in list(cache._entries.items()):
+                    cache._entries[key] = (entry, expires_at - seconds)
+
+            # the stale response is returned right away and refreshed in the background
+            brand["name"] = "Nike Inc."
+            refreshed.clear()
+            expire(61)
+            for _ in range(3):
+                assert (await client.brands.retrieve("brand_1")).name == "Nike"
+            refreshed.set()
+
+            deadline = time.monotonic() + 5
+            while (len(requests) < 2 or client._background_tasks) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            assert len(requests) == 2
+            assert requests[1].headers["X-Stainless-Retry-Count"] == "0"
+            assert (await client.brands.retrieve("brand_1")).name == "Nike Inc."
+
+            # past the window the call waits for a fresh response
+            brand["name"] = "Nike, Inc."
+            expire(60 + 3600)
+            assert (await client.brands.retrieve("brand_1")).name == "Nike, Inc."
+            assert len(requests) == 3
+
+        stats = cache.stats()
+        assert stats.stale_hits == 3
+        assert stats.misses == 2
+
+    async def test_retrieve_many(self) -> None:
+        requests: list[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            product_id = request.url.path.rsplit("/", 1)[-1]
+            if product_id == "prod_missing":
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(200, json={"id": product_id, "title": product_id.title()})
 
-        nb_retries = 0
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            products = await client.products.retrieve_many(
+                ["prod_2", "prod_missing", "prod_1", "prod_2"], max_concurrency=2, locale={"country": "GB"}
+            )
+            assert list(products) == ["prod_2", "prod_missing", "prod_1"]
+            assert isinstance(products["prod_1"], ProductDetail)
+            assert products["prod_1"].title == "Prod_1"
+            assert isinstance(products["prod_missing"], NotFoundError)
+            assert len(requests) == 3
+            assert all(request.url.params["country"] == "GB" for request in requests)
+
+            completed = {
+                product_id: product
+                async for product_id, product in client.products.retrieve_many(["prod_3", "prod_4"], as_completed=True)
+            }
+            assert sorted(completed) == ["prod_3", "prod_4"]
+
+            with pytest.raises(ValueError):
+                client.products.retrieve_many(["prod_1"], max_concurrency=0)
+
+    async def test_lookup_many(self) -> None:
+        requests: list[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            url = json.loads(request.content)["url"]
+            if "missing" in url:
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(200, json={"product": {"id": url.rsplit("/", 1)[-1], "title": "Shoe"}})
+
+        urls = [
+            "https://shop.example.com/shoe_1?utm_source=newsletter",
+            "https://Shop.Example.com/shoe_1#reviews",
+            "https://shop.example.com/missing",
+            "https://shop.example.com/shoe_2",
+        ]
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            results = {
+                url: result
+                async for url, result in client.products.lookup_many(
+                    iter(urls), max_concurrency=3, max_staleness_hours=1
+                )
+            }
+
+        assert list(sorted(results)) == sorted(urls)
+        first, second = results[urls[0]], results[urls[1]]
+        assert isinstance(first, LookupResponse)
+        assert first is second
+        assert isinstance(results[urls[2]], NotFoundError)
+        # the second link to the first page shared its lookup
+        assert len(requests) == 3
+        assert all(json.loads(request.content)["max_staleness_hours"] == 1 for request in requests)
+
+    async def test_enrich_url_many(self, tmp_path: Path) -> None:
+        requests: list[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            url = json.loads(request.content)["url"]
+            if "missing" in url:
+                return httpx.Response(404, json={"error": "not found"})
+            return httpx.Response(
+                200,
+                json={
+                    "id": url.rsplit("/", 1)[-1],
+                    "availability": "InStock",
+                    "price": {"currency": "USD", "price": 10.0},
+                    "title": "Shoe",
+                    "url": url,
+                },
+            )
 
-        def retry_handler(_request: httpx.Request) -> httpx.Response:
-            nonlocal nb_retries
-            if nb_retries < failures_before_success:
-                nb_retries += 1
-                if failure_mode == "exception":
-                    raise RuntimeError("oops")
-                return httpx.Response(500)
-            return httpx.Response(200)
+        urls = [
+            "https://shop.example.com/shoe_1",
+            "https://shop.example.com/missing",
+            "https://shop.example.com/shoe_2",
+        ]
+        checkpoint = tmp_path / "enriched.txt"
+        progress: list[BatchStats] = []
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            with pytest.warns(DeprecationWarning):
+                results = client.enrich.enrich_url_many(  # pyright: ignore[reportDeprecated]
+                    urls, checkpoint=checkpoint, on_progress=progress.append
+                )
+            enriched = {url: result async for url, result in results}
+
+            assert sorted(enriched) == sorted(urls)
+            assert isinstance(enriched[urls[1]], NotFoundError)
+            assert sorted(checkpoint.read_text().splitlines()) == [urls[0], urls[2]]
+            assert progress[-1].completed == 2
+            assert progress[-1].failed == 1
+            assert progress[-1].p50_latency is not None
+
+            # a restarted job only retries the URL that failed
+            with pytest.warns(DeprecationWarning):
+                results = client.enrich.enrich_url_many(  # pyright: ignore[reportDeprecated]
+                    urls, checkpoint=checkpoint, on_progress=progress.append
+                )
+            assert [url async for url, _ in results] == [urls[1]]
+            assert len(requests) == 4
+            assert progress[-1].skipped == 2
+
+    async def test_reconcile_price_tracking(self) -> None:
+        changes: list[tuple[str, str]] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/subscriptions"):
+                assert request.url.params["limit"] == "2"
+                if "cursor" not in request.url.params:
+                    items = [subscription("prod_1", "active"), subscription("prod_2", "active")]
+                    return httpx.Response(200, json={"items": items, "next_cursor": "page_2"})
+                items = [subscription("prod_3", "active"), subscription("prod_4", "cancelled")]
+                return httpx.Response(200, json={"items": items})
+
+            action = request.url.path.rsplit("/", 1)[-1]
+            canonical_product_id = json.loads(request.content)["canonical_product_id"]
+            changes.append((action, canonical_product_id))
+            if canonical_product_id == "prod_6":
+                return httpx.Response(400, json={"error": "unknown product"})
+            return httpx.Response(
+                200, json=subscription(canonical_product_id, "active" if action == "start" else "cancelled")
+            )
 
-        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+        def subscription(canonical_product_id: str, status: str) -> dict[str, str]:
+            return {
+                "canonical_product_id": canonical_product_id,
+                "created_at": "2024-01-01T00:00:00Z",
+                "subscription_status": status,
+            }
 
-        response = await client.products.with_raw_response.search()
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            report = await client.price_tracking.reconcile(
+                ["prod_2", "prod_3", "prod_5", "prod_6", "prod_5"], max_concurrency=2, page_size=2
+            )
 
-        assert response.retries_taken == failures_before_success
-        assert int(response.http_request.headers.get("x-stainless-retry-count")) == failures_before_success
+        assert report.desired == 4
+        assert report.active == 3
+        assert report.unchanged == 2
+        assert report.started == ["prod_5"]
+        assert report.stopped == ["prod_1"]
+        assert list(report.failed) == ["prod_6"]
+        assert isinstance(report.failed["prod_6"], BadRequestError)
+        assert sorted(changes) == [("start", "prod_5"), ("start", "prod_6"), ("stop", "prod_1")]
+
+    async def test_retrieve_history_many(self) -> None:
+        requested: list[str] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["days"] == "7"
+            canonical_product_id = request.url.path.rsplit("/", 1)[-1]
+            requested.append(canonical_product_id)
+            if canonical_product_id == "prod_3":
+                return httpx.Response(400, json={"error": "unknown product"})
+            history = [
+                {"currency": "USD", "price": 10.0, "timestamp": "2024-01-01T00:00:00Z"},
+                {"currency": "EUR", "price": 9.5, "timestamp": "2024-01-02T00:00:00Z"},
+            ]
+            return httpx.Response(
+                200,
+                json={
+                    "canonical_product_id": canonical_product_id,
+                    "history": history if canonical_product_id == "prod_1" else [],
+                    "statistics": {"currency": "USD", "current_price": 9.5, "current_status": "low"},
+                },
+            )
 
-    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
-    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
-    @pytest.mark.respx(base_url=base_url)
-    async def test_omit_retry_count_header(
-        self, async_client: AsyncChannel3, failures_before_success: int, respx_mock: MockRouter
-    ) -> None:
-        client = async_client.with_options(max_retries=4)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            columns = await client.price_tracking.retrieve_history_many(
+                ["prod_1", "prod_2", "prod_3", "prod_1"], days=7, max_concurrency=2
+            )
 
-        nb_retries = 0
+        assert sorted(requested) == ["prod_1", "prod_2", "prod_3"]
+        assert sorted(columns.product_ids) == ["prod_1", "prod_2"]
+        assert list(columns.failed) == ["prod_3"]
+        assert isinstance(columns.failed["prod_3"], BadRequestError)
+        assert len(columns) == 2
+        rows = columns.rows("prod_1")
+        assert list(columns.prices[rows]) == [10.0, 9.5]
+        assert list(columns.timestamps[rows]) == [1_704_067_200_000_000, 1_704_153_600_000_000]
+        assert [columns.currencies[code] for code in columns.currency_codes[rows]] == ["USD", "EUR"]
+        assert set(columns.product_index[rows]) == {columns.product_ids.index("prod_1")}
+        assert len(columns.prices[columns.rows("prod_2")]) == 0
+        assert columns.statistics["prod_2"].current_status == "low"
+
+    async def test_warmup(self) -> None:
+        methods: list[str] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            # simulate the events httpcore reports when it opens a new connection
+            trace = request.extensions["trace"]
+            await trace("connection.connect_tcp.started", {})
+            await trace("connection.connect_tcp.complete", {})
+            methods.append(request.method)
+            return httpx.Response(404)
 
-        def retry_handler(_request: httpx.Request) -> httpx.Response:
-            nonlocal nb_retries
-            if nb_retries < failures_before_success:
-                nb_retries += 1
-                return httpx.Response(500)
-            return httpx.Response(200)
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            result = await client.warmup(connections=3)
 
-        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+        assert methods == ["HEAD", "HEAD", "HEAD"]
+        assert result.failed == 0
+        assert result.dns is not None
+        assert len(result.connections) == 3
+        for connection in result.connections:
+            assert connection.connect is not None
+            assert connection.tls is None
+            assert connection.total >= connection.connect
 
-        response = await client.products.with_raw_response.search(extra_headers={"x-stainless-retry-count": Omit()})
+    async def test_warmup_failures(self) -> None:
+        async def handler(_request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused")
 
-        assert len(response.http_request.headers.get_list("x-stainless-retry-count")) == 0
+        async with AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            http_client=httpx.AsyncClient(transport=MockTransport(handler=handler)),
+        ) as client:
+            result = await client.warmup(connections=2)
+            assert result.failed == 2
+            assert result.connections == []
+
+            with pytest.raises(ValueError, match="at least 1"):
+                await client.warmup(connections=0)
 
-    @pytest.mark.parametrize("failures_before_success", [0, 2, 4])
-    @mock.patch("channel3_sdk._base_client.BaseClient._calculate_retry_timeout", _low_retry_timeout)
     @pytest.mark.respx(base_url=base_url)
-    async def test_overwrite_retry_count_header(
-        self, async_client: AsyncChannel3, failures_before_success: int, respx_mock: MockRouter
-    ) -> None:
-        client = async_client.with_options(max_retries=4)
+    async def test_request_compression(self, respx_mock: MockRouter) -> None:
+        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={}))
 
-        nb_retries = 0
+        client = AsyncChannel3(
+            base_url=base_url,
+            api_key=api_key,
+            _strict_response_validation=True,
+            request_compression="gzip",
+            request_compression_threshold=1024,
+        )
 
-        def retry_handler(_request: httpx.Request) -> httpx.Response:
-            nonlocal nb_retries
-            if nb_retries < failures_before_success:
-                nb_retries += 1
-                return httpx.Response(500)
-            return httpx.Response(200)
+        body = {"base64_image": "a" * 2048}
+        await client.post("/foo", body=body, cast_to=httpx.Response)
+        request = respx_mock.calls.last.request
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(request.content)) == body
 
-        respx_mock.post("/v1/search").mock(side_effect=retry_handler)
+        # small bodies are sent as-is
+        await client.post("/foo", body={"query": "shoes"}, cast_to=httpx.Response)
+        request = respx_mock.calls.last.request
+        assert "Content-Encoding" not in request.headers
+        assert json.loads(request.content) == {"query": "shoes"}
 
-        response = await client.products.with_raw_response.search(extra_headers={"x-stainless-retry-count": "42"})
+        # as are requests from a copy with compression disabled
+        await client.copy(request_compression=None).post("/foo", body=body, cast_to=httpx.Response)
+        assert "Content-Encoding" not in respx_mock.calls.last.request.headers
 
-        assert response.http_request.headers.get("x-stainless-retry-count") == "42"
+        await client.close()
 
-    async def test_get_platform(self) -> None:
-        platform = await asyncify(get_platform)()
-        assert isinstance(platform, (str, OtherPlatform))
+    @pytest.mark.respx(base_url=base_url)
+    async def test_request_compression_zstd(self, respx_mock: MockRouter) -> None:
+        zstandard = pytest.importorskip("zstandard")
+        respx_mock.post("/foo").mock(return_value=httpx.Response(200, json={}))
 
-    async def test_proxy_environment_variables(self, monkeypatch: pytest.MonkeyPatch) -> None:
-        # Test that the proxy environment variables are set correctly
-        monkeypatch.setenv("HTTPS_PROXY", "https://example.org")
-        # Delete in case our environment has any proxy env vars set
-        monkeypatch.delenv("HTTP_PROXY", raising=False)
-        monkeypatch.delenv("ALL_PROXY", raising=False)
-        monkeypatch.delenv("NO_PROXY", raising=False)
-        monkeypatch.delenv("http_proxy", raising=False)
-        monkeypatch.delenv("https_proxy", raising=False)
-        monkeypatch.delenv("all_proxy", raising=False)
-        monkeypatch.delenv("no_proxy", raising=False)
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, request_compression="zstd"
+        )
+        body = {"base64_image": "a" * 32 * 1024}
+        await client.post("/foo", body=body, cast_to=httpx.Response)
 
-        client = DefaultAsyncHttpxClient()
+        request = respx_mock.calls.last.request
+        assert request.headers["Content-Encoding"] == "zstd"
+        assert json.loads(zstandard.ZstdDecompressor().decompress(request.content)) == body
 
-        mounts = tuple(client._mounts.items())
-        assert len(mounts) == 1
-        assert mounts[0][0].pattern == "https://"
+        await client.close()
 
-    @pytest.mark.filterwarnings("ignore:.*deprecated.*:DeprecationWarning")
-    async def test_default_client_creation(self) -> None:
-        # Ensure that the client can be initialized without any exceptions
-        DefaultAsyncHttpxClient(
-            verify=True,
-            cert=None,
-            trust_env=True,
-            http1=True,
-            http2=False,
-            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    async def test_request_compression_falls_back_without_zstandard(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setitem(sys.modules, "zstandard", None)
+
+        client = AsyncChannel3(
+            base_url=base_url, api_key=api_key, _strict_response_validation=True, request_compression="zstd"
         )
+        assert client.request_compression == "gzip"
+
+        await client.close()
+
+    async def test_accept_encoding(self, async_client: AsyncChannel3) -> None:
+        request = async_client._build_request(FinalRequestOptions(method="get", url="/foo"))
+        encodings = [encoding.split(";")[0] for encoding in request.headers["Accept-Encoding"].split(", ")]
+        assert encodings[0] in ("zstd", "br", "gzip")
+        assert "gzip" in encodings
 
     @pytest.mark.respx(base_url=base_url)
     async def test_follow_redirects(self, respx_mock: MockRouter, async_client: AsyncChannel3) -> None:
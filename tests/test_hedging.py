@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import pytest
+
+from channel3_sdk import HedgingPolicy
+from channel3_sdk._endpoints import endpoint_key
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/v1/products/prod_1", "GET /v1/products/*"),
+        ("/v1/categories/womens-shoes/", "GET /v1/categories/*"),
+        ("/v1/brands", "GET /v1/brands"),
+        ("/v1/search", "GET /v1/search"),
+    ],
+)
+def test_endpoint_key(path: str, expected: str) -> None:
+    assert endpoint_key("get", path) == expected
+
+
+def test_percentile_delay() -> None:
+    policy = HedgingPolicy(min_samples=10, percentile=0.9)
+    endpoint = "GET /v1/products/*"
+
+    # not enough samples to know what a slow request looks like yet
+    for latency in range(1, 10):
+        policy.record(endpoint, latency / 100)
+    assert policy.hedge_delay(endpoint) is None
+
+    policy.record(endpoint, 1.0)
+    assert policy.hedge_delay(endpoint) == 0.09
+    assert policy.hedge_delay("GET /v1/brands/*") is None
+
+
+def test_fixed_delay() -> None:
+    policy = HedgingPolicy(delay=0.2)
+    assert policy.hedge_delay("GET /v1/products/*") == 0.2
+
+
+def test_budget() -> None:
+    policy = HedgingPolicy(delay=0, max_ratio=0.5, max_burst=1)
+
+    policy.hedge_delay("GET /v1/products/*")
+    assert not policy.acquire()
+
+    policy.hedge_delay("GET /v1/products/*")
+    assert policy.acquire()
+    assert not policy.acquire()
+
+    # unused budget only accumulates up to `max_burst`
+    for _ in range(10):
+        policy.hedge_delay("GET /v1/products/*")
+    assert policy.acquire()
+    assert not policy.acquire()
+
+    stats = policy.stats()
+    assert stats.requests == 12
+    assert stats.hedged == 2
+    assert stats.skipped == 3
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"delay": -1}, {"percentile": 1}, {"percentile": 0}, {"max_ratio": -0.1}],
+)
+def test_invalid_policy(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ValueError):
+        HedgingPolicy(**kwargs)  # type: ignore[arg-type]
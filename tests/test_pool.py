@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import types
+from typing import Any, List
+
+import httpx
+import pytest
+import httpcore
+
+from channel3_sdk import Channel3, AsyncChannel3
+from channel3_sdk._pool import ADAPTIVE_POOL_WINDOW, PoolMonitor
+
+base_url = "http://127.0.0.1:4010"
+api_key = "My API Key"
+
+RESPONSE = [b"HTTP/1.1 200 OK\r\n", b"Content-Type: application/json\r\n", b"Content-Length: 2\r\n", b"\r\n", b"{}"]
+
+
+def make_fake_pool(*, requests: int, max_connections: int = 10, max_keepalive_connections: int = 2) -> Any:
+    return types.SimpleNamespace(
+        _requests=[object()] * requests,
+        _connections=[],
+        _max_connections=max_connections,
+        _max_keepalive_connections=max_keepalive_connections,
+    )
+
+
+def test_pool_stats() -> None:
+    http_client = httpx.Client()
+    # serve responses from memory while still going through the real httpcore pool
+    http_client._transport._pool = httpcore.ConnectionPool(  # type: ignore[attr-defined]
+        max_connections=5,
+        max_keepalive_connections=3,
+        network_backend=httpcore.MockBackend(RESPONSE),
+    )
+
+    with Channel3(base_url=base_url, api_key=api_key, http_client=http_client) as client:
+        stats = client.pool_stats()
+        assert stats.connections == 0
+        assert stats.requests == 0
+        assert stats.wait_time_mean == 0.0
+
+        client.get("/foo", cast_to=httpx.Response)
+
+        stats = client.pool_stats()
+        assert stats.connections == 1
+        assert stats.idle == 1
+        assert stats.in_use == 0
+        assert stats.pending == 0
+        assert stats.max_connections == 5
+        assert stats.max_keepalive_connections == 3
+        assert stats.requests == 1
+        assert stats.pool_timeouts == 0
+        assert stats.wait_time_max >= 0.0
+
+        # copies re-use the same pool, so they share the measurements
+        assert client.copy().pool_stats().requests == 1
+
+
+def test_pool_stats_custom_transport() -> None:
+    http_client = httpx.Client(transport=httpx.MockTransport(lambda _request: httpx.Response(200, json={})))
+
+    with Channel3(base_url=base_url, api_key=api_key, http_client=http_client) as client:
+        client.get("/foo", cast_to=httpx.Response)
+
+        stats = client.pool_stats()
+        assert stats.connections is None
+        assert stats.pending is None
+        assert stats.requests == 0
+
+
+async def test_async_pool_stats() -> None:
+    http_client = httpx.AsyncClient()
+    http_client._transport._pool = httpcore.AsyncConnectionPool(  # type: ignore[attr-defined]
+        max_connections=5,
+        max_keepalive_connections=3,
+        network_backend=httpcore.AsyncMockBackend(RESPONSE),
+    )
+
+    async with AsyncChannel3(base_url=base_url, api_key=api_key, http_client=http_client) as client:
+        await client.get("/foo", cast_to=httpx.Response)
+
+        stats = client.pool_stats()
+        assert stats.connections == 1
+        assert stats.idle == 1
+        assert stats.requests == 1
+
+
+def test_adaptive_pool_grows_and_shrinks() -> None:
+    pool = make_fake_pool(requests=5)
+    monitor = PoolMonitor(pool)
+    request = httpx.Request("GET", base_url)
+
+    # five requests in flight plus the new one
+    monitor.track(request, adapt=True, is_async=False)
+    assert pool._max_keepalive_connections == 6
+
+    # the limit is kept for at least a full window of lower load
+    pool._requests = []
+    monitor._window_started_at -= ADAPTIVE_POOL_WINDOW
+    monitor.track(httpx.Request("GET", base_url), adapt=True, is_async=False)
+    assert pool._max_keepalive_connections == 6
+
+    # but never shrinks below the configured limit
+    monitor._window_started_at -= ADAPTIVE_POOL_WINDOW
+    monitor.track(httpx.Request("GET", base_url), adapt=True, is_async=False)
+    assert pool._max_keepalive_connections == 2
+
+
+@pytest.mark.parametrize("adapt", [True, False])
+def test_adaptive_pool_limits(adapt: bool) -> None:
+    pool = make_fake_pool(requests=50)
+    monitor = PoolMonitor(pool)
+
+    monitor.track(httpx.Request("GET", base_url), adapt=adapt, is_async=False)
+    assert pool._max_keepalive_connections == (10 if adapt else 2)
+
+
+def test_track_keeps_existing_trace() -> None:
+    events: List[str] = []
+
+    def trace(event_name: str, _info: Any) -> None:
+        events.append(event_name)
+
+    request = httpx.Request("GET", base_url, extensions={"trace": trace})
+
+    monitor = PoolMonitor(make_fake_pool(requests=0))
+    assert monitor.track(request, adapt=False, is_async=False) is None
+    assert request.extensions["trace"] is trace
+
+    monitor.record(None)
+    assert monitor.stats().requests == 0
+
+
+def test_record_pool_timeout() -> None:
+    monitor = PoolMonitor(make_fake_pool(requests=0))
+
+    wait = monitor.track(httpx.Request("GET", base_url), adapt=False, is_async=False)
+    monitor.record(wait, pool_timeout=True)
+
+    # requests that failed without ever being assigned a connection aren't counted
+    monitor.record(monitor.track(httpx.Request("GET", base_url), adapt=False, is_async=False))
+
+    stats = monitor.stats()
+    assert stats.requests == 1
+    assert stats.pool_timeouts == 1
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+from channel3_sdk import PriceHistoryColumns
+from channel3_sdk._price_history import parse_timestamp
+
+
+def _point(price: float, timestamp: str, currency: str = "USD") -> dict[str, object]:
+    return {"currency": currency, "price": price, "timestamp": timestamp}
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2024-01-01T00:00:01.5Z",
+        "2024-01-01T00:00:01.500000+00:00",
+        "2024-01-01T01:00:01.5+01:00",
+        "2024-01-01T00:00:01.5",
+        1_704_067_201.5,
+    ],
+)
+def test_parse_timestamp(value: str | float) -> None:
+    assert parse_timestamp(value) == 1_704_067_201_500_000
+
+
+def test_columns() -> None:
+    columns = PriceHistoryColumns()
+    columns.add("prod_1", {"history": [_point(10, "2024-01-01T00:00:00Z"), _point(8, "2024-01-02T00:00:00Z")]})
+    columns.add("prod_2", {"history": None})
+    columns.add("prod_3", {"history": [_point(5, "2024-01-01T00:00:00Z", "EUR")]})
+
+    assert len(columns) == 3
+    assert columns.product_ids == ["prod_1", "prod_2", "prod_3"]
+    assert list(columns.product_index) == [0, 0, 2]
+    assert list(columns.offsets) == [0, 2, 2, 3]
+    assert list(columns.currency_codes) == [0, 0, 1]
+    assert columns.currencies == ["USD", "EUR"]
+    assert columns.rows("prod_3") == slice(2, 3)
+    assert "prod_2" in columns
+    assert columns.statistics == {}
+
+    with pytest.raises(ValueError):
+        columns.add("prod_1", {"history": []})
+
+    # a malformed point doesn't add any of the product's points
+    with pytest.raises(KeyError):
+        columns.add("prod_4", {"history": [_point(1, "2024-01-01T00:00:00Z"), {"price": 2}]})
+    assert len(columns) == 3
+    assert "prod_4" not in columns
+
+
+def test_to_numpy() -> None:
+    np = pytest.importorskip("numpy")
+
+    columns = PriceHistoryColumns()
+    columns.add("prod_1", {"history": [_point(10, "2024-01-01T00:00:00Z"), _point(8, "2024-01-02T00:00:00Z")]})
+
+    arrays = columns.to_numpy()
+    assert arrays.prices.dtype == np.float64
+    assert arrays.timestamps.dtype == np.int64
+    assert arrays.prices.tolist() == [10.0, 8.0]
+    assert arrays.timestamps.view("datetime64[us]")[0] == np.datetime64("2024-01-01T00:00:00")
+    assert arrays.offsets.tolist() == [0, 2]
+
+    # the arrays share memory with the columns
+    columns.prices[0] = 11
+    assert arrays.prices[0] == 11
+    with pytest.raises(BufferError):
+        columns.add("prod_2", {"history": [_point(1, "2024-01-01T00:00:00Z")]})
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import pytest
+
+from channel3_sdk import RateLimiter
+
+
+def test_unlimited_until_rate_limited() -> None:
+    limiter = RateLimiter()
+
+    for _ in range(10):
+        assert limiter.acquire() == 0
+
+    assert limiter.stats().rate is None
+
+
+def test_paces_requests() -> None:
+    limiter = RateLimiter(rate=10)
+
+    assert limiter.acquire() == 0
+    # requests are spread out evenly rather than sent in bursts
+    assert abs(limiter.acquire() - 0.1) < 0.01
+    assert abs(limiter.acquire() - 0.2) < 0.01
+
+    stats = limiter.stats()
+    assert stats.delayed == 2
+    assert abs(stats.delay_total - 0.3) < 0.02
+
+
+def test_burst() -> None:
+    limiter = RateLimiter(rate=10, burst=3)
+
+    assert [limiter.acquire() for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire() > 0
+
+
+def test_backs_off_from_observed_rate() -> None:
+    limiter = RateLimiter(min_rate=0.1)
+    for _ in range(40):
+        limiter.acquire()
+
+    limiter.on_rate_limited()
+    # 40 requests in well under a second, halved
+    assert limiter.stats().rate == 20
+
+    # a burst of rejections only backs off once
+    limiter.on_rate_limited()
+    assert limiter.stats().rate == 20
+    assert limiter.stats().rate_limited == 2
+
+
+def test_retry_after_pauses_all_requests() -> None:
+    limiter = RateLimiter(rate=1000)
+
+    limiter.on_rate_limited(retry_after=2)
+    assert abs(limiter.acquire() - 2) < 0.01
+    # the next request is still paced after the pause ends
+    assert abs(limiter.acquire() - (2 + 1 / 500)) < 0.01
+
+
+def test_recovers() -> None:
+    limiter = RateLimiter(rate=100, max_rate=100, recovery=0.5, forget_after=60)
+
+    limiter.on_rate_limited()
+    assert limiter.stats().rate == 50
+
+    limiter._adjusted_at -= 1
+    limiter.acquire()
+    rate = limiter.stats().rate
+    assert rate is not None
+    assert abs(rate - 75) < 1
+
+    # without further rate limiting the limiter goes back to the configured maximum
+    assert limiter._rate_limited_at is not None
+    limiter._rate_limited_at -= 60
+    limiter.acquire()
+    assert limiter.stats().rate == 100
+
+
+def test_recovers_to_configured_rate() -> None:
+    # a `rate` on its own is a client-side cap that the limiter goes back to, rather than becoming unlimited
+    limiter = RateLimiter(rate=10, recovery=0.5, forget_after=60)
+
+    limiter.on_rate_limited()
+    assert limiter.stats().rate == 5
+
+    limiter._adjusted_at -= 10
+    limiter.acquire()
+    assert limiter.stats().rate == 10
+
+    assert limiter._rate_limited_at is not None
+    limiter._rate_limited_at -= 60
+    limiter.acquire()
+    assert limiter.stats().rate == 10
+
+
+@pytest.mark.parametrize("kwargs", [{"rate": 0}, {"burst": 0}, {"backoff": 1}])
+def test_invalid_limiter(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ValueError):
+        RateLimiter(**kwargs)  # type: ignore[arg-type]
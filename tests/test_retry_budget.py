@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from channel3_sdk import RetryBudget
+
+
+def test_min_retries() -> None:
+    budget = RetryBudget(ratio=0, min_retries=2)
+
+    assert budget.acquire()
+    assert budget.acquire()
+    assert not budget.acquire()
+
+    stats = budget.stats()
+    assert stats.retries == 2
+    assert stats.exhausted == 1
+
+
+def test_ratio() -> None:
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    assert budget.acquire()
+
+    budget.record_request()
+    assert not budget.acquire()
+
+    budget.record_request()
+    assert budget.acquire()
+    assert not budget.acquire()
+
+
+def test_capped_at_min_retries() -> None:
+    budget = RetryBudget(ratio=1, min_retries=2)
+
+    # unused budget doesn't accumulate beyond `min_retries`
+    for _ in range(10):
+        budget.record_request()
+
+    assert [budget.acquire() for _ in range(3)] == [True, True, False]
+    assert budget.stats().requests == 10
+
+
+@pytest.mark.parametrize("kwargs", [{"ratio": -1}, {"min_retries": -1}])
+def test_invalid_budget(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ValueError):
+        RetryBudget(**kwargs)
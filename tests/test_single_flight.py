@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from channel3_sdk import SingleFlight
+
+
+def test_sequential_calls_are_not_coalesced() -> None:
+    single_flight = SingleFlight()
+
+    assert single_flight.do("key", lambda: 1) == 1
+    assert single_flight.do("key", lambda: 2) == 2
+    assert single_flight.stats().coalesced == 0
+
+
+def test_errors_are_shared() -> None:
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls: list[int] = []
+
+    def fail() -> object:
+        calls.append(1)
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(single_flight.do, "key", fail) for _ in range(2)]
+        while single_flight.stats().coalesced < 1:
+            time.sleep(0.01)
+        release.set()
+
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+    assert len(calls) == 1
+
+
+async def test_waiter_takes_over_from_a_cancelled_leader() -> None:
+    single_flight = SingleFlight()
+    calls: list[int] = []
+
+    async def slow() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return len(calls)
+
+    leader = asyncio.ensure_future(single_flight.ado("key", slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(single_flight.ado("key", slow))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    assert await waiter == 2
+    assert single_flight.stats().coalesced == 1